@@ -0,0 +1,28 @@
+include(external_tools)
+if(NOT TARGET gtest)
+    add_subdirectory(${CMAKE_CURRENT_SOURCE_DIR}/deps/googletest)
+endif()
+set(BENCHMARKS_OUT_DIR ${CMAKE_BINARY_DIR}/df_benchmarks/)
+set(BENCHMARKS_OUT_DIR_BINARY ${BENCHMARKS_OUT_DIR}/${CMAKE_BUILD_TYPE})
+
+# ------------------------------------------------------------------------------
+# c++
+# ------------------------------------------------------------------------------
+# add new benchmark suites .cc here, they are run manually and not with ctest
+set(CPP_BENCHMARKS df_benchmarks)
+add_executable(${CPP_BENCHMARKS}
+    tests/benchmarks/DFPointCloudBenchmark.cc
+    tests/benchmarks/DFRegistrationBenchmark.cc
+    tests/benchmarks/DFSegmentationBenchmark.cc
+    tests/allCppTests.cc
+    )
+set_target_properties(${CPP_BENCHMARKS} PROPERTIES
+    RUNTIME_OUTPUT_DIRECTORY ${BENCHMARKS_OUT_DIR}
+    )
+target_link_libraries(${CPP_BENCHMARKS} gtest gtest_main)
+target_link_libraries(${CPP_BENCHMARKS} ${SHARED_LIB_NAME})
+if(WIN32)
+    target_link_libraries(${CPP_BENCHMARKS} psapi)
+endif()
+
+copy_dlls(${BENCHMARKS_OUT_DIR_BINARY} ${CPP_BENCHMARKS})
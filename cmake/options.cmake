@@ -10,4 +10,7 @@ option(BUILD_PYTHON_MODULE "Build the python bindings" ON)
 
 # Build/Run tests
 option(BUILD_TESTS "Build test suites" ON)
-option(RUN_TESTS "Run test suites" ON)
\ No newline at end of file
+option(RUN_TESTS "Run test suites" ON)
+
+# Build the benchmarks (not run with the tests)
+option(BUILD_BENCHMARKS "Build benchmark suites" OFF)
\ No newline at end of file
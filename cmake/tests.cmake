@@ -12,6 +12,8 @@ set(TEST_OUT_DIR_BINARY ${TESTS_OUT_DIR}/${CMAKE_BUILD_TYPE})
 set(CPP_UNIT_TESTS df_unit_tests)
 add_executable(${CPP_UNIT_TESTS}
     tests/unit_tests/DFPointCloudTest.cc
+    tests/unit_tests/DFPointCloudStreamReaderTest.cc
+    tests/unit_tests/DFSegmentationTest.cc
     tests/unit_tests/DFLog.cc
     tests/allCppTests.cc
     )
@@ -13,9 +13,13 @@ const diffCheck::Log LOG = diffCheck::Log();
 
 #include "diffCheck/geometry/DFPointCloud.hh"
 #include "diffCheck/geometry/DFMesh.hh"
+#include "diffCheck/geometry/DFMeshDistanceQuery.hh"
+#include "diffCheck/geometry/DFPointCloudStreamReader.hh"
 #include "diffCheck/IOManager.hh"
 #include "diffCheck/visualizer.hh"
 #include "diffCheck/transformation/DFTransformation.hh"
+#include "diffCheck/registrations/DFRegistrationResult.hh"
+#include "diffCheck/registrations/DFFeatureCache.hh"
 #include "diffCheck/registrations/DFGlobalRegistrations.hh"
 #include "diffCheck/registrations/DFRefinedRegistration.hh"
 #include "diffCheck/segmentation/DFSegmentation.hh"
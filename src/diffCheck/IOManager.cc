@@ -4,18 +4,193 @@
 
 #include "diffCheck/log.hh"
 
+#include <algorithm>
+#include <array>
+#include <cctype>
+#include <cmath>
+#include <cstdint>
 #include <cstdlib>
+#include <cstring>
 #include <filesystem>
 #include <iostream>
 #include <fstream>
 
 namespace diffCheck::io
 {
+    namespace
+    {
+        enum class PLYType { UInt8, Int32, Float32, Float64, TriangleList };
+
+        /**
+         * @brief Property of a binary PLY element, read from a strided buffer of doubles or ints. The UInt8
+         * properties are colors in [0, 1] written in [0, 255], the TriangleList property writes 3 indices.
+         */
+        struct PLYColumn
+        {
+            std::string Name;
+            PLYType Type;
+            const double* DoubleData = nullptr;
+            const int* IntData = nullptr;
+            int Stride = 1;
+        };
+
+        int GetPLYTypeSize(PLYType type)
+        {
+            switch (type)
+            {
+                case PLYType::UInt8: return 1;
+                case PLYType::Int32: return 4;
+                case PLYType::Float32: return 4;
+                case PLYType::Float64: return 8;
+                case PLYType::TriangleList: return 1 + 3 * 4;
+            }
+            return 0;
+        }
+
+        std::string GetPLYPropertyDeclaration(const PLYColumn &column)
+        {
+            switch (column.Type)
+            {
+                case PLYType::UInt8: return "property uchar " + column.Name;
+                case PLYType::Int32: return "property int " + column.Name;
+                case PLYType::Float32: return "property float " + column.Name;
+                case PLYType::Float64: return "property double " + column.Name;
+                case PLYType::TriangleList: return "property list uchar int " + column.Name;
+            }
+            return "";
+        }
+
+        /// @brief Add the 3 columns of a vector of Eigen::Vector3d, read in place from its buffer
+        void AddVectorColumns(
+            std::vector<PLYColumn> &columns,
+            const std::vector<Eigen::Vector3d> &vec,
+            const std::array<std::string, 3> &names,
+            PLYType type)
+        {
+            for (int k = 0; k < 3; k++)
+                columns.push_back({names[k], type, reinterpret_cast<const double*>(vec.data()) + k, nullptr, 3});
+        }
+
+        /// @brief Check that a per-vertex field can be written with the columns already declared
+        void CheckPLYField(const std::vector<PLYColumn> &columns, const std::string &name, std::size_t size, std::size_t numVertices)
+        {
+            if (name.empty() || std::any_of(name.begin(), name.end(), [](unsigned char c) { return std::isspace(c); }))
+                throw std::invalid_argument("The name of a PLY field cannot be empty or contain spaces: '" + name + "'.");
+            if (std::any_of(columns.begin(), columns.end(), [&name](const PLYColumn &column) { return column.Name == name; }))
+                throw std::invalid_argument("The PLY field '" + name + "' is declared twice.");
+            if (size != numVertices)
+                throw std::invalid_argument("The PLY field '" + name + "' must have one value per vertex.");
+        }
+
+        /// @brief Write the declaration of an element in the header
+        void WritePLYElementHeader(std::ostream &stream, const std::string &name, std::size_t numElements, const std::vector<PLYColumn> &columns)
+        {
+            stream << "element " << name << " " << numElements << "\n";
+            for (const PLYColumn &column : columns)
+                stream << GetPLYPropertyDeclaration(column) << "\n";
+        }
+
+        /**
+         * @brief Write the body of a binary element. The elements are serialized in parallel by chunks, each chunk
+         * being written with a single call. The values are copied as they are, the supported platforms being
+         * little-endian.
+         */
+        void WritePLYElement(std::ostream &stream, std::size_t numElements, const std::vector<PLYColumn> &columns)
+        {
+            std::vector<int> offsets;
+            int elementSize = 0;
+            for (const PLYColumn &column : columns)
+            {
+                offsets.push_back(elementSize);
+                elementSize += GetPLYTypeSize(column.Type);
+            }
+
+            constexpr std::size_t chunkSize = 1 << 18;
+            std::vector<char> buffer(std::min(numElements, chunkSize) * elementSize);
+            for (std::size_t begin = 0; begin < numElements; begin += chunkSize)
+            {
+                std::int64_t numChunkElements = static_cast<std::int64_t>(std::min(chunkSize, numElements - begin));
+                #pragma omp parallel for
+                for (std::int64_t i = 0; i < numChunkElements; i++)
+                {
+                    char* element = buffer.data() + i * elementSize;
+                    std::size_t source = begin + static_cast<std::size_t>(i);
+                    for (std::size_t c = 0; c < columns.size(); c++)
+                    {
+                        const PLYColumn &column = columns[c];
+                        char* destination = element + offsets[c];
+                        switch (column.Type)
+                        {
+                            case PLYType::UInt8:
+                            {
+                                double value = std::round(column.DoubleData[source * column.Stride] * 255.0);
+                                std::uint8_t color = static_cast<std::uint8_t>(std::clamp(value, 0.0, 255.0));
+                                std::memcpy(destination, &color, 1);
+                                break;
+                            }
+                            case PLYType::Int32:
+                                std::memcpy(destination, column.IntData + source * column.Stride, 4);
+                                break;
+                            case PLYType::Float32:
+                            {
+                                float value = static_cast<float>(column.DoubleData[source * column.Stride]);
+                                std::memcpy(destination, &value, 4);
+                                break;
+                            }
+                            case PLYType::Float64:
+                                std::memcpy(destination, column.DoubleData + source * column.Stride, 8);
+                                break;
+                            case PLYType::TriangleList:
+                                *destination = 3;
+                                std::memcpy(destination + 1, column.IntData + source * column.Stride, 3 * 4);
+                                break;
+                        }
+                    }
+                }
+                stream.write(buffer.data(), numChunkElements * elementSize);
+            }
+        }
+
+        /// @brief Add the columns of the vertices of a cloud or a mesh
+        std::vector<PLYColumn> GetPLYVertexColumns(
+            const std::vector<Eigen::Vector3d> &points,
+            const std::vector<Eigen::Vector3d> &normals,
+            const std::vector<Eigen::Vector3d> &colors,
+            bool isDoublePrecision)
+        {
+            PLYType floatType = isDoublePrecision ? PLYType::Float64 : PLYType::Float32;
+            std::vector<PLYColumn> columns;
+            AddVectorColumns(columns, points, {"x", "y", "z"}, floatType);
+            if (!normals.empty())
+            {
+                if (normals.size() != points.size())
+                    throw std::invalid_argument("The normals must have one value per vertex.");
+                AddVectorColumns(columns, normals, {"nx", "ny", "nz"}, floatType);
+            }
+            if (!colors.empty())
+            {
+                if (colors.size() != points.size())
+                    throw std::invalid_argument("The colors must have one value per vertex.");
+                AddVectorColumns(columns, colors, {"red", "green", "blue"}, PLYType::UInt8);
+            }
+            return columns;
+        }
+
+        std::ofstream OpenPLYStream(const std::string &filename)
+        {
+            std::ofstream stream(filename, std::ios::binary | std::ios::trunc);
+            if (!stream.is_open())
+                throw std::invalid_argument("The PLY file cannot be written: " + filename);
+            stream << "ply\nformat binary_little_endian 1.0\ncomment written by diffCheck\n";
+            return stream;
+        }
+    }
+
     std::shared_ptr<diffCheck::geometry::DFPointCloud> ReadPLYPointCloud(const std::string &filename)
     {
         std::shared_ptr<open3d::geometry::PointCloud> open3dPointCloud = open3d::io::CreatePointCloudFromFile(filename);
         std::shared_ptr<diffCheck::geometry::DFPointCloud> pointCloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
-        pointCloud->Cvt2DFPointCloud(open3dPointCloud);
+        pointCloud->MoveFromO3DPointCloud(*open3dPointCloud);
         return pointCloud;
     }
 
@@ -28,6 +203,48 @@ namespace diffCheck::io
         return mesh;
     }
 
+    void WritePLYPointCloud(
+        const diffCheck::geometry::DFPointCloud &cloud,
+        const std::string &filename,
+        const std::map<std::string, std::vector<double>> &scalarFields,
+        const std::map<std::string, std::vector<int>> &labelFields,
+        bool isDoublePrecision)
+    {
+        std::vector<PLYColumn> columns = GetPLYVertexColumns(cloud.Points, cloud.Normals, cloud.Colors, isDoublePrecision);
+        for (const auto &[name, values] : scalarFields)
+        {
+            CheckPLYField(columns, name, values.size(), cloud.Points.size());
+            columns.push_back({name, isDoublePrecision ? PLYType::Float64 : PLYType::Float32, values.data(), nullptr, 1});
+        }
+        for (const auto &[name, values] : labelFields)
+        {
+            CheckPLYField(columns, name, values.size(), cloud.Points.size());
+            columns.push_back({name, PLYType::Int32, nullptr, values.data(), 1});
+        }
+
+        std::ofstream stream = OpenPLYStream(filename);
+        WritePLYElementHeader(stream, "vertex", cloud.Points.size(), columns);
+        stream << "end_header\n";
+        WritePLYElement(stream, cloud.Points.size(), columns);
+        if (!stream)
+            throw std::runtime_error("Failed to write the PLY file: " + filename);
+    }
+
+    void WritePLYMesh(const diffCheck::geometry::DFMesh &mesh, const std::string &filename, bool isDoublePrecision)
+    {
+        std::vector<PLYColumn> vertexColumns = GetPLYVertexColumns(mesh.Vertices, mesh.NormalsVertex, mesh.ColorsVertex, isDoublePrecision);
+        std::vector<PLYColumn> faceColumns = {{"vertex_indices", PLYType::TriangleList, nullptr, reinterpret_cast<const int*>(mesh.Faces.data()), 3}};
+
+        std::ofstream stream = OpenPLYStream(filename);
+        WritePLYElementHeader(stream, "vertex", mesh.Vertices.size(), vertexColumns);
+        WritePLYElementHeader(stream, "face", mesh.Faces.size(), faceColumns);
+        stream << "end_header\n";
+        WritePLYElement(stream, mesh.Vertices.size(), vertexColumns);
+        WritePLYElement(stream, mesh.Faces.size(), faceColumns);
+        if (!stream)
+            throw std::runtime_error("Failed to write the PLY file: " + filename);
+    }
+
     std::string GetTestDataDir()
     {
         // for github action conviniency
@@ -59,4 +276,11 @@ namespace diffCheck::io
         std::filesystem::path pathCloud = pathTestData / "test_pc_for_SOR_101pts_with_1_outlier.ply";
         return pathCloud.string();
     }
+
+    std::string GetBunnyPlyPath()
+    {
+        std::filesystem::path pathTestData = GetTestDataDir();
+        std::filesystem::path pathCloud = pathTestData / "stanford_bunny_50kpts_with_normals.ply";
+        return pathCloud.string();
+    }
 } // namespace diffCheck::io
\ No newline at end of file
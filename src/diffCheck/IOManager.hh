@@ -1,5 +1,6 @@
 #pragma once
 
+#include <map>
 #include <string>
 #include <filesystem>
 
@@ -25,6 +26,32 @@ namespace diffCheck::io
      */
     std::shared_ptr<diffCheck::geometry::DFMesh> ReadPLYMeshFromFile(const std::string &filename);
 
+    /**
+     * @brief Write a point cloud in a binary little-endian PLY file. The vertices are serialized in parallel by
+     * chunks into a buffer written in one go per chunk.
+     * 
+     * @param cloud the point cloud
+     * @param filename the path to the file with the extension
+     * @param scalarFields per-point scalar fields (e.g. distances) written as float (or double) properties
+     * @param labelFields per-point integer fields (e.g. cluster ids) written as int properties
+     * @param isDoublePrecision if true, the points, normals and scalar fields are written as double instead of float
+     */
+    void WritePLYPointCloud(
+        const diffCheck::geometry::DFPointCloud &cloud,
+        const std::string &filename,
+        const std::map<std::string, std::vector<double>> &scalarFields = {},
+        const std::map<std::string, std::vector<int>> &labelFields = {},
+        bool isDoublePrecision = false);
+
+    /**
+     * @brief Write a mesh in a binary little-endian PLY file, with its vertex normals and colors if any
+     * 
+     * @param mesh the mesh
+     * @param filename the path to the file with the extension
+     * @param isDoublePrecision if true, the vertices and normals are written as double instead of float
+     */
+    void WritePLYMesh(const diffCheck::geometry::DFMesh &mesh, const std::string &filename, bool isDoublePrecision = false);
+
 
     //////////////////////////////////////////////////////////////////////////
     // IO for test suite and tests data
@@ -35,4 +62,6 @@ namespace diffCheck::io
     std::string GetRoofQuarterPlyPath();
     /// @brief Get the path to the plane point cloud with one outlier
     std::string GetPlanePCWithOneOutliers();
+    /// @brief Get the path to the stanford bunny ply test file
+    std::string GetBunnyPlyPath();
 } // namespace diffCheck::io
\ No newline at end of file
@@ -1,8 +1,10 @@
 #include "diffCheck/geometry/DFMesh.hh"
 #include "diffCheck/IOManager.hh"
+#include "diffCheck/hash.hh"
 
 #include <open3d/t/geometry/RaycastingScene.h>
 
+#include <algorithm>
 
 namespace diffCheck::geometry
 {
@@ -57,20 +59,44 @@ namespace diffCheck::geometry
         return O3DTriangleMesh;
     }
 
+    open3d::core::Tensor DFMesh::CvtVectors2Tensor(const std::vector<Eigen::Vector3d> &vectors)
+    {
+        std::vector<float> values(vectors.size() * 3);
+        for (size_t i = 0; i < vectors.size(); i++)
+        {
+            values[3 * i] = static_cast<float>(vectors[i].x());
+            values[3 * i + 1] = static_cast<float>(vectors[i].y());
+            values[3 * i + 2] = static_cast<float>(vectors[i].z());
+        }
+        return open3d::core::Tensor(values, {static_cast<int64_t>(vectors.size()), 3}, open3d::core::Dtype::Float32);
+    }
+
     std::shared_ptr<diffCheck::geometry::DFPointCloud> DFMesh::SampleCloudUniform(int numPoints)
     {
         auto O3DTriangleMesh = this->Cvt2O3DTriangleMesh();
         auto O3DPointCloud = O3DTriangleMesh->SamplePointsUniformly(numPoints);
         std::shared_ptr<geometry::DFPointCloud> DFPointCloud = std::make_shared<geometry::DFPointCloud>();
-        DFPointCloud->Cvt2DFPointCloud(O3DPointCloud);
+        DFPointCloud->MoveFromO3DPointCloud(*O3DPointCloud);
         return DFPointCloud;
     }
 
     void DFMesh::ApplyTransformation(const diffCheck::transformation::DFTransformation &transformation)
     {
-        auto O3DTriangleMesh = this->Cvt2O3DTriangleMesh();
-        O3DTriangleMesh->Transform(transformation.TransformationMatrix);
-        this->Cvt2DFMesh(O3DTriangleMesh);
+        // the cached raycasting scene and triangle frames are rebuilt from the hash of the new vertices
+        transformation.TransformPoints(this->Vertices);
+        transformation.TransformNormals(this->NormalsVertex);
+        transformation.TransformNormals(this->NormalsFace);
+    }
+
+    void DFMesh::ApplyTransformationBatch(
+        const std::vector<std::shared_ptr<DFMesh>> &meshes,
+        const std::vector<diffCheck::transformation::DFTransformation> &transformations)
+    {
+        if (transformations.size() != 1 && transformations.size() != meshes.size())
+            throw std::invalid_argument("The transformations must be given once for all the meshes or once per mesh.");
+
+        for (std::size_t i = 0; i < meshes.size(); i++)
+            meshes[i]->ApplyTransformation(transformations[transformations.size() == 1 ? 0 : i]);
     }
 
     std::vector<Eigen::Vector3d> DFMesh::GetTightBoundingBox()
@@ -98,47 +124,50 @@ namespace diffCheck::geometry
     }
 
     bool DFMesh::IsPointOnFace(Eigen::Vector3d point, double associationThreshold)
+    {
+        // hashing the geometry to find the cached frames would cost as much as computing them for a single point
+        return DFMesh::IsPointOnTriangleFrames(this->BuildTriangleFrames(), point, associationThreshold);
+    }
+
+    std::vector<bool> DFMesh::ArePointsOnFace(const std::vector<Eigen::Vector3d> &points, double associationThreshold)
+    {
+        std::shared_ptr<const TriangleFramesCache> triangleFrames = this->GetTriangleFrames(this->ComputeGeometryHash());
+        const std::vector<TriangleFrame> &frames = triangleFrames->Frames;
+
+        // std::vector<bool> packs its flags in bits and cannot be written from several threads
+        std::vector<char> isOnFace(points.size(), 0);
+        int numPoints = static_cast<int>(points.size());
+        #pragma omp parallel for
+        for (int i = 0; i < numPoints; i++)
+        {
+            isOnFace[i] = DFMesh::IsPointOnTriangleFrames(frames, points[i], associationThreshold);
+        }
+        return std::vector<bool>(isOnFace.begin(), isOnFace.end());
+    }
+
+    bool DFMesh::IsPointOnTriangleFrames(const std::vector<TriangleFrame> &frames, const Eigen::Vector3d &point, double associationThreshold)
     {
         /*
         To check if the point is in the face, we take into account all the triangles forming the face.
-        We calculate the area of each triangle, then check if the sum of the areas of the tree triangles 
-        formed by two of the points of the referencr triangle and our point is equal to the reference triangle area 
-        (within a user-defined margin). If it is the case, the triangle is in the face.
+        We project the point on the plane of each triangle and express it in the (u,v) isoparametric mapping of the triangle,
+        where (u,v) = (1,0) if the projected point is v2, (u,v) = (0,1) if it is v1 and (u,v) = (0,0) if it is v0.
+        The point is on the triangle if (u,v) is inside the triangle (within a user-defined margin) and if the point is close enough to the plane.
         */
-        std::vector<Eigen::Vector3i> faceTriangles = this->Faces;
-        for (Eigen::Vector3i triangle : faceTriangles)
-        {
-            Eigen::Vector3d v0 = this->Vertices[triangle[0]];
-            Eigen::Vector3d v1 = this->Vertices[triangle[1]];
-            Eigen::Vector3d v2 = this->Vertices[triangle[2]];
-            Eigen::Vector3d n = (v1 - v0).cross(v2 - v0);
-            n.normalize();
-
-            // Project the point onto the plane of the triangle
-            Eigen::Vector3d projectedPoint = point - n * (n.dot(point - v0));
-
-            // Compute vectors
-            Eigen::Vector3d v0v1 = v1 - v0;
-            Eigen::Vector3d v0v2 = v2 - v0;
-            Eigen::Vector3d v0p = projectedPoint - v0;
-
-            // Compute dot products
-            double dot00 = v0v2.dot(v0v2);
-            double dot01 = v0v2.dot(v0v1);
-            double dot02 = v0v2.dot(v0p);
-            double dot11 = v0v1.dot(v0v1);
-            double dot12 = v0v1.dot(v0p);
-
-            // create u,v isoparametric mapping to the triangle where (u,v) = (1,0) if projectedPoint = v2, (u,v) = (0,1) if projectedPoint = v1 and (u,v) = (0,0) if projectedPoint = v0
-            double invDenom = 1.0 / (dot00 * dot11 - dot01 * dot01);
-            double u = (dot11 * dot02 - dot01 * dot12) * invDenom;
-            double v = (dot00 * dot12 - dot01 * dot02) * invDenom;
-
-            // Check if point is in triangle
+        for (const TriangleFrame &frame : frames)
+        {
+            double signedDistance = frame.Normal.dot(point - frame.Origin);
+            Eigen::Vector3d projectedPoint = point - frame.Normal * signedDistance;
+            Eigen::Vector3d v0p = projectedPoint - frame.Origin;
+
+            double dot02 = frame.Edge02.dot(v0p);
+            double dot12 = frame.Edge01.dot(v0p);
+            double u = (frame.Dot11 * dot02 - frame.Dot01 * dot12) * frame.InvDenom;
+            double v = (frame.Dot00 * dot12 - frame.Dot01 * dot02) * frame.InvDenom;
+
             if ((u >= -associationThreshold / 100) && (v >= -associationThreshold / 100) && (u + v <= 1 + associationThreshold / 100))
             {
                 // Check if the point is close enough to the face
-                double maxProjectionDistance = associationThreshold * std::min({(v1 - v0).norm(), (v2 - v1).norm(), (v0 - v2).norm()}) ;
+                double maxProjectionDistance = associationThreshold * frame.MinEdgeLength;
                 if ((projectedPoint - point).norm() < maxProjectionDistance)
                 {
                     return true;
@@ -148,6 +177,55 @@ namespace diffCheck::geometry
         return false;
     }
 
+    std::size_t DFMesh::ComputeGeometryHash() const
+    {
+        std::size_t numVertices = this->Vertices.size();
+        std::size_t numFaces = this->Faces.size();
+        std::uint64_t hash = diffCheck::FNV1A_OFFSET_BASIS;
+        hash = diffCheck::HashWords(hash, &numVertices, sizeof(numVertices));
+        hash = diffCheck::HashWords(hash, &numFaces, sizeof(numFaces));
+        hash = diffCheck::HashWords(hash, this->Vertices.data(), numVertices * sizeof(Eigen::Vector3d));
+        hash = diffCheck::HashWords(hash, this->Faces.data(), numFaces * sizeof(Eigen::Vector3i));
+        return static_cast<std::size_t>(hash);
+    }
+
+    std::vector<DFMesh::TriangleFrame> DFMesh::BuildTriangleFrames() const
+    {
+        std::vector<TriangleFrame> frames(this->Faces.size());
+        for (size_t i = 0; i < this->Faces.size(); i++)
+        {
+            const Eigen::Vector3i &triangle = this->Faces[i];
+            const Eigen::Vector3d &v0 = this->Vertices[triangle[0]];
+            const Eigen::Vector3d &v1 = this->Vertices[triangle[1]];
+            const Eigen::Vector3d &v2 = this->Vertices[triangle[2]];
+
+            TriangleFrame &frame = frames[i];
+            frame.Origin = v0;
+            frame.Edge01 = v1 - v0;
+            frame.Edge02 = v2 - v0;
+            frame.Normal = frame.Edge01.cross(frame.Edge02).normalized();
+            frame.Dot00 = frame.Edge02.dot(frame.Edge02);
+            frame.Dot01 = frame.Edge02.dot(frame.Edge01);
+            frame.Dot11 = frame.Edge01.dot(frame.Edge01);
+            frame.InvDenom = 1.0 / (frame.Dot00 * frame.Dot11 - frame.Dot01 * frame.Dot01);
+            frame.MinEdgeLength = std::min({(v1 - v0).norm(), (v2 - v1).norm(), (v0 - v2).norm()});
+        }
+        return frames;
+    }
+
+    std::shared_ptr<const DFMesh::TriangleFramesCache> DFMesh::GetTriangleFrames(std::size_t geometryHash)
+    {
+        std::shared_ptr<const TriangleFramesCache> cache = std::atomic_load(&this->m_TriangleFramesCache);
+        if (cache != nullptr && cache->GeometryHash == geometryHash)
+            return cache;
+
+        std::shared_ptr<TriangleFramesCache> newCache = std::make_shared<TriangleFramesCache>();
+        newCache->Frames = this->BuildTriangleFrames();
+        newCache->GeometryHash = geometryHash;
+        std::atomic_store(&this->m_TriangleFramesCache, std::shared_ptr<const TriangleFramesCache>(newCache));
+        return newCache;
+    }
+
     std::tuple<Eigen::Vector3d, Eigen::Vector3d> DFMesh::ComputeOBBCenterAndAxis()
     {
         Eigen::Vector3d center = Eigen::Vector3d::Zero();
@@ -184,38 +262,152 @@ namespace diffCheck::geometry
         this->ColorsFace = tempMesh_ptr->ColorsFace;
     }
 
+    void DFMesh::SaveToPLY(const std::string &path, bool isDoublePrecision) const
+    {
+        diffCheck::io::WritePLYMesh(*this, path, isDoublePrecision);
+    }
+
     std::vector<float> DFMesh::ComputeDistance(const diffCheck::geometry::DFPointCloud &targetCloud, bool useAbs)
     {
-        auto rayCastingScene = open3d::t::geometry::RaycastingScene();
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> rayCastingScene = this->GetRaycastingScene();
 
-        std::vector<Eigen::Vector3d> vertices = this->Vertices;
-        std::vector<float> verticesPosition;
-        for (const auto& vertex : vertices) {
-            verticesPosition.insert(verticesPosition.end(), vertex.data(), vertex.data() + 3);
+        open3d::core::Tensor sdf = rayCastingScene->ComputeSignedDistance(DFMesh::CvtVectors2Tensor(targetCloud.Points));
+        if (useAbs)
+            sdf = sdf.Abs();
+        std::vector<float> sdfVector(sdf.GetDataPtr<float>(), sdf.GetDataPtr<float>() + sdf.NumElements());
+
+        return sdfVector;
+    }
+
+    DFMeshClosestPoints DFMesh::ComputeClosestPoints(const std::vector<Eigen::Vector3d> &points, bool isSigned)
+    {
+        DFMeshClosestPoints result;
+        if (points.empty())
+            return result;
+        if (this->Faces.empty())
+            throw std::invalid_argument("The mesh has no faces.");
+
+        // the geometry is hashed once for the whole batch, to look up both caches
+        std::size_t geometryHash = this->ComputeGeometryHash();
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> rayCastingScene = this->GetRaycastingScene(geometryHash);
+        std::shared_ptr<const TriangleFramesCache> triangleFrames = this->GetTriangleFrames(geometryHash);
+        return this->ComputeClosestPoints(points, isSigned, rayCastingScene, triangleFrames->Frames);
+    }
+
+    DFMeshClosestPoints DFMesh::ComputeClosestPoints(
+        const std::vector<Eigen::Vector3d> &points,
+        bool isSigned,
+        const std::shared_ptr<open3d::t::geometry::RaycastingScene> &scene,
+        const std::vector<TriangleFrame> &frames) const
+    {
+        DFMeshClosestPoints result;
+        if (points.empty())
+            return result;
+
+        std::unordered_map<std::string, open3d::core::Tensor> closest = scene->ComputeClosestPoints(DFMesh::CvtVectors2Tensor(points));
+        const float *closestPoints = closest.at("points").GetDataPtr<float>();
+        const uint32_t *triangleIds = closest.at("primitive_ids").GetDataPtr<uint32_t>();
+        bool hasVertexNormals = this->NormalsVertex.size() == this->Vertices.size();
+
+        int numPoints = static_cast<int>(points.size());
+        result.Distances.resize(numPoints);
+        result.ClosestPoints.resize(numPoints);
+        result.TriangleIds.resize(numPoints);
+        result.Normals.resize(numPoints);
+        #pragma omp parallel for
+        for (int i = 0; i < numPoints; i++)
+        {
+            Eigen::Vector3d closestPoint(closestPoints[3 * i], closestPoints[3 * i + 1], closestPoints[3 * i + 2]);
+            const TriangleFrame &frame = frames[triangleIds[i]];
+
+            // as rhino Mesh.NormalAt, the vertex normals are interpolated at the closest point, in the (u,v) mapping
+            // of IsPointOnTriangleFrames. Without vertex normals, the normal follows the winding of the face.
+            Eigen::Vector3d normal = frame.Normal;
+            if (hasVertexNormals)
+            {
+                Eigen::Vector3d v0p = closestPoint - frame.Origin;
+                double dot02 = frame.Edge02.dot(v0p);
+                double dot12 = frame.Edge01.dot(v0p);
+                double u = (frame.Dot11 * dot02 - frame.Dot01 * dot12) * frame.InvDenom;
+                double v = (frame.Dot00 * dot12 - frame.Dot01 * dot02) * frame.InvDenom;
+                const Eigen::Vector3i &triangle = this->Faces[triangleIds[i]];
+                Eigen::Vector3d interpolatedNormal = (1.0 - u - v) * this->NormalsVertex[triangle[0]]
+                    + v * this->NormalsVertex[triangle[1]]
+                    + u * this->NormalsVertex[triangle[2]];
+                if (interpolatedNormal.allFinite() && interpolatedNormal.squaredNorm() > 0)
+                    normal = interpolatedNormal.normalized();
+            }
+            Eigen::Vector3d direction = points[i] - closestPoint;
+            double distance = direction.norm();
+            if (isSigned && direction.dot(normal) < 0)
+                distance = -distance;
+
+            result.Distances[i] = distance;
+            result.ClosestPoints[i] = closestPoint;
+            result.TriangleIds[i] = static_cast<int>(triangleIds[i]);
+            result.Normals[i] = normal;
         }
-        open3d::core::Tensor verticesPositionTensor(verticesPosition.data(), {static_cast<int64_t>(vertices.size()), 3}, open3d::core::Dtype::Float32);
-        std::vector<uint32_t> triangles;
-        for (int i = 0; i < this->Faces.size(); i++) {
-            triangles.push_back(static_cast<uint32_t>(this->Faces[i].x()));
-            triangles.push_back(static_cast<uint32_t>(this->Faces[i].y()));
-            triangles.push_back(static_cast<uint32_t>(this->Faces[i].z()));
+        return result;
+    }
+
+    std::vector<DFMeshClosestPoints> DFMesh::ComputeClosestPointsBatch(
+        const std::vector<std::shared_ptr<DFMesh>> &meshes,
+        const std::vector<std::shared_ptr<DFPointCloud>> &clouds,
+        bool isSigned)
+    {
+        if (meshes.size() != clouds.size())
+            throw std::invalid_argument("The number of meshes and clouds must be the same.");
+
+        // checked before the parallel loop, an exception cannot leave it
+        for (size_t i = 0; i < meshes.size(); i++)
+        {
+            if (!clouds[i]->Points.empty() && meshes[i]->Faces.empty())
+                throw std::invalid_argument("The mesh has no faces.");
         }
-        open3d::core::Tensor trianglesTensor(triangles.data(), {static_cast<int64_t>(this->Faces.size()), 3}, open3d::core::Dtype::UInt32);
-        rayCastingScene.AddTriangles(verticesPositionTensor, trianglesTensor);
 
-        auto pointCloudO3dCopy = targetCloud;
-        std::shared_ptr<open3d::geometry::PointCloud> pointCloudO3d_ptr = pointCloudO3dCopy.Cvt2O3DPointCloud();
-        std::vector<float> cloudPoints;
-        for (const auto& point : pointCloudO3d_ptr->points_) {
-            cloudPoints.insert(cloudPoints.end(), point.data(), point.data() + 3);
+        // the pairs are processed in parallel, the small beams of an assembly cannot keep all the threads busy alone
+        std::vector<DFMeshClosestPoints> results(meshes.size());
+        int numPairs = static_cast<int>(meshes.size());
+        #pragma omp parallel for schedule(dynamic, 1)
+        for (int i = 0; i < numPairs; i++)
+            results[i] = meshes[i]->ComputeClosestPoints(clouds[i]->Points, isSigned);
+        return results;
+    }
+
+    std::shared_ptr<open3d::t::geometry::RaycastingScene> DFMesh::GetRaycastingScene()
+    {
+        return this->GetRaycastingScene(this->ComputeGeometryHash());
+    }
+
+    std::shared_ptr<open3d::t::geometry::RaycastingScene> DFMesh::GetRaycastingScene(std::size_t geometryHash)
+    {
+        std::shared_ptr<const RaycastingSceneCache> cache = std::atomic_load(&this->m_RaycastingSceneCache);
+        if (cache != nullptr && cache->GeometryHash == geometryHash)
+            return cache->Scene;
+
+        std::shared_ptr<RaycastingSceneCache> newCache = std::make_shared<RaycastingSceneCache>();
+        newCache->Scene = this->BuildRaycastingScene();
+        newCache->GeometryHash = geometryHash;
+        std::atomic_store(&this->m_RaycastingSceneCache, std::shared_ptr<const RaycastingSceneCache>(newCache));
+        return newCache->Scene;
+    }
+
+    std::shared_ptr<open3d::t::geometry::RaycastingScene> DFMesh::BuildRaycastingScene() const
+    {
+        std::vector<uint32_t> triangles(this->Faces.size() * 3);
+        for (size_t i = 0; i < this->Faces.size(); i++)
+        {
+            triangles[3 * i] = static_cast<uint32_t>(this->Faces[i].x());
+            triangles[3 * i + 1] = static_cast<uint32_t>(this->Faces[i].y());
+            triangles[3 * i + 2] = static_cast<uint32_t>(this->Faces[i].z());
         }
-        open3d::core::Tensor cloudPointsTensor(cloudPoints.data(), {static_cast<int64_t>(pointCloudO3d_ptr->points_.size()), 3}, open3d::core::Dtype::Float32);
+        open3d::core::Tensor trianglesTensor(triangles, {static_cast<int64_t>(this->Faces.size()), 3}, open3d::core::Dtype::UInt32);
 
-        open3d::core::Tensor sdf = rayCastingScene.ComputeSignedDistance(cloudPointsTensor);
-        if (useAbs)
-            sdf = sdf.Abs();
-        std::vector<float> sdfVector(sdf.GetDataPtr<float>(), sdf.GetDataPtr<float>() + sdf.NumElements());
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> rayCastingScene = std::make_shared<open3d::t::geometry::RaycastingScene>();
+        rayCastingScene->AddTriangles(DFMesh::CvtVectors2Tensor(this->Vertices), trianglesTensor);
 
-        return sdfVector;
+        // the BVH is committed by the first query, it is forced here so that the cached scene is never modified afterwards
+        rayCastingScene->ComputeDistance(open3d::core::Tensor::Zeros({1, 3}, open3d::core::Dtype::Float32));
+        return rayCastingScene;
     }
 } // namespace diffCheck::geometry
\ No newline at end of file
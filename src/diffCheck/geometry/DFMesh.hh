@@ -2,14 +2,33 @@
 
 #include <Eigen/Core>
 #include <open3d/Open3D.h>
+#include <open3d/t/geometry/RaycastingScene.h>
 
 #include "diffCheck/geometry/DFPointCloud.hh"
 #include "diffCheck/transformation/DFTransformation.hh"
 
 namespace diffCheck::geometry
 {
+    /// @brief Closest points of a batch of query points on a mesh, one entry per query point
+    struct DFMeshClosestPoints
+    {
+        /// @brief distance of the query point to the mesh, negative if it is behind the closest triangle when signed
+        std::vector<double> Distances;
+        /// @brief closest point on the mesh
+        std::vector<Eigen::Vector3d> ClosestPoints;
+        /// @brief index of the closest triangle in the faces of the mesh
+        std::vector<int> TriangleIds;
+        /// @brief normal of the mesh at the closest point, used to sign the distance
+        std::vector<Eigen::Vector3d> Normals;
+    };
+
+    class DFMeshDistanceQuery;
+
     class DFMesh
     {
+        /// @brief the distance queries pin the caches of the mesh and query them directly
+        friend class DFMeshDistanceQuery;
+
     public:
         DFMesh() {}
         DFMesh(std::vector<Eigen::Vector3d> vertices,
@@ -45,6 +64,14 @@ namespace diffCheck::geometry
          */
         std::shared_ptr<open3d::geometry::TriangleMesh> Cvt2O3DTriangleMesh();
 
+        /**
+         * @brief Copy 3D vectors (points, ray directions) in a (N,3) float32 tensor, the format of the raycasting queries
+         * 
+         * @param vectors the vectors to copy
+         * @return open3d::core::Tensor the (N,3) float32 tensor
+         */
+        static open3d::core::Tensor CvtVectors2Tensor(const std::vector<Eigen::Vector3d> &vectors);
+
     public:  ///< Mesh methods
         /**
          * @brief Sample the mesh uniformly with a target number of points
@@ -56,12 +83,23 @@ namespace diffCheck::geometry
 
     public:  ///< Transformers
         /**
-         * @brief Apply a transformation to the mesh
+         * @brief Apply a transformation to the vertices and the vertex and face normals of the mesh, in place and in
+         * parallel. The faces and the colors are kept.
          * 
          * @param transformation the transformation to apply
          */
         void ApplyTransformation(const diffCheck::transformation::DFTransformation &transformation);
 
+        /**
+         * @brief Apply transformations to many meshes in one call
+         * 
+         * @param meshes the meshes to transform in place
+         * @param transformations the transformation of each mesh, or a single one for all the meshes
+         */
+        static void ApplyTransformationBatch(
+            const std::vector<std::shared_ptr<DFMesh>> &meshes,
+            const std::vector<diffCheck::transformation::DFTransformation> &transformations);
+
     public:  ///< Utils
         /**
          * @brief Get the mesh tight bounding box
@@ -79,13 +117,25 @@ namespace diffCheck::geometry
         Eigen::Vector3d GetFirstNormal();
 
         /**
-         * @brief Check if a point is on a face of the mesh
+         * @brief Check if a point is on a face of the mesh. The barycentric frames of the triangles are computed for
+         * this call only, use ArePointsOnFace to test many points.
          * 
          * @param point the point to check
          * @param associationThreshold the threshold to consider the point associable to the mesh. It is the ratio between the surface of the closest mesh triangle of the mesh face, and the sum of the areas of the three triangles described by the point projected on the mesh face and two of the mesh triangle vertices. The lower the number, the more strict the association will be and some poinnts on the mesh face might be wrongfully excluded. In theory, in a perfect case, a value of 0 could be used, but in practice, values of 0.05-0.2 are more realistic, depending on the application.
          */
         bool IsPointOnFace(Eigen::Vector3d point, double associationThreshold = 0.1);
 
+        /**
+         * @brief Check for a batch of points if they are on a face of the mesh. The barycentric frames of the triangles
+         * are computed once, cached on the mesh and rebuilt only if the vertices or the faces change, which is checked
+         * once per batch. The points are tested in parallel.
+         * 
+         * @param points the points to check
+         * @param associationThreshold the threshold to consider the points associable to the mesh, see IsPointOnFace
+         * @return std::vector<bool> the mask of the points on the face, one flag per point
+         */
+        std::vector<bool> ArePointsOnFace(const std::vector<Eigen::Vector3d> &points, double associationThreshold = 0.1);
+
         /**
          * @brief Get the center and main axis of oriented boundung box of the mesh. It was developped for the cylinder case, but can be used for other shapes.
          * 
@@ -101,6 +151,14 @@ namespace diffCheck::geometry
          */
         void LoadFromPLY(const std::string &path);
 
+        /**
+         * @brief Write the mesh in a binary PLY file, with its vertex normals and colors if any
+         * 
+         * @param path the path to the file with the extension
+         * @param isDoublePrecision if true, the vertices and normals are written as double instead of float
+         */
+        void SaveToPLY(const std::string &path, bool isDoublePrecision = false) const;
+
     public:  ///< Getters
         /// @brief Number of vertices in the mesh
         int GetNumVertices() const { return this->Vertices.size(); }
@@ -110,7 +168,7 @@ namespace diffCheck::geometry
     public:  ///< Distance calculations
         /**
          * @brief Compute the distance between the df mesh and a df point cloud. It
-         * can be considered as a point to plane distance.
+         * can be considered as a point to plane distance. The raycasting scene of the mesh is cached.
          * 
          * @param target the target cloud in format df
          * @param useAbs if true, the absolute value of the distance is returned
@@ -118,6 +176,32 @@ namespace diffCheck::geometry
          */
         std::vector<float> ComputeDistance(const diffCheck::geometry::DFPointCloud &targetMesh, bool useAbs = true);
 
+        /**
+         * @brief Find the closest points on the mesh of a batch of points. The distances can be signed with the normal
+         * of the mesh at the closest point: a point behind it gets a negative distance, so the mesh does not need to be closed.
+         * As rhino Mesh.NormalAt, the normal is interpolated from the vertex normals if the mesh has them, otherwise it
+         * follows the winding of the closest triangle.
+         * 
+         * @param points the query points
+         * @param isSigned if true, the distances are signed with the normals of the mesh at the closest points
+         * @return DFMeshClosestPoints the distances, closest points, triangle ids and normals
+         */
+        DFMeshClosestPoints ComputeClosestPoints(const std::vector<Eigen::Vector3d> &points, bool isSigned = false);
+
+        /**
+         * @brief Find the closest points of several clouds on their meshes in one call, e.g. all the scanned beams
+         * of an assembly against their CAD meshes. The pairs are processed in parallel.
+         * 
+         * @param meshes the meshes
+         * @param clouds the clouds, one per mesh
+         * @param isSigned if true, the distances are signed as in ComputeClosestPoints
+         * @return std::vector<DFMeshClosestPoints> the closest points of each cloud on its mesh
+         */
+        static std::vector<DFMeshClosestPoints> ComputeClosestPointsBatch(
+            const std::vector<std::shared_ptr<DFMesh>> &meshes,
+            const std::vector<std::shared_ptr<DFPointCloud>> &clouds,
+            bool isSigned = false);
+
 
     public:  ///< Basic mesh data
         /// @brief Eigen vector of 3D vertices
@@ -132,5 +216,107 @@ namespace diffCheck::geometry
         std::vector<Eigen::Vector3d> ColorsVertex;
         /// @brief Eigen vector of 3D colors for faces
         std::vector<Eigen::Vector3d> ColorsFace;
+
+    public:  ///< Open3d raycasting
+        /**
+         * @brief Get the open3d raycasting scene (and its BVH) of the mesh. It is built once, cached on the mesh
+         * and rebuilt only if the vertices or the faces change, so that repeated distance, occupancy and ray
+         * queries on the same mesh do not pay for it again.
+         * 
+         * @return std::shared_ptr<open3d::t::geometry::RaycastingScene> the committed raycasting scene
+         */
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> GetRaycastingScene();
+
+    private:  ///< Open3d raycasting
+        /**
+         * @brief Get the cached raycasting scene, (re)building it if it was built for another geometry
+         * 
+         * @param geometryHash the current hash of the geometry, computed once by the calling batch
+         * @return std::shared_ptr<open3d::t::geometry::RaycastingScene> the committed raycasting scene
+         */
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> GetRaycastingScene(std::size_t geometryHash);
+
+        /// @brief Raycasting scene with the geometry hash it was built for
+        struct RaycastingSceneCache
+        {
+            std::shared_ptr<open3d::t::geometry::RaycastingScene> Scene;
+            std::size_t GeometryHash = 0;
+        };
+
+        /**
+         * @brief Build an open3d raycasting scene containing the triangles of the mesh
+         * 
+         * @return std::shared_ptr<open3d::t::geometry::RaycastingScene> the committed raycasting scene
+         */
+        std::shared_ptr<open3d::t::geometry::RaycastingScene> BuildRaycastingScene() const;
+
+        /// @brief the cached raycasting scene, swapped atomically so that several threads can query the mesh
+        std::shared_ptr<const RaycastingSceneCache> m_RaycastingSceneCache;
+
+    private:  ///< Cached geometry data
+        /// @brief Barycentric frame of a triangle, precomputed to test points against it
+        struct TriangleFrame
+        {
+            Eigen::Vector3d Origin;
+            Eigen::Vector3d Normal;
+            Eigen::Vector3d Edge01;
+            Eigen::Vector3d Edge02;
+            double Dot00;
+            double Dot01;
+            double Dot11;
+            double InvDenom;
+            double MinEdgeLength;
+        };
+
+        /**
+         * @brief Compute a hash of the vertices and faces, used to detect changes of the geometry of the mesh
+         * 
+         * @return std::size_t the hash of the geometry
+         */
+        std::size_t ComputeGeometryHash() const;
+
+        /// @brief Triangle frames with the geometry hash they were computed for
+        struct TriangleFramesCache
+        {
+            std::vector<TriangleFrame> Frames;
+            std::size_t GeometryHash = 0;
+        };
+
+        /// @brief Compute the barycentric frames of the triangles of the mesh
+        std::vector<TriangleFrame> BuildTriangleFrames() const;
+
+        /**
+         * @brief Get the cached triangle frames, (re)building them if they were computed for another geometry
+         * 
+         * @param geometryHash the current hash of the geometry, computed once by the calling batch
+         * @return std::shared_ptr<const TriangleFramesCache> the triangle frames, never modified once built
+         */
+        std::shared_ptr<const TriangleFramesCache> GetTriangleFrames(std::size_t geometryHash);
+
+        /**
+         * @brief Find the closest points on the mesh of a batch of points with a given raycasting scene and triangle frames
+         * 
+         * @see ComputeClosestPoints
+         * @param scene the raycasting scene of the mesh
+         * @param frames the triangle frames of the mesh
+         */
+        DFMeshClosestPoints ComputeClosestPoints(
+            const std::vector<Eigen::Vector3d> &points,
+            bool isSigned,
+            const std::shared_ptr<open3d::t::geometry::RaycastingScene> &scene,
+            const std::vector<TriangleFrame> &frames) const;
+
+        /**
+         * @brief Test a point against the triangle frames
+         * 
+         * @param frames the triangle frames of the mesh
+         * @param point the point to check
+         * @param associationThreshold the threshold to consider the point associable to the mesh
+         * @return true if the point is on one of the triangles
+         */
+        static bool IsPointOnTriangleFrames(const std::vector<TriangleFrame> &frames, const Eigen::Vector3d &point, double associationThreshold);
+
+        /// @brief the cached triangle frames, swapped atomically so that several threads can query the mesh
+        std::shared_ptr<const TriangleFramesCache> m_TriangleFramesCache;
     };
 } // namespace diffCheck::geometry
\ No newline at end of file
@@ -0,0 +1,92 @@
+#include "diffCheck/geometry/DFMeshDistanceQuery.hh"
+
+#include <limits>
+
+namespace diffCheck::geometry
+{
+    DFMeshDistanceQuery::DFMeshDistanceQuery(std::shared_ptr<DFMesh> mesh)
+        : m_Mesh(mesh)
+    {
+        if (this->m_Mesh == nullptr)
+            throw std::invalid_argument("The mesh of the distance query is null.");
+        this->Update();
+    }
+
+    void DFMeshDistanceQuery::Update()
+    {
+        std::size_t geometryHash = this->m_Mesh->ComputeGeometryHash();
+        std::shared_ptr<MeshCaches> meshCaches = std::make_shared<MeshCaches>();
+        meshCaches->Scene = this->m_Mesh->GetRaycastingScene(geometryHash);
+        meshCaches->TriangleFrames = this->m_Mesh->GetTriangleFrames(geometryHash);
+        std::atomic_store(&this->m_MeshCaches, std::shared_ptr<const MeshCaches>(meshCaches));
+    }
+
+    std::vector<double> DFMeshDistanceQuery::ComputeDistance(const std::vector<Eigen::Vector3d> &points, bool isSigned)
+    {
+        if (isSigned)
+            return this->ComputeClosestPoints(points, true).Distances;
+
+        std::shared_ptr<const MeshCaches> meshCaches = std::atomic_load(&this->m_MeshCaches);
+        open3d::core::Tensor distances = meshCaches->Scene->ComputeDistance(DFMesh::CvtVectors2Tensor(points));
+        const float *distancesData = distances.GetDataPtr<float>();
+        return std::vector<double>(distancesData, distancesData + distances.NumElements());
+    }
+
+    DFMeshClosestPoints DFMeshDistanceQuery::ComputeClosestPoints(const std::vector<Eigen::Vector3d> &points, bool isSigned)
+    {
+        std::shared_ptr<const MeshCaches> meshCaches = std::atomic_load(&this->m_MeshCaches);
+        if (!points.empty() && meshCaches->TriangleFrames->Frames.empty())
+            throw std::invalid_argument("The mesh has no faces.");
+        return this->m_Mesh->ComputeClosestPoints(points, isSigned, meshCaches->Scene, meshCaches->TriangleFrames->Frames);
+    }
+
+    std::vector<bool> DFMeshDistanceQuery::ComputeOccupancy(const std::vector<Eigen::Vector3d> &points)
+    {
+        std::shared_ptr<const MeshCaches> meshCaches = std::atomic_load(&this->m_MeshCaches);
+        open3d::core::Tensor occupancy = meshCaches->Scene->ComputeOccupancy(DFMesh::CvtVectors2Tensor(points));
+        const float *occupancyData = occupancy.GetDataPtr<float>();
+
+        std::vector<bool> isInside(points.size());
+        for (size_t i = 0; i < points.size(); i++)
+            isInside[i] = occupancyData[i] > 0.5f;
+        return isInside;
+    }
+
+    DFMeshRayHits DFMeshDistanceQuery::CastRays(const std::vector<Eigen::Vector3d> &origins, const std::vector<Eigen::Vector3d> &directions)
+    {
+        if (origins.size() != directions.size())
+            throw std::invalid_argument("The number of origins and directions must be the same.");
+
+        std::vector<float> rays(origins.size() * 6);
+        for (size_t i = 0; i < origins.size(); i++)
+        {
+            for (int j = 0; j < 3; j++)
+            {
+                rays[6 * i + j] = static_cast<float>(origins[i][j]);
+                rays[6 * i + 3 + j] = static_cast<float>(directions[i][j]);
+            }
+        }
+        open3d::core::Tensor raysTensor(rays, {static_cast<int64_t>(origins.size()), 6}, open3d::core::Dtype::Float32);
+
+        std::shared_ptr<const MeshCaches> meshCaches = std::atomic_load(&this->m_MeshCaches);
+        std::unordered_map<std::string, open3d::core::Tensor> hits = meshCaches->Scene->CastRays(raysTensor);
+        const float *hitDistances = hits.at("t_hit").GetDataPtr<float>();
+        const uint32_t *triangleIds = hits.at("primitive_ids").GetDataPtr<uint32_t>();
+        const float *triangleNormals = hits.at("primitive_normals").GetDataPtr<float>();
+
+        DFMeshRayHits result;
+        result.Distances.resize(origins.size());
+        result.TriangleIds.resize(origins.size());
+        result.Normals.resize(origins.size());
+        for (size_t i = 0; i < origins.size(); i++)
+        {
+            bool isHit = triangleIds[i] != open3d::t::geometry::RaycastingScene::INVALID_ID();
+            result.Distances[i] = isHit ? static_cast<double>(hitDistances[i]) : std::numeric_limits<double>::infinity();
+            result.TriangleIds[i] = isHit ? static_cast<int>(triangleIds[i]) : -1;
+            result.Normals[i] = isHit
+                ? Eigen::Vector3d(triangleNormals[3 * i], triangleNormals[3 * i + 1], triangleNormals[3 * i + 2])
+                : Eigen::Vector3d::Zero();
+        }
+        return result;
+    }
+} // namespace diffCheck::geometry
@@ -0,0 +1,89 @@
+#pragma once
+
+#include <Eigen/Core>
+#include <open3d/Open3D.h>
+#include <open3d/t/geometry/RaycastingScene.h>
+
+#include "diffCheck/geometry/DFMesh.hh"
+
+namespace diffCheck::geometry
+{
+    /// @brief Hits of a batch of rays on a mesh, one entry per ray
+    struct DFMeshRayHits
+    {
+        /// @brief distance along the ray to the hit, infinite if the ray misses the mesh
+        std::vector<double> Distances;
+        /// @brief index of the hit triangle in the faces of the mesh, -1 if the ray misses the mesh
+        std::vector<int> TriangleIds;
+        /// @brief normal of the hit triangle, zero if the ray misses the mesh
+        std::vector<Eigen::Vector3d> Normals;
+    };
+
+    /**
+     * @brief Reusable distance, occupancy and ray queries on a mesh, e.g. when the same CAD beam is compared to many
+     * scans. The raycasting scene (and its BVH) and the triangle frames of the mesh are taken from the caches of the
+     * mesh at construction and kept by the query, so the queries neither rebuild nor rehash the mesh. If the mesh is
+     * modified afterwards, Update must be called before the next query.
+     */
+    class DFMeshDistanceQuery
+    {
+    public:
+        DFMeshDistanceQuery(std::shared_ptr<DFMesh> mesh);
+        ~DFMeshDistanceQuery() = default;
+
+    public:  ///< Queries
+        /// @brief Take the raycasting scene and the triangle frames of the mesh again, after it was modified. The running queries keep the previous ones.
+        void Update();
+
+        /**
+         * @brief Compute the distance of a batch of points to the mesh
+         * 
+         * @param points the query points
+         * @param isSigned if true, the points behind their closest triangle get a negative distance
+         * @return std::vector<double> the distance of each point
+         */
+        std::vector<double> ComputeDistance(const std::vector<Eigen::Vector3d> &points, bool isSigned = false);
+
+        /**
+         * @brief Find the closest points on the mesh of a batch of points
+         * 
+         * @see DFMesh::ComputeClosestPoints
+         */
+        DFMeshClosestPoints ComputeClosestPoints(const std::vector<Eigen::Vector3d> &points, bool isSigned = false);
+
+        /**
+         * @brief Check for a batch of points if they are inside the mesh. The mesh must be closed.
+         * 
+         * @param points the query points
+         * @return std::vector<bool> true for the points inside the mesh
+         */
+        std::vector<bool> ComputeOccupancy(const std::vector<Eigen::Vector3d> &points);
+
+        /**
+         * @brief Cast a batch of rays on the mesh and get their first hits
+         * 
+         * @param origins the origins of the rays
+         * @param directions the directions of the rays, the hit distances are expressed in their length
+         * @return DFMeshRayHits the hit distances, triangle ids and triangle normals
+         */
+        DFMeshRayHits CastRays(const std::vector<Eigen::Vector3d> &origins, const std::vector<Eigen::Vector3d> &directions);
+
+    public:  ///< Getters
+        /// @brief Get the queried mesh
+        std::shared_ptr<DFMesh> GetMesh() const { return this->m_Mesh; }
+
+    private:
+        /// @brief the queried mesh
+        std::shared_ptr<DFMesh> m_Mesh;
+
+        /// @brief Caches of the mesh taken by the query
+        struct MeshCaches
+        {
+            std::shared_ptr<open3d::t::geometry::RaycastingScene> Scene;
+            std::shared_ptr<const DFMesh::TriangleFramesCache> TriangleFrames;
+        };
+
+        /// @brief the caches of the mesh when the query was last updated, swapped atomically by Update
+        std::shared_ptr<const MeshCaches> m_MeshCaches;
+    };
+} // namespace diffCheck::geometry
@@ -1,161 +1,323 @@
 #include "DFPointCloud.hh"
 #include "diffCheck/log.hh"
+#include "diffCheck/hash.hh"
+#include "diffCheck/parallel.hh"
 
 #include "diffCheck/IOManager.hh"
 
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <functional>
+#include <limits>
+#include <numeric>
+#include <queue>
+#include <tuple>
 
-namespace diffCheck::geometry
-{
-    void DFPointCloud::Cvt2DFPointCloud(const std::shared_ptr<open3d::geometry::PointCloud> &O3DPointCloud)
-    {
-        this->Points.clear();
-        this->Colors.clear();
-        this->Normals.clear();
+#include <Eigen/Eigenvalues>
 
-        if (O3DPointCloud->points_.size() != 0)
-            for (auto &point : O3DPointCloud->points_)
-                this->Points.push_back(point);
-        if (O3DPointCloud->HasColors())
-            for (auto &color : O3DPointCloud->colors_)
-                this->Colors.push_back(color);
-        if (O3DPointCloud->HasNormals())
-            for (auto &normal : O3DPointCloud->normals_)
-                this->Normals.push_back(normal);
-    }
 
-    void DFPointCloud::Cvt2DFPointCloud(const std::shared_ptr<cilantro::PointCloud3f> &cilantroPointCloud)
+namespace diffCheck::geometry
+{
+    namespace
     {
-        this->Points.clear();
-        this->Colors.clear();
-        this->Normals.clear();
-        
-        auto ptt = cilantroPointCloud->points;
-        int n_pt = (int)ptt.cols();
-        auto col = cilantroPointCloud->colors;
-        auto nor = cilantroPointCloud->normals;
+        /// @brief Map a vector of Eigen::Vector3d as a 3xN matrix without copying it
+        Eigen::Map<const Eigen::Matrix3Xd> MapAsMatrix3Xd(const std::vector<Eigen::Vector3d> &vec)
+        {
+            return Eigen::Map<const Eigen::Matrix3Xd>(reinterpret_cast<const double*>(vec.data()), 3, vec.size());
+        }
 
-        if (n_pt == 0)
-            throw std::invalid_argument("The point cloud is empty.");
-        for (int i = 0; i < n_pt; i++)
+        /// @brief Fill a vector of Eigen::Vector3d from a 3xN float matrix with a single allocation
+        void CopyFromMatrix3Xf(const cilantro::VectorSet3f &matrix, std::vector<Eigen::Vector3d> &vec)
         {
-            Eigen::Vector3d pt_d = ptt.col(i).cast<double>();
-            this->Points.push_back(pt_d);
+            vec.resize(matrix.cols());
+            Eigen::Map<Eigen::Matrix3Xd>(reinterpret_cast<double*>(vec.data()), 3, vec.size()) = matrix.cast<double>();
         }
 
-        if (cilantroPointCloud->hasColors())
+        /// @brief Keep in place the elements flagged by the mask, if the vector has one element per flag
+        void KeepMasked(std::vector<Eigen::Vector3d> &vec, const std::vector<char> &mask)
         {
-            for (int i = 0; i < n_pt; i++)
+            if (vec.size() != mask.size())
+                return;
+            std::size_t kept = 0;
+            for (std::size_t i = 0; i < vec.size(); i++)
             {
-                Eigen::Vector3d cl_d = col.col(i).cast <double>();
-                this->Colors.push_back(cl_d);
+                if (mask[i])
+                    vec[kept++] = vec[i];
             }
+            vec.resize(kept);
         }
 
-        if (cilantroPointCloud->hasNormals())
+        /**
+         * @brief Solve the covariance of the neighborhood of a point
+         *
+         * @param points the points of the cloud
+         * @param graph the neighborhood graph of the cloud
+         * @param i the index of the point
+         * @return Eigen::SelfAdjointEigenSolver<Eigen::Matrix3d> the eigen decomposition, eigenvalues sorted increasingly
+         */
+        Eigen::SelfAdjointEigenSolver<Eigen::Matrix3d> SolveNeighborhoodCovariance(
+            const std::vector<Eigen::Vector3d> &points,
+            const DFNeighborhoodGraph &graph,
+            int i)
         {
-            for (int i = 0; i < n_pt; i++)
+            int begin = graph.Offsets[i];
+            int end = graph.Offsets[i + 1];
+            Eigen::Vector3d mean = Eigen::Vector3d::Zero();
+            for (int j = begin; j < end; j++)
+                mean += points[graph.Indices[j]];
+            mean /= static_cast<double>(end - begin);
+
+            Eigen::Matrix3d covariance = Eigen::Matrix3d::Zero();
+            for (int j = begin; j < end; j++)
             {
-                Eigen::Vector3d no_d = nor.col(i).cast <double>();
-                this->Normals.push_back(no_d);
+                Eigen::Vector3d centered = points[graph.Indices[j]] - mean;
+                covariance += centered * centered.transpose();
             }
+            covariance /= static_cast<double>(end - begin);
+
+            Eigen::SelfAdjointEigenSolver<Eigen::Matrix3d> solver;
+            solver.computeDirect(covariance);
+            return solver;
         }
-    }
 
-    std::shared_ptr<open3d::geometry::PointCloud> DFPointCloud::Cvt2O3DPointCloud()
-    {
-        std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud(new open3d::geometry::PointCloud());
-        if (this->Points.size() != 0)
-            for (auto &point : this->Points)
-                O3DPointCloud->points_.push_back(point);
-        if (this->Colors.size() != 0)
-            for (auto &color : this->Colors)
-                O3DPointCloud->colors_.push_back(color);
-        if (this->Normals.size() != 0)
-            for (auto &normal : this->Normals)
-                O3DPointCloud->normals_.push_back(normal);
-        return O3DPointCloud;
-    }
+        /// @brief Header of the binary cache of a point cloud, only made of 8-byte fields so that it has no padding
+        struct CloudCacheHeader
+        {
+            char Magic[8];
+            std::uint64_t Version;
+            std::uint64_t ScalarSize;
+            std::uint64_t NumPoints;
+            std::uint64_t NumNormals;
+            std::uint64_t NumColors;
+            std::uint64_t HasGraph;
+            std::uint64_t NumGraphIndices;
+            std::int64_t GraphKnn;         ///< -1 if the graph has no knn
+            double GraphSearchRadius;      ///< -1 if the graph has no search radius
+            std::uint64_t SourceSize;
+            std::int64_t SourceModificationTime;
+            std::uint64_t SourceFingerprint;
+        };
+        static_assert(sizeof(CloudCacheHeader) == 13 * 8, "The cache header must not be padded.");
 
-    std::shared_ptr<cilantro::PointCloud3f> DFPointCloud::Cvt2CilantroPointCloud()
-    {
-        std::shared_ptr<cilantro::PointCloud3f> cilantroPointCloud = std::make_shared<cilantro::PointCloud3f>();
+        constexpr char CLOUD_CACHE_MAGIC[8] = "DFCLOUD";
+        constexpr std::uint64_t CLOUD_CACHE_VERSION = 1;
 
-        cilantro::VectorSet3f points;
-        for (auto& pt : this->Points)
+        /// @brief Key of the source file of a cache, all zeros for a cache without source
+        struct CloudCacheSourceKey
         {
-            Eigen::Vector3f pt_f = pt.cast <float>();
-            points.conservativeResize(points.rows(), points.cols() + 1);
-            points.col(points.cols() - 1) = pt_f;
-        }
-        cilantroPointCloud->points = points;
+            std::uint64_t Size = 0;
+            std::int64_t ModificationTime = 0;
+            std::uint64_t Fingerprint = 0;
+        };
 
-        cilantro::VectorSet3f colors;
-        if (this->HasColors())
+        /**
+         * @brief Compute the key of the source file of a cache: its size, its modification time and a FNV-1a hash of
+         * its first, middle and last 64KB, which catches most of the edits keeping the size and the time without
+         * reading the whole file
+         *
+         * @param path the path to the source file, empty for a cache without source
+         * @return std::optional<CloudCacheSourceKey> the key, nullopt if the file does not exist
+         */
+        std::optional<CloudCacheSourceKey> ComputeCloudCacheSourceKey(const std::string &path)
         {
-            for (auto& color : this->Colors)
+            CloudCacheSourceKey key;
+            if (path.empty())
+                return key;
+            std::error_code error;
+            if (!std::filesystem::is_regular_file(path, error))
+                return std::nullopt;
+            key.Size = std::filesystem::file_size(path);
+            key.ModificationTime = static_cast<std::int64_t>(std::filesystem::last_write_time(path).time_since_epoch().count());
+
+            constexpr std::uint64_t blockSize = 1 << 16;
+            std::ifstream file(path, std::ios::binary);
+            std::vector<char> buffer(blockSize);
+            std::uint64_t hash = FNV1A_OFFSET_BASIS;
+            std::uint64_t lastBlock = key.Size > blockSize ? key.Size - blockSize : 0;
+            for (std::uint64_t offset : {std::uint64_t(0), key.Size / 2, lastBlock})
             {
-                Eigen::Vector3f color_f = color.cast <float>();
-                colors.conservativeResize(colors.rows(), colors.cols() + 1);
-                colors.col(colors.cols() - 1) = color_f;
+                file.clear();
+                file.seekg(static_cast<std::streamoff>(offset));
+                file.read(buffer.data(), blockSize);
+                hash = HashWords(hash, buffer.data(), static_cast<std::size_t>(file.gcount()));
             }
+            key.Fingerprint = hash;
+            return key;
         }
-        cilantroPointCloud->colors = colors;
 
-        cilantro::VectorSet3f normals;
-        if (this->HasNormals())
+        /// @brief Write a block of vectors in one go, as float64 or converted to float32
+        void WriteCloudCacheBlock(std::ofstream &stream, const std::vector<Eigen::Vector3d> &vec, bool isDoublePrecision)
         {
-            for (auto& normal : this->Normals)
+            if (isDoublePrecision)
             {
-                Eigen::Vector3f normal_f = normal.cast <float>();
-                normals.conservativeResize(normals.rows(), normals.cols() + 1);
-                normals.col(normals.cols() - 1) = normal_f;
+                stream.write(reinterpret_cast<const char*>(vec.data()), vec.size() * sizeof(Eigen::Vector3d));
+                return;
             }
+            std::vector<Eigen::Vector3f> buffer(vec.size());
+            for (std::size_t i = 0; i < vec.size(); i++)
+                buffer[i] = vec[i].cast<float>();
+            stream.write(reinterpret_cast<const char*>(buffer.data()), buffer.size() * sizeof(Eigen::Vector3f));
         }
-        cilantroPointCloud->normals = normals;
+
+        /// @brief Read a block of vectors in one go straight into the vector, converted from float32 if needed
+        bool ReadCloudCacheBlock(std::ifstream &stream, std::vector<Eigen::Vector3d> &vec, std::size_t size, bool isDoublePrecision)
+        {
+            vec.resize(size);
+            if (isDoublePrecision)
+                return static_cast<bool>(stream.read(reinterpret_cast<char*>(vec.data()), size * sizeof(Eigen::Vector3d)));
+
+            std::vector<Eigen::Vector3f> buffer(size);
+            if (!stream.read(reinterpret_cast<char*>(buffer.data()), size * sizeof(Eigen::Vector3f)))
+                return false;
+            for (std::size_t i = 0; i < size; i++)
+                vec[i] = buffer[i].cast<double>();
+            return true;
+        }
+
+        /**
+         * @brief Check that a neighborhood graph read from a cache is consistent, so that its consumers never index out of
+         * the graph or of the cloud
+         *
+         * @param graph the graph, with one offset more than the number of points
+         * @param numPoints the number of points of the cloud
+         * @return bool true if the offsets start at 0, never decrease and end at the number of indices, and if every
+         * index is a point of the cloud
+         */
+        bool IsValidNeighborhoodGraph(const DFNeighborhoodGraph &graph, std::size_t numPoints)
+        {
+            if (graph.Offsets.empty() || graph.Offsets.front() != 0
+                || static_cast<std::size_t>(graph.Offsets.back()) != graph.Indices.size()
+                || !std::is_sorted(graph.Offsets.begin(), graph.Offsets.end()))
+                return false;
+            return std::all_of(graph.Indices.begin(), graph.Indices.end(),
+                [numPoints](int index) { return index >= 0 && static_cast<std::size_t>(index) < numPoints; });
+        }
+    }
+
+    void DFPointCloud::Cvt2DFPointCloud(const std::shared_ptr<open3d::geometry::PointCloud> &O3DPointCloud)
+    {
+        this->InvalidateIndex();
+        this->Points = O3DPointCloud->points_;
+        this->Colors = O3DPointCloud->HasColors() ? O3DPointCloud->colors_ : std::vector<Eigen::Vector3d>();
+        this->Normals = O3DPointCloud->HasNormals() ? O3DPointCloud->normals_ : std::vector<Eigen::Vector3d>();
+    }
+
+    void DFPointCloud::Cvt2DFPointCloud(const std::shared_ptr<cilantro::PointCloud3f> &cilantroPointCloud)
+    {
+        this->InvalidateIndex();
+        this->Points.clear();
+        this->Colors.clear();
+        this->Normals.clear();
+
+        if (cilantroPointCloud->points.cols() == 0)
+            throw std::invalid_argument("The point cloud is empty.");
+
+        CopyFromMatrix3Xf(cilantroPointCloud->points, this->Points);
+        if (cilantroPointCloud->hasColors())
+            CopyFromMatrix3Xf(cilantroPointCloud->colors, this->Colors);
+        if (cilantroPointCloud->hasNormals())
+            CopyFromMatrix3Xf(cilantroPointCloud->normals, this->Normals);
+    }
+
+    std::shared_ptr<open3d::geometry::PointCloud> DFPointCloud::Cvt2O3DPointCloud() const
+    {
+        std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud(new open3d::geometry::PointCloud());
+        O3DPointCloud->points_ = this->Points;
+        O3DPointCloud->colors_ = this->Colors;
+        O3DPointCloud->normals_ = this->Normals;
+        return O3DPointCloud;
+    }
+
+    std::shared_ptr<open3d::geometry::PointCloud> DFPointCloud::MoveToO3DPointCloud()
+    {
+        this->InvalidateIndex();
+        std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud = std::make_shared<open3d::geometry::PointCloud>();
+        O3DPointCloud->points_ = std::move(this->Points);
+        O3DPointCloud->colors_ = std::move(this->Colors);
+        O3DPointCloud->normals_ = std::move(this->Normals);
+        this->Points.clear();
+        this->Colors.clear();
+        this->Normals.clear();
+        return O3DPointCloud;
+    }
+
+    void DFPointCloud::MoveFromO3DPointCloud(open3d::geometry::PointCloud &O3DPointCloud)
+    {
+        this->InvalidateIndex();
+        this->Points = std::move(O3DPointCloud.points_);
+        this->Colors = std::move(O3DPointCloud.colors_);
+        this->Normals = std::move(O3DPointCloud.normals_);
+        O3DPointCloud.points_.clear();
+        O3DPointCloud.colors_.clear();
+        O3DPointCloud.normals_.clear();
+    }
+
+    std::shared_ptr<cilantro::PointCloud3f> DFPointCloud::Cvt2CilantroPointCloud() const
+    {
+        std::shared_ptr<cilantro::PointCloud3f> cilantroPointCloud = std::make_shared<cilantro::PointCloud3f>();
+
+        // the DF buffers are mapped as 3xN matrices, so each attribute is allocated once and cast in bulk
+        cilantroPointCloud->points = MapAsMatrix3Xd(this->Points).cast<float>();
+        if (this->HasColors())
+            cilantroPointCloud->colors = MapAsMatrix3Xd(this->Colors).cast<float>();
+        if (this->HasNormals())
+            cilantroPointCloud->normals = MapAsMatrix3Xd(this->Normals).cast<float>();
 
         return cilantroPointCloud;
     }
 
-    std::vector<Eigen::Vector3d> DFPointCloud::GetAxixAlignedBoundingBox()
+    std::vector<Eigen::Vector3d> DFPointCloud::GetAxixAlignedBoundingBox() const
     {
-        auto O3DPointCloud = this->Cvt2O3DPointCloud();
-        auto boundingBox = O3DPointCloud->GetAxisAlignedBoundingBox();
+        Eigen::Vector3d minBound = Eigen::Vector3d::Zero();
+        Eigen::Vector3d maxBound = Eigen::Vector3d::Zero();
+        if (!this->Points.empty())
+        {
+            minBound = this->Points[0];
+            maxBound = this->Points[0];
+            for (const Eigen::Vector3d &point : this->Points)
+            {
+                minBound = minBound.cwiseMin(point);
+                maxBound = maxBound.cwiseMax(point);
+            }
+        }
         std::vector<Eigen::Vector3d> extremePoints;
-        extremePoints.push_back(boundingBox.GetMinBound());
-        extremePoints.push_back(boundingBox.GetMaxBound());
+        extremePoints.push_back(minBound);
+        extremePoints.push_back(maxBound);
         return extremePoints;
     }
 
     void DFPointCloud::EstimateNormals(
         bool useCilantroEvaluator,
         std::optional<int> knn,
-        std::optional<double> searchRadius
+        std::optional<double> searchRadius,
+        int numThreads
     )
     {
         if (!useCilantroEvaluator)
         {
-            this->Normals.clear();
-            auto O3DPointCloud = this->Cvt2O3DPointCloud();
-
-            if (knn.value() != 30 && searchRadius.has_value() == false)
-            {
-                open3d::geometry::KDTreeSearchParamKNN knnSearchParam(knn.value());
-                O3DPointCloud->EstimateNormals(knnSearchParam);
-                DIFFCHECK_INFO(("Estimating normals with knn = " + std::to_string(knn.value())).c_str());
-            }
-            else if (searchRadius.has_value())
+            std::shared_ptr<const DFNeighborhoodGraph> graph = this->GetNeighborhoodGraph(knn, searchRadius, numThreads);
+            int numPoints = this->GetNumPoints();
+            this->Normals.resize(numPoints);
+            #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+            for (int i = 0; i < numPoints; i++)
             {
-                open3d::geometry::KDTreeSearchParamHybrid hybridSearchParam(searchRadius.value(), knn.value());
-                O3DPointCloud->EstimateNormals(hybridSearchParam);
-                DIFFCHECK_INFO(("Estimating normals with hybrid search radius = " + std::to_string(searchRadius.value()) + "and knn = " + std::to_string(knn.value())).c_str());
+                // as in open3d, the points with a degenerate neighborhood get an upward normal
+                if (graph->Offsets[i + 1] - graph->Offsets[i] < 3)
+                {
+                    this->Normals[i] = Eigen::Vector3d::UnitZ();
+                    continue;
+                }
+                this->Normals[i] = SolveNeighborhoodCovariance(this->Points, *graph, i).eigenvectors().col(0).normalized();
             }
+
+            if (searchRadius.has_value())
+                DIFFCHECK_INFO(("Estimating normals with search radius = " + std::to_string(searchRadius.value()) + (knn.has_value() ? " and knn = " + std::to_string(knn.value()) : "")).c_str());
             else
-            {
-                O3DPointCloud->EstimateNormals();
-                DIFFCHECK_INFO("Default estimation of normals with knn = 30");
-            }
-            for (auto &normal : O3DPointCloud->normals_)
-                this->Normals.push_back(normal);
+                DIFFCHECK_INFO(("Estimating normals with knn = " + std::to_string(knn.value())).c_str());
         }
         else
         {
@@ -163,36 +325,100 @@ namespace diffCheck::geometry
             cilantro::KNNNeighborhoodSpecification<int> neighborhood(knn.value());
             cilantroPointCloud->estimateNormals(neighborhood, false);
 
-            this->Normals.clear();
-            for (int i = 0; i < cilantroPointCloud->normals.cols(); i++)
-                this->Normals.push_back(cilantroPointCloud->normals.col(i).cast<double>());
+            CopyFromMatrix3Xf(cilantroPointCloud->normals, this->Normals);
             DIFFCHECK_INFO(("Estimating normals with cilantro evaluator with knn = " + std::to_string(knn.value())).c_str());
         }
 
     }
 
+    std::vector<double> DFPointCloud::ComputeCurvatures(
+        std::optional<int> knn,
+        std::optional<double> searchRadius,
+        int numThreads)
+    {
+        std::shared_ptr<const DFNeighborhoodGraph> graph = this->GetNeighborhoodGraph(knn, searchRadius, numThreads);
+        int numPoints = this->GetNumPoints();
+        std::vector<double> curvatures(numPoints, 0.0);
+        #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+        for (int i = 0; i < numPoints; i++)
+        {
+            if (graph->Offsets[i + 1] - graph->Offsets[i] < 3)
+                continue;
+            Eigen::Vector3d eigenvalues = SolveNeighborhoodCovariance(this->Points, *graph, i).eigenvalues();
+            double sumEigenvalues = eigenvalues.sum();
+            if (sumEigenvalues > 0)
+                curvatures[i] = std::max(eigenvalues[0], 0.0) / sumEigenvalues;
+        }
+        return curvatures;
+    }
+
+    void DFPointCloud::OrientNormalsConsistently(
+        std::optional<int> knn,
+        std::optional<double> searchRadius,
+        int numThreads)
+    {
+        if (!this->HasNormals())
+        {
+            DIFFCHECK_WARN("The point cloud has no normals to orient.");
+            return;
+        }
+        std::shared_ptr<const DFNeighborhoodGraph> graph = this->GetNeighborhoodGraph(knn, searchRadius, numThreads);
+        int numPoints = this->GetNumPoints();
+
+        // the components are seeded from their highest point
+        std::vector<int> seeds(numPoints);
+        std::iota(seeds.begin(), seeds.end(), 0);
+        std::sort(seeds.begin(), seeds.end(), [this](int a, int b) { return this->Points[a].z() > this->Points[b].z(); });
+
+        // edges (weight, parent, child), the lightest edges join the most parallel normals
+        using Edge = std::tuple<double, int, int>;
+        std::priority_queue<Edge, std::vector<Edge>, std::greater<Edge>> edges;
+        std::vector<char> isOriented(numPoints, 0);
+        auto pushEdges = [&](int parent)
+        {
+            for (int j = graph->Offsets[parent]; j < graph->Offsets[parent + 1]; j++)
+            {
+                int child = graph->Indices[j];
+                if (!isOriented[child])
+                    edges.emplace(1.0 - std::abs(this->Normals[parent].dot(this->Normals[child])), parent, child);
+            }
+        };
+
+        for (int seed : seeds)
+        {
+            if (isOriented[seed])
+                continue;
+            if (this->Normals[seed].z() < 0)
+                this->Normals[seed] = -this->Normals[seed];
+            isOriented[seed] = 1;
+            pushEdges(seed);
+            while (!edges.empty())
+            {
+                auto [weight, parent, child] = edges.top();
+                edges.pop();
+                if (isOriented[child])
+                    continue;
+                if (this->Normals[parent].dot(this->Normals[child]) < 0)
+                    this->Normals[child] = -this->Normals[child];
+                isOriented[child] = 1;
+                pushEdges(child);
+            }
+        }
+    }
+
     void DFPointCloud::VoxelDownsample(double voxelSize)
     {
         if (voxelSize <= 0)
             throw std::invalid_argument("Voxel size must be greater than 0.");
-        auto O3DPointCloud = this->Cvt2O3DPointCloud();
-        auto O3DPointCloudDown = O3DPointCloud->VoxelDownSample(voxelSize);
-        this->Points.clear();
-        for (auto &point : O3DPointCloudDown->points_)
-            this->Points.push_back(point);
-        this->Colors.clear();
-        for (auto &color : O3DPointCloudDown->colors_)
-            this->Colors.push_back(color);
-        this->Normals.clear();
-        for (auto &normal : O3DPointCloudDown->normals_)
-            this->Normals.push_back(normal);
+        this->ApplyO3DOperation([voxelSize](std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud)
+        {
+            return O3DPointCloud->VoxelDownSample(voxelSize);
+        });
     }
 
     void DFPointCloud::ApplyColor(const Eigen::Vector3d &color)
     {
-        this->Colors.clear();
-        for (auto &point : this->Points)
-            this->Colors.push_back(color);
+        this->Colors.assign(this->Points.size(), color);
     }
     void DFPointCloud::ApplyColor(int r, int g, int b)
     {
@@ -202,33 +428,74 @@ namespace diffCheck::geometry
 
     void DFPointCloud::RemoveStatisticalOutliers(int nbNeighbors, double stdRatio)
     {
-        std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud = this->Cvt2O3DPointCloud();
-        std::tuple<std::shared_ptr<open3d::geometry::PointCloud>, std::vector<size_t>> returnedTuple = O3DPointCloud->RemoveStatisticalOutliers(nbNeighbors, stdRatio);
-        std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloudWithoutOutliers = std::get<0>(returnedTuple);
-        this->Points.clear();
-        for (auto &point : O3DPointCloudWithoutOutliers->points_)
-            this->Points.push_back(point);
-        this->Colors.clear();
-        for (auto &color : O3DPointCloudWithoutOutliers->colors_)
-            this->Colors.push_back(color);
-        this->Normals.clear();
-        for (auto &normal : O3DPointCloudWithoutOutliers->normals_)
-            this->Normals.push_back(normal);
+        if (nbNeighbors < 1 || stdRatio <= 0)
+            throw std::invalid_argument("The number of neighbors and the standard deviation ratio must be positive.");
+        std::shared_ptr<const KDTreeIndex> index = this->GetIndex();
+        if (index == nullptr)
+        {
+            DIFFCHECK_WARN("The point cloud is empty. No outliers to remove.");
+            return;
+        }
+
+        // mean distance of each point to its neighbors, the point itself being its first neighbor
+        int numPoints = this->GetNumPoints();
+        std::vector<double> meanDistances(numPoints, -1.0);
+        int numValidDistances = 0;
+        #pragma omp parallel for reduction(+ : numValidDistances)
+        for (int i = 0; i < numPoints; i++)
+        {
+            std::vector<int> neighborIndices;
+            std::vector<double> neighborSquaredDistances;
+            index->KDTree.SearchKNN(this->Points[i], nbNeighbors, neighborIndices, neighborSquaredDistances);
+            if (neighborSquaredDistances.empty())
+                continue;
+            double sumDistances = 0.0;
+            for (double squaredDistance : neighborSquaredDistances)
+                sumDistances += std::sqrt(squaredDistance);
+            meanDistances[i] = sumDistances / neighborSquaredDistances.size();
+            numValidDistances++;
+        }
+        if (numValidDistances == 0)
+        {
+            this->Points.clear();
+            this->Colors.clear();
+            this->Normals.clear();
+            this->InvalidateIndex();
+            return;
+        }
+
+        // the points whose mean distance is above the cloud mean plus stdRatio standard deviations are outliers
+        double cloudMean = 0.0;
+        for (double meanDistance : meanDistances)
+        {
+            if (meanDistance > 0)
+                cloudMean += meanDistance;
+        }
+        cloudMean /= numValidDistances;
+        double squaredSum = 0.0;
+        for (double meanDistance : meanDistances)
+        {
+            if (meanDistance > 0)
+                squaredSum += (meanDistance - cloudMean) * (meanDistance - cloudMean);
+        }
+        double stdDev = std::sqrt(squaredSum / (numValidDistances - 1));
+        double distanceThreshold = cloudMean + stdRatio * stdDev;
+
+        std::vector<char> isInlier(numPoints, 0);
+        for (int i = 0; i < numPoints; i++)
+            isInlier[i] = meanDistances[i] > 0 && meanDistances[i] < distanceThreshold;
+        KeepMasked(this->Points, isInlier);
+        KeepMasked(this->Colors, isInlier);
+        KeepMasked(this->Normals, isInlier);
+        this->InvalidateIndex();
     }
 
     void DFPointCloud::UniformDownsample(int everyKPoints)
     {
-        auto O3DPointCloud = this->Cvt2O3DPointCloud();
-        auto O3DPointCloudDown = O3DPointCloud->UniformDownSample(everyKPoints);
-        this->Points.clear();
-        for (auto &point : O3DPointCloudDown->points_)
-            this->Points.push_back(point);
-        this->Colors.clear();
-        for (auto &color : O3DPointCloudDown->colors_)
-            this->Colors.push_back(color);
-        this->Normals.clear();
-        for (auto &normal : O3DPointCloudDown->normals_)
-            this->Normals.push_back(normal);
+        this->ApplyO3DOperation([everyKPoints](std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud)
+        {
+            return O3DPointCloud->UniformDownSample(everyKPoints);
+        });
     }
 
     void DFPointCloud::DownsampleBySize(int targetSize)
@@ -238,20 +505,13 @@ namespace diffCheck::geometry
         if (numPoints <= targetSize)
             throw std::invalid_argument("The target size must be smaller than the number of points in the cloud.");
         double ratio = (double)targetSize / (double)numPoints;
-        auto O3DPointCloud = this->Cvt2O3DPointCloud();
-        auto O3DPointCloudDown = O3DPointCloud->RandomDownSample(ratio);
-        this->Points.clear();
-        for (auto &point : O3DPointCloudDown->points_)
-            this->Points.push_back(point);
-        this->Colors.clear();
-        for (auto &color : O3DPointCloudDown->colors_)
-            this->Colors.push_back(color);
-        this->Normals.clear();
-        for (auto &normal : O3DPointCloudDown->normals_)
-            this->Normals.push_back(normal);
+        this->ApplyO3DOperation([ratio](std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud)
+        {
+            return O3DPointCloud->RandomDownSample(ratio);
+        });
     }
     
-    std::vector<Eigen::Vector3d> DFPointCloud::GetTightBoundingBox()
+    std::vector<Eigen::Vector3d> DFPointCloud::GetTightBoundingBox() const
     {
         open3d::geometry::OrientedBoundingBox tightOOBB = this->Cvt2O3DPointCloud()->GetMinimalOrientedBoundingBox();
         std::vector<Eigen::Vector3d> bboxPts = tightOOBB.GetBoxPoints();
@@ -260,37 +520,417 @@ namespace diffCheck::geometry
 
     void DFPointCloud::ApplyTransformation(const diffCheck::transformation::DFTransformation &transformation)
     {
-        auto O3DPointCloud = this->Cvt2O3DPointCloud();
-        O3DPointCloud->Transform(transformation.TransformationMatrix);
-        this->Points.clear();
-        this->Colors.clear();
-        this->Normals.clear();
-        this->Cvt2DFPointCloud(O3DPointCloud);
+        // the points are edited in place, so the KD-tree cannot detect the change by itself
+        this->InvalidateIndex();
+        transformation.TransformPoints(this->Points);
+        transformation.TransformNormals(this->Normals);
+    }
+
+    void DFPointCloud::ApplyTransformationBatch(
+        const std::vector<std::shared_ptr<DFPointCloud>> &clouds,
+        const std::vector<diffCheck::transformation::DFTransformation> &transformations)
+    {
+        if (transformations.size() != 1 && transformations.size() != clouds.size())
+            throw std::invalid_argument("The transformations must be given once for all the clouds or once per cloud.");
+
+        for (std::size_t i = 0; i < clouds.size(); i++)
+            clouds[i]->ApplyTransformation(transformations[transformations.size() == 1 ? 0 : i]);
     }
 
     void DFPointCloud::LoadFromPLY(const std::string &path)
     {
         auto cloud = diffCheck::io::ReadPLYPointCloud(path);
+        this->InvalidateIndex();
+
+        this->Points = std::move(cloud->Points);
+        this->Colors = std::move(cloud->Colors);
+        this->Normals = std::move(cloud->Normals);
+    }
+
+    void DFPointCloud::SaveToPLY(
+        const std::string &path,
+        const std::map<std::string, std::vector<double>> &scalarFields,
+        const std::map<std::string, std::vector<int>> &labelFields,
+        bool isDoublePrecision) const
+    {
+        diffCheck::io::WritePLYPointCloud(*this, path, scalarFields, labelFields, isDoublePrecision);
+    }
+
+    void DFPointCloud::SaveCache(const std::string &cachePath, const std::string &sourcePath, bool isDoublePrecision)
+    {
+        std::optional<CloudCacheSourceKey> sourceKey = ComputeCloudCacheSourceKey(sourcePath);
+        if (!sourceKey.has_value())
+            throw std::invalid_argument("The source file of the cache does not exist: " + sourcePath);
+
+        // the graph is only cached if it was built for the current points
+        std::shared_ptr<const NeighborhoodGraphCache> graphCache = std::atomic_load(&this->m_NeighborhoodGraphCache);
+        if (graphCache != nullptr && (graphCache->NumPoints != this->Points.size() || graphCache->PointsHash != this->ComputePointsHash()))
+            graphCache = nullptr;
+
+        CloudCacheHeader header = {};
+        std::memcpy(header.Magic, CLOUD_CACHE_MAGIC, sizeof(header.Magic));
+        header.Version = CLOUD_CACHE_VERSION;
+        header.ScalarSize = isDoublePrecision ? sizeof(double) : sizeof(float);
+        header.NumPoints = this->Points.size();
+        header.NumNormals = this->Normals.size();
+        header.NumColors = this->Colors.size();
+        header.HasGraph = graphCache != nullptr;
+        header.NumGraphIndices = graphCache != nullptr ? graphCache->Graph->Indices.size() : 0;
+        header.GraphKnn = graphCache != nullptr && graphCache->Knn.has_value() ? graphCache->Knn.value() : -1;
+        header.GraphSearchRadius = graphCache != nullptr && graphCache->SearchRadius.has_value() ? graphCache->SearchRadius.value() : -1.0;
+        header.SourceSize = sourceKey->Size;
+        header.SourceModificationTime = sourceKey->ModificationTime;
+        header.SourceFingerprint = sourceKey->Fingerprint;
+
+        // written next to the cache and renamed, so that a reader never sees a partial cache
+        std::string tempPath = cachePath + ".tmp";
+        {
+            std::ofstream stream(tempPath, std::ios::binary | std::ios::trunc);
+            if (!stream.is_open())
+                throw std::invalid_argument("The cache file cannot be written: " + cachePath);
+            stream.write(reinterpret_cast<const char*>(&header), sizeof(header));
+            WriteCloudCacheBlock(stream, this->Points, isDoublePrecision);
+            WriteCloudCacheBlock(stream, this->Normals, isDoublePrecision);
+            WriteCloudCacheBlock(stream, this->Colors, isDoublePrecision);
+            if (graphCache != nullptr)
+            {
+                stream.write(reinterpret_cast<const char*>(graphCache->Graph->Offsets.data()), graphCache->Graph->Offsets.size() * sizeof(int));
+                stream.write(reinterpret_cast<const char*>(graphCache->Graph->Indices.data()), graphCache->Graph->Indices.size() * sizeof(int));
+            }
+            if (!stream)
+                throw std::runtime_error("Failed to write the cache file: " + cachePath);
+        }
+        std::filesystem::rename(tempPath, cachePath);
+    }
+
+    bool DFPointCloud::LoadCache(const std::string &cachePath, const std::string &sourcePath)
+    {
+        std::ifstream stream(cachePath, std::ios::binary);
+        if (!stream.is_open())
+            return false;
+
+        CloudCacheHeader header;
+        if (!stream.read(reinterpret_cast<char*>(&header), sizeof(header))
+            || std::memcmp(header.Magic, CLOUD_CACHE_MAGIC, sizeof(header.Magic)) != 0
+            || header.Version != CLOUD_CACHE_VERSION
+            || (header.ScalarSize != sizeof(double) && header.ScalarSize != sizeof(float)))
+        {
+            DIFFCHECK_WARN(("The file " + cachePath + " is not a valid point cloud cache.").c_str());
+            return false;
+        }
+
+        if (!sourcePath.empty())
+        {
+            std::optional<CloudCacheSourceKey> sourceKey = ComputeCloudCacheSourceKey(sourcePath);
+            if (!sourceKey.has_value()
+                || sourceKey->Size != header.SourceSize
+                || sourceKey->ModificationTime != header.SourceModificationTime
+                || sourceKey->Fingerprint != header.SourceFingerprint)
+            {
+                DIFFCHECK_INFO(("The cache " + cachePath + " is out of date.").c_str());
+                return false;
+            }
+        }
+
+        // checking the size of the file before allocating protects from truncated caches and corrupted headers
+        std::uint64_t expectedSize = sizeof(header) + (header.NumPoints + header.NumNormals + header.NumColors) * 3 * header.ScalarSize;
+        if (header.HasGraph)
+            expectedSize += (header.NumPoints + 1 + header.NumGraphIndices) * sizeof(int);
+        if (std::filesystem::file_size(cachePath) != expectedSize)
+        {
+            DIFFCHECK_WARN(("The cache " + cachePath + " is truncated or corrupted.").c_str());
+            return false;
+        }
+
+        bool isDoublePrecision = header.ScalarSize == sizeof(double);
+        std::vector<Eigen::Vector3d> points, normals, colors;
+        std::shared_ptr<DFNeighborhoodGraph> graph;
+        bool isRead = ReadCloudCacheBlock(stream, points, header.NumPoints, isDoublePrecision)
+            && ReadCloudCacheBlock(stream, normals, header.NumNormals, isDoublePrecision)
+            && ReadCloudCacheBlock(stream, colors, header.NumColors, isDoublePrecision);
+        if (isRead && header.HasGraph)
+        {
+            graph = std::make_shared<DFNeighborhoodGraph>();
+            graph->Offsets.resize(header.NumPoints + 1);
+            graph->Indices.resize(header.NumGraphIndices);
+            isRead = stream.read(reinterpret_cast<char*>(graph->Offsets.data()), graph->Offsets.size() * sizeof(int))
+                && stream.read(reinterpret_cast<char*>(graph->Indices.data()), graph->Indices.size() * sizeof(int));
+        }
+        if (!isRead)
+        {
+            DIFFCHECK_WARN(("Failed to read the cache " + cachePath + ".").c_str());
+            return false;
+        }
+        if (graph != nullptr && !IsValidNeighborhoodGraph(*graph, header.NumPoints))
+        {
+            DIFFCHECK_WARN(("The neighborhood graph of the cache " + cachePath + " is corrupted.").c_str());
+            return false;
+        }
+
+        this->InvalidateIndex();
+        this->Points = std::move(points);
+        this->Normals = std::move(normals);
+        this->Colors = std::move(colors);
+
+        if (graph != nullptr)
+        {
+            std::shared_ptr<NeighborhoodGraphCache> newCache = std::make_shared<NeighborhoodGraphCache>();
+            newCache->Graph = graph;
+            if (header.GraphKnn >= 0)
+                newCache->Knn = static_cast<int>(header.GraphKnn);
+            if (header.GraphSearchRadius >= 0)
+                newCache->SearchRadius = header.GraphSearchRadius;
+            newCache->PointsHash = this->ComputePointsHash();
+            newCache->NumPoints = this->Points.size();
+            std::atomic_store(&this->m_NeighborhoodGraphCache, std::shared_ptr<const NeighborhoodGraphCache>(newCache));
+        }
+        return true;
+    }
+
+    bool DFPointCloud::LoadFromPLYCached(const std::string &path, const std::string &cachePath)
+    {
+        if (!std::filesystem::is_regular_file(path))
+            throw std::invalid_argument("The PLY file does not exist: " + path);
+
+        std::string resolvedCachePath = cachePath.empty() ? std::filesystem::path(path).replace_extension(".dfcache").string() : cachePath;
+        if (this->LoadCache(resolvedCachePath, path))
+            return true;
+
+        this->LoadFromPLY(path);
+        try
+        {
+            this->SaveCache(resolvedCachePath, path);
+        }
+        catch (const std::exception &e)
+        {
+            // e.g. a read-only folder, the cloud is loaded anyway
+            DIFFCHECK_WARN(("Failed to write the cache of the point cloud: " + std::string(e.what())).c_str());
+        }
+        return false;
+    }
+
+    void DFPointCloud::BuildIndex()
+    {
+        this->GetIndex();
+    }
+
+    void DFPointCloud::InvalidateIndex()
+    {
+        std::atomic_store(&this->m_Index, std::shared_ptr<const KDTreeIndex>());
+        std::atomic_store(&this->m_NeighborhoodGraphCache, std::shared_ptr<const NeighborhoodGraphCache>());
+    }
+
+    bool DFPointCloud::HasIndex() const
+    {
+        std::shared_ptr<const KDTreeIndex> index = std::atomic_load(&this->m_Index);
+        return index != nullptr
+            && index->NumPoints == this->Points.size()
+            && index->PointsHash == this->ComputePointsHash();
+    }
+
+    std::shared_ptr<const open3d::geometry::KDTreeFlann> DFPointCloud::GetKDTree()
+    {
+        std::shared_ptr<const KDTreeIndex> index = this->GetIndex();
+        if (index == nullptr)
+            return nullptr;
+        // the returned pointer shares the ownership of the whole index
+        return std::shared_ptr<const open3d::geometry::KDTreeFlann>(index, &index->KDTree);
+    }
+
+    std::uint64_t DFPointCloud::ComputePointsHash() const
+    {
+        return diffCheck::HashWords(diffCheck::FNV1A_OFFSET_BASIS, this->Points.data(), this->Points.size() * sizeof(Eigen::Vector3d));
+    }
+
+    std::shared_ptr<const DFPointCloud::KDTreeIndex> DFPointCloud::GetIndex()
+    {
+        return this->GetIndex(this->ComputePointsHash());
+    }
+
+    std::shared_ptr<const DFPointCloud::KDTreeIndex> DFPointCloud::GetIndex(std::uint64_t pointsHash)
+    {
+        if (this->Points.empty())
+            return nullptr;
+        auto isUpToDate = [&](const std::shared_ptr<const KDTreeIndex> &index)
+        {
+            return index != nullptr && index->PointsHash == pointsHash && index->NumPoints == this->Points.size();
+        };
+        std::shared_ptr<const KDTreeIndex> index = std::atomic_load(&this->m_Index);
+        if (isUpToDate(index))
+            return index;
+
+        // another thread may have built the tree while this one was waiting
+        std::lock_guard<std::mutex> lock(this->m_IndexBuildMutex.Mutex);
+        index = std::atomic_load(&this->m_Index);
+        if (isUpToDate(index))
+            return index;
+
+        std::shared_ptr<KDTreeIndex> newIndex = std::make_shared<KDTreeIndex>();
+        newIndex->KDTree.SetMatrixData(Eigen::MatrixXd(MapAsMatrix3Xd(this->Points)));
+        newIndex->PointsHash = pointsHash;
+        newIndex->NumPoints = this->Points.size();
+        index = newIndex;
+        std::atomic_store(&this->m_Index, index);
+        return index;
+    }
+
+    std::tuple<std::vector<int>, std::vector<double>> DFPointCloud::QueryKNN(const std::vector<Eigen::Vector3d> &queryPoints, int knn)
+    {
+        if (knn < 1)
+            throw std::invalid_argument("The number of neighbors must be greater than 0.");
+
+        std::vector<int> indices(queryPoints.size() * knn, -1);
+        std::vector<double> distances(queryPoints.size() * knn, std::numeric_limits<double>::infinity());
+        std::shared_ptr<const KDTreeIndex> index = this->GetIndex();
+        if (index == nullptr)
+            return std::make_tuple(std::move(indices), std::move(distances));
+
+        int numQueries = static_cast<int>(queryPoints.size());
+        #pragma omp parallel for
+        for (int i = 0; i < numQueries; i++)
+        {
+            std::vector<int> neighborIndices;
+            std::vector<double> neighborSquaredDistances;
+            int numNeighbors = index->KDTree.SearchKNN(queryPoints[i], knn, neighborIndices, neighborSquaredDistances);
+            std::size_t offset = static_cast<std::size_t>(i) * knn;
+            for (int j = 0; j < numNeighbors; j++)
+            {
+                indices[offset + j] = neighborIndices[j];
+                distances[offset + j] = std::sqrt(neighborSquaredDistances[j]);
+            }
+        }
+        return std::make_tuple(std::move(indices), std::move(distances));
+    }
+
+    std::tuple<std::vector<int>, std::vector<double>, std::vector<int>> DFPointCloud::QueryRadius(const std::vector<Eigen::Vector3d> &queryPoints, double radius)
+    {
+        if (radius <= 0)
+            throw std::invalid_argument("The search radius must be greater than 0.");
 
-        this->Points = cloud->Points;
-        this->Colors = cloud->Colors;
-        this->Normals = cloud->Normals;
+        int numQueries = static_cast<int>(queryPoints.size());
+        std::vector<std::vector<int>> neighborIndices(numQueries);
+        std::vector<std::vector<double>> neighborDistances(numQueries);
+        std::shared_ptr<const KDTreeIndex> index = this->GetIndex();
+        if (index != nullptr)
+        {
+            #pragma omp parallel for
+            for (int i = 0; i < numQueries; i++)
+            {
+                index->KDTree.SearchRadius(queryPoints[i], radius, neighborIndices[i], neighborDistances[i]);
+                for (double &distance : neighborDistances[i])
+                    distance = std::sqrt(distance);
+            }
+        }
+
+        // flatten the neighborhoods, the offsets delimit the neighbors of each query point
+        std::vector<int> offsets(numQueries + 1, 0);
+        for (int i = 0; i < numQueries; i++)
+            offsets[i + 1] = offsets[i] + static_cast<int>(neighborIndices[i].size());
+        std::vector<int> indices(offsets.back());
+        std::vector<double> distances(offsets.back());
+        for (int i = 0; i < numQueries; i++)
+        {
+            std::copy(neighborIndices[i].begin(), neighborIndices[i].end(), indices.begin() + offsets[i]);
+            std::copy(neighborDistances[i].begin(), neighborDistances[i].end(), distances.begin() + offsets[i]);
+        }
+        return std::make_tuple(std::move(indices), std::move(distances), std::move(offsets));
+    }
+
+    std::tuple<std::vector<int>, std::vector<double>> DFPointCloud::QueryNearest(const std::vector<Eigen::Vector3d> &queryPoints)
+    {
+        return this->QueryKNN(queryPoints, 1);
+    }
+
+    std::shared_ptr<const DFNeighborhoodGraph> DFPointCloud::GetNeighborhoodGraph(
+        std::optional<int> knn,
+        std::optional<double> searchRadius,
+        int numThreads)
+    {
+        if (!knn.has_value() && !searchRadius.has_value())
+            throw std::invalid_argument("The neighborhood needs a number of neighbors or a search radius.");
+        if (knn.has_value() && knn.value() < 1)
+            throw std::invalid_argument("The number of neighbors must be greater than 0.");
+        if (searchRadius.has_value() && searchRadius.value() <= 0)
+            throw std::invalid_argument("The search radius must be greater than 0.");
+
+        std::uint64_t pointsHash = this->ComputePointsHash();
+        auto isUpToDate = [&](const std::shared_ptr<const NeighborhoodGraphCache> &cache)
+        {
+            return cache != nullptr
+                && cache->Knn == knn
+                && cache->SearchRadius == searchRadius
+                && cache->PointsHash == pointsHash
+                && cache->NumPoints == this->Points.size();
+        };
+        std::shared_ptr<const NeighborhoodGraphCache> cache = std::atomic_load(&this->m_NeighborhoodGraphCache);
+        if (isUpToDate(cache))
+            return cache->Graph;
+
+        // another thread may have built the same graph while this one was waiting
+        std::lock_guard<std::mutex> lock(this->m_NeighborhoodGraphBuildMutex.Mutex);
+        cache = std::atomic_load(&this->m_NeighborhoodGraphCache);
+        if (isUpToDate(cache))
+            return cache->Graph;
+
+        int numPoints = this->GetNumPoints();
+        std::vector<std::vector<int>> neighborIndices(numPoints);
+        std::shared_ptr<const KDTreeIndex> index = this->GetIndex(pointsHash);
+        if (index != nullptr)
+        {
+            #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+            for (int i = 0; i < numPoints; i++)
+            {
+                std::vector<double> neighborSquaredDistances;
+                if (knn.has_value() && searchRadius.has_value())
+                    index->KDTree.SearchHybrid(this->Points[i], searchRadius.value(), knn.value(), neighborIndices[i], neighborSquaredDistances);
+                else if (knn.has_value())
+                    index->KDTree.SearchKNN(this->Points[i], knn.value(), neighborIndices[i], neighborSquaredDistances);
+                else
+                    index->KDTree.SearchRadius(this->Points[i], searchRadius.value(), neighborIndices[i], neighborSquaredDistances);
+            }
+        }
+
+        // flatten the neighborhoods in compressed rows
+        std::shared_ptr<DFNeighborhoodGraph> graph = std::make_shared<DFNeighborhoodGraph>();
+        graph->Offsets.assign(numPoints + 1, 0);
+        for (int i = 0; i < numPoints; i++)
+            graph->Offsets[i + 1] = graph->Offsets[i] + static_cast<int>(neighborIndices[i].size());
+        graph->Indices.resize(graph->Offsets.back());
+        #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+        for (int i = 0; i < numPoints; i++)
+        {
+            std::copy(neighborIndices[i].begin(), neighborIndices[i].end(), graph->Indices.begin() + graph->Offsets[i]);
+            std::vector<int>().swap(neighborIndices[i]);
+        }
+
+        std::shared_ptr<NeighborhoodGraphCache> newCache = std::make_shared<NeighborhoodGraphCache>();
+        newCache->Graph = graph;
+        newCache->Knn = knn;
+        newCache->SearchRadius = searchRadius;
+        newCache->PointsHash = pointsHash;
+        newCache->NumPoints = this->Points.size();
+        std::atomic_store(&this->m_NeighborhoodGraphCache, std::shared_ptr<const NeighborhoodGraphCache>(newCache));
+        return graph;
     }
 
     std::vector<double> DFPointCloud::ComputeDistance(std::shared_ptr<geometry::DFPointCloud> target)
     {
-        std::vector<double> errors;
-        auto O3DSourcePointCloud = this->Cvt2O3DPointCloud();
-        auto O3DTargetPointCloud = target->Cvt2O3DPointCloud();
-        
+        std::vector<int> nearestIndices;
         std::vector<double> distances;
+        std::tie(nearestIndices, distances) = target->QueryNearest(this->Points);
 
-        distances = O3DSourcePointCloud->ComputePointCloudDistance(*O3DTargetPointCloud);
+        // as in open3d, the distance is 0 if there is no point in the target
+        for (std::size_t i = 0; i < distances.size(); i++)
+        {
+            if (nearestIndices[i] < 0)
+                distances[i] = 0.0;
+        }
         return distances;
     }
 
     void DFPointCloud::AddPoints(const DFPointCloud &pointCloud)
     {
+        this->InvalidateIndex();
         this->Points.insert(this->Points.end(), pointCloud.Points.begin(), pointCloud.Points.end());
         this->Colors.insert(this->Colors.end(), pointCloud.Colors.begin(), pointCloud.Colors.end());
         this->Normals.insert(this->Normals.end(), pointCloud.Normals.begin(), pointCloud.Normals.end());
@@ -1,6 +1,11 @@
 #pragma once
 
+#include <cstdint>
+#include <map>
+#include <memory>
+#include <mutex>
 #include <optional>
+#include <tuple>
 #include <Eigen/Core>
 #include <open3d/Open3D.h>
 
@@ -11,6 +16,19 @@
 
 namespace diffCheck::geometry
 {
+    /**
+     * @brief Neighborhood graph of the points of a cloud, stored as compressed rows: the neighbors of the point i
+     * are Indices[Offsets[i]] to Indices[Offsets[i+1] - 1], the point itself included.
+     */
+    struct DFNeighborhoodGraph
+    {
+        std::vector<int> Indices;
+        std::vector<int> Offsets;
+
+        /// @brief Number of points of the graph
+        int GetNumPoints() const { return this->Offsets.empty() ? 0 : static_cast<int>(this->Offsets.size()) - 1; }
+    };
+
     class DFPointCloud
     {
     public:
@@ -38,14 +56,30 @@ namespace diffCheck::geometry
          * 
          * @return std::shared_ptr<open3d::geometry::PointCloud> the open3d point cloud
          */
-        std::shared_ptr<open3d::geometry::PointCloud> Cvt2O3DPointCloud();
+        std::shared_ptr<open3d::geometry::PointCloud> Cvt2O3DPointCloud() const;
+
+        /**
+         * @brief Move the buffers of the DFPointCloud into an open3d point cloud without copying them.
+         * The DFPointCloud is left empty until the buffers are moved back with MoveFromO3DPointCloud.
+         * 
+         * @return std::shared_ptr<open3d::geometry::PointCloud> the open3d point cloud owning the buffers
+         */
+        std::shared_ptr<open3d::geometry::PointCloud> MoveToO3DPointCloud();
+
+        /**
+         * @brief Take over the buffers of an open3d point cloud without copying them.
+         * The open3d point cloud is left empty.
+         * 
+         * @param O3DPointCloud the open3d point cloud to move the buffers from
+         */
+        void MoveFromO3DPointCloud(open3d::geometry::PointCloud &O3DPointCloud);
 
         /**
          * @brief Convert DFPointCloud to cilantro point cloud
          * 
          * @return std::shared_ptr<cilantro::PointCloud3f> the cilantro point cloud
          */
-        std::shared_ptr<cilantro::PointCloud3f> Cvt2CilantroPointCloud();
+        std::shared_ptr<cilantro::PointCloud3f> Cvt2CilantroPointCloud() const;
 
     public:  ///< Utilities
         /**
@@ -54,22 +88,53 @@ namespace diffCheck::geometry
          * @return std::vector<Eigen::Vector3d> A vector of two Eigen::Vector3d, with the first one being the minimum
          *  point and the second one the maximum point of the bounding box.
         */
-        std::vector<Eigen::Vector3d> GetAxixAlignedBoundingBox();
+        std::vector<Eigen::Vector3d> GetAxixAlignedBoundingBox() const;
 
         /**
          * @brief Estimate the normals of the point cloud by either knn or if the radius
-         * is provided by hybrid search.
+         * is provided by hybrid search. Without the cilantro evaluator, the normals are computed in parallel
+         * from the neighborhood graph of the cloud, which is kept for the next estimations and segmentations.
          * 
          * <a href=https://www.open3d.org/html/cpp_api/classopen3d_1_1t_1_1geometry_1_1_point_cloud.html#a4937528c4b6194092631f002bccc44d0> Reference from Open3d</a>.
          *
-         * @param useCilantroEvaluator if true, the cilantro evaluator will be used, otherwise the open3d one
+         * @param useCilantroEvaluator if true, the cilantro evaluator will be used, otherwise the native one
          * @param knn the number of nearest neighbors to consider (by default 30)
          * @param searchRadius the radius of the search, by default deactivated (only if useCilantroEvaluator is false)
+         * @param numThreads the number of threads of the native evaluator, all the available ones if 0
          */
         void EstimateNormals(
             bool useCilantroEvaluator = false,
             std::optional<int> knn = 50,
-            std::optional<double> searchRadius = std::nullopt);
+            std::optional<double> searchRadius = std::nullopt,
+            int numThreads = 0);
+
+        /**
+         * @brief Compute the surface variation of every point, the smallest eigenvalue of the covariance of its
+         * neighborhood divided by the sum of the eigenvalues. It is 0 on a plane and 1/3 for isotropic neighborhoods.
+         * 
+         * @param knn the number of nearest neighbors to consider
+         * @param searchRadius the radius of the search, by default deactivated
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::vector<double> the curvature of each point
+         */
+        std::vector<double> ComputeCurvatures(
+            std::optional<int> knn = 50,
+            std::optional<double> searchRadius = std::nullopt,
+            int numThreads = 0);
+
+        /**
+         * @brief Orient the normals consistently by propagating the orientation along the minimum spanning tree of the
+         * neighborhood graph, the edges between parallel normals first. Each connected component starts from its highest
+         * point, whose normal is oriented upwards.
+         * 
+         * @param knn the number of nearest neighbors to consider
+         * @param searchRadius the radius of the search, by default deactivated
+         * @param numThreads the number of threads building the neighborhood graph, all the available ones if 0
+         */
+        void OrientNormalsConsistently(
+            std::optional<int> knn = 50,
+            std::optional<double> searchRadius = std::nullopt,
+            int numThreads = 0);
 
         /**
          * @brief Paint the point cloud with a uniform color
@@ -80,7 +145,8 @@ namespace diffCheck::geometry
         void ApplyColor(int r, int g, int b);
 
         /**
-         * @brief Remove the statistical outilers from the point cloud
+         * @brief Remove the statistical outilers from the point cloud. It follows the open3d implementation
+         * but it queries the spatial index of the cloud.
          * 
          * @param nbNeighbors the number of neighbors to consider
          * @param stdRatio the standard deviation ratio
@@ -135,16 +201,26 @@ namespace diffCheck::geometry
          *  /// 5 ------------------- 4
          *  /// 
         */
-        std::vector<Eigen::Vector3d> GetTightBoundingBox();
+        std::vector<Eigen::Vector3d> GetTightBoundingBox() const;
 
     public:  ///< Transformers
         /**
-         * @brief Apply a transformation to the point cloud
+         * @brief Apply a transformation to the points and normals of the point cloud, in place and in parallel
          * 
          * @param transformation the transformation to apply
          */
         void ApplyTransformation(const diffCheck::transformation::DFTransformation &transformation);
 
+        /**
+         * @brief Apply transformations to many point clouds in one call, e.g. to place all the scans of an assembly
+         * 
+         * @param clouds the point clouds to transform in place
+         * @param transformations the transformation of each cloud, or a single one for all the clouds
+         */
+        static void ApplyTransformationBatch(
+            const std::vector<std::shared_ptr<DFPointCloud>> &clouds,
+            const std::vector<diffCheck::transformation::DFTransformation> &transformations);
+
     public:  ///< I/O loader
         /**
          * @brief Read a point cloud from a file
@@ -153,10 +229,127 @@ namespace diffCheck::geometry
          */
         void LoadFromPLY(const std::string &path);
 
+        /**
+         * @brief Write the point cloud in a binary PLY file, with its normals and colors if any
+         * 
+         * @param path the path to the file with the extension
+         * @param scalarFields per-point scalar fields (e.g. distances) written as float properties
+         * @param labelFields per-point integer fields (e.g. cluster ids) written as int properties
+         * @param isDoublePrecision if true, the points, normals and scalar fields are written as double
+         * 
+         * @see diffCheck::io::WritePLYPointCloud
+         */
+        void SaveToPLY(
+            const std::string &path,
+            const std::map<std::string, std::vector<double>> &scalarFields = {},
+            const std::map<std::string, std::vector<int>> &labelFields = {},
+            bool isDoublePrecision = false) const;
+
+        /**
+         * @brief Save the cloud in the binary cache format of diffCheck: a header followed by the contiguous blocks
+         * of the points, normals and colors, and of the last neighborhood graph if it is up to date. The cache is
+         * keyed on the size, the modification time and a fingerprint of the content of its source file.
+         *
+         * @param cachePath the path to the cache file
+         * @param sourcePath the path to the file the cloud was loaded from, empty if the cache has no source
+         * @param isDoublePrecision if false, the blocks are stored as float32 to halve the size of the cache
+         */
+        void SaveCache(const std::string &cachePath, const std::string &sourcePath = "", bool isDoublePrecision = true);
+
+        /**
+         * @brief Load the cloud from a cache written by SaveCache. The cache is rejected if it is missing, corrupted
+         * or if its source file changed since it was written, and the cloud is left untouched.
+         *
+         * @param cachePath the path to the cache file
+         * @param sourcePath the path to the source file to check the cache against, empty to skip the check
+         * @return true if the cloud was loaded from the cache
+         */
+        bool LoadCache(const std::string &cachePath, const std::string &sourcePath = "");
+
+        /**
+         * @brief Read a point cloud from a PLY file through its cache: the cache is loaded if it is up to date,
+         * otherwise the PLY file is parsed and the cache is (re)written next to it.
+         *
+         * @param path the path to the PLY file
+         * @param cachePath the path to the cache file, the path of the PLY file with the extension .dfcache if empty
+         * @return true if the cloud was loaded from the cache
+         */
+        bool LoadFromPLYCached(const std::string &path, const std::string &cachePath = "");
+
+    public:  ///< Spatial index
+        /**
+         * @brief Build the KD-tree of the points. The queries build it lazily, and it is rebuilt as soon as the points
+         * change, including in place edits from outside the class (e.g. through a writeable numpy view): each query
+         * batch checks a hash of the points, so prefer querying many points at once.
+         */
+        void BuildIndex();
+
+        /// @brief Drop the KD-tree and the neighborhood graph of the points to free their memory, they will be rebuilt by the next query
+        void InvalidateIndex();
+
+        /// @brief Check if the KD-tree of the points is built and up to date
+        bool HasIndex() const;
+
+        /**
+         * @brief Get the KD-tree of the points, built if it is missing or out of date, to run many single point
+         * searches without checking the points again, e.g. in a loop with an early exit. The tree is never modified:
+         * it keeps describing the points it was built for even if the cloud changes afterwards.
+         * 
+         * @return std::shared_ptr<const open3d::geometry::KDTreeFlann> the KD-tree, nullptr if the cloud is empty
+         */
+        std::shared_ptr<const open3d::geometry::KDTreeFlann> GetKDTree();
+
+        /**
+         * @brief Find the k nearest neighbors of a batch of query points
+         * 
+         * @param queryPoints the points to query
+         * @param knn the number of neighbors for each query point
+         * @return std::tuple<std::vector<int>, std::vector<double>> the indices of the neighbors in the cloud and their
+         * distances (not squared), stored row-major with knn entries per query point sorted by distance. Missing
+         * neighbors (if the cloud has less than knn points) have an index of -1 and an infinite distance.
+         */
+        std::tuple<std::vector<int>, std::vector<double>> QueryKNN(const std::vector<Eigen::Vector3d> &queryPoints, int knn);
+
+        /**
+         * @brief Find the neighbors within a radius of a batch of query points
+         * 
+         * @param queryPoints the points to query
+         * @param radius the search radius
+         * @return std::tuple<std::vector<int>, std::vector<double>, std::vector<int>> the indices of the neighbors in the cloud,
+         * their distances (not squared) and the offsets of each query point: the neighbors of the query point i are stored
+         * between offsets[i] and offsets[i+1].
+         */
+        std::tuple<std::vector<int>, std::vector<double>, std::vector<int>> QueryRadius(const std::vector<Eigen::Vector3d> &queryPoints, double radius);
+
+        /**
+         * @brief Find the nearest point of the cloud for a batch of query points
+         * 
+         * @param queryPoints the points to query
+         * @return std::tuple<std::vector<int>, std::vector<double>> the index of the nearest point and its distance for each
+         * query point, -1 and an infinite distance if the cloud is empty
+         */
+        std::tuple<std::vector<int>, std::vector<double>> QueryNearest(const std::vector<Eigen::Vector3d> &queryPoints);
+
+        /**
+         * @brief Get the neighborhood graph of the points, computed in parallel from the KD-tree. The last graph is kept
+         * on the cloud and returned as long as the points and the neighborhood parameters do not change, it is dropped
+         * with the KD-tree by InvalidateIndex.
+         * 
+         * @param knn the number of nearest neighbors, or the maximum number of neighbors if a search radius is given
+         * @param searchRadius the radius of the search, a pure radius search if knn is not given
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::shared_ptr<const DFNeighborhoodGraph> the neighborhood graph
+         */
+        std::shared_ptr<const DFNeighborhoodGraph> GetNeighborhoodGraph(
+            std::optional<int> knn,
+            std::optional<double> searchRadius = std::nullopt,
+            int numThreads = 0);
+
     public:  ///< Distance calculations
         /**
          * @brief Compute the distance between two point clouds.
          * For every point in the source point cloud, it looks in the KDTree of the target point cloud and finds the closest point.
+         * The KDTree of the target is kept and reused by the next calls.
          * It returns a vector of distances, one for each point in the source point cloud.
          * 
          * @param target the target point cloud in format df
@@ -190,6 +383,87 @@ namespace diffCheck::geometry
         /// @brief Check if the cloud has normals
         bool HasNormals() const { return this->Normals.size() > 0; }
 
+    private:  ///< Open3d operations
+        /**
+         * @brief Run an open3d operation on the buffers of the cloud without copying them. The buffers are
+         * moved into an open3d point cloud, and the buffers of the point cloud returned by the operation are
+         * moved back. If the operation throws, the original buffers are restored. The cloud is empty while the
+         * operation runs, so it must not be read by another thread meanwhile (the bindings keep the GIL).
+         * 
+         * @param operation callable taking the open3d point cloud and returning the resulting open3d point cloud
+         * (it can be the same one for in-place operations)
+         */
+        template <typename O3DOperation>
+        void ApplyO3DOperation(O3DOperation operation)
+        {
+            std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud = this->MoveToO3DPointCloud();
+            std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloudResult;
+            try
+            {
+                O3DPointCloudResult = operation(O3DPointCloud);
+            }
+            catch (...)
+            {
+                this->MoveFromO3DPointCloud(*O3DPointCloud);
+                throw;
+            }
+            this->MoveFromO3DPointCloud(*O3DPointCloudResult);
+        }
+
+    private:  ///< Spatial index
+        /// @brief KD-tree of the points, with the hash of the points it was built for
+        struct KDTreeIndex
+        {
+            open3d::geometry::KDTreeFlann KDTree;
+            std::uint64_t PointsHash = 0;
+            std::size_t NumPoints = 0;
+        };
+
+        /// @brief Mutex serializing the builds of a cache, a copied cloud gets its own one
+        struct CacheBuildMutex
+        {
+            CacheBuildMutex() = default;
+            CacheBuildMutex(const CacheBuildMutex&) {}
+            CacheBuildMutex& operator=(const CacheBuildMutex&) { return *this; }
+            std::mutex Mutex;
+        };
+
+        /// @brief Hash the coordinates of the points, to detect any change of the points since a cache was built
+        std::uint64_t ComputePointsHash() const;
+
+        /**
+         * @brief Get the KD-tree of the points, (re)building it if it is missing or out of date. The index is
+         * swapped atomically so that several threads can query the same cloud, and built by one thread at a time
+         * so that concurrent queries never build it twice.
+         * 
+         * @param pointsHash the current hash of the points, computed once by the calling batch
+         * @return std::shared_ptr<const KDTreeIndex> the KD-tree, nullptr if the cloud is empty
+         */
+        std::shared_ptr<const KDTreeIndex> GetIndex(std::uint64_t pointsHash);
+
+        /// @brief Get the KD-tree of the points for their current hash
+        std::shared_ptr<const KDTreeIndex> GetIndex();
+
+        /// @brief the KD-tree of the points, never modified once built
+        std::shared_ptr<const KDTreeIndex> m_Index;
+        /// @brief serializes the builds of the KD-tree
+        CacheBuildMutex m_IndexBuildMutex;
+
+        /// @brief Neighborhood graph of the points, with the parameters and the hash of the points it was built for
+        struct NeighborhoodGraphCache
+        {
+            std::shared_ptr<const DFNeighborhoodGraph> Graph;
+            std::optional<int> Knn;
+            std::optional<double> SearchRadius;
+            std::uint64_t PointsHash = 0;
+            std::size_t NumPoints = 0;
+        };
+
+        /// @brief the last neighborhood graph of the points, never modified once built
+        std::shared_ptr<const NeighborhoodGraphCache> m_NeighborhoodGraphCache;
+        /// @brief serializes the builds of the neighborhood graph
+        CacheBuildMutex m_NeighborhoodGraphBuildMutex;
+
     public:  ///< Basic point cloud data
         /// @brief Eigen vector of 3D points
         std::vector<Eigen::Vector3d> Points;
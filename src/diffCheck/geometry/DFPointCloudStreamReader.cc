@@ -0,0 +1,432 @@
+#include "diffCheck/geometry/DFPointCloudStreamReader.hh"
+#include "diffCheck/log.hh"
+
+#include <algorithm>
+#include <cstdlib>
+#include <cstring>
+#include <sstream>
+#include <unordered_map>
+
+namespace diffCheck::geometry
+{
+    namespace
+    {
+        /// @brief Hash of the integer coordinates of a voxel
+        struct VoxelKeyHash
+        {
+            std::size_t operator()(const Eigen::Vector3i &key) const
+            {
+                std::size_t hash = static_cast<std::size_t>(key.x()) * 73856093;
+                hash ^= static_cast<std::size_t>(key.y()) * 19349663;
+                hash ^= static_cast<std::size_t>(key.z()) * 83492791;
+                return hash;
+            }
+        };
+
+        /**
+         * @brief Average of the points, normals and colors falling in the voxels of a grid aligned on the origin.
+         * The clouds are added one after the other, only the occupied voxels are kept in memory.
+         */
+        class VoxelAccumulator
+        {
+        public:
+            explicit VoxelAccumulator(double voxelSize) : m_VoxelSize(voxelSize) {}
+
+            /// @brief Add the points of a cloud to their voxels
+            void Add(const DFPointCloud &cloud)
+            {
+                if (this->m_Voxels.empty())
+                {
+                    this->m_HasNormals = cloud.HasNormals();
+                    this->m_HasColors = cloud.HasColors();
+                }
+                for (std::size_t i = 0; i < cloud.Points.size(); i++)
+                {
+                    Eigen::Vector3i key = (cloud.Points[i] / this->m_VoxelSize).array().floor().cast<int>();
+                    auto [voxelEntry, isNew] = this->m_VoxelIndices.try_emplace(key, static_cast<int>(this->m_Voxels.size()));
+                    if (isNew)
+                        this->m_Voxels.emplace_back();
+                    Voxel &voxel = this->m_Voxels[voxelEntry->second];
+                    voxel.Point += cloud.Points[i];
+                    if (this->m_HasNormals && cloud.HasNormals())
+                        voxel.Normal += cloud.Normals[i];
+                    if (this->m_HasColors && cloud.HasColors())
+                        voxel.Color += cloud.Colors[i];
+                    voxel.NumPoints++;
+                }
+            }
+
+            /// @brief Replace the content of a cloud by one averaged point per voxel, in the order the voxels were filled
+            void MoveTo(DFPointCloud &cloud)
+            {
+                cloud.Points.resize(this->m_Voxels.size());
+                cloud.Normals.resize(this->m_HasNormals ? this->m_Voxels.size() : 0);
+                cloud.Colors.resize(this->m_HasColors ? this->m_Voxels.size() : 0);
+                for (std::size_t i = 0; i < this->m_Voxels.size(); i++)
+                {
+                    const Voxel &voxel = this->m_Voxels[i];
+                    cloud.Points[i] = voxel.Point / voxel.NumPoints;
+                    if (this->m_HasNormals)
+                        cloud.Normals[i] = voxel.Normal.normalized();
+                    if (this->m_HasColors)
+                        cloud.Colors[i] = voxel.Color / voxel.NumPoints;
+                }
+                cloud.InvalidateIndex();
+                this->m_Voxels.clear();
+                this->m_VoxelIndices.clear();
+            }
+
+        private:
+            struct Voxel
+            {
+                Eigen::Vector3d Point = Eigen::Vector3d::Zero();
+                Eigen::Vector3d Normal = Eigen::Vector3d::Zero();
+                Eigen::Vector3d Color = Eigen::Vector3d::Zero();
+                int NumPoints = 0;
+            };
+
+            double m_VoxelSize;
+            bool m_HasNormals = false;
+            bool m_HasColors = false;
+            std::unordered_map<Eigen::Vector3i, int, VoxelKeyHash> m_VoxelIndices;
+            std::vector<Voxel> m_Voxels;
+        };
+
+        /// @brief Read a binary scalar of a given size and convert it to a double
+        template <typename T>
+        double ReadBinaryScalar(const char *data, bool swapBytes)
+        {
+            char bytes[sizeof(T)];
+            std::memcpy(bytes, data, sizeof(T));
+            if (swapBytes)
+                std::reverse(bytes, bytes + sizeof(T));
+            T value;
+            std::memcpy(&value, bytes, sizeof(T));
+            return static_cast<double>(value);
+        }
+    }
+
+    DFPointCloudStreamReader::DFPointCloudStreamReader(const std::string &path, int chunkSize)
+        : m_Path(path), m_ChunkSize(chunkSize)
+    {
+        if (chunkSize < 1)
+            throw std::invalid_argument("The chunk size must be greater than 0.");
+        this->m_Stream.open(path, std::ios::binary);
+        if (!this->m_Stream.is_open())
+            throw std::invalid_argument("The PLY file " + path + " cannot be opened.");
+        this->ParseHeader();
+    }
+
+    void DFPointCloudStreamReader::SetCropBox(const Eigen::Vector3d &minBound, const Eigen::Vector3d &maxBound)
+    {
+        if ((minBound.array() > maxBound.array()).any())
+            throw std::invalid_argument("The minimum corner of the crop box must be below its maximum corner.");
+        this->m_CropBox = std::make_pair(minBound, maxBound);
+    }
+
+    void DFPointCloudStreamReader::SetVoxelSize(double voxelSize)
+    {
+        if (voxelSize < 0)
+            throw std::invalid_argument("Voxel size must be positive.");
+        this->m_VoxelSize = voxelSize;
+    }
+
+    void DFPointCloudStreamReader::SetStatisticalFilter(int nbNeighbors, double stdRatio)
+    {
+        if (nbNeighbors < 0 || (nbNeighbors > 0 && stdRatio <= 0))
+            throw std::invalid_argument("The number of neighbors and the standard deviation ratio must be positive.");
+        this->m_StatisticalNbNeighbors = nbNeighbors;
+        this->m_StatisticalStdRatio = stdRatio;
+    }
+
+    std::shared_ptr<DFPointCloud> DFPointCloudStreamReader::ReadChunk()
+    {
+        int numPoints = static_cast<int>(std::min<std::int64_t>(this->m_ChunkSize, this->m_NumPoints - this->m_NumPointsRead));
+        std::shared_ptr<DFPointCloud> chunk = this->ReadVertices(std::max(numPoints, 0));
+        this->FilterChunk(*chunk);
+        if (this->m_VoxelSize > 0)
+        {
+            VoxelAccumulator accumulator(this->m_VoxelSize);
+            accumulator.Add(*chunk);
+            accumulator.MoveTo(*chunk);
+        }
+        return chunk;
+    }
+
+    std::shared_ptr<DFPointCloud> DFPointCloudStreamReader::ReadAll()
+    {
+        std::shared_ptr<DFPointCloud> cloud = std::make_shared<DFPointCloud>();
+        VoxelAccumulator accumulator(this->m_VoxelSize);
+        while (this->HasNext())
+        {
+            int numPoints = static_cast<int>(std::min<std::int64_t>(this->m_ChunkSize, this->m_NumPoints - this->m_NumPointsRead));
+            std::shared_ptr<DFPointCloud> chunk = this->ReadVertices(numPoints);
+            this->FilterChunk(*chunk);
+            if (this->m_VoxelSize > 0)
+                accumulator.Add(*chunk);
+            else
+                cloud->AddPoints(*chunk);
+        }
+        if (this->m_VoxelSize > 0)
+            accumulator.MoveTo(*cloud);
+        return cloud;
+    }
+
+    void DFPointCloudStreamReader::Reset()
+    {
+        this->m_Stream.clear();
+        this->m_Stream.seekg(this->m_VerticesPosition);
+        this->m_NumPointsRead = 0;
+    }
+
+    void DFPointCloudStreamReader::ParseHeader()
+    {
+        const std::unordered_map<std::string, std::pair<PLYType, int>> types = {
+            {"char", {PLYType::Int8, 1}}, {"int8", {PLYType::Int8, 1}},
+            {"uchar", {PLYType::UInt8, 1}}, {"uint8", {PLYType::UInt8, 1}},
+            {"short", {PLYType::Int16, 2}}, {"int16", {PLYType::Int16, 2}},
+            {"ushort", {PLYType::UInt16, 2}}, {"uint16", {PLYType::UInt16, 2}},
+            {"int", {PLYType::Int32, 4}}, {"int32", {PLYType::Int32, 4}},
+            {"uint", {PLYType::UInt32, 4}}, {"uint32", {PLYType::UInt32, 4}},
+            {"float", {PLYType::Float32, 4}}, {"float32", {PLYType::Float32, 4}},
+            {"double", {PLYType::Float64, 8}}, {"float64", {PLYType::Float64, 8}}};
+
+        std::string line;
+        std::getline(this->m_Stream, line);
+        if (line.rfind("ply", 0) != 0)
+            throw std::invalid_argument("The file " + this->m_Path + " is not a PLY file.");
+
+        // the elements before the vertices are skipped: their number of lines if ascii, their size if binary
+        std::int64_t numLinesBeforeVertices = 0;
+        std::int64_t numBytesBeforeVertices = 0;
+        bool hasVertexElement = false;
+        bool isInVertexElement = false;
+        std::int64_t currentElementCount = 0;
+        while (std::getline(this->m_Stream, line))
+        {
+            if (!line.empty() && line.back() == '\r')
+                line.pop_back();
+            std::istringstream tokens(line);
+            std::string keyword;
+            tokens >> keyword;
+            if (keyword == "format")
+            {
+                std::string format;
+                tokens >> format;
+                if (format == "ascii")
+                    this->m_Format = PLYFormat::Ascii;
+                else if (format == "binary_little_endian")
+                    this->m_Format = PLYFormat::BinaryLittleEndian;
+                else if (format == "binary_big_endian")
+                    this->m_Format = PLYFormat::BinaryBigEndian;
+                else
+                    throw std::invalid_argument("The PLY format " + format + " is not supported.");
+            }
+            else if (keyword == "element")
+            {
+                std::string name;
+                tokens >> name >> currentElementCount;
+                isInVertexElement = name == "vertex";
+                if (isInVertexElement)
+                {
+                    hasVertexElement = true;
+                    this->m_NumPoints = currentElementCount;
+                }
+                else if (!hasVertexElement)
+                    numLinesBeforeVertices += currentElementCount;
+            }
+            else if (keyword == "property")
+            {
+                std::string typeName;
+                std::string name;
+                tokens >> typeName;
+                if (typeName == "list")
+                {
+                    if (isInVertexElement)
+                        throw std::invalid_argument("The list properties of the vertices are not supported.");
+                    if (!hasVertexElement && this->m_Format != PLYFormat::Ascii)
+                        throw std::invalid_argument("The binary PLY elements with lists before the vertices are not supported.");
+                    continue;
+                }
+                tokens >> name;
+                auto type = types.find(typeName);
+                if (type == types.end())
+                    throw std::invalid_argument("The PLY property type " + typeName + " is not supported.");
+                if (isInVertexElement)
+                {
+                    this->m_Properties.push_back({name, type->second.first, this->m_VertexSize});
+                    this->m_VertexSize += type->second.second;
+                }
+                else if (!hasVertexElement)
+                    numBytesBeforeVertices += currentElementCount * type->second.second;
+            }
+            else if (keyword == "end_header")
+                break;
+        }
+        if (!hasVertexElement)
+            throw std::invalid_argument("The PLY file " + this->m_Path + " has no vertex element.");
+
+        // map the properties to the point attributes
+        const std::array<std::string, 3> pointNames = {"x", "y", "z"};
+        const std::array<std::string, 3> normalNames = {"nx", "ny", "nz"};
+        const std::array<std::string, 3> colorNames = {"red", "green", "blue"};
+        const std::array<std::string, 3> diffuseColorNames = {"diffuse_red", "diffuse_green", "diffuse_blue"};
+        for (int i = 0; i < static_cast<int>(this->m_Properties.size()); i++)
+        {
+            const std::string &name = this->m_Properties[i].Name;
+            for (int axis = 0; axis < 3; axis++)
+            {
+                if (name == pointNames[axis])
+                    this->m_PointProperties[axis] = i;
+                else if (name == normalNames[axis])
+                    this->m_NormalProperties[axis] = i;
+                else if (name == colorNames[axis] || name == diffuseColorNames[axis])
+                    this->m_ColorProperties[axis] = i;
+            }
+        }
+        if (*std::min_element(this->m_PointProperties.begin(), this->m_PointProperties.end()) < 0)
+            throw std::invalid_argument("The vertices of the PLY file " + this->m_Path + " have no x, y, z properties.");
+        if (*std::min_element(this->m_NormalProperties.begin(), this->m_NormalProperties.end()) < 0)
+            this->m_NormalProperties = {-1, -1, -1};
+        if (*std::min_element(this->m_ColorProperties.begin(), this->m_ColorProperties.end()) < 0)
+            this->m_ColorProperties = {-1, -1, -1};
+
+        // place the stream on the first vertex
+        if (this->m_Format == PLYFormat::Ascii)
+        {
+            for (std::int64_t i = 0; i < numLinesBeforeVertices; i++)
+                std::getline(this->m_Stream, line);
+        }
+        else
+            this->m_Stream.seekg(numBytesBeforeVertices, std::ios::cur);
+        this->m_VerticesPosition = this->m_Stream.tellg();
+
+        DIFFCHECK_INFO(("Streaming " + std::to_string(this->m_NumPoints) + " vertices from " + this->m_Path).c_str());
+    }
+
+    std::shared_ptr<DFPointCloud> DFPointCloudStreamReader::ReadVertices(int numPoints)
+    {
+        std::shared_ptr<DFPointCloud> chunk = std::make_shared<DFPointCloud>();
+        if (numPoints <= 0)
+            return chunk;
+        chunk->Points.resize(numPoints);
+        if (this->HasNormals())
+            chunk->Normals.resize(numPoints);
+        if (this->HasColors())
+            chunk->Colors.resize(numPoints);
+
+        // as in open3d, the integer color channels are normalized by their maximum value
+        std::array<double, 3> colorScales = {1.0, 1.0, 1.0};
+        for (int axis = 0; axis < 3 && this->HasColors(); axis++)
+        {
+            PLYType colorType = this->m_Properties[this->m_ColorProperties[axis]].Type;
+            if (colorType == PLYType::UInt8)
+                colorScales[axis] = 1.0 / 255.0;
+            else if (colorType == PLYType::UInt16)
+                colorScales[axis] = 1.0 / 65535.0;
+        }
+
+        // the values of a vertex are converted to doubles in the order of the properties, then dispatched
+        int numProperties = static_cast<int>(this->m_Properties.size());
+        auto dispatchValues = [&](int i, const std::vector<double> &values)
+        {
+            for (int axis = 0; axis < 3; axis++)
+            {
+                chunk->Points[i][axis] = values[this->m_PointProperties[axis]];
+                if (this->HasNormals())
+                    chunk->Normals[i][axis] = values[this->m_NormalProperties[axis]];
+                if (this->HasColors())
+                    chunk->Colors[i][axis] = values[this->m_ColorProperties[axis]] * colorScales[axis];
+            }
+        };
+
+        if (this->m_Format == PLYFormat::Ascii)
+        {
+            std::vector<std::string> lines(numPoints);
+            for (int i = 0; i < numPoints; i++)
+            {
+                if (!std::getline(this->m_Stream, lines[i]))
+                    throw std::invalid_argument("The PLY file " + this->m_Path + " ends before its last vertex.");
+            }
+            #pragma omp parallel
+            {
+                std::vector<double> values(numProperties);
+                #pragma omp for
+                for (int i = 0; i < numPoints; i++)
+                {
+                    const char *cursor = lines[i].c_str();
+                    for (int k = 0; k < numProperties; k++)
+                    {
+                        char *end = nullptr;
+                        values[k] = std::strtod(cursor, &end);
+                        cursor = end;
+                    }
+                    dispatchValues(i, values);
+                }
+            }
+        }
+        else
+        {
+            std::vector<char> buffer(static_cast<std::size_t>(numPoints) * this->m_VertexSize);
+            this->m_Stream.read(buffer.data(), buffer.size());
+            if (this->m_Stream.gcount() != static_cast<std::streamsize>(buffer.size()))
+                throw std::invalid_argument("The PLY file " + this->m_Path + " ends before its last vertex.");
+            bool swapBytes = this->m_Format == PLYFormat::BinaryBigEndian;
+            #pragma omp parallel
+            {
+                std::vector<double> values(numProperties);
+                #pragma omp for
+                for (int i = 0; i < numPoints; i++)
+                {
+                    const char *vertex = buffer.data() + static_cast<std::size_t>(i) * this->m_VertexSize;
+                    for (int k = 0; k < numProperties; k++)
+                    {
+                        const char *data = vertex + this->m_Properties[k].Offset;
+                        switch (this->m_Properties[k].Type)
+                        {
+                            case PLYType::Int8: values[k] = ReadBinaryScalar<std::int8_t>(data, swapBytes); break;
+                            case PLYType::UInt8: values[k] = ReadBinaryScalar<std::uint8_t>(data, swapBytes); break;
+                            case PLYType::Int16: values[k] = ReadBinaryScalar<std::int16_t>(data, swapBytes); break;
+                            case PLYType::UInt16: values[k] = ReadBinaryScalar<std::uint16_t>(data, swapBytes); break;
+                            case PLYType::Int32: values[k] = ReadBinaryScalar<std::int32_t>(data, swapBytes); break;
+                            case PLYType::UInt32: values[k] = ReadBinaryScalar<std::uint32_t>(data, swapBytes); break;
+                            case PLYType::Float32: values[k] = ReadBinaryScalar<float>(data, swapBytes); break;
+                            case PLYType::Float64: values[k] = ReadBinaryScalar<double>(data, swapBytes); break;
+                        }
+                    }
+                    dispatchValues(i, values);
+                }
+            }
+        }
+        this->m_NumPointsRead += numPoints;
+        return chunk;
+    }
+
+    void DFPointCloudStreamReader::FilterChunk(DFPointCloud &chunk) const
+    {
+        if (this->m_CropBox.has_value())
+        {
+            const Eigen::Vector3d &minBound = this->m_CropBox->first;
+            const Eigen::Vector3d &maxBound = this->m_CropBox->second;
+            std::size_t kept = 0;
+            for (std::size_t i = 0; i < chunk.Points.size(); i++)
+            {
+                if ((chunk.Points[i].array() < minBound.array()).any() || (chunk.Points[i].array() > maxBound.array()).any())
+                    continue;
+                chunk.Points[kept] = chunk.Points[i];
+                if (chunk.HasNormals())
+                    chunk.Normals[kept] = chunk.Normals[i];
+                if (chunk.HasColors())
+                    chunk.Colors[kept] = chunk.Colors[i];
+                kept++;
+            }
+            chunk.Points.resize(kept);
+            if (chunk.HasNormals())
+                chunk.Normals.resize(kept);
+            if (chunk.HasColors())
+                chunk.Colors.resize(kept);
+        }
+        if (this->m_StatisticalNbNeighbors > 0 && chunk.HasPoints())
+            chunk.RemoveStatisticalOutliers(this->m_StatisticalNbNeighbors, this->m_StatisticalStdRatio);
+    }
+} // namespace diffCheck::geometry
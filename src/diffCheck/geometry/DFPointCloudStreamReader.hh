@@ -0,0 +1,153 @@
+#pragma once
+
+#include <array>
+#include <cstdint>
+#include <fstream>
+#include <optional>
+#include <string>
+#include <Eigen/Core>
+
+#include "diffCheck/geometry/DFPointCloud.hh"
+
+namespace diffCheck::geometry
+{
+    /**
+     * @brief Out-of-core reader of the vertices of a PLY file (ascii or binary). The points are read by chunks of
+     * fixed size, so that a scan larger than the memory can be reduced to a working cloud on the fly by cropping it,
+     * filtering its statistical outliers and downsampling it on a voxel grid.
+     */
+    class DFPointCloudStreamReader
+    {
+    public:
+        /**
+         * @brief Open a PLY file and parse its header
+         *
+         * @param path the path to the PLY file
+         * @param chunkSize the number of vertices read by chunk
+         */
+        DFPointCloudStreamReader(const std::string &path, int chunkSize = 1000000);
+        ~DFPointCloudStreamReader() = default;
+
+    public:  ///< Filters applied on the fly
+        /**
+         * @brief Keep only the points inside an axis-aligned bounding box
+         *
+         * @param minBound the minimum corner of the box
+         * @param maxBound the maximum corner of the box
+         */
+        void SetCropBox(const Eigen::Vector3d &minBound, const Eigen::Vector3d &maxBound);
+
+        /**
+         * @brief Downsample the points on a voxel grid aligned on the origin, each voxel being replaced by the average
+         * of its points, normals and colors. ReadChunk downsamples each chunk on its own, ReadAll the whole file.
+         *
+         * @param voxelSize the size of the voxels, 0 to deactivate the downsampling
+         */
+        void SetVoxelSize(double voxelSize);
+
+        /**
+         * @brief Remove the statistical outliers of each chunk, before its downsampling
+         *
+         * @param nbNeighbors the number of neighbors to consider, 0 to deactivate the filter
+         * @param stdRatio the standard deviation ratio
+         *
+         * @see DFPointCloud::RemoveStatisticalOutliers
+         */
+        void SetStatisticalFilter(int nbNeighbors, double stdRatio);
+
+    public:  ///< Reading
+        /// @brief Check if there are vertices left to read
+        bool HasNext() const { return this->m_NumPointsRead < this->m_NumPoints; }
+
+        /**
+         * @brief Read the next chunk of vertices and apply the filters to it
+         *
+         * @return std::shared_ptr<DFPointCloud> the filtered chunk, it can be empty if all its points are filtered out
+         */
+        std::shared_ptr<DFPointCloud> ReadChunk();
+
+        /**
+         * @brief Read all the remaining vertices chunk by chunk and merge the filtered chunks. With a voxel size, only
+         * the occupied voxels of the whole file are kept in memory.
+         *
+         * @return std::shared_ptr<DFPointCloud> the filtered point cloud
+         */
+        std::shared_ptr<DFPointCloud> ReadAll();
+
+        /// @brief Go back to the first vertex of the file
+        void Reset();
+
+    public:  ///< Getters
+        /// @brief Number of vertices in the file
+        std::int64_t GetNumPoints() const { return this->m_NumPoints; }
+        /// @brief Number of vertices already read
+        std::int64_t GetNumPointsRead() const { return this->m_NumPointsRead; }
+        /// @brief Check if the vertices have normals
+        bool HasNormals() const { return this->m_NormalProperties[0] >= 0; }
+        /// @brief Check if the vertices have colors
+        bool HasColors() const { return this->m_ColorProperties[0] >= 0; }
+
+    private:  ///< PLY layout
+        enum class PLYFormat { Ascii, BinaryLittleEndian, BinaryBigEndian };
+        enum class PLYType { Int8, UInt8, Int16, UInt16, Int32, UInt32, Float32, Float64 };
+
+        /// @brief Scalar property of the vertex element, with its byte offset in a binary vertex
+        struct PLYProperty
+        {
+            std::string Name;
+            PLYType Type;
+            int Offset;
+        };
+
+        /// @brief Parse the header of the file and place the stream on the first vertex
+        void ParseHeader();
+
+        /**
+         * @brief Read the next vertices of the file without filtering them
+         *
+         * @param numPoints the number of vertices to read
+         * @return std::shared_ptr<DFPointCloud> the vertices
+         */
+        std::shared_ptr<DFPointCloud> ReadVertices(int numPoints);
+
+        /// @brief Crop and remove the statistical outliers of a chunk in place
+        void FilterChunk(DFPointCloud &chunk) const;
+
+    private:
+        /// @brief the path to the PLY file
+        std::string m_Path;
+        /// @brief the stream on the file, placed on the next vertex to read
+        std::ifstream m_Stream;
+        /// @brief the position of the first vertex in the file
+        std::streampos m_VerticesPosition;
+
+        /// @brief the encoding of the file
+        PLYFormat m_Format = PLYFormat::Ascii;
+        /// @brief the properties of the vertex element
+        std::vector<PLYProperty> m_Properties;
+        /// @brief the size in bytes of a binary vertex
+        int m_VertexSize = 0;
+        /// @brief the indices of the x, y, z properties
+        std::array<int, 3> m_PointProperties = {-1, -1, -1};
+        /// @brief the indices of the nx, ny, nz properties, -1 if missing
+        std::array<int, 3> m_NormalProperties = {-1, -1, -1};
+        /// @brief the indices of the red, green, blue properties, -1 if missing
+        std::array<int, 3> m_ColorProperties = {-1, -1, -1};
+
+        /// @brief the number of vertices read by chunk
+        int m_ChunkSize;
+        /// @brief the number of vertices in the file
+        std::int64_t m_NumPoints = 0;
+        /// @brief the number of vertices already read
+        std::int64_t m_NumPointsRead = 0;
+
+        /// @brief the crop box, if any
+        std::optional<std::pair<Eigen::Vector3d, Eigen::Vector3d>> m_CropBox;
+        /// @brief the size of the voxels, 0 if deactivated
+        double m_VoxelSize = 0.0;
+        /// @brief the number of neighbors of the statistical filter, 0 if deactivated
+        int m_StatisticalNbNeighbors = 0;
+        /// @brief the standard deviation ratio of the statistical filter
+        double m_StatisticalStdRatio = 0.0;
+    };
+} // namespace diffCheck::geometry
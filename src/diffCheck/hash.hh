@@ -0,0 +1,42 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+
+namespace diffCheck
+{
+    /// @brief Offset basis of the 64-bit FNV-1a hash
+    constexpr std::uint64_t FNV1A_OFFSET_BASIS = 14695981039346656037ULL;
+
+    /// @brief Prime of the 64-bit FNV-1a hash
+    constexpr std::uint64_t FNV1A_PRIME = 1099511628211ULL;
+
+    /**
+     * @brief Add raw data to a 64-bit FNV-1a hash. The data is hashed 8-byte word by word rather than byte by byte
+     * to hash large buffers quickly, the trailing bytes are hashed one by one.
+     * 
+     * @param hash the current hash, FNV1A_OFFSET_BASIS to start a new one
+     * @param data the data to hash
+     * @param numBytes the size of the data in bytes
+     * @return std::uint64_t the updated hash
+     */
+    inline std::uint64_t HashWords(std::uint64_t hash, const void *data, std::size_t numBytes)
+    {
+        const unsigned char *bytes = static_cast<const unsigned char*>(data);
+        std::size_t i = 0;
+        for (; i + sizeof(std::uint64_t) <= numBytes; i += sizeof(std::uint64_t))
+        {
+            std::uint64_t word;
+            std::memcpy(&word, bytes + i, sizeof(word));
+            hash ^= word;
+            hash *= FNV1A_PRIME;
+        }
+        for (; i < numBytes; i++)
+        {
+            hash ^= bytes[i];
+            hash *= FNV1A_PRIME;
+        }
+        return hash;
+    }
+} // namespace diffCheck
@@ -0,0 +1,23 @@
+#pragma once
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+namespace diffCheck
+{
+    /**
+     * @brief Get the number of threads of a parallel loop
+     * 
+     * @param numThreads the requested number of threads, 0 for all the available ones
+     * @return int the number of threads of the loop, 1 without OpenMP
+     */
+    inline int ResolveNumThreads(int numThreads)
+    {
+    #ifdef _OPENMP
+        return numThreads > 0 ? numThreads : omp_get_max_threads();
+    #else
+        return 1;
+    #endif
+    }
+} // namespace diffCheck
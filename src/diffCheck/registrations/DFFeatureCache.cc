@@ -0,0 +1,217 @@
+#include "diffCheck/registrations/DFFeatureCache.hh"
+#include "diffCheck/log.hh"
+#include "diffCheck/hash.hh"
+
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <functional>
+#include <iomanip>
+#include <sstream>
+#include <stdexcept>
+
+namespace diffCheck::registrations
+{
+    namespace
+    {
+        /// @brief Header of a persisted feature file, only made of 8-byte fields so that it has no padding
+        struct FeatureFileHeader
+        {
+            char Magic[8];
+            std::uint64_t Version;
+            std::uint64_t CloudHash;
+            std::uint64_t NumPoints;
+            double RadiusKDTreeSearch;
+            std::int64_t MaxNeighborKDTreeSearch;
+            std::uint64_t Dimension;
+            std::uint64_t NumFeatures;
+        };
+        static_assert(sizeof(FeatureFileHeader) == 8 * 8, "The feature file header must not be padded.");
+
+        constexpr char FEATURE_FILE_MAGIC[8] = "DFFPFH";
+        constexpr std::uint64_t FEATURE_FILE_VERSION = 1;
+
+        /// @brief Hash the points and the normals of a cloud, the features only depend on them
+        std::uint64_t HashCloud(const open3d::geometry::PointCloud &cloud)
+        {
+            std::uint64_t hash = FNV1A_OFFSET_BASIS;
+            hash = HashWords(hash, cloud.points_.data(), cloud.points_.size() * sizeof(Eigen::Vector3d));
+            hash = HashWords(hash, cloud.normals_.data(), cloud.normals_.size() * sizeof(Eigen::Vector3d));
+            return hash;
+        }
+    }
+
+    DFFeatureCache::DFFeatureCache(int capacity, const std::string &directory)
+        : m_Capacity(capacity), m_Directory(directory)
+    {
+        if (capacity < 0)
+            throw std::invalid_argument("The capacity of the feature cache must be positive.");
+        if (!directory.empty())
+            std::filesystem::create_directories(directory);
+    }
+
+    std::shared_ptr<open3d::pipelines::registration::Feature> DFFeatureCache::ComputeFPFHFeature(
+        const open3d::geometry::PointCloud &cloud,
+        double radiusKDTreeSearch,
+        int maxNeighborKDTreeSearch)
+    {
+        Key key = {HashCloud(cloud), cloud.points_.size(), radiusKDTreeSearch, maxNeighborKDTreeSearch};
+
+        std::shared_ptr<open3d::pipelines::registration::Feature> feature = this->FindInMemory(key);
+        if (feature == nullptr && !this->m_Directory.empty())
+        {
+            feature = this->LoadFromDisk(key);
+            if (feature != nullptr)
+                this->AddToMemory(key, feature);
+        }
+        if (feature != nullptr)
+        {
+            std::lock_guard<std::mutex> lock(this->m_Mutex);
+            this->m_NumHits++;
+            return feature;
+        }
+
+        // computed outside of the lock, so that the clouds of other threads are not blocked by this one
+        feature = open3d::pipelines::registration::ComputeFPFHFeature(
+            cloud,
+            open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
+        if (!this->m_Directory.empty())
+            this->SaveToDisk(key, *feature);
+        this->AddToMemory(key, feature);
+        {
+            std::lock_guard<std::mutex> lock(this->m_Mutex);
+            this->m_NumMisses++;
+        }
+        return feature;
+    }
+
+    void DFFeatureCache::Clear()
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        this->m_Entries.clear();
+    }
+
+    int DFFeatureCache::GetNumEntries() const
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        return static_cast<int>(this->m_Entries.size());
+    }
+
+    int DFFeatureCache::GetNumHits() const
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        return this->m_NumHits;
+    }
+
+    int DFFeatureCache::GetNumMisses() const
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        return this->m_NumMisses;
+    }
+
+    std::shared_ptr<open3d::pipelines::registration::Feature> DFFeatureCache::FindInMemory(const Key &key)
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        for (auto entry = this->m_Entries.begin(); entry != this->m_Entries.end(); entry++)
+        {
+            if (entry->first == key)
+            {
+                this->m_Entries.splice(this->m_Entries.begin(), this->m_Entries, entry);
+                return this->m_Entries.front().second;
+            }
+        }
+        return nullptr;
+    }
+
+    void DFFeatureCache::AddToMemory(const Key &key, std::shared_ptr<open3d::pipelines::registration::Feature> feature)
+    {
+        std::lock_guard<std::mutex> lock(this->m_Mutex);
+        // another thread may have added the same features in the meantime
+        for (auto entry = this->m_Entries.begin(); entry != this->m_Entries.end(); entry++)
+        {
+            if (entry->first == key)
+            {
+                this->m_Entries.erase(entry);
+                break;
+            }
+        }
+        this->m_Entries.emplace_front(key, std::move(feature));
+        while (static_cast<int>(this->m_Entries.size()) > this->m_Capacity)
+            this->m_Entries.pop_back();
+    }
+
+    std::string DFFeatureCache::GetFilePath(const Key &key) const
+    {
+        std::ostringstream fileName;
+        fileName << "fpfh_" << std::hex << std::setfill('0') << std::setw(16) << key.CloudHash
+                 << std::dec << "_" << key.NumPoints << "_" << key.MaxNeighborKDTreeSearch
+                 << "_" << std::hex << std::setw(16) << std::hash<double>{}(key.RadiusKDTreeSearch) << ".dffpfh";
+        return (std::filesystem::path(this->m_Directory) / fileName.str()).string();
+    }
+
+    std::shared_ptr<open3d::pipelines::registration::Feature> DFFeatureCache::LoadFromDisk(const Key &key) const
+    {
+        std::string path = this->GetFilePath(key);
+        std::ifstream stream(path, std::ios::binary);
+        if (!stream.is_open())
+            return nullptr;
+
+        // the header repeats the key, so that a collision of the file names is not taken for a hit
+        FeatureFileHeader header;
+        if (!stream.read(reinterpret_cast<char*>(&header), sizeof(header))
+            || std::memcmp(header.Magic, FEATURE_FILE_MAGIC, sizeof(header.Magic)) != 0
+            || header.Version != FEATURE_FILE_VERSION
+            || header.CloudHash != key.CloudHash
+            || header.NumPoints != key.NumPoints
+            || header.RadiusKDTreeSearch != key.RadiusKDTreeSearch
+            || header.MaxNeighborKDTreeSearch != key.MaxNeighborKDTreeSearch
+            || header.NumFeatures != key.NumPoints
+            || std::filesystem::file_size(path) != sizeof(header) + header.Dimension * header.NumFeatures * sizeof(double))
+        {
+            DIFFCHECK_WARN(("The file " + path + " is not a valid feature file.").c_str());
+            return nullptr;
+        }
+
+        std::shared_ptr<open3d::pipelines::registration::Feature> feature = std::make_shared<open3d::pipelines::registration::Feature>();
+        feature->Resize(static_cast<int>(header.Dimension), static_cast<int>(header.NumFeatures));
+        if (!stream.read(reinterpret_cast<char*>(feature->data_.data()), feature->data_.size() * sizeof(double)))
+            return nullptr;
+        return feature;
+    }
+
+    void DFFeatureCache::SaveToDisk(const Key &key, const open3d::pipelines::registration::Feature &feature) const
+    {
+        FeatureFileHeader header = {};
+        std::memcpy(header.Magic, FEATURE_FILE_MAGIC, sizeof(header.Magic));
+        header.Version = FEATURE_FILE_VERSION;
+        header.CloudHash = key.CloudHash;
+        header.NumPoints = key.NumPoints;
+        header.RadiusKDTreeSearch = key.RadiusKDTreeSearch;
+        header.MaxNeighborKDTreeSearch = key.MaxNeighborKDTreeSearch;
+        header.Dimension = static_cast<std::uint64_t>(feature.Dimension());
+        header.NumFeatures = static_cast<std::uint64_t>(feature.Num());
+
+        // written next to the file and renamed, so that a reader never sees a partial file
+        std::string path = this->GetFilePath(key);
+        std::string tempPath = path + ".tmp";
+        {
+            std::ofstream stream(tempPath, std::ios::binary | std::ios::trunc);
+            if (!stream.is_open())
+            {
+                DIFFCHECK_WARN(("The feature file " + path + " cannot be written.").c_str());
+                return;
+            }
+            stream.write(reinterpret_cast<const char*>(&header), sizeof(header));
+            stream.write(reinterpret_cast<const char*>(feature.data_.data()), feature.data_.size() * sizeof(double));
+            if (!stream)
+            {
+                DIFFCHECK_WARN(("Failed to write the feature file " + path + ".").c_str());
+                return;
+            }
+        }
+        std::error_code error;
+        std::filesystem::rename(tempPath, path, error);
+        if (error)
+            DIFFCHECK_WARN(("The feature file " + path + " cannot be written.").c_str());
+    }
+}
@@ -0,0 +1,106 @@
+#pragma once
+
+#include <cstdint>
+#include <list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <open3d/geometry/PointCloud.h>
+#include <open3d/pipelines/registration/Feature.h>
+
+namespace diffCheck::registrations
+{
+    /**
+     * @brief Cache of the FPFH features of point clouds, so that a cloud registered many times (e.g. the target
+     * sampled on the CAD model, against every new scan) gets its features computed only once.
+     *
+     * The features are keyed on a hash of the points and normals of the cloud and on the parameters of the KD-tree
+     * search. The most recently used ones are kept in memory, and they are optionally persisted in a directory to be
+     * reused across sessions. The cache can be shared between threads.
+     */
+    class DFFeatureCache
+    {
+    public:
+        /**
+         * @brief Create a feature cache
+         *
+         * @param capacity the maximum number of features kept in memory, the least recently used ones are dropped first
+         * @param directory the directory where the features are persisted, empty to keep them only in memory
+         */
+        DFFeatureCache(int capacity = 8, const std::string &directory = "");
+        ~DFFeatureCache() = default;
+
+    public:  ///< Features
+        /**
+         * @brief Get the FPFH features of a point cloud from the cache, or compute and cache them
+         *
+         * @param cloud the point cloud, with normals
+         * @param radiusKDTreeSearch the radius used to search for neighbors in the KDTree
+         * @param maxNeighborKDTreeSearch the maximum number of neighbors to search for in the KDTree
+         * @return std::shared_ptr<open3d::pipelines::registration::Feature> the features of the cloud, not to be modified
+         */
+        std::shared_ptr<open3d::pipelines::registration::Feature> ComputeFPFHFeature(
+            const open3d::geometry::PointCloud &cloud,
+            double radiusKDTreeSearch,
+            int maxNeighborKDTreeSearch);
+
+        /// @brief Drop the features kept in memory, the persisted ones are kept
+        void Clear();
+
+    public:  ///< Getters
+        /// @brief Maximum number of features kept in memory
+        int GetCapacity() const { return this->m_Capacity; }
+        /// @brief Directory where the features are persisted, empty if they are only kept in memory
+        std::string GetDirectory() const { return this->m_Directory; }
+        /// @brief Number of features kept in memory
+        int GetNumEntries() const;
+        /// @brief Number of features found in memory or on disk
+        int GetNumHits() const;
+        /// @brief Number of features computed
+        int GetNumMisses() const;
+
+    private:
+        /// @brief Key of the features of a cloud
+        struct Key
+        {
+            std::uint64_t CloudHash;
+            std::uint64_t NumPoints;
+            double RadiusKDTreeSearch;
+            int MaxNeighborKDTreeSearch;
+
+            bool operator==(const Key &other) const
+            {
+                return this->CloudHash == other.CloudHash
+                    && this->NumPoints == other.NumPoints
+                    && this->RadiusKDTreeSearch == other.RadiusKDTreeSearch
+                    && this->MaxNeighborKDTreeSearch == other.MaxNeighborKDTreeSearch;
+            }
+        };
+
+        /// @brief Get the features of a key from memory, moving them to the front, nullptr if absent
+        std::shared_ptr<open3d::pipelines::registration::Feature> FindInMemory(const Key &key);
+        /// @brief Add features at the front of the memory and drop the least recently used ones beyond the capacity
+        void AddToMemory(const Key &key, std::shared_ptr<open3d::pipelines::registration::Feature> feature);
+
+        /// @brief Get the path of the file of a key in the directory
+        std::string GetFilePath(const Key &key) const;
+        /// @brief Read the features of a key from the directory, nullptr if absent or invalid
+        std::shared_ptr<open3d::pipelines::registration::Feature> LoadFromDisk(const Key &key) const;
+        /// @brief Write the features of a key in the directory
+        void SaveToDisk(const Key &key, const open3d::pipelines::registration::Feature &feature) const;
+
+    private:
+        /// @brief the maximum number of features kept in memory
+        int m_Capacity;
+        /// @brief the directory where the features are persisted, empty if deactivated
+        std::string m_Directory;
+        /// @brief the features kept in memory, the most recently used first
+        std::list<std::pair<Key, std::shared_ptr<open3d::pipelines::registration::Feature>>> m_Entries;
+        /// @brief the number of features found in memory or on disk
+        int m_NumHits = 0;
+        /// @brief the number of features computed
+        int m_NumMisses = 0;
+        /// @brief the mutex protecting the entries and the counters
+        mutable std::mutex m_Mutex;
+    };
+}
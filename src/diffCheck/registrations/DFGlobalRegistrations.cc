@@ -1,69 +1,247 @@
 #include "diffCheck/registrations/DFGlobalRegistrations.hh"
+#include "diffCheck/parallel.hh"
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cmath>
+#include <limits>
+#include <random>
+
 
 namespace diffCheck::registrations
 {   
+    namespace
+    {
+        /// @brief Number of points between two checks of the early termination of EvaluateRegistrations
+        constexpr int EARLY_TERMINATION_BLOCK_SIZE = 1024;
+
+        /// @brief Get the seconds elapsed since a time point
+        double GetElapsedSeconds(const std::chrono::steady_clock::time_point &start)
+        {
+            return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+        }
+
+        /// @brief Compute the FPFH features of a cloud, or get them from the cache if there is one
+        std::shared_ptr<open3d::pipelines::registration::Feature> ComputeFPFHFeature(
+            const open3d::geometry::PointCloud &cloud,
+            double radiusKDTreeSearch,
+            int maxNeighborKDTreeSearch,
+            const std::shared_ptr<DFFeatureCache> &featureCache)
+        {
+            if (featureCache != nullptr)
+                return featureCache->ComputeFPFHFeature(cloud, radiusKDTreeSearch, maxNeighborKDTreeSearch);
+            return open3d::pipelines::registration::ComputeFPFHFeature(
+                cloud,
+                open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
+        }
+
+        /**
+         * @brief Evaluate a transformation of the source on the target as the ransac of open3d does, the source points
+         * being transformed on the fly
+         *
+         * @param source the source point cloud
+         * @param targetKDTree the KD-tree of the target point cloud
+         * @param maxCorrespondenceDistance the maximum distance of a correspondence
+         * @param transformation the transformation of the source
+         * @param keepCorrespondences whether to fill the correspondence set of the result
+         * @return open3d::pipelines::registration::RegistrationResult the fitness and inlier RMSE of the transformation
+         */
+        open3d::pipelines::registration::RegistrationResult EvaluateTransformation(
+            const open3d::geometry::PointCloud &source,
+            const open3d::geometry::KDTreeFlann &targetKDTree,
+            double maxCorrespondenceDistance,
+            const Eigen::Matrix4d &transformation,
+            bool keepCorrespondences)
+        {
+            open3d::pipelines::registration::RegistrationResult result(transformation);
+            Eigen::Matrix3d rotation = transformation.block<3, 3>(0, 0);
+            Eigen::Vector3d translation = transformation.block<3, 1>(0, 3);
+            std::vector<int> indices(1);
+            std::vector<double> squaredDistances(1);
+            double error2 = 0.0;
+            int numInliers = 0;
+            for (int i = 0; i < static_cast<int>(source.points_.size()); i++)
+            {
+                Eigen::Vector3d point = rotation * source.points_[i] + translation;
+                if (targetKDTree.SearchHybrid(point, maxCorrespondenceDistance, 1, indices, squaredDistances) > 0)
+                {
+                    error2 += squaredDistances[0];
+                    numInliers++;
+                    if (keepCorrespondences)
+                        result.correspondence_set_.push_back(Eigen::Vector2i(i, indices[0]));
+                }
+            }
+            if (numInliers > 0)
+            {
+                result.fitness_ = static_cast<double>(numInliers) / source.points_.size();
+                result.inlier_rmse_ = std::sqrt(error2 / numInliers);
+            }
+            return result;
+        }
+
+        /// @brief Find the nearest feature of each feature of a set in another set
+        std::vector<int> MatchNearestFeatures(
+            const open3d::pipelines::registration::Feature &queryFeatures,
+            const open3d::pipelines::registration::Feature &features)
+        {
+            open3d::geometry::KDTreeFlann featureKDTree(features);
+            std::vector<int> matches(queryFeatures.Num(), -1);
+            #pragma omp parallel for
+            for (int i = 0; i < queryFeatures.Num(); i++)
+            {
+                std::vector<int> indices(1);
+                std::vector<double> squaredDistances(1);
+                if (featureKDTree.SearchKNN(Eigen::VectorXd(queryFeatures.data_.col(i)), 1, indices, squaredDistances) > 0)
+                    matches[i] = indices[0];
+            }
+            return matches;
+        }
+
+        /**
+         * @brief Match the source features to their nearest target features and keep the mutual matches, as open3d
+         * does. The mutual filter is skipped if it leaves too few matches to sample from.
+         *
+         * @param sourceFeatures the features of the source point cloud
+         * @param targetFeatures the features of the target point cloud
+         * @param ransacN the number of correspondences sampled for each ransac model
+         * @return open3d::pipelines::registration::CorrespondenceSet the (source index, target index) matches
+         */
+        open3d::pipelines::registration::CorrespondenceSet MatchFeatures(
+            const open3d::pipelines::registration::Feature &sourceFeatures,
+            const open3d::pipelines::registration::Feature &targetFeatures,
+            int ransacN)
+        {
+            std::vector<int> sourceToTarget = MatchNearestFeatures(sourceFeatures, targetFeatures);
+            std::vector<int> targetToSource = MatchNearestFeatures(targetFeatures, sourceFeatures);
+
+            open3d::pipelines::registration::CorrespondenceSet correspondences;
+            open3d::pipelines::registration::CorrespondenceSet mutualCorrespondences;
+            for (int i = 0; i < static_cast<int>(sourceToTarget.size()); i++)
+            {
+                if (sourceToTarget[i] < 0)
+                    continue;
+                correspondences.push_back(Eigen::Vector2i(i, sourceToTarget[i]));
+                if (targetToSource[sourceToTarget[i]] == i)
+                    mutualCorrespondences.push_back(Eigen::Vector2i(i, sourceToTarget[i]));
+            }
+            if (static_cast<int>(mutualCorrespondences.size()) >= 3 * ransacN)
+                return mutualCorrespondences;
+            DIFFCHECK_WARN("Too few mutual feature matches, all the matches are used.");
+            return correspondences;
+        }
+    }
+
     std::vector<double> DFGlobalRegistrations::EvaluateRegistrations(
         std::shared_ptr<geometry::DFPointCloud> source, 
         std::shared_ptr<geometry::DFPointCloud> target,
-        std::vector<Eigen::Matrix<double, 4, 4>> transforms)
+        const std::vector<Eigen::Matrix<double, 4, 4>> &transforms,
+        bool earlyTermination,
+        int numThreads)
     {
-        std::vector<double> errors;
-        for(int i = 0; i < transforms.size(); i++)
-        {
-            std::shared_ptr<open3d::geometry::PointCloud> o3DPointCloud = source->Cvt2O3DPointCloud();
+        if (!source->HasPoints() || !target->HasPoints())
+            throw std::invalid_argument("The source and target point clouds must not be empty.");
+
+        // the persistent index of the target is reused, e.g. across the calls evaluating the candidates of several sources
+        std::shared_ptr<const open3d::geometry::KDTreeFlann> targetKDTree = target->GetKDTree();
 
-            std::shared_ptr<open3d::geometry::PointCloud> o3DPointCloudAfterTrans = 
-            std::make_shared<open3d::geometry::PointCloud>(o3DPointCloud->Transform(transforms[i]));
+        int numPoints = source->GetNumPoints();
+        int numTransforms = static_cast<int>(transforms.size());
+        std::vector<double> errors(numTransforms, std::numeric_limits<double>::infinity());
+        // the distances are positive, so a partial sum above the best sum cannot give a better mean
+        std::atomic<double> bestSum(std::numeric_limits<double>::infinity());
 
-            std::shared_ptr<geometry::DFPointCloud> dfPointCloudPtrAfterTrans = std::make_shared<geometry::DFPointCloud>();
-            dfPointCloudPtrAfterTrans->Cvt2DFPointCloud(o3DPointCloudAfterTrans);
-            std::vector<double> registrationErrors = dfPointCloudPtrAfterTrans->ComputeDistance(target);
-            errors.push_back(std::accumulate(registrationErrors.begin(), registrationErrors.end(), 0.0) / registrationErrors.size());
+        #pragma omp parallel for schedule(dynamic, 1) num_threads(ResolveNumThreads(numThreads))
+        for (int i = 0; i < numTransforms; i++)
+        {
+            Eigen::Matrix3d rotation = transforms[i].block<3, 3>(0, 0);
+            Eigen::Vector3d translation = transforms[i].block<3, 1>(0, 3);
+            std::vector<int> indices(1);
+            std::vector<double> squaredDistances(1);
+            double sum = 0.0;
+            bool isDropped = false;
+            for (int j = 0; j < numPoints && !isDropped; j++)
+            {
+                Eigen::Vector3d point = rotation * source->Points[j] + translation;
+                if (targetKDTree->SearchKNN(point, 1, indices, squaredDistances) > 0)
+                    sum += std::sqrt(squaredDistances[0]);
+                if (earlyTermination && (j + 1) % EARLY_TERMINATION_BLOCK_SIZE == 0 && sum > bestSum.load())
+                    isDropped = true;
+            }
+            if (isDropped)
+                continue;
+
+            errors[i] = sum / numPoints;
+            double best = bestSum.load();
+            while (sum < best && !bestSum.compare_exchange_weak(best, sum)) {}
         }
         return errors;
-    };
+    }
 
-    diffCheck::transformation::DFTransformation DFGlobalRegistrations::O3DFastGlobalRegistrationFeatureMatching(
-        std::shared_ptr<geometry::DFPointCloud> source, 
-        std::shared_ptr<geometry::DFPointCloud> target,
-        bool voxelise,
+    std::shared_ptr<DFRegistrationFeatures> DFGlobalRegistrations::ComputeRegistrationFeatures(
+        std::shared_ptr<geometry::DFPointCloud> cloud,
         double voxelSize,
         double radiusKDTreeSearch,
         int maxNeighborKDTreeSearch,
-        double maxCorrespondenceDistance,
-        int iterationNumber,
-        int maxTupleCount)
+        std::shared_ptr<DFFeatureCache> featureCache)
     {
-        std::shared_ptr<open3d::geometry::PointCloud> sourceO3D = source->Cvt2O3DPointCloud();
-        std::shared_ptr<open3d::geometry::PointCloud> targetO3D = target->Cvt2O3DPointCloud();
+        if (voxelSize < 0)
+            throw std::invalid_argument("The voxel size must be positive or 0.");
 
-        // voxelize at the scale of the point cloud
-        if (voxelise)
-        {
-            sourceO3D->VoxelDownSample(voxelSize);
-            targetO3D->VoxelDownSample(voxelSize);
-        }
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+        std::shared_ptr<DFRegistrationFeatures> registrationFeatures = std::make_shared<DFRegistrationFeatures>();
+        registrationFeatures->Cloud = cloud->Cvt2O3DPointCloud();
 
-        if (sourceO3D->normals_.size() == 0)
-        {
-            sourceO3D->EstimateNormals();
-        }
+        // the features are computed on the downsampled cloud, their cost drops with its number of points
+        if (voxelSize > 0)
+            registrationFeatures->Cloud = registrationFeatures->Cloud->VoxelDownSample(voxelSize);
 
-        if (targetO3D->normals_.size() == 0)
+        if (registrationFeatures->Cloud->normals_.size() == 0)
         {
-            targetO3D->EstimateNormals();
+            if (voxelSize > 0)
+                registrationFeatures->Cloud->EstimateNormals(open3d::geometry::KDTreeSearchParamHybrid(2 * voxelSize, 30));
+            else
+                registrationFeatures->Cloud->EstimateNormals();
         }
+        registrationFeatures->Timings["preprocessing"] = GetElapsedSeconds(start);
 
-        std::shared_ptr<open3d::pipelines::registration::Feature> sourceFPFHFeatures = 
-        open3d::pipelines::registration::ComputeFPFHFeature(
-            *sourceO3D,
-            open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
+        start = std::chrono::steady_clock::now();
+        registrationFeatures->Features = ComputeFPFHFeature(*registrationFeatures->Cloud, radiusKDTreeSearch, maxNeighborKDTreeSearch, featureCache);
+        registrationFeatures->Timings["features"] = GetElapsedSeconds(start);
+        return registrationFeatures;
+    }
 
-        std::shared_ptr<open3d::pipelines::registration::Feature> targetFPFHFeatures =
-        open3d::pipelines::registration::ComputeFPFHFeature(
-            *targetO3D,
-            open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
+    DFRegistrationResult DFGlobalRegistrations::O3DFastGlobalRegistrationFeatureMatching(
+        std::shared_ptr<geometry::DFPointCloud> source, 
+        std::shared_ptr<geometry::DFPointCloud> target,
+        bool voxelise,
+        double voxelSize,
+        double radiusKDTreeSearch,
+        int maxNeighborKDTreeSearch,
+        double maxCorrespondenceDistance,
+        int iterationNumber,
+        int maxTupleCount,
+        std::shared_ptr<DFFeatureCache> featureCache)
+    {
+        std::shared_ptr<DFRegistrationFeatures> sourceFeatures = ComputeRegistrationFeatures(
+            source, voxelise ? voxelSize : 0.0, radiusKDTreeSearch, maxNeighborKDTreeSearch, featureCache);
+        std::shared_ptr<DFRegistrationFeatures> targetFeatures = ComputeRegistrationFeatures(
+            target, voxelise ? voxelSize : 0.0, radiusKDTreeSearch, maxNeighborKDTreeSearch, featureCache);
+
+        DFRegistrationResult registrationResult = O3DFastGlobalRegistrationOnFeatures(
+            sourceFeatures, targetFeatures, maxCorrespondenceDistance, iterationNumber, maxTupleCount);
+        registrationResult.Timings["preprocessing"] = sourceFeatures->Timings["preprocessing"] + targetFeatures->Timings["preprocessing"];
+        registrationResult.Timings["features"] = sourceFeatures->Timings["features"] + targetFeatures->Timings["features"];
+        return registrationResult;
+    }
 
+    DFRegistrationResult DFGlobalRegistrations::O3DFastGlobalRegistrationOnFeatures(
+        std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+        std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+        double maxCorrespondenceDistance,
+        int iterationNumber,
+        int maxTupleCount)
+    {
         std::shared_ptr<open3d::pipelines::registration::FastGlobalRegistrationOption> option = 
         std::make_shared<open3d::pipelines::registration::FastGlobalRegistrationOption>();
 
@@ -71,21 +249,23 @@ namespace diffCheck::registrations
         option->iteration_number_ = iterationNumber;
         option->maximum_tuple_count_ = maxTupleCount;
 
-        
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
         open3d::pipelines::registration::RegistrationResult result = 
         open3d::pipelines::registration::FastGlobalRegistrationBasedOnFeatureMatching(
-            *sourceO3D,
-            *targetO3D,
-            *sourceFPFHFeatures,
-            *targetFPFHFeatures,
+            *sourceFeatures->Cloud,
+            *targetFeatures->Cloud,
+            *sourceFeatures->Features,
+            *targetFeatures->Features,
             *option);
-        diffCheck::transformation::DFTransformation transformation = 
-        diffCheck::transformation::DFTransformation(result.transformation_);
 
-        return transformation;
+        // the fast global registration always runs all its iterations
+        DFRegistrationResult registrationResult(result);
+        registrationResult.NumIterations = iterationNumber;
+        registrationResult.Timings["registration"] = GetElapsedSeconds(start);
+        return registrationResult;
     }
 
-    diffCheck::transformation::DFTransformation DFGlobalRegistrations::O3DRansacOnFeatureMatching(
+    DFRegistrationResult DFGlobalRegistrations::O3DRansacOnFeatureMatching(
         std::shared_ptr<geometry::DFPointCloud> source, 
         std::shared_ptr<geometry::DFPointCloud> target,
         bool voxelise,
@@ -98,41 +278,43 @@ namespace diffCheck::registrations
         double correspondenceCheckerDistance,
         double similarityThreshold,
         int ransacMaxIteration,
-        double ransacConfidenceThreshold)
+        double ransacConfidenceThreshold,
+        std::shared_ptr<DFFeatureCache> featureCache)
     {
-        std::shared_ptr<open3d::geometry::PointCloud> sourceO3D = source->Cvt2O3DPointCloud();
-        std::shared_ptr<open3d::geometry::PointCloud> targetO3D = target->Cvt2O3DPointCloud();
+        std::shared_ptr<DFRegistrationFeatures> sourceFeatures = ComputeRegistrationFeatures(
+            source, voxelise ? voxelSize : 0.0, radiusKDTreeSearch, maxNeighborKDTreeSearch, featureCache);
+        std::shared_ptr<DFRegistrationFeatures> targetFeatures = ComputeRegistrationFeatures(
+            target, voxelise ? voxelSize : 0.0, radiusKDTreeSearch, maxNeighborKDTreeSearch, featureCache);
+
+        DFRegistrationResult registrationResult = O3DRansacOnFeatures(
+            sourceFeatures,
+            targetFeatures,
+            maxCorrespondenceDistance,
+            isTEstimatePt2Pt,
+            ransacN,
+            correspondenceCheckerDistance,
+            similarityThreshold,
+            ransacMaxIteration,
+            ransacConfidenceThreshold);
+        registrationResult.Timings["preprocessing"] = sourceFeatures->Timings["preprocessing"] + targetFeatures->Timings["preprocessing"];
+        registrationResult.Timings["features"] = sourceFeatures->Timings["features"] + targetFeatures->Timings["features"];
+        return registrationResult;
+    }
 
+    DFRegistrationResult DFGlobalRegistrations::O3DRansacOnFeatures(
+        std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+        std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+        double maxCorrespondenceDistance,
+        bool isTEstimatePt2Pt,
+        int ransacN,
+        double correspondenceCheckerDistance,
+        double similarityThreshold,
+        int ransacMaxIteration,
+        double ransacConfidenceThreshold)
+    {
         open3d::pipelines::registration::TransformationEstimationPointToPoint transformationEstimation = 
             open3d::pipelines::registration::TransformationEstimationPointToPoint(isTEstimatePt2Pt);
 
-        // voxelize at the scale of the point cloud
-        if (voxelise)
-        {
-            sourceO3D->VoxelDownSample(voxelSize);
-            targetO3D->VoxelDownSample(voxelSize);
-        }
-        
-        if (sourceO3D->normals_.size() == 0)
-        {
-            sourceO3D->EstimateNormals();
-        }
-
-        if (targetO3D->normals_.size() == 0)
-        {
-            targetO3D->EstimateNormals();
-        }
-
-        std::shared_ptr<open3d::pipelines::registration::Feature> sourceFPFHFeatures = 
-        open3d::pipelines::registration::ComputeFPFHFeature(
-            *sourceO3D,
-            open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
-
-        std::shared_ptr<open3d::pipelines::registration::Feature> targetFPFHFeatures = 
-        open3d::pipelines::registration::ComputeFPFHFeature(
-            *targetO3D,
-            open3d::geometry::KDTreeSearchParamHybrid(radiusKDTreeSearch, maxNeighborKDTreeSearch));
-
         std::vector<std::reference_wrapper<const open3d::pipelines::registration::CorrespondenceChecker>> correspondanceChecker;
         
         open3d::pipelines::registration::CorrespondenceCheckerBasedOnDistance checkerOnDistance = 
@@ -142,12 +324,12 @@ namespace diffCheck::registrations
         open3d::pipelines::registration::CorrespondenceCheckerBasedOnEdgeLength(similarityThreshold);
         correspondanceChecker.push_back(checkerOnDistance);
         
-        
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
         auto result = open3d::pipelines::registration::RegistrationRANSACBasedOnFeatureMatching(
-            *sourceO3D,
-            *targetO3D,
-            *sourceFPFHFeatures,
-            *targetFPFHFeatures,
+            *sourceFeatures->Cloud,
+            *targetFeatures->Cloud,
+            *sourceFeatures->Features,
+            *targetFeatures->Features,
             true,
             maxCorrespondenceDistance,
             transformationEstimation,
@@ -155,8 +337,118 @@ namespace diffCheck::registrations
             correspondanceChecker,
             open3d::pipelines::registration::RANSACConvergenceCriteria(ransacMaxIteration, ransacConfidenceThreshold));
 
-        diffCheck::transformation::DFTransformation transformation = diffCheck::transformation::DFTransformation(result.transformation_);
+        // open3d does not report the number of ransac iterations run before reaching the confidence
+        DFRegistrationResult registrationResult(result);
+        registrationResult.Timings["registration"] = GetElapsedSeconds(start);
+        return registrationResult;
+    }
+
+    DFRegistrationResult DFGlobalRegistrations::O3DRansacMultiStart(
+        std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+        std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+        int numStarts,
+        const std::vector<unsigned int> &seeds,
+        double maxCorrespondenceDistance,
+        bool isTEstimatePt2Pt,
+        int ransacN,
+        double correspondenceCheckerDistance,
+        double similarityThreshold,
+        int ransacMaxIteration,
+        double ransacConfidenceThreshold,
+        int numThreads)
+    {
+        if (ransacN < 3)
+            throw std::invalid_argument("The ransac needs at least 3 correspondences per model.");
+        if (similarityThreshold < 0 || similarityThreshold > 1)
+            throw std::invalid_argument("The similarity threshold must be between 0 and 1.");
+        if (sourceFeatures->GetNumPoints() < ransacN || targetFeatures->GetNumPoints() < ransacN)
+            throw std::invalid_argument("The point clouds must have at least ransacN points.");
+        if (seeds.empty() && numStarts < 1)
+            throw std::invalid_argument("The number of starts must be greater than 0.");
+
+        std::vector<unsigned int> runSeeds = seeds;
+        if (runSeeds.empty())
+        {
+            std::random_device device;
+            for (int i = 0; i < numStarts; i++)
+                runSeeds.push_back(device());
+        }
 
-        return transformation;
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+        const open3d::geometry::PointCloud &source = *sourceFeatures->Cloud;
+        const open3d::geometry::PointCloud &target = *targetFeatures->Cloud;
+        open3d::pipelines::registration::CorrespondenceSet correspondences = MatchFeatures(*sourceFeatures->Features, *targetFeatures->Features, ransacN);
+        if (static_cast<int>(correspondences.size()) < ransacN)
+            throw std::invalid_argument("The features must give at least ransacN matches.");
+        open3d::geometry::KDTreeFlann targetKDTree(target);
+        double correspondencesTime = GetElapsedSeconds(start);
+
+        open3d::pipelines::registration::TransformationEstimationPointToPoint transformationEstimation = 
+            open3d::pipelines::registration::TransformationEstimationPointToPoint(isTEstimatePt2Pt);
+        open3d::pipelines::registration::CorrespondenceCheckerBasedOnDistance checkerOnDistance = 
+            open3d::pipelines::registration::CorrespondenceCheckerBasedOnDistance(correspondenceCheckerDistance);
+        open3d::pipelines::registration::CorrespondenceCheckerBasedOnEdgeLength checkerOnEdgeLength = 
+            open3d::pipelines::registration::CorrespondenceCheckerBasedOnEdgeLength(similarityThreshold);
+
+        start = std::chrono::steady_clock::now();
+        int numRuns = static_cast<int>(runSeeds.size());
+        std::vector<open3d::pipelines::registration::RegistrationResult> runResults(numRuns);
+        std::vector<int> runIterations(numRuns, 0);
+        #pragma omp parallel for schedule(dynamic, 1) num_threads(ResolveNumThreads(numThreads))
+        for (int run = 0; run < numRuns; run++)
+        {
+            std::mt19937 generator(runSeeds[run]);
+            std::uniform_int_distribution<int> pickCorrespondence(0, static_cast<int>(correspondences.size()) - 1);
+            std::vector<int> sampleIndices(ransacN);
+            open3d::pipelines::registration::CorrespondenceSet sample(ransacN);
+            open3d::pipelines::registration::RegistrationResult bestResult;
+            int maxIteration = ransacMaxIteration;
+            int iteration = 0;
+            for (; iteration < maxIteration; iteration++)
+            {
+                // as in open3d, the correspondences of a sample are distinct, a repeated one would make it degenerate
+                for (int j = 0; j < ransacN; j++)
+                {
+                    do
+                        sampleIndices[j] = pickCorrespondence(generator);
+                    while (std::find(sampleIndices.begin(), sampleIndices.begin() + j, sampleIndices[j]) != sampleIndices.begin() + j);
+                    sample[j] = correspondences[sampleIndices[j]];
+                }
+                // as in open3d, the edge length check does not need the transformation and runs before its estimation
+                if (!checkerOnEdgeLength.Check(source, target, sample, Eigen::Matrix4d::Identity()))
+                    continue;
+                Eigen::Matrix4d transformation = transformationEstimation.ComputeTransformation(source, target, sample);
+                if (!checkerOnDistance.Check(source, target, sample, transformation))
+                    continue;
+
+                open3d::pipelines::registration::RegistrationResult result
+                    = EvaluateTransformation(source, targetKDTree, maxCorrespondenceDistance, transformation, false);
+                if (result.IsBetterRANSACThan(bestResult))
+                {
+                    bestResult = result;
+                    // the number of iterations needed to draw an all-inlier sample with the required confidence. With a
+                    // low fitness, 1 - fitness^n rounds to 1 and the estimate is not finite: the limit is kept
+                    double estimatedIterations = std::log(1.0 - ransacConfidenceThreshold) / std::log(1.0 - std::pow(result.fitness_, ransacN));
+                    if (std::isfinite(estimatedIterations) && estimatedIterations >= 0 && estimatedIterations < maxIteration)
+                        maxIteration = static_cast<int>(std::ceil(estimatedIterations));
+                }
+            }
+            runResults[run] = bestResult;
+            runIterations[run] = iteration;
+        }
+
+        // the runs are compared in the order of the seeds, so that ties do not depend on the threads
+        int bestRun = 0;
+        for (int run = 1; run < numRuns; run++)
+        {
+            if (runResults[run].IsBetterRANSACThan(runResults[bestRun]))
+                bestRun = run;
+        }
+        DFRegistrationResult registrationResult(EvaluateTransformation(
+            source, targetKDTree, maxCorrespondenceDistance, runResults[bestRun].transformation_, true));
+        registrationResult.NumIterations = runIterations[bestRun];
+        registrationResult.Timings["correspondences"] = correspondencesTime;
+        registrationResult.Timings["registration"] = GetElapsedSeconds(start);
+        return registrationResult;
     }
-}
\ No newline at end of file
+}
@@ -1,13 +1,52 @@
 #pragma once
 
 #include "diffCheck.hh"
+#include <map>
+#include <string>
 #include <open3d/pipelines/registration/Registration.h>
 #include <open3d/pipelines/registration/TransformationEstimation.h>
 
+#include "diffCheck/registrations/DFFeatureCache.hh"
+#include "diffCheck/registrations/DFRegistrationResult.hh"
+
 namespace diffCheck::registrations
 {
+    /// @brief A point cloud prepared for the global registrations: downsampled, with normals, and its FPFH features
+    struct DFRegistrationFeatures
+    {
+        /// @brief the downsampled point cloud, with normals
+        std::shared_ptr<open3d::geometry::PointCloud> Cloud;
+        /// @brief the FPFH features of the points of the cloud
+        std::shared_ptr<open3d::pipelines::registration::Feature> Features;
+        /// @brief the duration in seconds of the preprocessing (downsampling and normals) and of the features
+        std::map<std::string, double> Timings;
+
+        /// @brief Number of points of the downsampled cloud
+        int GetNumPoints() const { return this->Cloud != nullptr ? static_cast<int>(this->Cloud->points_.size()) : 0; }
+    };
+
     class DFGlobalRegistrations
     {
+    public:  ///< Preprocessing
+        /**
+         * @brief Prepare a point cloud for the global registrations: downsample it on a voxel grid, estimate its normals
+         * if it has none, and compute its FPFH features. The cost of the features drops with the number of points, and a
+         * cloud registered many times (e.g. the target sampled on the CAD model) can be prepared once and reused.
+         *
+         * @param cloud the diffCheck point cloud
+         * @param voxelSize the size of the voxels used to downsample the point cloud, 0 to keep all the points. The normals of a downsampled cloud are estimated within twice the voxel size
+         * @param radiusKDTreeSearch the radius used to search for neighbors in the KDTree. It is used for the calculation of FPFHFeatures, and should be a few times the voxel size
+         * @param maxNeighborKDTreeSearch the maximum number of neighbors to search for in the KDTree. It is used for the calculation of FPFHFeatures
+         * @param featureCache the cache of the FPFH features. If nullptr, the features are always computed
+         * @return std::shared_ptr<DFRegistrationFeatures> the downsampled cloud with its features
+         */
+        static std::shared_ptr<DFRegistrationFeatures> ComputeRegistrationFeatures(
+            std::shared_ptr<geometry::DFPointCloud> cloud,
+            double voxelSize = 0.0,
+            double radiusKDTreeSearch = 0.8,
+            int maxNeighborKDTreeSearch = 50,
+            std::shared_ptr<DFFeatureCache> featureCache = nullptr);
+
     public:  ///< Open3d registrations
         /**
         * @brief Fast Global Registration based on Feature Matching using (Fast) Point Feature Histograms (FPFH) on the source and target point clouds
@@ -27,14 +66,15 @@ namespace diffCheck::registrations
         * @param maxCorrespondenceDistance the maximum distance between correspondences. A higher value will result in more correspondences, but potentially include wrong ones.
         * @param iterationNumber the number of iterations to run the RanSaC registration algorithm. A higher value will take more time to compute but increases the chances of finding a good transformation. As parameter of the FastGlobalRegistrationOption options 
         * @param maxTupleCount the maximum number of tuples to consider in the FPFH hyperspace. A higher value will result in heavier computation but potentially more precise. As parameter of the FastGlobalRegistrationOption options 
-        * @return diffCheck::transformation::DFTransformation The result of the registration, containing the transformation matrix and the fitness score.
+        * @param featureCache the cache of the FPFH features, e.g. to compute the features of a target registered against many sources only once. If nullptr, the features are always computed
+        * @return DFRegistrationResult The result of the registration, containing the transformation matrix, the fitness score, the inlier RMSE, the correspondences and the timings of the stages.
         * 
         * @see https://www.open3d.org/docs/latest/cpp_api/classopen3d_1_1pipelines_1_1registration_1_1_registration_result.html#a6722256f1f3ddccb2c4ec8d724693974 for more information on the RegistrationResult object
         * @see https://link.springer.com/content/pdf/10.1007/978-3-319-46475-6_47.pdf for the original article on Fast Global Registration
         * @see https://pcl.readthedocs.io/projects/tutorials/en/latest/pfh_estimation.html#pfh-estimation for more information on PFH (from PCL, not Open3D)
         * @see https://mediatum.ub.tum.de/doc/800632/941254.pdf for in-depth documentation on the theory
         */
-        static diffCheck::transformation::DFTransformation O3DFastGlobalRegistrationFeatureMatching(
+        static DFRegistrationResult O3DFastGlobalRegistrationFeatureMatching(
             std::shared_ptr<geometry::DFPointCloud> source, 
             std::shared_ptr<geometry::DFPointCloud> target,
             bool voxelize = false,
@@ -43,6 +83,18 @@ namespace diffCheck::registrations
             int maxNeighborKDTreeSearch = 50,
             double maxCorrespondenceDistance = 0.05,
             int iterationNumber = 128,
+            int maxTupleCount = 1000,
+            std::shared_ptr<DFFeatureCache> featureCache = nullptr);
+        /**
+         * @brief Fast Global Registration of point clouds already prepared by ComputeRegistrationFeatures
+         *
+         * @see O3DFastGlobalRegistrationFeatureMatching for the meaning of the parameters
+         */
+        static DFRegistrationResult O3DFastGlobalRegistrationOnFeatures(
+            std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+            std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+            double maxCorrespondenceDistance = 0.05,
+            int iterationNumber = 128,
             int maxTupleCount = 1000);
         /**
         * @brief Ransac registration based on Feature Matching using (Fast) Point Feature Histograms (FPFH) on the source and target point clouds
@@ -62,11 +114,12 @@ namespace diffCheck::registrations
         * @param similarityThreshold the threshold for the ransac check based on edge length to consider a model as inlier. A higher value will be stricter, discarding more ransac models. 
         * @param ransacMaxIteration the maximum number of iterations to run the Ransac algorithm. A higher value will take more time to compute but increases the chances of finding a good transformation.
         * @param ransacConfidenceThreshold the threshold for the convergence criteria of the ransac models. A higher value will be stricter, discarding more ransac models.
-        * @return diffCheck::transformation::DFTransformation The result of the registration, containing the transformation matrix and the fitness score.
+        * @param featureCache the cache of the FPFH features, e.g. to compute the features of a target registered against many sources only once. If nullptr, the features are always computed
+        * @return DFRegistrationResult The result of the registration, containing the transformation matrix, the fitness score, the inlier RMSE, the correspondences and the timings of the stages.
         * 
         * @see https://www.open3d.org/docs/release/tutorial/pipelines/global_registration.html#RANSAC (from PCL, not Open3D)
         */
-        static diffCheck::transformation::DFTransformation O3DRansacOnFeatureMatching(
+        static DFRegistrationResult O3DRansacOnFeatureMatching(
             std::shared_ptr<geometry::DFPointCloud> source,
             std::shared_ptr<geometry::DFPointCloud> target,
             bool voxelize = false,
@@ -79,22 +132,85 @@ namespace diffCheck::registrations
             double correspondenceCheckerDistance = 0.5,
             double similarityThreshold = 0.9,
             int ransacMaxIteration = 100000,
+            double ransacConfidenceThreshold = 0.999,
+            std::shared_ptr<DFFeatureCache> featureCache = nullptr);
+        /**
+         * @brief Ransac registration of point clouds already prepared by ComputeRegistrationFeatures
+         *
+         * @see O3DRansacOnFeatureMatching for the meaning of the parameters
+         */
+        static DFRegistrationResult O3DRansacOnFeatures(
+            std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+            std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+            double maxCorrespondenceDistance = 0.5,
+            bool isTEstimatePt2Pt = false,
+            int ransacN = 3,
+            double correspondenceCheckerDistance = 0.5,
+            double similarityThreshold = 0.9,
+            int ransacMaxIteration = 100000,
             double ransacConfidenceThreshold = 0.999);
 
-    private: ///< o3d utilities to evaluate registration errors
+        /**
+         * @brief Multi-start Ransac registration of point clouds already prepared by ComputeRegistrationFeatures
+         *
+         * Independent Ransac runs are launched in parallel, one per seed, and the best result is kept, ranked by fitness
+         * and then by inlier RMSE. The feature matches and the KD-tree of the target are computed once and shared by all
+         * the runs. Each run follows the loop of open3d (sampling of distinct correspondences, estimation, edge length and distance checks, evaluation
+         * and confidence based stop) with its own random generator, so that the result only depends on the seeds and not on the threads.
+         *
+         * @param sourceFeatures the prepared source point cloud
+         * @param targetFeatures the prepared target point cloud
+         * @param numStarts the number of runs, each with a random seed, if no seeds are given
+         * @param seeds the seeds of the runs, for reproducible results
+         * @param maxCorrespondenceDistance the maximum distance between the points of a correspondence when evaluating a model
+         * @param isTEstimatePt2Pt the transformation estimation method to use. If true it will scale and deform the cloud.
+         * @param ransacN the number of correspondences sampled for each model
+         * @param correspondenceCheckerDistance the maximum distance between the sampled correspondences once transformed, before evaluating a model
+         * @param similarityThreshold the minimum ratio, between 0 and 1, of the lengths of the matching edges of the sampled source and target points, before evaluating a model. 0 disables the check.
+         * @param ransacMaxIteration the maximum number of iterations of each run
+         * @param ransacConfidenceThreshold the confidence after which a run stops
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return DFRegistrationResult the best result of the runs, with its number of iterations
+         *
+         * @see O3DRansacOnFeatureMatching for the single run of open3d
+         */
+        static DFRegistrationResult O3DRansacMultiStart(
+            std::shared_ptr<DFRegistrationFeatures> sourceFeatures,
+            std::shared_ptr<DFRegistrationFeatures> targetFeatures,
+            int numStarts = 8,
+            const std::vector<unsigned int> &seeds = {},
+            double maxCorrespondenceDistance = 0.5,
+            bool isTEstimatePt2Pt = false,
+            int ransacN = 3,
+            double correspondenceCheckerDistance = 0.5,
+            double similarityThreshold = 0.9,
+            int ransacMaxIteration = 100000,
+            double ransacConfidenceThreshold = 0.999,
+            int numThreads = 0);
+
+    public: ///< utilities to evaluate registration errors
         /**
          * @brief Evaluate the registration of a source point cloud to a target point cloud by applying a transformation matrix 
          * to the source point cloud and evaluate the error between the transformed source point cloud and the target point cloud.
          * 
+         * The persistent KD-tree of the target is used for all the transforms, so it is built at most once across the calls
+         * sharing the same target, and the transforms are evaluated in parallel,
+         * each source point being transformed on the fly without copying the source. With early termination, a transform
+         * is dropped as soon as its partial sum of distances exceeds the one of the best transform evaluated so far.
+         * 
          * @param source The source diffCheck point cloud
          * @param target The target diffCheck point cloud
-         * @param transform The vector of transformation matrix we want to evaluate. they are applied to the source point cloud.
-         * @return std::vector<double> A vector of mean distances, one for each transform.
+         * @param transforms The vector of transformation matrix we want to evaluate. they are applied to the source point cloud, and are expected to be affine.
+         * @param earlyTermination whether to stop evaluating a transform once it cannot beat the best one
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::vector<double> A vector of mean distances, one for each transform. With early termination, the dropped transforms have an infinite distance.
         */
         static std::vector<double> EvaluateRegistrations(
             std::shared_ptr<geometry::DFPointCloud> source, 
             std::shared_ptr<geometry::DFPointCloud> target,
-            std::vector<Eigen::Matrix<double, 4, 4>> transforms);
+            const std::vector<Eigen::Matrix<double, 4, 4>> &transforms,
+            bool earlyTermination = false,
+            int numThreads = 0);
     };
 
 }
\ No newline at end of file
@@ -1,10 +1,120 @@
 #include "DFRefinedRegistration.hh"
+#include "diffCheck/parallel.hh"
+
+#include <chrono>
+#include <cmath>
+#include <exception>
 
 
 namespace diffCheck::registrations
 {
-    diffCheck::transformation::DFTransformation DFRefinedRegistration::O3DICP(
-        std::shared_ptr<geometry::DFPointCloud> source, 
+    namespace
+    {
+        /// @brief Get the seconds elapsed since a time point
+        double GetElapsedSeconds(const std::chrono::steady_clock::time_point &start)
+        {
+            return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+        }
+
+        /**
+         * @brief Find the nearest target point of each source point within the maximum correspondence distance, and
+         * evaluate the fitness and inlier RMSE of the correspondences as open3d does
+         *
+         * @param source the source point cloud, already transformed
+         * @param targetKDTree the KD-tree of the target point cloud
+         * @param maxCorrespondenceDistance the maximum distance of a correspondence
+         * @param transformation the transformation applied to the source
+         * @return open3d::pipelines::registration::RegistrationResult the evaluated correspondences
+         */
+        open3d::pipelines::registration::RegistrationResult EvaluateCorrespondences(
+            const open3d::geometry::PointCloud &source,
+            const open3d::geometry::KDTreeFlann &targetKDTree,
+            double maxCorrespondenceDistance,
+            const Eigen::Matrix4d &transformation)
+        {
+            int numPoints = static_cast<int>(source.points_.size());
+            std::vector<int> matches(numPoints, -1);
+            std::vector<double> squaredDistances(numPoints, 0.0);
+            #pragma omp parallel for
+            for (int i = 0; i < numPoints; i++)
+            {
+                std::vector<int> indices(1);
+                std::vector<double> distances2(1);
+                if (targetKDTree.SearchHybrid(source.points_[i], maxCorrespondenceDistance, 1, indices, distances2) > 0)
+                {
+                    matches[i] = indices[0];
+                    squaredDistances[i] = distances2[0];
+                }
+            }
+
+            open3d::pipelines::registration::RegistrationResult result(transformation);
+            double error2 = 0.0;
+            for (int i = 0; i < numPoints; i++)
+            {
+                if (matches[i] < 0)
+                    continue;
+                result.correspondence_set_.push_back(Eigen::Vector2i(i, matches[i]));
+                error2 += squaredDistances[i];
+            }
+            if (!result.correspondence_set_.empty())
+            {
+                result.fitness_ = static_cast<double>(result.correspondence_set_.size()) / numPoints;
+                result.inlier_rmse_ = std::sqrt(error2 / result.correspondence_set_.size());
+            }
+            return result;
+        }
+
+        /**
+         * @brief Run the ICP iterations of open3d (RegistrationICP and RegistrationGeneralizedICP follow the same loop),
+         * keeping track of the number of iterations
+         *
+         * @param source the source point cloud, with the normals or covariances required by the estimation
+         * @param target the target point cloud, with the normals or covariances required by the estimation
+         * @param targetKDTree the KD-tree of the target point cloud
+         * @param estimation the estimation of the transformation from the correspondences
+         * @param maxCorrespondenceDistance the maximum distance of a correspondence
+         * @param initialTransformation the transformation applied to the source before the first iteration
+         * @param criteria the convergence criteria
+         * @return DFRegistrationResult the result of the registration
+         */
+        DFRegistrationResult RunICPIterations(
+            const open3d::geometry::PointCloud &source,
+            const open3d::geometry::PointCloud &target,
+            const open3d::geometry::KDTreeFlann &targetKDTree,
+            const open3d::pipelines::registration::TransformationEstimation &estimation,
+            double maxCorrespondenceDistance,
+            const Eigen::Matrix4d &initialTransformation,
+            const open3d::pipelines::registration::ICPConvergenceCriteria &criteria)
+        {
+            open3d::geometry::PointCloud transformedSource = source;
+            if (!initialTransformation.isIdentity())
+                transformedSource.Transform(initialTransformation);
+
+            Eigen::Matrix4d transformation = initialTransformation;
+            open3d::pipelines::registration::RegistrationResult result
+                = EvaluateCorrespondences(transformedSource, targetKDTree, maxCorrespondenceDistance, transformation);
+            int numIterations = 0;
+            while (numIterations < criteria.max_iteration_)
+            {
+                numIterations++;
+                Eigen::Matrix4d update = estimation.ComputeTransformation(transformedSource, target, result.correspondence_set_);
+                transformation = update * transformation;
+                transformedSource.Transform(update);
+                open3d::pipelines::registration::RegistrationResult previousResult = result;
+                result = EvaluateCorrespondences(transformedSource, targetKDTree, maxCorrespondenceDistance, transformation);
+                if (std::abs(previousResult.fitness_ - result.fitness_) < criteria.relative_fitness_
+                    && std::abs(previousResult.inlier_rmse_ - result.inlier_rmse_) < criteria.relative_rmse_)
+                    break;
+            }
+
+            DFRegistrationResult registrationResult(result);
+            registrationResult.NumIterations = numIterations;
+            return registrationResult;
+        }
+    }
+
+    DFRegistrationResult DFRefinedRegistration::O3DICP(
+        std::shared_ptr<geometry::DFPointCloud> source,
         std::shared_ptr<geometry::DFPointCloud> target,
         double maxCorrespondenceDistance,
         bool scalingForPointToPointTransformationEstimation,
@@ -13,51 +123,167 @@ namespace diffCheck::registrations
         int maxIteration,
         bool usePointToPlane)
     {
-        std::vector<Eigen::Vector3d> minMax = source->GetAxixAlignedBoundingBox();
+        DFICPParameters parameters;
+        parameters.MaxCorrespondenceDistance = maxCorrespondenceDistance;
+        parameters.ScalingForPointToPointTransformationEstimation = scalingForPointToPointTransformationEstimation;
+        parameters.RelativeFitness = relativeFitness;
+        parameters.RelativeRMSE = relativeRMSE;
+        parameters.MaxIteration = maxIteration;
+        parameters.UsePointToPlane = usePointToPlane;
+        return RunO3DICP(*source, *target, parameters);
+    }
+
+    std::vector<DFRegistrationResult> DFRefinedRegistration::O3DICPBatch(
+        const std::vector<std::shared_ptr<geometry::DFPointCloud>> &sources,
+        const std::vector<std::shared_ptr<geometry::DFPointCloud>> &targets,
+        const std::vector<DFICPParameters> &parameters,
+        int numThreads)
+    {
+        if (sources.size() != targets.size())
+            throw std::invalid_argument("The number of sources and targets must be the same.");
+        if (parameters.size() > 1 && parameters.size() != sources.size())
+            throw std::invalid_argument("The parameters must be given once for all the pairs or once per pair.");
+
+        int numPairs = static_cast<int>(sources.size());
+        std::vector<DFRegistrationResult> results(numPairs);
+        std::vector<std::exception_ptr> errors(numPairs);
+        DFICPParameters defaultParameters;
+
+        // the pairs have very different sizes, they are dispatched one by one to the free threads
+        #pragma omp parallel for schedule(dynamic, 1) num_threads(ResolveNumThreads(numThreads))
+        for (int i = 0; i < numPairs; i++)
+        {
+            if (!sources[i]->HasPoints() || !targets[i]->HasPoints())
+                continue;
+            try
+            {
+                const DFICPParameters &pairParameters = parameters.empty() ? defaultParameters : parameters[parameters.size() == 1 ? 0 : i];
+                results[i] = RunO3DICP(*sources[i], *targets[i], pairParameters);
+            }
+            catch (...)
+            {
+                errors[i] = std::current_exception();
+            }
+        }
+
+        for (const std::exception_ptr &error : errors)
+            if (error)
+                std::rethrow_exception(error);
+        int numSkipped = 0;
+        for (int i = 0; i < numPairs; i++)
+            if (!sources[i]->HasPoints() || !targets[i]->HasPoints())
+                numSkipped++;
+        if (numSkipped > 0)
+            DIFFCHECK_WARN((std::to_string(numSkipped) + " pairs with an empty point cloud were not registered.").c_str());
+        return results;
+    }
+
+    DFRegistrationResult DFRefinedRegistration::O3DMultiScaleICP(
+        std::shared_ptr<geometry::DFPointCloud> source,
+        std::shared_ptr<geometry::DFPointCloud> target,
+        const std::vector<DFICPLevel> &levels,
+        const diffCheck::transformation::DFTransformation &initialTransformation,
+        bool usePointToPlane)
+    {
+        if (!source->HasPoints() || !target->HasPoints())
+            throw std::invalid_argument("The source and target point clouds must not be empty.");
 
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
         std::shared_ptr<open3d::geometry::PointCloud> O3Dsource = source->Cvt2O3DPointCloud();
         std::shared_ptr<open3d::geometry::PointCloud> O3Dtarget = target->Cvt2O3DPointCloud();
-        Eigen::Matrix4d initialTransformation = Eigen::Matrix4d::Identity();
-        open3d::pipelines::registration::ICPConvergenceCriteria criteria
-            = open3d::pipelines::registration::ICPConvergenceCriteria(
-                relativeFitness, 
-                relativeRMSE,
-                maxIteration);
-
-        open3d::pipelines::registration::RegistrationResult result;
 
-        if(usePointToPlane)
+        // the default pyramid is at the scale of the source point cloud
+        std::vector<DFICPLevel> pyramid = levels;
+        if (pyramid.empty())
         {
-            O3Dsource->EstimateNormals();
-            O3Dtarget->EstimateNormals();
-            open3d::pipelines::registration::TransformationEstimationPointToPlane transformation_estimation 
-                = open3d::pipelines::registration::TransformationEstimationPointToPlane();
-            result = open3d::pipelines::registration::RegistrationICP(
-                *O3Dsource, 
-                *O3Dtarget, 
-                maxCorrespondenceDistance,
-                initialTransformation,
-                transformation_estimation,
-                criteria);
+            std::vector<Eigen::Vector3d> boundingBox = source->GetAxixAlignedBoundingBox();
+            double diagonal = (boundingBox[1] - boundingBox[0]).norm();
+            for (double voxelRatio : {0.02, 0.01, 0.0})
+            {
+                DFICPLevel level;
+                level.VoxelSize = voxelRatio * diagonal;
+                level.MaxCorrespondenceDistance = voxelRatio > 0 ? 2.5 * voxelRatio * diagonal : 0.01 * diagonal;
+                pyramid.push_back(level);
+            }
         }
-        else
+        for (const DFICPLevel &level : pyramid)
         {
-            open3d::pipelines::registration::TransformationEstimationPointToPoint transformation_estimation 
-                = open3d::pipelines::registration::TransformationEstimationPointToPoint(scalingForPointToPointTransformationEstimation);
-            result = open3d::pipelines::registration::RegistrationICP(
-                *O3Dsource, 
-                *O3Dtarget, 
-                maxCorrespondenceDistance,
-                initialTransformation,
-                transformation_estimation,
-                criteria);
+            if (level.VoxelSize < 0 || level.MaxCorrespondenceDistance <= 0)
+                throw std::invalid_argument("The voxel size of a level must be positive or 0 and its maximum correspondence distance strictly positive.");
         }
-        
-        diffCheck::transformation::DFTransformation transformation 
-            = diffCheck::transformation::DFTransformation(result.transformation_);
-        return transformation;
+
+        DFRegistrationResult result;
+        result.Timings["preprocessing"] = GetElapsedSeconds(start);
+
+        Eigen::Matrix4d transformation = initialTransformation.TransformationMatrix;
+        int numIterations = 0;
+        for (size_t i = 0; i < pyramid.size(); i++)
+        {
+            start = std::chrono::steady_clock::now();
+            const DFICPLevel &level = pyramid[i];
+            std::shared_ptr<open3d::geometry::PointCloud> levelSource = O3Dsource;
+            std::shared_ptr<open3d::geometry::PointCloud> levelTarget = O3Dtarget;
+            if (level.VoxelSize > 0)
+            {
+                levelSource = O3Dsource->VoxelDownSample(level.VoxelSize);
+                levelTarget = O3Dtarget->VoxelDownSample(level.VoxelSize);
+            }
+            // only the target normals are used by the point-to-plane estimation
+            if (usePointToPlane && !levelTarget->HasNormals())
+            {
+                if (level.VoxelSize > 0)
+                    levelTarget->EstimateNormals(open3d::geometry::KDTreeSearchParamHybrid(2 * level.VoxelSize, 30));
+                else
+                    levelTarget->EstimateNormals();
+            }
+            open3d::geometry::KDTreeFlann targetKDTree(*levelTarget);
+
+            open3d::pipelines::registration::ICPConvergenceCriteria criteria
+                = open3d::pipelines::registration::ICPConvergenceCriteria(
+                    level.RelativeFitness,
+                    level.RelativeRMSE,
+                    level.MaxIteration);
+            DFRegistrationResult levelResult;
+            if (usePointToPlane)
+            {
+                open3d::pipelines::registration::TransformationEstimationPointToPlane transformation_estimation
+                    = open3d::pipelines::registration::TransformationEstimationPointToPlane();
+                levelResult = RunICPIterations(
+                    *levelSource,
+                    *levelTarget,
+                    targetKDTree,
+                    transformation_estimation,
+                    level.MaxCorrespondenceDistance,
+                    transformation,
+                    criteria);
+            }
+            else
+            {
+                open3d::pipelines::registration::TransformationEstimationPointToPoint transformation_estimation
+                    = open3d::pipelines::registration::TransformationEstimationPointToPoint(false);
+                levelResult = RunICPIterations(
+                    *levelSource,
+                    *levelTarget,
+                    targetKDTree,
+                    transformation_estimation,
+                    level.MaxCorrespondenceDistance,
+                    transformation,
+                    criteria);
+            }
+            transformation = levelResult.Transformation.TransformationMatrix;
+            numIterations += levelResult.NumIterations;
+
+            result.Transformation = levelResult.Transformation;
+            result.Fitness = levelResult.Fitness;
+            result.InlierRMSE = levelResult.InlierRMSE;
+            result.CorrespondenceSet = std::move(levelResult.CorrespondenceSet);
+            result.Timings["level_" + std::to_string(i)] = GetElapsedSeconds(start);
+        }
+        result.NumIterations = numIterations;
+        return result;
     }
-    diffCheck::transformation::DFTransformation DFRefinedRegistration::O3DGeneralizedICP(
+
+    DFRegistrationResult DFRefinedRegistration::O3DGeneralizedICP(
         std::shared_ptr<geometry::DFPointCloud> source,
         std::shared_ptr<geometry::DFPointCloud> target,
          double maxCorrespondenceDistance,
@@ -65,35 +291,92 @@ namespace diffCheck::registrations
             double relativeFitness,
             double relativeRMSE)
     {
-        std::vector<Eigen::Vector3d> minMax = source->GetAxixAlignedBoundingBox();
-
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
         std::shared_ptr<open3d::geometry::PointCloud> O3Dsource = source->Cvt2O3DPointCloud();
         std::shared_ptr<open3d::geometry::PointCloud> O3Dtarget = target->Cvt2O3DPointCloud();
 
         O3Dsource->EstimateCovariances();
         O3Dtarget->EstimateCovariances();
+        open3d::geometry::KDTreeFlann targetKDTree(*O3Dtarget);
+        double preprocessingTime = GetElapsedSeconds(start);
 
         Eigen::Matrix4d initialTransformation = Eigen::Matrix4d::Identity();
         open3d::pipelines::registration::ICPConvergenceCriteria criteria
             = open3d::pipelines::registration::ICPConvergenceCriteria(
-                relativeFitness, 
+                relativeFitness,
                 relativeRMSE,
                 maxIteration);
 
-        open3d::pipelines::registration::TransformationEstimationForGeneralizedICP transformation_estimation 
+        open3d::pipelines::registration::TransformationEstimationForGeneralizedICP transformation_estimation
             = open3d::pipelines::registration::TransformationEstimationForGeneralizedICP();
 
-        open3d::pipelines::registration::RegistrationResult result 
-            = open3d::pipelines::registration::RegistrationGeneralizedICP(
-                *O3Dsource, 
-                *O3Dtarget, 
-                maxCorrespondenceDistance,
+        start = std::chrono::steady_clock::now();
+        DFRegistrationResult result = RunICPIterations(
+            *O3Dsource,
+            *O3Dtarget,
+            targetKDTree,
+            transformation_estimation,
+            maxCorrespondenceDistance,
+            initialTransformation,
+            criteria);
+        result.Timings["preprocessing"] = preprocessingTime;
+        result.Timings["registration"] = GetElapsedSeconds(start);
+        return result;
+    }
+
+    DFRegistrationResult DFRefinedRegistration::RunO3DICP(
+        const geometry::DFPointCloud &source,
+        const geometry::DFPointCloud &target,
+        const DFICPParameters &parameters)
+    {
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+        std::shared_ptr<open3d::geometry::PointCloud> O3Dsource = source.Cvt2O3DPointCloud();
+        std::shared_ptr<open3d::geometry::PointCloud> O3Dtarget = target.Cvt2O3DPointCloud();
+        if (parameters.UsePointToPlane)
+        {
+            O3Dsource->EstimateNormals();
+            O3Dtarget->EstimateNormals();
+        }
+        open3d::geometry::KDTreeFlann targetKDTree(*O3Dtarget);
+        double preprocessingTime = GetElapsedSeconds(start);
+
+        Eigen::Matrix4d initialTransformation = Eigen::Matrix4d::Identity();
+        open3d::pipelines::registration::ICPConvergenceCriteria criteria
+            = open3d::pipelines::registration::ICPConvergenceCriteria(
+                parameters.RelativeFitness,
+                parameters.RelativeRMSE,
+                parameters.MaxIteration);
+
+        start = std::chrono::steady_clock::now();
+        DFRegistrationResult result;
+        if(parameters.UsePointToPlane)
+        {
+            open3d::pipelines::registration::TransformationEstimationPointToPlane transformation_estimation
+                = open3d::pipelines::registration::TransformationEstimationPointToPlane();
+            result = RunICPIterations(
+                *O3Dsource,
+                *O3Dtarget,
+                targetKDTree,
+                transformation_estimation,
+                parameters.MaxCorrespondenceDistance,
                 initialTransformation,
+                criteria);
+        }
+        else
+        {
+            open3d::pipelines::registration::TransformationEstimationPointToPoint transformation_estimation
+                = open3d::pipelines::registration::TransformationEstimationPointToPoint(parameters.ScalingForPointToPointTransformationEstimation);
+            result = RunICPIterations(
+                *O3Dsource,
+                *O3Dtarget,
+                targetKDTree,
                 transformation_estimation,
+                parameters.MaxCorrespondenceDistance,
+                initialTransformation,
                 criteria);
-
-        diffCheck::transformation::DFTransformation transformation 
-            = diffCheck::transformation::DFTransformation(result.transformation_);
-        return transformation;
+        }
+        result.Timings["preprocessing"] = preprocessingTime;
+        result.Timings["registration"] = GetElapsedSeconds(start);
+        return result;
     }
-}
\ No newline at end of file
+}
@@ -3,8 +3,31 @@
 
 # include <open3d/pipelines/registration/Registration.h>
 
+# include "diffCheck/registrations/DFRegistrationResult.hh"
+
 namespace diffCheck::registrations
 {
+    /// @brief Parameters of an ICP registration, see DFRefinedRegistration::O3DICP for their meaning
+    struct DFICPParameters
+    {
+        double MaxCorrespondenceDistance = 5;
+        bool ScalingForPointToPointTransformationEstimation = false;
+        double RelativeFitness = 1e-6;
+        double RelativeRMSE = 1e-6;
+        int MaxIteration = 30;
+        bool UsePointToPlane = false;
+    };
+
+    /// @brief Parameters of a level of a multi-scale ICP, see DFRefinedRegistration::O3DMultiScaleICP for their meaning
+    struct DFICPLevel
+    {
+        double VoxelSize = 0;
+        double MaxCorrespondenceDistance = 5;
+        double RelativeFitness = 1e-6;
+        double RelativeRMSE = 1e-6;
+        int MaxIteration = 30;
+    };
+
     class DFRefinedRegistration
     {
         public: ///< open3d registration methods
@@ -23,9 +46,9 @@ namespace diffCheck::registrations
          * @param relativeFitness Threshold for relative fitness to use in the p2p transformation estimation
          * @param relativeRMSE Threshold for relative RMSE to use in the p2p transformation estimation
          * @param usePointToPlane Use point-to-plane ICP instead of point-to-point. This replaces the p2p with the point-to-plane transformation estimation. 
-         * @return diffCheck::transformation::DFTransformation
+         * @return DFRegistrationResult the transformation with its fitness, inlier RMSE, correspondences, number of iterations and timings
         */
-        static diffCheck::transformation::DFTransformation O3DICP(
+        static DFRegistrationResult O3DICP(
             std::shared_ptr<geometry::DFPointCloud> source, 
             std::shared_ptr<geometry::DFPointCloud> target,
             double maxCorrespondenceDistance = 5,
@@ -35,6 +58,46 @@ namespace diffCheck::registrations
             int maxIteration = 30,
             bool usePointToPlane = false);
 
+        /**
+         * @brief Perform the ICP registration of many source/target pairs in parallel, e.g. the joints of an assembly.
+         * Each pair is registered on its own thread as with O3DICP, and the pairs with an empty cloud are skipped
+         * with an identity transformation and a fitness of 0.
+         * 
+         * @param sources the source point clouds
+         * @param targets the target point clouds, one per source
+         * @param parameters the parameters of each pair, a single one for all the pairs, or none for the default ones
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::vector<DFRegistrationResult> the transformation, fitness and inlier RMSE of each pair
+         */
+        static std::vector<DFRegistrationResult> O3DICPBatch(
+            const std::vector<std::shared_ptr<geometry::DFPointCloud>> &sources,
+            const std::vector<std::shared_ptr<geometry::DFPointCloud>> &targets,
+            const std::vector<DFICPParameters> &parameters = {},
+            int numThreads = 0);
+
+        /**
+         * @brief Perform a coarse-to-fine ICP registration using Open3D
+         * 
+         * Both point clouds are voxel-downsampled at the scale of each level and the ICP of each level starts from
+         *  the transformation found by the previous one, so that the full resolution clouds are only aligned
+         *  for the last few iterations. The levels are run in the given order, from the coarsest to the finest.
+         * 
+         * @param source DFPointCloud source point cloud
+         * @param target DFPointCloud Target point cloud
+         * @param levels the voxel size (0 for the full resolution), the maximum correspondence distance and the convergence criteria of each level.
+         *  If empty, three levels are derived from the bounding box diagonal of the source: voxels of 2% and 1% of the diagonal, then the full resolution
+         * @param initialTransformation the transformation applied to the source before the first level
+         * @param usePointToPlane Use point-to-plane ICP instead of point-to-point. The target normals are estimated at each level if missing
+         * @return DFRegistrationResult the transformation with the fitness, inlier RMSE and correspondences of the last level,
+         *  the number of iterations of all the levels and the timing of each level
+         */
+        static DFRegistrationResult O3DMultiScaleICP(
+            std::shared_ptr<geometry::DFPointCloud> source,
+            std::shared_ptr<geometry::DFPointCloud> target,
+            const std::vector<DFICPLevel> &levels = {},
+            const diffCheck::transformation::DFTransformation &initialTransformation = diffCheck::transformation::DFTransformation(Eigen::Matrix4d::Identity()),
+            bool usePointToPlane = false);
+
         /**
          * @brief Perform Generalized ICP registration using Open3D
          * 
@@ -48,16 +111,30 @@ namespace diffCheck::registrations
          * @param maxIteration Maximum number of ICP iterations to use in the p2p transformation estimation
          * @param relativeFitness Threshold for relative fitness to use in the p2p transformation estimation
          * @param relativeRMSE Threshold for relative RMSE to use in the p2p transformation estimation
-         * @return diffCheck::transformation::DFTransformation
+         * @return DFRegistrationResult the transformation with its fitness, inlier RMSE, correspondences, number of iterations and timings
          * 
          * @see http://dx.doi.org/10.15607/RSS.2009.V.021 for more information
          */
-        static diffCheck::transformation::DFTransformation O3DGeneralizedICP(
+        static DFRegistrationResult O3DGeneralizedICP(
             std::shared_ptr<geometry::DFPointCloud> source, 
             std::shared_ptr<geometry::DFPointCloud> target,
             double maxCorrespondenceDistance = 5,
             int maxIteration = 30,
             double relativeFitness = 1e-6,
             double relativeRMSE = 1e-6);
+
+        private: ///< open3d registration runners
+        /**
+         * @brief Run the ICP registration of a pair of point clouds
+         * 
+         * @param source DFPointCloud source point cloud
+         * @param target DFPointCloud Target point cloud
+         * @param parameters the parameters of the ICP
+         * @return DFRegistrationResult the result of the registration
+         */
+        static DFRegistrationResult RunO3DICP(
+            const geometry::DFPointCloud &source,
+            const geometry::DFPointCloud &target,
+            const DFICPParameters &parameters);
     };
 }
\ No newline at end of file
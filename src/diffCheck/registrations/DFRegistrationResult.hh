@@ -0,0 +1,37 @@
+#pragma once
+
+#include <map>
+#include <string>
+#include <vector>
+#include <Eigen/Core>
+#include <open3d/pipelines/registration/Registration.h>
+
+#include "diffCheck/transformation/DFTransformation.hh"
+
+namespace diffCheck::registrations
+{
+    /// @brief Result of the registration of a source point cloud on a target point cloud
+    struct DFRegistrationResult
+    {
+        DFRegistrationResult() = default;
+        explicit DFRegistrationResult(const open3d::pipelines::registration::RegistrationResult &result)
+            : Transformation(result.transformation_),
+              Fitness(result.fitness_),
+              InlierRMSE(result.inlier_rmse_),
+              CorrespondenceSet(result.correspondence_set_)
+        {}
+
+        /// @brief the transformation to apply to the source point cloud
+        diffCheck::transformation::DFTransformation Transformation = diffCheck::transformation::DFTransformation(Eigen::Matrix4d::Identity());
+        /// @brief the ratio of source points with a correspondence in the target point cloud, the higher the better
+        double Fitness = 0.0;
+        /// @brief the root mean square error of the distances of the correspondences, the lower the better
+        double InlierRMSE = 0.0;
+        /// @brief the correspondences (source index, target index) of the last evaluation of the registration
+        std::vector<Eigen::Vector2i> CorrespondenceSet;
+        /// @brief the number of iterations run, -1 if the method does not report it
+        int NumIterations = -1;
+        /// @brief the duration in seconds of each stage of the registration (e.g. preprocessing, features, registration)
+        std::map<std::string, double> Timings;
+    };
+}
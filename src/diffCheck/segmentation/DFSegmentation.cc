@@ -1,12 +1,394 @@
 #include "DFSegmentation.hh"
+#include "diffCheck/parallel.hh"
 
-#include <cilantro/utilities/point_cloud.hpp>
-#include <cilantro/core/nearest_neighbors.hpp>
-#include <cilantro/clustering/connected_component_extraction.hpp>
+#include <algorithm>
 #include <cmath>
+#include <cstdint>
+#include <limits>
+#include <numeric>
+#include <stdexcept>
+#include <utility>
+
 
 namespace diffCheck::segmentation
-{   
+{
+    namespace
+    {
+        /// @brief Union-find of the points of a cloud, with path halving and union by size
+        class DisjointSets
+        {
+        public:
+            explicit DisjointSets(int numElements)
+                : m_Parents(numElements), m_Sizes(numElements, 1)
+            {
+                std::iota(this->m_Parents.begin(), this->m_Parents.end(), 0);
+            }
+
+            /// @brief Get the representative of the set of an element
+            int Find(int element)
+            {
+                while (this->m_Parents[element] != element)
+                {
+                    this->m_Parents[element] = this->m_Parents[this->m_Parents[element]];
+                    element = this->m_Parents[element];
+                }
+                return element;
+            }
+
+            /// @brief Merge the sets of two elements
+            void Unite(int a, int b)
+            {
+                a = this->Find(a);
+                b = this->Find(b);
+                if (a == b)
+                    return;
+                if (this->m_Sizes[a] < this->m_Sizes[b])
+                    std::swap(a, b);
+                this->m_Parents[b] = a;
+                this->m_Sizes[a] += this->m_Sizes[b];
+            }
+
+            /// @brief Get the number of elements of the set of an element
+            int GetSize(int element) { return this->m_Sizes[this->Find(element)]; }
+
+        private:
+            std::vector<int> m_Parents;
+            std::vector<int> m_Sizes;
+        };
+
+        /// @brief The points of a tile grown by the overlap, the points of the tile itself being its core points
+        struct Tile
+        {
+            std::vector<int> Indices;
+            std::vector<char> IsCore;
+        };
+
+        /**
+         * @brief Assign the points of a cloud to cubic tiles grown by an overlap. A point is a core point of its own
+         * tile and belongs to the neighboring tiles whose overlap contains it. The tiles of the points are computed in
+         * parallel as linear keys of the grid, then sorted to group the points of each tile.
+         *
+         * @param points the points of the cloud
+         * @param minBound the minimum corner of the bounding box of the points, the corner of the first tile
+         * @param maxBound the maximum corner of the bounding box of the points
+         * @param tileSize the size of the tiles
+         * @param tileOverlap the width by which the tiles are grown, smaller than the tile size
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::vector<Tile> the tiles holding core points, their point indices in increasing order
+         */
+        std::vector<Tile> AssignPointsToTiles(
+            const std::vector<Eigen::Vector3d> &points,
+            const Eigen::Vector3d &minBound,
+            const Eigen::Vector3d &maxBound,
+            double tileSize,
+            double tileOverlap,
+            int numThreads)
+        {
+            // the grid is padded by one tile on each side for the overlaps of the border tiles
+            std::int64_t gridSize[3];
+            double gridVolume = 1.0;
+            for (int axis = 0; axis < 3; ++axis)
+            {
+                gridSize[axis] = static_cast<std::int64_t>(std::floor((maxBound[axis] - minBound[axis]) / tileSize)) + 3;
+                gridVolume *= static_cast<double>(gridSize[axis]);
+            }
+            if (gridVolume >= static_cast<double>(std::numeric_limits<std::int64_t>::max()))
+                throw std::invalid_argument("The tile size is too small for the extent of the point cloud.");
+
+            double overlapRatio = tileOverlap / tileSize;
+            auto collectTileKeys = [&](const Eigen::Vector3d &point, std::int64_t keys[27]) -> int
+            {
+                // the tiles of each axis containing the point, its own one first
+                Eigen::Vector3d position = (point - minBound) / tileSize;
+                std::int64_t cells[3][3];
+                int numCells[3];
+                for (int axis = 0; axis < 3; ++axis)
+                {
+                    std::int64_t cell = static_cast<std::int64_t>(std::floor(position[axis]));
+                    double offset = position[axis] - cell;
+                    cells[axis][0] = cell + 1;
+                    numCells[axis] = 1;
+                    if (overlapRatio > 0 && offset <= overlapRatio)
+                        cells[axis][numCells[axis]++] = cell;
+                    if (overlapRatio > 0 && 1.0 - offset <= overlapRatio)
+                        cells[axis][numCells[axis]++] = cell + 2;
+                }
+
+                int numKeys = 0;
+                for (int x = 0; x < numCells[0]; ++x)
+                    for (int y = 0; y < numCells[1]; ++y)
+                        for (int z = 0; z < numCells[2]; ++z)
+                            keys[numKeys++] = cells[0][x] + gridSize[0] * (cells[1][y] + gridSize[1] * cells[2][z]);
+                return numKeys;
+            };
+
+            int numPoints = static_cast<int>(points.size());
+            std::vector<std::int64_t> ownKeys(numPoints);
+            std::vector<std::size_t> offsets(numPoints + 1, 0);
+            #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+            for (int i = 0; i < numPoints; ++i)
+            {
+                std::int64_t keys[27];
+                offsets[i + 1] = collectTileKeys(points[i], keys);
+                ownKeys[i] = keys[0];
+            }
+            std::partial_sum(offsets.begin(), offsets.end(), offsets.begin());
+
+            std::vector<std::pair<std::int64_t, int>> entries(offsets.back());
+            #pragma omp parallel for num_threads(ResolveNumThreads(numThreads))
+            for (int i = 0; i < numPoints; ++i)
+            {
+                std::int64_t keys[27];
+                int numKeys = collectTileKeys(points[i], keys);
+                for (int k = 0; k < numKeys; ++k)
+                    entries[offsets[i] + k] = std::make_pair(keys[k], i);
+            }
+            std::sort(entries.begin(), entries.end());
+
+            // the tiles made only of overlap points have no neighborhood of their own to contribute
+            std::vector<Tile> tiles;
+            for (std::size_t begin = 0, end = 0; begin < entries.size(); begin = end)
+            {
+                Tile tile;
+                bool hasCorePoints = false;
+                for (end = begin; end < entries.size() && entries[end].first == entries[begin].first; ++end)
+                {
+                    bool isCore = ownKeys[entries[end].second] == entries[begin].first;
+                    tile.Indices.push_back(entries[end].second);
+                    tile.IsCore.push_back(isCore);
+                    hasCorePoints |= isCore;
+                }
+                if (hasCorePoints)
+                    tiles.push_back(std::move(tile));
+            }
+            return tiles;
+        }
+
+        /**
+         * @brief Copy the points of a tile, with their normals, into a new cloud
+         *
+         * @param source the cloud to copy the points from
+         * @param tile the tile to copy
+         * @return geometry::DFPointCloud the cloud of the tile
+         */
+        geometry::DFPointCloud ExtractTile(const geometry::DFPointCloud &source, const Tile &tile)
+        {
+            geometry::DFPointCloud cloud;
+            cloud.Points.reserve(tile.Indices.size());
+            cloud.Normals.reserve(tile.Indices.size());
+            for (int i : tile.Indices)
+            {
+                cloud.Points.push_back(source.Points[i]);
+                cloud.Normals.push_back(source.Normals[i]);
+            }
+            return cloud;
+        }
+
+        /**
+         * @brief Find the largest distance from the points to their k-th nearest neighbor within their own tile. As the
+         * tile only holds part of the cloud, it bounds the distance to their k-th nearest neighbor in the whole cloud:
+         * tiles grown by it hold the exact k nearest neighbors of their core points.
+         *
+         * @param pointCloud the point cloud, with normals
+         * @param tiles the tiles of the cloud, without overlap
+         * @param knn the number of nearest neighbors
+         * @param maxExtent the distance above which the k-th nearest neighbors are ignored
+         * @param numThreads the number of threads, all the available ones if 0
+         * @return std::pair<double, int> the largest distance below maxExtent, and the number of points whose k-th
+         * nearest neighbor within their tile is farther or missing
+         */
+        std::pair<double, int> ComputeKnnExtent(
+            const geometry::DFPointCloud &pointCloud,
+            const std::vector<Tile> &tiles,
+            int knn,
+            double maxExtent,
+            int numThreads)
+        {
+            int numTiles = static_cast<int>(tiles.size());
+            std::vector<double> tileExtents(numTiles, 0.0);
+            std::vector<int> tileNumBeyond(numTiles, 0);
+            #pragma omp parallel for schedule(dynamic,1) num_threads(ResolveNumThreads(numThreads))
+            for (int t = 0; t < numTiles; ++t)
+            {
+                geometry::DFPointCloud tile = ExtractTile(pointCloud, tiles[t]);
+                std::shared_ptr<const open3d::geometry::KDTreeFlann> kdTree = tile.GetKDTree();
+                std::vector<int> neighborIndices;
+                std::vector<double> neighborSquaredDistances;
+                for (const Eigen::Vector3d &point : tile.Points)
+                {
+                    int numNeighbors = kdTree->SearchKNN(point, knn, neighborIndices, neighborSquaredDistances);
+                    double extent = numNeighbors < knn
+                        ? std::numeric_limits<double>::infinity()
+                        : std::sqrt(neighborSquaredDistances.back());
+                    if (extent < maxExtent)
+                        tileExtents[t] = std::max(tileExtents[t], extent);
+                    else
+                        ++tileNumBeyond[t];
+                }
+            }
+            return std::make_pair(
+                *std::max_element(tileExtents.begin(), tileExtents.end()),
+                std::accumulate(tileNumBeyond.begin(), tileNumBeyond.end(), 0));
+        }
+
+        /**
+         * @brief Copy the points flagged by the mask at the end of the target cloud, with their normals and colors if both
+         * clouds have them. An attribute missing from one of the clouds is cleared from the target once points are added,
+         * so that its attributes stay aligned with its points.
+         *
+         * @param source the cloud to copy the points from
+         * @param mask the membership mask, one flag per point of the source
+         * @param target the cloud receiving the points
+         */
+        void AppendMaskedPoints(
+            const geometry::DFPointCloud &source,
+            const std::vector<bool> &mask,
+            geometry::DFPointCloud &target)
+        {
+            bool hasNormals = source.Normals.size() == source.Points.size() && target.Normals.size() == target.Points.size();
+            bool hasColors = source.Colors.size() == source.Points.size() && target.Colors.size() == target.Points.size();
+            std::size_t numTargetPoints = target.Points.size();
+            for (std::size_t i = 0; i < source.Points.size(); ++i)
+            {
+                if (!mask[i])
+                    continue;
+                target.Points.push_back(source.Points[i]);
+                if (hasNormals)
+                    target.Normals.push_back(source.Normals[i]);
+                if (hasColors)
+                    target.Colors.push_back(source.Colors[i]);
+            }
+            if (target.Points.size() == numTargetPoints)
+                return;
+            if (!hasNormals)
+                target.Normals.clear();
+            if (!hasColors)
+                target.Colors.clear();
+        }
+
+        /**
+         * @brief Remove in place and in one pass the points flagged by the mask, with their normals and colors.
+         * The order of the remaining points is preserved.
+         *
+         * @param cloud the cloud to remove the points from
+         * @param mask the membership mask, one flag per point of the cloud
+         */
+        void EraseMaskedPoints(geometry::DFPointCloud &cloud, const std::vector<bool> &mask)
+        {
+            bool hasNormals = cloud.Normals.size() == cloud.Points.size();
+            bool hasColors = cloud.Colors.size() == cloud.Points.size();
+            std::size_t kept = 0;
+            for (std::size_t i = 0; i < cloud.Points.size(); ++i)
+            {
+                if (mask[i])
+                    continue;
+                cloud.Points[kept] = cloud.Points[i];
+                if (hasNormals)
+                    cloud.Normals[kept] = cloud.Normals[i];
+                if (hasColors)
+                    cloud.Colors[kept] = cloud.Colors[i];
+                ++kept;
+            }
+            cloud.Points.resize(kept);
+            if (hasNormals)
+                cloud.Normals.resize(kept);
+            if (hasColors)
+                cloud.Colors.resize(kept);
+        }
+
+        /**
+         * @brief Unite the points with their neighbors whose unoriented normals are within the angle threshold. A point
+         * is thus in the same set as its neighbors and as the points having it as a neighbor, so that the sets do not
+         * depend on the order of the points even if the neighborhoods are not symmetric, as the k nearest neighbors.
+         *
+         * @param graph the neighborhood graph of the cloud
+         * @param normals the normals of the cloud
+         * @param cosThreshold the cosine of the angle threshold
+         * @param isLinked the flags of the points whose neighborhoods are followed, all of them if empty
+         * @param components the sets of the points of the cloud
+         */
+        void UniteNormalNeighbors(
+            const geometry::DFNeighborhoodGraph &graph,
+            const std::vector<Eigen::Vector3d> &normals,
+            double cosThreshold,
+            const std::vector<char> &isLinked,
+            DisjointSets &components)
+        {
+            for (int i = 0; i < graph.GetNumPoints(); ++i)
+            {
+                if (!isLinked.empty() && !isLinked[i])
+                    continue;
+                for (int j = graph.Offsets[i]; j < graph.Offsets[i + 1]; ++j)
+                {
+                    int neighbor = graph.Indices[j];
+                    if (std::abs(normals[i].dot(normals[neighbor])) >= cosThreshold)
+                        components.Unite(i, neighbor);
+                }
+            }
+        }
+
+        /**
+         * @brief Collect the sets of the points large enough to be regions
+         *
+         * @param components the sets of the points of the cloud
+         * @param numPoints the number of points of the cloud
+         * @param minClusterSize the minimum number of points of a region
+         * @return std::vector<std::vector<int>> the point indices of each region in increasing order, the largest region
+         * first and the ties in the order of their first point
+         */
+        std::vector<std::vector<int>> CollectRegions(DisjointSets &components, int numPoints, int minClusterSize)
+        {
+            std::vector<std::vector<int>> regions;
+            std::vector<int> rootRegions(numPoints, -1);
+            for (int i = 0; i < numPoints; ++i)
+            {
+                int root = components.Find(i);
+                if (components.GetSize(root) < minClusterSize)
+                    continue;
+                if (rootRegions[root] == -1)
+                {
+                    rootRegions[root] = static_cast<int>(regions.size());
+                    regions.emplace_back();
+                    regions.back().reserve(components.GetSize(root));
+                }
+                regions[rootRegions[root]].push_back(i);
+            }
+            std::stable_sort(regions.begin(), regions.end(),
+                [](const std::vector<int> &a, const std::vector<int> &b) { return a.size() > b.size(); });
+            return regions;
+        }
+
+        /**
+         * @brief Copy the indexed points, with their normals and colors, into a new cloud
+         *
+         * @param source the cloud to copy the points from
+         * @param indices the indices of the points to copy
+         * @return std::shared_ptr<geometry::DFPointCloud> the new cloud
+         */
+        std::shared_ptr<geometry::DFPointCloud> ExtractIndexedPoints(
+            const geometry::DFPointCloud &source,
+            const std::vector<int> &indices)
+        {
+            bool hasNormals = source.Normals.size() == source.Points.size();
+            bool hasColors = source.Colors.size() == source.Points.size();
+            std::shared_ptr<geometry::DFPointCloud> cloud = std::make_shared<geometry::DFPointCloud>();
+            cloud->Points.reserve(indices.size());
+            if (hasNormals)
+                cloud->Normals.reserve(indices.size());
+            if (hasColors)
+                cloud->Colors.reserve(indices.size());
+            for (int i : indices)
+            {
+                cloud->Points.push_back(source.Points[i]);
+                if (hasNormals)
+                    cloud->Normals.push_back(source.Normals[i]);
+                if (hasColors)
+                    cloud->Colors.push_back(source.Colors[i]);
+            }
+            return cloud;
+        }
+    } // namespace
+
     std::vector<std::shared_ptr<geometry::DFPointCloud>> DFSegmentation::NormalBasedSegmentation(
         std::shared_ptr<geometry::DFPointCloud> &pointCloud,
         float normalThresholdDegree,
@@ -19,80 +401,123 @@ namespace diffCheck::segmentation
         if (!pointCloud->HasNormals())
         {
             DIFFCHECK_WARN("The point cloud does not have normals. Estimating normals with 50 neighbors.");
-            pointCloud->EstimateNormals(true, 50);
+            pointCloud->EstimateNormals(false, 50);
         }
 
-        std::shared_ptr<cilantro::PointCloud3f> cilantroPointCloud = pointCloud->Cvt2CilantroPointCloud();
+        // the neighborhood graph is shared with the normal estimation if the neighborhoods are the same
+        std::shared_ptr<const geometry::DFNeighborhoodGraph> graph = useKnnNeighborhood
+            ? pointCloud->GetNeighborhoodGraph(knnNeighborhoodSize)
+            : pointCloud->GetNeighborhoodGraph(std::nullopt, radiusNeighborhoodSize);
+
+        DisjointSets components(pointCloud->GetNumPoints());
+        UniteNormalNeighbors(
+            *graph,
+            pointCloud->Normals,
+            std::cos(normalThresholdDegree * M_PI / 180.0),
+            std::vector<char>(),
+            components);
+        std::vector<std::vector<int>> regions = CollectRegions(components, pointCloud->GetNumPoints(), minClusterSize);
 
         std::vector<std::shared_ptr<geometry::DFPointCloud>> segments;
-        if (useKnnNeighborhood)
+        segments.reserve(regions.size());
+        for (const std::vector<int> &region : regions)
         {
-            cilantro::KNNNeighborhoodSpecification<int> neighborhood(knnNeighborhoodSize);
+            std::shared_ptr<geometry::DFPointCloud> segment = ExtractIndexedPoints(*pointCloud, region);
+            if (colorClusters)
+                segment->ApplyColor(Eigen::Vector3d::Random());
+            segments.push_back(segment);
+        }
 
-            cilantro::NormalsProximityEvaluator<float, 3> similarityEvaluator(
-            cilantroPointCloud->normals, 
-            normalThresholdDegree*M_PI/180.0f);
+        return segments;
+    }
 
-            cilantro::ConnectedComponentExtraction3f<> segmenter(cilantroPointCloud->points);
-            segmenter.segment(neighborhood, similarityEvaluator, minClusterSize);
-            auto clusterToPointMap = segmenter.getClusterToPointIndicesMap();
-            int nSegments = segmenter.getNumberOfClusters();
+    std::vector<int> DFSegmentation::TiledNormalBasedSegmentation(
+        std::shared_ptr<geometry::DFPointCloud> &pointCloud,
+        double tileSize,
+        float normalThresholdDegree,
+        int minClusterSize,
+        bool useKnnNeighborhood,
+        int knnNeighborhoodSize,
+        float radiusNeighborhoodSize,
+        double tileOverlap,
+        int numThreads)
+    {
+        if (tileSize <= 0)
+            throw std::invalid_argument("The tile size must be greater than 0.");
+        if (tileOverlap < 0 || tileOverlap >= tileSize)
+            throw std::invalid_argument("The tile overlap must be positive and smaller than the tile size.");
+
+        int numPoints = pointCloud->GetNumPoints();
+        if (numPoints == 0)
+            return std::vector<int>();
+        if (!pointCloud->HasNormals())
+        {
+            DIFFCHECK_WARN("The point cloud does not have normals. Estimating normals with 50 neighbors.");
+            pointCloud->EstimateNormals(false, 50);
+        }
 
-            for (int indice = 0; indice<nSegments; indice++)
-            {
-                std::shared_ptr<geometry::DFPointCloud> segment = std::make_shared<geometry::DFPointCloud>();
-                for (auto pointIndice : clusterToPointMap[indice])
-                {
-                    Eigen::Vector3d point = cilantroPointCloud->points.col(pointIndice).cast<double>();
-                    Eigen::Vector3d normal = cilantroPointCloud->normals.col(pointIndice).cast<double>();
-                    segment->Points.push_back(point);
-                    segment->Normals.push_back(normal);
-                    if (cilantroPointCloud->hasColors())
-                    {
-                        Eigen::Vector3d color = cilantroPointCloud->colors.col(pointIndice).cast<double>();
-                        segment->Colors.push_back(color);
-                    }
-                }
-                if (colorClusters)
-                    segment->ApplyColor(Eigen::Vector3d::Random());
-                segments.push_back(segment);
-            }
+        std::vector<Eigen::Vector3d> boundingBox = pointCloud->GetAxixAlignedBoundingBox();
+        if (tileOverlap == 0 && !useKnnNeighborhood)
+        {
+            tileOverlap = radiusNeighborhoodSize;
+            if (tileOverlap >= tileSize)
+                throw std::invalid_argument("The search radius must be smaller than the tile size, or a smaller tile overlap must be given.");
         }
-        else
+        else if (tileOverlap == 0)
         {
-            cilantro::RadiusNeighborhoodSpecification<float> neighborhood(radiusNeighborhoodSize);
-            cilantro::NormalsProximityEvaluator<float, 3> similarityEvaluator(
-            cilantroPointCloud->normals,
-            normalThresholdDegree*M_PI/180.0f);
-
-            cilantro::ConnectedComponentExtraction3f<> segmenter(cilantroPointCloud->points);
-            segmenter.segment(neighborhood, similarityEvaluator, minClusterSize);
-
-            auto clusterToPointMap = segmenter.getClusterToPointIndicesMap();
-            int nSegments = segmenter.getNumberOfClusters();
+            // the k nearest neighbors of the points within their own tile are at least as far as in the whole cloud
+            std::pair<double, int> knnExtent = ComputeKnnExtent(
+                *pointCloud,
+                AssignPointsToTiles(pointCloud->Points, boundingBox[0], boundingBox[1], tileSize, 0.0, numThreads),
+                knnNeighborhoodSize,
+                tileSize,
+                numThreads);
+            tileOverlap = knnExtent.first;
+            if (knnExtent.second > 0)
+                DIFFCHECK_WARN((std::to_string(knnExtent.second) + " points have their k nearest neighbors farther than the tile size, their neighborhoods are cut by the tiles.").c_str());
+        }
 
-            for (int indice = 0; indice<nSegments; indice++)
+        std::vector<Tile> tiles = AssignPointsToTiles(
+            pointCloud->Points, boundingBox[0], boundingBox[1], tileSize, tileOverlap, numThreads);
+        int numTiles = static_cast<int>(tiles.size());
+        DIFFCHECK_INFO(("Segmenting " + std::to_string(numPoints) + " points in " + std::to_string(numTiles) + " tiles overlapping by " + std::to_string(tileOverlap) + ".").c_str());
+
+        // each tile only holds the neighborhood graph of its own points. Only the edges of the core points are kept,
+        // as the neighborhoods of the overlap points are cut by the tile, and each point is a core point of one tile
+        DisjointSets components(numPoints);
+        double cosThreshold = std::cos(normalThresholdDegree * M_PI / 180.0);
+        #pragma omp parallel for schedule(dynamic,1) num_threads(ResolveNumThreads(numThreads))
+        for (int t = 0; t < numTiles; ++t)
+        {
+            geometry::DFPointCloud tile = ExtractTile(*pointCloud, tiles[t]);
+            std::shared_ptr<const geometry::DFNeighborhoodGraph> graph = useKnnNeighborhood
+                ? tile.GetNeighborhoodGraph(knnNeighborhoodSize, std::nullopt, 1)
+                : tile.GetNeighborhoodGraph(std::nullopt, radiusNeighborhoodSize, 1);
+
+            int numTilePoints = static_cast<int>(tile.Points.size());
+            DisjointSets tileComponents(numTilePoints);
+            UniteNormalNeighbors(*graph, tile.Normals, cosThreshold, tiles[t].IsCore, tileComponents);
+            std::vector<int> tileRoots(numTilePoints);
+            for (int i = 0; i < numTilePoints; ++i)
+                tileRoots[i] = tileComponents.Find(i);
+
+            #pragma omp critical
             {
-                std::shared_ptr<geometry::DFPointCloud> segment = std::make_shared<geometry::DFPointCloud>();
-                for (auto pointIndice : clusterToPointMap[indice])
-                {
-                    Eigen::Vector3d point = cilantroPointCloud->points.col(pointIndice).cast<double>();
-                    Eigen::Vector3d normal = cilantroPointCloud->normals.col(pointIndice).cast<double>();
-                    segment->Points.push_back(point);
-                    segment->Normals.push_back(normal);
-                    if (cilantroPointCloud->hasColors())
-                    {
-                        Eigen::Vector3d color = cilantroPointCloud->colors.col(pointIndice).cast<double>();
-                        segment->Colors.push_back(color);
-                    }
-                }
-                if (colorClusters)
-                    segment->ApplyColor(Eigen::Vector3d::Random());
-                segments.push_back(segment);
+                for (int i = 0; i < numTilePoints; ++i)
+                    if (tileRoots[i] != i)
+                        components.Unite(tiles[t].Indices[i], tiles[t].Indices[tileRoots[i]]);
             }
+            std::vector<int>().swap(tiles[t].Indices);
+            std::vector<char>().swap(tiles[t].IsCore);
         }
 
-        return segments;
+        // the clusters are labelled from the largest one, the ties in the order of their first point
+        std::vector<int> labels(numPoints, -1);
+        std::vector<std::vector<int>> regions = CollectRegions(components, numPoints, minClusterSize);
+        for (int label = 0; label < static_cast<int>(regions.size()); ++label)
+            for (int i : regions[label])
+                labels[i] = label;
+        return labels;
     }
 
     std::vector<std::shared_ptr<geometry::DFPointCloud>> DFSegmentation::AssociateClustersToMeshes(
@@ -144,8 +569,8 @@ namespace diffCheck::segmentation
                 }
                 for (auto segment : clusters)
                 {
-                    Eigen::Vector3d segmentCenter;
-                    Eigen::Vector3d segmentNormal;
+                    Eigen::Vector3d segmentCenter = Eigen::Vector3d::Zero();
+                    Eigen::Vector3d segmentNormal = Eigen::Vector3d::Zero();
 
                     for (auto point : segment->Points)
                     {
@@ -183,40 +608,9 @@ namespace diffCheck::segmentation
                     faceSegments.push_back(facePoints);
                     continue;
                 }
-                bool hasColors = correspondingSegment->GetNumColors() > 0;
-                for (Eigen::Vector3d point : correspondingSegment->Points)
-                {
-                    if (face->IsPointOnFace(point, associationThreshold))
-                    {
-                        facePoints->Points.push_back(point);
-                        facePoints->Normals.push_back(
-                            correspondingSegment->Normals[std::distance(
-                                correspondingSegment->Points.begin(), 
-                                std::find(correspondingSegment->Points.begin(), 
-                                correspondingSegment->Points.end(), 
-                                point))]
-                            );
-                        if (hasColors)
-                        {
-                            facePoints->Colors.push_back(
-                                correspondingSegment->Colors[std::distance(
-                                    correspondingSegment->Points.begin(), 
-                                    std::find(correspondingSegment->Points.begin(), 
-                                    correspondingSegment->Points.end(), 
-                                    point))]
-                                );
-                        }
-                    }
-                }
-                for(Eigen::Vector3d point : facePoints->Points)
-                {
-                    correspondingSegment->Points.erase(
-                        std::remove(
-                            correspondingSegment->Points.begin(), 
-                            correspondingSegment->Points.end(), 
-                            point), 
-                        correspondingSegment->Points.end());
-                }
+                std::vector<bool> onFaceMask = face->ArePointsOnFace(correspondingSegment->Points, associationThreshold);
+                AppendMaskedPoints(*correspondingSegment, onFaceMask, *facePoints);
+                EraseMaskedPoints(*correspondingSegment, onFaceMask);
                 if (correspondingSegment->GetNumPoints() == 0)
                 {
                     DIFFCHECK_WARN("No point was left in the segment. Deleting the segment.");
@@ -253,8 +647,8 @@ namespace diffCheck::segmentation
                 }
                 for (auto segment : clusters)
                 {   
-                    Eigen::Vector3d segmentCenter;
-                    Eigen::Vector3d segmentNormal;
+                    Eigen::Vector3d segmentCenter = Eigen::Vector3d::Zero();
+                    Eigen::Vector3d segmentNormal = Eigen::Vector3d::Zero();
 
                     for (auto point : segment->Points){segmentCenter += point;}
                     if (segment->GetNumPoints() > 0)
@@ -284,43 +678,9 @@ namespace diffCheck::segmentation
                     faceSegments.push_back(facePoints);
                     continue;
                 }
-                bool hasColors = correspondingSegment->GetNumColors() > 0;
-
-                for (Eigen::Vector3d point : correspondingSegment->Points)
-                {
-                    bool pointInFace = false;
-                    if (face->IsPointOnFace(point, associationThreshold))
-                    {
-                        facePoints->Points.push_back(point);
-                        facePoints->Normals.push_back(
-                            correspondingSegment->Normals[std::distance(
-                                correspondingSegment->Points.begin(), 
-                                std::find(correspondingSegment->Points.begin(), 
-                                correspondingSegment->Points.end(), 
-                                point))]
-                            );
-                        if (hasColors)
-                        {
-                            facePoints->Colors.push_back(
-                                correspondingSegment->Colors[std::distance(
-                                    correspondingSegment->Points.begin(), 
-                                    std::find(correspondingSegment->Points.begin(), 
-                                    correspondingSegment->Points.end(), 
-                                    point))]
-                                );
-                        }
-                    }
-                }
-                
-                for(Eigen::Vector3d point : facePoints->Points)
-                {
-                    correspondingSegment->Points.erase(
-                        std::remove(
-                            correspondingSegment->Points.begin(), 
-                            correspondingSegment->Points.end(), 
-                            point), 
-                        correspondingSegment->Points.end());
-                }
+                std::vector<bool> onFaceMask = face->ArePointsOnFace(correspondingSegment->Points, associationThreshold);
+                AppendMaskedPoints(*correspondingSegment, onFaceMask, *facePoints);
+                EraseMaskedPoints(*correspondingSegment, onFaceMask);
                 faceSegments.push_back(facePoints);
             }
         }
@@ -345,7 +705,7 @@ namespace diffCheck::segmentation
             for (std::shared_ptr<geometry::DFPointCloud> cluster : unassociatedClusters)
             {
                 std::shared_ptr<geometry::DFMesh> correspondingMeshFace;
-                Eigen::Vector3d clusterCenter;
+                Eigen::Vector3d clusterCenter = Eigen::Vector3d::Zero();
                 Eigen::Vector3d clusterNormal = Eigen::Vector3d::Zero();
 
                 if (cluster->GetNumPoints() == 0)
@@ -466,40 +826,12 @@ namespace diffCheck::segmentation
                 }
                 std::shared_ptr<geometry::DFPointCloud> completed_segment = existingPointCloudSegments[goodMeshIndex];
 
-                for (Eigen::Vector3d point : cluster->Points)
-                {
-                    if(isCylinder)
-                    {
-                        completed_segment->Points.push_back(point);
-                        completed_segment->Normals.push_back(cluster->Normals[std::distance(cluster->Points.begin(), std::find(cluster->Points.begin(), cluster->Points.end(), point))]);
-                        completed_segment->Colors.push_back(cluster->Colors[std::distance(cluster->Points.begin(), std::find(cluster->Points.begin(), cluster->Points.end(), point))]);
-                    }
-                    else
-                        if (correspondingMeshFace->IsPointOnFace(point, associationThreshold))
-                        {
-                            completed_segment->Points.push_back(point);
-                            completed_segment->Normals.push_back(cluster->Normals[std::distance(cluster->Points.begin(), std::find(cluster->Points.begin(), cluster->Points.end(), point))]);
-                            completed_segment->Colors.push_back(cluster->Colors[std::distance(cluster->Points.begin(), std::find(cluster->Points.begin(), cluster->Points.end(), point))]);
-                        }
-                }
-                std::vector<int> indicesToRemove;
-
-                for (int i = 0; i < cluster->Points.size(); ++i) 
-                {
-                    if (std::find(completed_segment->Points.begin(), completed_segment->Points.end(), cluster->Points[i]) != completed_segment->Points.end()) 
-                    {
-                        indicesToRemove.push_back(i);
-                    }
-                }
-                for (auto it = indicesToRemove.rbegin(); it != indicesToRemove.rend(); ++it) 
-                {
-                    std::swap(cluster->Points[*it], cluster->Points.back());
-                    cluster->Points.pop_back();
-                    std::swap(cluster->Normals[*it], cluster->Normals.back());
-                    cluster->Normals.pop_back();
-                    std::swap(cluster->Colors[*it], cluster->Colors.back());
-                    cluster->Colors.pop_back();
-                }
+                // cylinders take the whole cluster, other shapes only the points lying on the face
+                std::vector<bool> transferMask = isCylinder
+                    ? std::vector<bool>(cluster->GetNumPoints(), true)
+                    : correspondingMeshFace->ArePointsOnFace(cluster->Points, associationThreshold);
+                AppendMaskedPoints(*cluster, transferMask, *completed_segment);
+                EraseMaskedPoints(*cluster, transferMask);
             }
         }
     };
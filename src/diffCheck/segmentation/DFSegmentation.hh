@@ -6,7 +6,7 @@ namespace diffCheck::segmentation
     class DFSegmentation
     {
         public: ///< main segmentation methods
-        /** @brief Downsamples and segments the point cloud using Cilantro's ConnectedComponentExtraction3f method. It uses the normals' variations to detect different parts in the point cloud.
+        /** @brief Segments the point cloud by growing regions over its neighborhood graph. It uses the normals' variations to detect different parts in the point cloud. A point is linked to its neighbors and to the points having it as a neighbor if their normals are within the threshold, so that the segments do not depend on the order of the points even though the k nearest neighbors are not symmetric. The neighborhood graph is kept on the cloud and shared with the normal estimation.
          * @param pointCloud the point cloud to segment
          * @param normalThresholdDegree the normal threshold in degrees do differentiate segments. The higher the number, the more tolerent the segmentation will be to normal differences
          * @param minClusterSize the minimum cluster size to consider a segment. A lower number will discard smaller segments
@@ -25,6 +25,29 @@ namespace diffCheck::segmentation
             float radiusNeighborhoodSize = 10.f,
             bool colorClusters = false);
 
+        /** @brief Segments the point cloud tile by tile, so that the neighborhood graph is only held for one tile per thread instead of all the points. The cloud itself stays in memory. It is cut in cubic tiles grown by an overlap, the neighbors of the points of each tile are linked in parallel and the links are merged over the whole cloud. With an overlap covering the neighborhoods, the segments are the same as the ones of NormalBasedSegmentation.
+         * @param pointCloud the point cloud to segment
+         * @param tileSize the size of the cubic tiles. The smaller the tiles, the less memory each of them needs, but the more points are shared in the overlaps
+         * @param normalThresholdDegree the normal threshold in degrees do differentiate segments. The higher the number, the more tolerent the segmentation will be to normal differences
+         * @param minClusterSize the minimum cluster size to consider a segment. A lower number will discard smaller segments
+         * @param useKnnNeighborhood if true, the neighborhood search will be done using the knnNeighborhoodSize, otherwise it will be done using radiusNeighborhoodSize
+         * @param knnNeighborhoodSize the k nearest neighbors size for the "neighborhood search". This is used when useKnnNeighborhood is true
+         * @param radiusNeighborhoodSize the radius of the neighborhood size for the "radius search". This is used when useKnnNeighborhood is false
+         * @param tileOverlap the width by which the tiles are grown to hold the neighborhoods of their points, it must be smaller than the tile size. 0 to use the search radius, or with the knn neighborhood the largest distance from the points to their k-th nearest neighbor within their own tile, which bounds the one within the whole cloud
+         * @param numThreads the number of threads processing the tiles, 0 to use all the available ones
+         * @return std::vector<int> the cluster label of each point, the largest cluster being 0, and -1 for the points of the discarded segments
+         */
+        static std::vector<int> TiledNormalBasedSegmentation(
+            std::shared_ptr<geometry::DFPointCloud> &pointCloud,
+            double tileSize,
+            float normalThresholdDegree = 20.f,
+            int minClusterSize = 10,
+            bool useKnnNeighborhood = true,
+            int knnNeighborhoodSize = 10,
+            float radiusNeighborhoodSize = 10.f,
+            double tileOverlap = 0.0,
+            int numThreads = 0);
+
         public: ///< segmentation refinement methods
         /** @brief Associates point cloud segments to mesh faces and merges them. It uses the center of mass of the segments and the mesh faces to find correspondances. For each mesh face it then iteratively associate the points of the segment that are actually on the mesh face.
          * @param isCylinder a boolean to indicate if the model is a cylinder. If true, the method will use the GetCenterAndAxis method of the mesh to find the center and axis of the mesh. based on that, we only want points that have normals more or less perpendicular to the cylinder axis.
@@ -3,5 +3,38 @@
 
 namespace diffCheck::transformation
 {
+    namespace
+    {
+        /// @brief Number of vectors under which a transformation is not worth spreading over threads
+        constexpr int PARALLEL_TRANSFORMATION_THRESHOLD = 10000;
+    }
 
-}
\ No newline at end of file
+    void DFTransformation::TransformPoints(std::vector<Eigen::Vector3d> &points) const
+    {
+        int numPoints = static_cast<int>(points.size());
+        Eigen::Matrix3d linear = this->TransformationMatrix.block<3, 3>(0, 0);
+        Eigen::Vector3d translation = this->TransformationMatrix.block<3, 1>(0, 3);
+        if (this->TransformationMatrix.row(3) == Eigen::RowVector4d(0, 0, 0, 1))
+        {
+            #pragma omp parallel for if(numPoints > PARALLEL_TRANSFORMATION_THRESHOLD)
+            for (int i = 0; i < numPoints; i++)
+                points[i] = linear * points[i] + translation;
+            return;
+        }
+
+        Eigen::RowVector3d projective = this->TransformationMatrix.block<1, 3>(3, 0);
+        double projectiveOffset = this->TransformationMatrix(3, 3);
+        #pragma omp parallel for if(numPoints > PARALLEL_TRANSFORMATION_THRESHOLD)
+        for (int i = 0; i < numPoints; i++)
+            points[i] = (linear * points[i] + translation) / (projective.dot(points[i]) + projectiveOffset);
+    }
+
+    void DFTransformation::TransformNormals(std::vector<Eigen::Vector3d> &normals) const
+    {
+        int numNormals = static_cast<int>(normals.size());
+        Eigen::Matrix3d linear = this->TransformationMatrix.block<3, 3>(0, 0);
+        #pragma omp parallel for if(numNormals > PARALLEL_TRANSFORMATION_THRESHOLD)
+        for (int i = 0; i < numNormals; i++)
+            normals[i] = linear * normals[i];
+    }
+}
@@ -1,4 +1,5 @@
 #pragma once
+#include <vector>
 #include <Eigen/Core>
 
 namespace diffCheck::transformation
@@ -11,10 +12,26 @@ namespace diffCheck::transformation
             : TransformationMatrix(transformationMatrix)
         {}
 
+    public:  ///< Transformers
+        /**
+         * @brief Transform points in place and in parallel, as open3d does: the points are divided by their
+         * homogeneous coordinate if the matrix is not affine
+         * 
+         * @param points the points to transform
+         */
+        void TransformPoints(std::vector<Eigen::Vector3d> &points) const;
+
+        /**
+         * @brief Transform normals in place and in parallel by the linear part of the matrix, as open3d does
+         * 
+         * @param normals the normals to transform
+         */
+        void TransformNormals(std::vector<Eigen::Vector3d> &normals) const;
+
     public:
         /**
          * @brief 4x4 Transformation matrix for point clouds
          */
         Eigen::Matrix4d TransformationMatrix;
     };
-}
\ No newline at end of file
+}
@@ -2,6 +2,9 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/eigen.h>
 #include <pybind11/stl.h>
+#include <pybind11/numpy.h>
+
+#include <cstring>
 
 #include "diffCheck.hh"
 
@@ -9,6 +12,174 @@ namespace py = pybind11;
 
 bool test() { return true; }
 
+static_assert(sizeof(Eigen::Vector3d) == 3 * sizeof(double), "Eigen::Vector3d must be tightly packed to be viewed as a (N,3) array");
+static_assert(sizeof(Eigen::Vector3i) == 3 * sizeof(int), "Eigen::Vector3i must be tightly packed to be viewed as a (N,3) array");
+static_assert(sizeof(Eigen::Vector2i) == 2 * sizeof(int), "Eigen::Vector2i must be tightly packed to be copied as a (N,2) array");
+
+/**
+ * @brief Expose a vector of Eigen::Vector3d or Eigen::Vector3i as a (N,3) numpy array sharing the same memory.
+ * The array keeps the owner alive, but it is invalidated by any operation resizing the vector.
+ *
+ * @param vec the vector to view
+ * @param owner the python object owning the vector
+ * @param writeable if false, the numpy array is flagged as read-only
+ * @return py::array_t<Scalar> the (N,3) view
+ */
+template <typename Scalar>
+py::array_t<Scalar> cvt_eigen_vector_2_ndarray_view(std::vector<Eigen::Matrix<Scalar, 3, 1>> &vec, py::handle owner, bool writeable)
+{
+    py::array_t<Scalar> array(
+        {static_cast<py::ssize_t>(vec.size()), static_cast<py::ssize_t>(3)},
+        {static_cast<py::ssize_t>(sizeof(Eigen::Matrix<Scalar, 3, 1>)), static_cast<py::ssize_t>(sizeof(Scalar))},
+        vec.empty() ? nullptr : vec.data()->data(),
+        owner);
+    if (!writeable)
+        array.attr("setflags")(py::arg("write") = false);
+    return array;
+}
+
+/**
+ * @brief Copy a (N,3) numpy array into a vector of Eigen::Vector3d or Eigen::Vector3i with a single memcpy
+ *
+ * @param array the (N,3) numpy array, cast to a C-contiguous array of the vector scalar if needed
+ * @param vec the vector to fill, it is resized to N
+ */
+template <typename Scalar>
+void cvt_ndarray_2_eigen_vector(
+    const py::array_t<Scalar, py::array::c_style | py::array::forcecast> &array,
+    std::vector<Eigen::Matrix<Scalar, 3, 1>> &vec)
+{
+    if (array.ndim() != 2 || array.shape(1) != 3)
+        throw std::invalid_argument("The array must be of shape (N,3).");
+    vec.resize(array.shape(0));
+    if (array.shape(0) > 0)
+        std::memcpy(vec.data()->data(), array.data(), array.shape(0) * sizeof(Eigen::Matrix<Scalar, 3, 1>));
+}
+
+/**
+ * @brief Copy a flat float32 or float64 numpy buffer of xyz triplets into a vector of Eigen::Vector3d.
+ * The float64 buffers are copied with a single memcpy, the float32 ones are widened in one native loop.
+ *
+ * @param buffer the (3N,) buffer, any C-contiguous array of 3N elements such as a (N,3) array is accepted
+ * @param vec the vector to fill, it is resized to N
+ */
+void cvt_flat_buffer_2_eigen_vector(const py::array &buffer, std::vector<Eigen::Vector3d> &vec)
+{
+    if (buffer.size() % 3 != 0)
+        throw std::invalid_argument("The size of the flat buffer must be a multiple of 3.");
+    vec.resize(buffer.size() / 3);
+    if (vec.empty())
+        return;
+
+    if (py::isinstance<py::array_t<float>>(buffer))
+    {
+        auto floatBuffer = py::array_t<float, py::array::c_style | py::array::forcecast>::ensure(buffer);
+        const float *data = floatBuffer.data();
+        for (size_t i = 0; i < vec.size(); ++i)
+            vec[i] = Eigen::Vector3d(data[3 * i], data[3 * i + 1], data[3 * i + 2]);
+    }
+    else
+    {
+        auto doubleBuffer = py::array_t<double, py::array::c_style | py::array::forcecast>::ensure(buffer);
+        if (!doubleBuffer)
+            throw std::invalid_argument("The flat buffer must be convertible to float64.");
+        std::memcpy(vec.data()->data(), doubleBuffer.data(), vec.size() * sizeof(Eigen::Vector3d));
+    }
+}
+
+/**
+ * @brief Copy a vector of Eigen::Vector3d into a flat (3N,) numpy buffer
+ *
+ * @param vec the vector to copy
+ * @param dtype the dtype of the buffer, float32 or float64
+ * @return py::array the flat buffer
+ */
+py::array cvt_eigen_vector_2_flat_buffer(const std::vector<Eigen::Vector3d> &vec, const py::dtype &dtype)
+{
+    py::ssize_t size = static_cast<py::ssize_t>(3 * vec.size());
+    if (dtype.kind() == 'f' && dtype.itemsize() == sizeof(float))
+    {
+        py::array_t<float> buffer(size);
+        float *data = buffer.mutable_data();
+        const double *source = vec.empty() ? nullptr : vec.data()->data();
+        for (py::ssize_t i = 0; i < size; ++i)
+            data[i] = static_cast<float>(source[i]);
+        return buffer;
+    }
+    if (dtype.kind() == 'f' && dtype.itemsize() == sizeof(double))
+    {
+        py::array_t<double> buffer(size);
+        if (size > 0)
+            std::memcpy(buffer.mutable_data(), vec.data()->data(), size * sizeof(double));
+        return buffer;
+    }
+    throw std::invalid_argument("The dtype of the flat buffer must be float32 or float64.");
+}
+
+/**
+ * @brief Expose a std::vector as a numpy array without copying it. The vector is moved to the heap and
+ * released with the array.
+ *
+ * @param vec the vector to expose, it is left empty
+ * @param shape the shape of the array, its size must match the vector one
+ * @return py::array_t<T> the numpy array owning the data
+ */
+template <typename T>
+py::array_t<T> cvt_std_vector_2_ndarray(std::vector<T> &&vec, const std::vector<py::ssize_t> &shape)
+{
+    std::vector<T> *owner = new std::vector<T>(std::move(vec));
+    py::capsule capsule(owner, [](void *ptr) { delete static_cast<std::vector<T>*>(ptr); });
+    return py::array_t<T>(shape, owner->data(), capsule);
+}
+
+/**
+ * @brief Expose a vector of Eigen::Vector3d as a (N,3) numpy array without copying it
+ *
+ * @param vec the vector to expose, it is left empty
+ * @return py::array_t<double> the (N,3) numpy array owning the data
+ */
+py::array_t<double> cvt_eigen_vector_2_ndarray(std::vector<Eigen::Vector3d> &&vec)
+{
+    std::vector<Eigen::Vector3d> *owner = new std::vector<Eigen::Vector3d>(std::move(vec));
+    py::capsule capsule(owner, [](void *ptr) { delete static_cast<std::vector<Eigen::Vector3d>*>(ptr); });
+    return py::array_t<double>(
+        {static_cast<py::ssize_t>(owner->size()), static_cast<py::ssize_t>(3)},
+        {static_cast<py::ssize_t>(sizeof(Eigen::Vector3d)), static_cast<py::ssize_t>(sizeof(double))},
+        owner->empty() ? nullptr : owner->data()->data(),
+        capsule);
+}
+
+/**
+ * @brief Convert a vector of flags to a numpy boolean array
+ *
+ * @param flags the flags
+ * @return py::array_t<bool> the (N,) numpy boolean array
+ */
+py::array_t<bool> cvt_bool_vector_2_ndarray(const std::vector<bool> &flags)
+{
+    py::array_t<bool> mask(static_cast<py::ssize_t>(flags.size()));
+    auto maskView = mask.mutable_unchecked<1>();
+    for (py::ssize_t i = 0; i < maskView.shape(0); ++i)
+        maskView(i) = flags[i];
+    return mask;
+}
+
+/**
+ * @brief Convert the closest points of a cloud on a mesh to a tuple of numpy arrays
+ *
+ * @param closestPoints the closest points, its buffers are moved to the arrays
+ * @return py::tuple the (N,) distances, the (N,3) closest points, the (N,) triangle ids and the (N,3) triangle normals
+ */
+py::tuple cvt_closest_points_2_tuple(diffCheck::geometry::DFMeshClosestPoints &&closestPoints)
+{
+    py::ssize_t numPoints = static_cast<py::ssize_t>(closestPoints.Distances.size());
+    return py::make_tuple(
+        cvt_std_vector_2_ndarray(std::move(closestPoints.Distances), {numPoints}),
+        cvt_eigen_vector_2_ndarray(std::move(closestPoints.ClosestPoints)),
+        cvt_std_vector_2_ndarray(std::move(closestPoints.TriangleIds), {numPoints}),
+        cvt_eigen_vector_2_ndarray(std::move(closestPoints.Normals)));
+}
+
 PYBIND11_MODULE(diffcheck_bindings, m) {
     m.doc() = "The diffcheck bindings for python.";
 
@@ -32,6 +203,7 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             py::arg("points"), py::arg("colors"), py::arg("normals"))
         
         .def("compute_distance", &diffCheck::geometry::DFPointCloud::ComputeDistance,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("target_cloud"))
         
         .def("voxel_downsample", &diffCheck::geometry::DFPointCloud::VoxelDownsample,
@@ -43,23 +215,85 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
 
         .def("apply_transformation", &diffCheck::geometry::DFPointCloud::ApplyTransformation,
             py::arg("transformation"))
+        .def_static("apply_transformation_batch", &diffCheck::geometry::DFPointCloud::ApplyTransformationBatch,
+            py::arg("clouds"),
+            py::arg("transformations"),
+            "Transform many point clouds in place in one call, with one transformation per cloud or a single one for all.")
 
         .def("estimate_normals", &diffCheck::geometry::DFPointCloud::EstimateNormals,
             py::arg("use_cilantro_evaluator") = false,
             py::arg("knn") = 100,
-            py::arg("search_radius") = std::nullopt)
+            py::arg("search_radius") = std::nullopt,
+            py::arg("num_threads") = 0)
+        .def("compute_curvatures",
+            [](diffCheck::geometry::DFPointCloud &self, std::optional<int> knn, std::optional<double> searchRadius, int numThreads) {
+                std::vector<double> curvatures;
+                {
+                    py::gil_scoped_release release;
+                    curvatures = self.ComputeCurvatures(knn, searchRadius, numThreads);
+                }
+                py::ssize_t numPoints = static_cast<py::ssize_t>(curvatures.size());
+                return cvt_std_vector_2_ndarray(std::move(curvatures), {numPoints});
+            },
+            py::arg("knn") = 50,
+            py::arg("search_radius") = std::nullopt,
+            py::arg("num_threads") = 0,
+            "Compute the surface variation of every point from the neighborhood graph of the cloud, as a (N,) numpy array.")
+        .def("orient_normals_consistently", &diffCheck::geometry::DFPointCloud::OrientNormalsConsistently,
+            py::arg("knn") = 50,
+            py::arg("search_radius") = std::nullopt,
+            py::arg("num_threads") = 0,
+            "Orient the normals consistently along the neighborhood graph of the cloud, the highest point of each component facing upwards.")
 
         .def("apply_color", (void (diffCheck::geometry::DFPointCloud::*)(int, int, int)) &diffCheck::geometry::DFPointCloud::ApplyColor,
             py::arg("r"), py::arg("g"), py::arg("b"))
 
-        .def("remove_statistical_outliers", &diffCheck::geometry::DFPointCloud::RemoveStatisticalOutliers, 
+        .def("remove_statistical_outliers", &diffCheck::geometry::DFPointCloud::RemoveStatisticalOutliers,
             py::arg("nb_neighbors"), py::arg("std_ratio"))
 
         .def("load_from_PLY", &diffCheck::geometry::DFPointCloud::LoadFromPLY)
+        .def("save_to_PLY",
+            [](const diffCheck::geometry::DFPointCloud &self, const std::string &path, const py::dict &scalarFields, bool isDoublePrecision) {
+                std::map<std::string, std::vector<double>> floatFields;
+                std::map<std::string, std::vector<int>> labelFields;
+                for (const auto &[key, value] : scalarFields)
+                {
+                    std::string name = py::str(key);
+                    py::array array = py::array::ensure(value);
+                    if (!array)
+                        throw std::invalid_argument("The scalar field '" + name + "' must be convertible to a numpy array.");
+                    char kind = array.dtype().kind();
+                    if (kind == 'i' || kind == 'u' || kind == 'b')
+                    {
+                        auto labels = py::array_t<int, py::array::c_style | py::array::forcecast>::ensure(array);
+                        labelFields[name] = std::vector<int>(labels.data(), labels.data() + labels.size());
+                    }
+                    else
+                    {
+                        auto values = py::array_t<double, py::array::c_style | py::array::forcecast>::ensure(array);
+                        floatFields[name] = std::vector<double>(values.data(), values.data() + values.size());
+                    }
+                }
+                py::gil_scoped_release release;
+                self.SaveToPLY(path, floatFields, labelFields, isDoublePrecision);
+            },
+            py::arg("path"),
+            py::arg("scalar_fields") = py::dict(),
+            py::arg("is_double_precision") = false,
+            "Write the cloud in a binary PLY file. The scalar fields are a dict of per-point arrays, the integer ones (e.g. cluster ids) are written as int properties and the others (e.g. distances) as float properties.")
+        .def("load_from_PLY_cached", &diffCheck::geometry::DFPointCloud::LoadFromPLYCached,
+            py::arg("path"), py::arg("cache_path") = "")
+        .def("save_cache", &diffCheck::geometry::DFPointCloud::SaveCache,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("cache_path"), py::arg("source_path") = "", py::arg("is_double_precision") = true)
+        .def("load_cache", &diffCheck::geometry::DFPointCloud::LoadCache,
+            py::arg("cache_path"), py::arg("source_path") = "")
         .def("add_points", &diffCheck::geometry::DFPointCloud::AddPoints)
 
-        .def("get_tight_bounding_box", &diffCheck::geometry::DFPointCloud::GetTightBoundingBox)
-        .def("get_axis_aligned_bounding_box", &diffCheck::geometry::DFPointCloud::GetAxixAlignedBoundingBox)
+        .def("get_tight_bounding_box", &diffCheck::geometry::DFPointCloud::GetTightBoundingBox,
+            py::call_guard<py::gil_scoped_release>())
+        .def("get_axis_aligned_bounding_box", &diffCheck::geometry::DFPointCloud::GetAxixAlignedBoundingBox,
+            py::call_guard<py::gil_scoped_release>())
 
         .def("get_num_points", &diffCheck::geometry::DFPointCloud::GetNumPoints,
             "Get the number of points in the point cloud.")
@@ -71,15 +305,209 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
         .def("has_colors", &diffCheck::geometry::DFPointCloud::HasColors)
         .def("has_normals", &diffCheck::geometry::DFPointCloud::HasNormals)
 
+        .def("build_index", &diffCheck::geometry::DFPointCloud::BuildIndex,
+            py::call_guard<py::gil_scoped_release>(),
+            "Build the KD-tree of the points. It is otherwise built by the first query and kept until the points change.")
+        .def("invalidate_index", &diffCheck::geometry::DFPointCloud::InvalidateIndex,
+            "Drop the KD-tree of the points. Call it after editing the points in place through a writeable view.")
+        .def("has_index", &diffCheck::geometry::DFPointCloud::HasIndex)
+        .def("query_knn",
+            [](diffCheck::geometry::DFPointCloud &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               int knn) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                std::vector<int> indices;
+                std::vector<double> distances;
+                {
+                    py::gil_scoped_release release;
+                    std::tie(indices, distances) = self.QueryKNN(queryPoints, knn);
+                }
+                py::ssize_t numQueries = static_cast<py::ssize_t>(queryPoints.size());
+                return py::make_tuple(
+                    cvt_std_vector_2_ndarray(std::move(indices), {numQueries, static_cast<py::ssize_t>(knn)}),
+                    cvt_std_vector_2_ndarray(std::move(distances), {numQueries, static_cast<py::ssize_t>(knn)}));
+            },
+            py::arg("points"),
+            py::arg("knn"),
+            "Find the knn nearest points of a (M,3) array of query points. It returns two (M,knn) arrays with the indices and the distances of the neighbors, missing neighbors have an index of -1 and an infinite distance.")
+        .def("query_radius",
+            [](diffCheck::geometry::DFPointCloud &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               double radius) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                std::vector<int> indices;
+                std::vector<double> distances;
+                std::vector<int> offsets;
+                {
+                    py::gil_scoped_release release;
+                    std::tie(indices, distances, offsets) = self.QueryRadius(queryPoints, radius);
+                }
+                py::ssize_t numNeighbors = static_cast<py::ssize_t>(indices.size());
+                py::ssize_t numOffsets = static_cast<py::ssize_t>(offsets.size());
+                return py::make_tuple(
+                    cvt_std_vector_2_ndarray(std::move(indices), {numNeighbors}),
+                    cvt_std_vector_2_ndarray(std::move(distances), {numNeighbors}),
+                    cvt_std_vector_2_ndarray(std::move(offsets), {numOffsets}));
+            },
+            py::arg("points"),
+            py::arg("radius"),
+            "Find the points within a radius of a (M,3) array of query points. It returns the flat arrays of the indices and distances of the neighbors, and the (M+1,) offsets array: the neighbors of the query i are between offsets[i] and offsets[i+1].")
+        .def("query_nearest",
+            [](diffCheck::geometry::DFPointCloud &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                std::vector<int> indices;
+                std::vector<double> distances;
+                {
+                    py::gil_scoped_release release;
+                    std::tie(indices, distances) = self.QueryNearest(queryPoints);
+                }
+                py::ssize_t numQueries = static_cast<py::ssize_t>(queryPoints.size());
+                return py::make_tuple(
+                    cvt_std_vector_2_ndarray(std::move(indices), {numQueries}),
+                    cvt_std_vector_2_ndarray(std::move(distances), {numQueries}));
+            },
+            py::arg("points"),
+            "Find the nearest point of a (M,3) array of query points. It returns two (M,) arrays with the index and the distance of the nearest point.")
+
         .def_property("points",
             [](const diffCheck::geometry::DFPointCloud &self) { return self.Points; },
-            [](diffCheck::geometry::DFPointCloud &self, const std::vector<Eigen::Vector3d>& value) { self.Points = value; })
+            [](diffCheck::geometry::DFPointCloud &self, const std::vector<Eigen::Vector3d>& value) { self.Points = value; self.InvalidateIndex(); })
         .def_property("colors",
             [](const diffCheck::geometry::DFPointCloud &self) { return self.Colors; },
             [](diffCheck::geometry::DFPointCloud &self, const std::vector<Eigen::Vector3d>& value) { self.Colors = value; })
         .def_property("normals",
             [](const diffCheck::geometry::DFPointCloud &self) { return self.Normals; },
-            [](diffCheck::geometry::DFPointCloud &self, const std::vector<Eigen::Vector3d>& value) { self.Normals = value; });
+            [](diffCheck::geometry::DFPointCloud &self, const std::vector<Eigen::Vector3d>& value) { self.Normals = value; })
+
+        .def_static("from_numpy",
+            [](const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               const std::optional<py::array_t<double, py::array::c_style | py::array::forcecast>> &normals,
+               const std::optional<py::array_t<double, py::array::c_style | py::array::forcecast>> &colors)
+            {
+                auto cloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+                cvt_ndarray_2_eigen_vector(points, cloud->Points);
+                if (normals.has_value())
+                {
+                    if (normals->ndim() != 2 || normals->shape(0) != points.shape(0))
+                        throw std::invalid_argument("The normals must have the same length as the points.");
+                    cvt_ndarray_2_eigen_vector(normals.value(), cloud->Normals);
+                }
+                if (colors.has_value())
+                {
+                    if (colors->ndim() != 2 || colors->shape(0) != points.shape(0))
+                        throw std::invalid_argument("The colors must have the same length as the points.");
+                    cvt_ndarray_2_eigen_vector(colors.value(), cloud->Colors);
+                }
+                return cloud;
+            },
+            py::arg("points"),
+            py::arg("normals") = py::none(),
+            py::arg("colors") = py::none(),
+            "Create a point cloud from (N,3) float64 numpy arrays, each one copied in bulk.")
+        .def_static("from_flat_buffer",
+            [](const py::array &points,
+               const std::optional<py::array> &normals,
+               const std::optional<py::array> &colors)
+            {
+                auto cloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+                cvt_flat_buffer_2_eigen_vector(points, cloud->Points);
+                if (normals.has_value())
+                {
+                    cvt_flat_buffer_2_eigen_vector(normals.value(), cloud->Normals);
+                    if (cloud->Normals.size() != cloud->Points.size())
+                        throw std::invalid_argument("The normals must have the same length as the points.");
+                }
+                if (colors.has_value())
+                {
+                    cvt_flat_buffer_2_eigen_vector(colors.value(), cloud->Colors);
+                    if (cloud->Colors.size() != cloud->Points.size())
+                        throw std::invalid_argument("The colors must have the same length as the points.");
+                }
+                return cloud;
+            },
+            py::arg("points"),
+            py::arg("normals") = py::none(),
+            py::arg("colors") = py::none(),
+            "Create a point cloud from flat (3N,) float32 or float64 buffers of xyz triplets, e.g. the float arrays of Rhino.")
+        .def("to_flat_buffer",
+            [](const diffCheck::geometry::DFPointCloud &self, const std::string &attribute, const py::object &dtype) {
+                py::dtype bufferDtype = py::dtype::from_args(dtype);
+                if (attribute == "points")
+                    return cvt_eigen_vector_2_flat_buffer(self.Points, bufferDtype);
+                if (attribute == "normals")
+                    return cvt_eigen_vector_2_flat_buffer(self.Normals, bufferDtype);
+                if (attribute == "colors")
+                    return cvt_eigen_vector_2_flat_buffer(self.Colors, bufferDtype);
+                throw std::invalid_argument("The attribute must be one of points, normals or colors.");
+            },
+            py::arg("attribute") = "points",
+            py::arg("dtype") = "float64",
+            "Copy the points, normals or colors to a flat (3N,) float32 or float64 numpy buffer of xyz triplets.")
+
+        .def("get_points_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFPointCloud&>().Points, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (N,3) numpy view on the points without copy. It is invalidated if the cloud is resized. The edits through a writeable view are detected by the next query, which rebuilds the index.")
+        .def("get_normals_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFPointCloud&>().Normals, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (N,3) numpy view on the normals without copy. It is invalidated if the cloud is resized.")
+        .def("get_colors_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFPointCloud&>().Colors, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (N,3) numpy view on the colors without copy. It is invalidated if the cloud is resized.");
+
+    py::class_<diffCheck::geometry::DFPointCloudStreamReader, std::shared_ptr<diffCheck::geometry::DFPointCloudStreamReader>>(submodule_geometry, "DFPointCloudStreamReader",
+        "Out-of-core reader of the vertices of a PLY file (ascii or binary) by chunks of fixed size. Iterating over it yields the non-empty filtered chunks as DFPointCloud.")
+        .def(py::init<const std::string &, int>(),
+            py::arg("path"),
+            py::arg("chunk_size") = 1000000)
+
+        .def("set_crop_box", &diffCheck::geometry::DFPointCloudStreamReader::SetCropBox,
+            py::arg("min_bound"), py::arg("max_bound"),
+            "Keep only the points inside an axis-aligned bounding box.")
+        .def("set_voxel_size", &diffCheck::geometry::DFPointCloudStreamReader::SetVoxelSize,
+            py::arg("voxel_size"),
+            "Downsample the points on a voxel grid, per chunk when iterating and over the whole file with read_all. 0 deactivates it.")
+        .def("set_statistical_filter", &diffCheck::geometry::DFPointCloudStreamReader::SetStatisticalFilter,
+            py::arg("nb_neighbors"), py::arg("std_ratio"),
+            "Remove the statistical outliers of each chunk before its downsampling. 0 neighbors deactivates it.")
+
+        .def("has_next", &diffCheck::geometry::DFPointCloudStreamReader::HasNext)
+        .def("read_chunk", &diffCheck::geometry::DFPointCloudStreamReader::ReadChunk,
+            py::call_guard<py::gil_scoped_release>(),
+            "Read and filter the next chunk, it can be empty if all its points are filtered out.")
+        .def("read_all", &diffCheck::geometry::DFPointCloudStreamReader::ReadAll,
+            py::call_guard<py::gil_scoped_release>(),
+            "Read and filter all the remaining chunks and merge them in one point cloud.")
+        .def("reset", &diffCheck::geometry::DFPointCloudStreamReader::Reset,
+            "Go back to the first vertex of the file.")
+
+        .def("get_num_points", &diffCheck::geometry::DFPointCloudStreamReader::GetNumPoints)
+        .def("get_num_points_read", &diffCheck::geometry::DFPointCloudStreamReader::GetNumPointsRead)
+        .def("has_normals", &diffCheck::geometry::DFPointCloudStreamReader::HasNormals)
+        .def("has_colors", &diffCheck::geometry::DFPointCloudStreamReader::HasColors)
+
+        .def("__iter__", [](py::object self) { return self; })
+        .def("__next__",
+            [](diffCheck::geometry::DFPointCloudStreamReader &self) {
+                std::shared_ptr<diffCheck::geometry::DFPointCloud> chunk;
+                {
+                    py::gil_scoped_release release;
+                    while (self.HasNext() && (chunk == nullptr || !chunk->HasPoints()))
+                        chunk = self.ReadChunk();
+                }
+                if (chunk == nullptr || !chunk->HasPoints())
+                    throw py::stop_iteration();
+                return chunk;
+            });
 
     py::class_<diffCheck::geometry::DFMesh, std::shared_ptr<diffCheck::geometry::DFMesh>>(submodule_geometry, "DFMesh",
         "A class for the triangle mesh representation.")
@@ -87,14 +515,142 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
         .def(py::init<std::vector<Eigen::Vector3d>, std::vector<Eigen::Vector3i>, std::vector<Eigen::Vector3d>, std::vector<Eigen::Vector3d>, std::vector<Eigen::Vector3d>>())
 
         .def("compute_distance", &diffCheck::geometry::DFMesh::ComputeDistance,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("target_cloud"),
             py::arg("is_abs") = true)
             
+        .def("compute_closest_points",
+            [](diffCheck::geometry::DFMesh &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               bool isSigned) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                diffCheck::geometry::DFMeshClosestPoints closestPoints;
+                {
+                    py::gil_scoped_release release;
+                    closestPoints = self.ComputeClosestPoints(queryPoints, isSigned);
+                }
+                return cvt_closest_points_2_tuple(std::move(closestPoints));
+            },
+            py::arg("points"),
+            py::arg("is_signed") = false,
+            "Find the closest points on the mesh of a (N,3) array of points. It returns the distances (negative behind the mesh if signed), the closest points, the triangle ids and the normals as numpy arrays. The normals are interpolated from the vertex normals if the mesh has them, as rhino Mesh.NormalAt, otherwise they follow the winding of the triangles.")
+        .def_static("compute_closest_points_batch",
+            [](const std::vector<std::shared_ptr<diffCheck::geometry::DFMesh>> &meshes,
+               const std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> &clouds,
+               bool isSigned) {
+                std::vector<diffCheck::geometry::DFMeshClosestPoints> results;
+                {
+                    py::gil_scoped_release release;
+                    results = diffCheck::geometry::DFMesh::ComputeClosestPointsBatch(meshes, clouds, isSigned);
+                }
+                py::list closestPointsList;
+                for (diffCheck::geometry::DFMeshClosestPoints &closestPoints : results)
+                    closestPointsList.append(cvt_closest_points_2_tuple(std::move(closestPoints)));
+                return closestPointsList;
+            },
+            py::arg("meshes"),
+            py::arg("clouds"),
+            py::arg("is_signed") = false,
+            "Find the closest points of each cloud on its mesh in one call. It returns a list with the tuple of compute_closest_points for each pair.")
+
         .def("load_from_PLY", &diffCheck::geometry::DFMesh::LoadFromPLY)
+        .def("save_to_PLY", &diffCheck::geometry::DFMesh::SaveToPLY,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("path"), py::arg("is_double_precision") = false)
+
+        .def("apply_transformation", &diffCheck::geometry::DFMesh::ApplyTransformation,
+            py::arg("transformation"))
+        .def_static("apply_transformation_batch", &diffCheck::geometry::DFMesh::ApplyTransformationBatch,
+            py::arg("meshes"),
+            py::arg("transformations"),
+            "Transform many meshes in place in one call, with one transformation per mesh or a single one for all.")
 
-        .def("sample_points_uniformly", &diffCheck::geometry::DFMesh::SampleCloudUniform)
+        .def("sample_points_uniformly", &diffCheck::geometry::DFMesh::SampleCloudUniform,
+            py::call_guard<py::gil_scoped_release>())
 
-        .def("get_tight_bounding_box", &diffCheck::geometry::DFMesh::GetTightBoundingBox)
+        .def("get_tight_bounding_box", &diffCheck::geometry::DFMesh::GetTightBoundingBox,
+            py::call_guard<py::gil_scoped_release>())
+
+        .def("are_points_on_face",
+            [](diffCheck::geometry::DFMesh &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               double associationThreshold) {
+                std::vector<Eigen::Vector3d> pointsVector;
+                cvt_ndarray_2_eigen_vector(points, pointsVector);
+                std::vector<bool> isOnFace;
+                {
+                    py::gil_scoped_release release;
+                    isOnFace = self.ArePointsOnFace(pointsVector, associationThreshold);
+                }
+                return cvt_bool_vector_2_ndarray(isOnFace);
+            },
+            "Test a (N,3) array of points against the faces of the mesh and return a boolean mask of the points on the mesh.",
+            py::arg("points"),
+            py::arg("association_threshold") = 0.1)
+
+        .def_static("from_numpy",
+            [](const py::array_t<double, py::array::c_style | py::array::forcecast> &vertices,
+               const py::array_t<int, py::array::c_style | py::array::forcecast> &faces,
+               const std::optional<py::array_t<double, py::array::c_style | py::array::forcecast>> &normalsVertex,
+               const std::optional<py::array_t<double, py::array::c_style | py::array::forcecast>> &colorsVertex)
+            {
+                std::vector<Eigen::Vector3d> meshVertices;
+                std::vector<Eigen::Vector3i> meshFaces;
+                std::vector<Eigen::Vector3d> meshNormalsVertex;
+                std::vector<Eigen::Vector3d> meshColorsVertex;
+                cvt_ndarray_2_eigen_vector(vertices, meshVertices);
+                cvt_ndarray_2_eigen_vector(faces, meshFaces);
+                if (normalsVertex.has_value())
+                {
+                    cvt_ndarray_2_eigen_vector(normalsVertex.value(), meshNormalsVertex);
+                    if (meshNormalsVertex.size() != meshVertices.size())
+                        throw std::invalid_argument("The vertex normals must have the same length as the vertices.");
+                }
+                if (colorsVertex.has_value())
+                {
+                    cvt_ndarray_2_eigen_vector(colorsVertex.value(), meshColorsVertex);
+                    if (meshColorsVertex.size() != meshVertices.size())
+                        throw std::invalid_argument("The vertex colors must have the same length as the vertices.");
+                }
+                for (const Eigen::Vector3i &face : meshFaces)
+                {
+                    if (face.minCoeff() < 0 || face.maxCoeff() >= static_cast<int>(meshVertices.size()))
+                        throw std::invalid_argument("The faces must index existing vertices.");
+                }
+                return std::make_shared<diffCheck::geometry::DFMesh>(
+                    std::move(meshVertices),
+                    std::move(meshFaces),
+                    std::move(meshNormalsVertex),
+                    std::vector<Eigen::Vector3d>(),
+                    std::move(meshColorsVertex));
+            },
+            py::arg("vertices"),
+            py::arg("faces"),
+            py::arg("normals_vertex") = py::none(),
+            py::arg("colors_vertex") = py::none(),
+            "Create a mesh from a (V,3) float64 array of vertices and a (F,3) int32 array of faces, with optional (V,3) vertex normals and colors, each one copied in bulk.")
+
+        .def("get_vertices_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFMesh&>().Vertices, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (V,3) float64 numpy view on the vertices without copy. It is invalidated if the mesh is resized.")
+        .def("get_faces_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFMesh&>().Faces, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (F,3) int32 numpy view on the faces without copy. It is invalidated if the mesh is resized.")
+        .def("get_normals_vertex_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFMesh&>().NormalsVertex, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (V,3) float64 numpy view on the vertex normals without copy. It is invalidated if the mesh is resized.")
+        .def("get_colors_vertex_view",
+            [](py::object self, bool writeable) {
+                return cvt_eigen_vector_2_ndarray_view(self.cast<diffCheck::geometry::DFMesh&>().ColorsVertex, self, writeable); },
+            py::arg("writeable") = false,
+            "Get a (V,3) float64 numpy view on the vertex colors without copy. It is invalidated if the mesh is resized.")
 
         .def("get_num_vertices", &diffCheck::geometry::DFMesh::GetNumVertices)
         .def("get_num_faces", &diffCheck::geometry::DFMesh::GetNumFaces)
@@ -118,6 +674,86 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             [](const diffCheck::geometry::DFMesh &self) { return self.ColorsFace; },
             [](diffCheck::geometry::DFMesh &self, const std::vector<Eigen::Vector3d>& value) { self.ColorsFace = value; });
     
+    py::class_<diffCheck::geometry::DFMeshDistanceQuery, std::shared_ptr<diffCheck::geometry::DFMeshDistanceQuery>>(submodule_geometry, "DFMeshDistanceQuery",
+        "Reusable distance, occupancy and ray queries on a mesh. The raycasting scene of the mesh is taken at construction and kept by the query, call update after modifying the mesh.")
+        .def(py::init<std::shared_ptr<diffCheck::geometry::DFMesh>>(),
+            py::arg("mesh"))
+        .def("update", &diffCheck::geometry::DFMeshDistanceQuery::Update,
+            py::call_guard<py::gil_scoped_release>(),
+            "Take the raycasting scene of the mesh again, after it was modified.")
+
+        .def("compute_distance",
+            [](diffCheck::geometry::DFMeshDistanceQuery &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               bool isSigned) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                std::vector<double> distances;
+                {
+                    py::gil_scoped_release release;
+                    distances = self.ComputeDistance(queryPoints, isSigned);
+                }
+                py::ssize_t numPoints = static_cast<py::ssize_t>(distances.size());
+                return cvt_std_vector_2_ndarray(std::move(distances), {numPoints});
+            },
+            py::arg("points"),
+            py::arg("is_signed") = false,
+            "Compute the distance of a (N,3) array of points to the mesh, negative behind the closest triangle if signed.")
+        .def("compute_closest_points",
+            [](diffCheck::geometry::DFMeshDistanceQuery &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points,
+               bool isSigned) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                diffCheck::geometry::DFMeshClosestPoints closestPoints;
+                {
+                    py::gil_scoped_release release;
+                    closestPoints = self.ComputeClosestPoints(queryPoints, isSigned);
+                }
+                return cvt_closest_points_2_tuple(std::move(closestPoints));
+            },
+            py::arg("points"),
+            py::arg("is_signed") = false,
+            "Find the closest points on the mesh of a (N,3) array of points, see DFMesh.compute_closest_points.")
+        .def("compute_occupancy",
+            [](diffCheck::geometry::DFMeshDistanceQuery &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &points) {
+                std::vector<Eigen::Vector3d> queryPoints;
+                cvt_ndarray_2_eigen_vector(points, queryPoints);
+                std::vector<bool> isInside;
+                {
+                    py::gil_scoped_release release;
+                    isInside = self.ComputeOccupancy(queryPoints);
+                }
+                return cvt_bool_vector_2_ndarray(isInside);
+            },
+            py::arg("points"),
+            "Get a boolean mask of the points of a (N,3) array inside the mesh. The mesh must be closed.")
+        .def("cast_rays",
+            [](diffCheck::geometry::DFMeshDistanceQuery &self,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &origins,
+               const py::array_t<double, py::array::c_style | py::array::forcecast> &directions) {
+                std::vector<Eigen::Vector3d> rayOrigins;
+                std::vector<Eigen::Vector3d> rayDirections;
+                cvt_ndarray_2_eigen_vector(origins, rayOrigins);
+                cvt_ndarray_2_eigen_vector(directions, rayDirections);
+                diffCheck::geometry::DFMeshRayHits hits;
+                {
+                    py::gil_scoped_release release;
+                    hits = self.CastRays(rayOrigins, rayDirections);
+                }
+                py::ssize_t numRays = static_cast<py::ssize_t>(hits.Distances.size());
+                return py::make_tuple(
+                    cvt_std_vector_2_ndarray(std::move(hits.Distances), {numRays}),
+                    cvt_std_vector_2_ndarray(std::move(hits.TriangleIds), {numRays}),
+                    cvt_eigen_vector_2_ndarray(std::move(hits.Normals)));
+            },
+            py::arg("origins"),
+            py::arg("directions"),
+            "Cast rays from (N,3) arrays of origins and directions. It returns the hit distances (inf if missed), the hit triangle ids (-1 if missed) and the triangle normals.")
+
+        .def_property_readonly("mesh", &diffCheck::geometry::DFMeshDistanceQuery::GetMesh);
+
     //#################################################################################################
     // dfb_transformation namespace
     //#################################################################################################
@@ -136,9 +772,112 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
 
     py::module_ submodule_registrations = m.def_submodule("dfb_registrations", "A submodule for the registration methods.");
 
+    py::class_<diffCheck::registrations::DFRegistrationResult>(submodule_registrations, "DFRegistrationResult",
+        "The result of a registration: the transformation to apply to the source, its fitness, its inlier RMSE, its correspondences, its number of iterations and the timings of its stages.")
+        .def(py::init<>())
+        .def_readwrite("transformation", &diffCheck::registrations::DFRegistrationResult::Transformation)
+        .def_readwrite("fitness", &diffCheck::registrations::DFRegistrationResult::Fitness)
+        .def_readwrite("inlier_rmse", &diffCheck::registrations::DFRegistrationResult::InlierRMSE)
+        .def_readwrite("num_iterations", &diffCheck::registrations::DFRegistrationResult::NumIterations,
+            "The number of iterations run, -1 if the method does not report it.")
+        .def_readwrite("timings", &diffCheck::registrations::DFRegistrationResult::Timings,
+            "The duration in seconds of each stage of the registration.")
+        .def_property_readonly("correspondence_set",
+            [](const diffCheck::registrations::DFRegistrationResult &self) {
+                py::array_t<int> correspondences({static_cast<py::ssize_t>(self.CorrespondenceSet.size()), static_cast<py::ssize_t>(2)});
+                if (!self.CorrespondenceSet.empty())
+                    std::memcpy(correspondences.mutable_data(), self.CorrespondenceSet.data(), self.CorrespondenceSet.size() * sizeof(Eigen::Vector2i));
+                return correspondences; },
+            "The (N,2) array of the correspondences (source index, target index).")
+        .def_property_readonly("transformation_matrix",
+            [](const diffCheck::registrations::DFRegistrationResult &self) { return self.Transformation.TransformationMatrix; },
+            "The transformation matrix, as the one of a DFTransformation.");
+
+    py::class_<diffCheck::registrations::DFICPParameters>(submodule_registrations, "DFICPParameters",
+        "The parameters of an ICP registration, with the same meaning and defaults as the arguments of O3DICP.")
+        .def(py::init([](double maxCorrespondenceDistance, bool scaling, double relativeFitness, double relativeRMSE, int maxIteration, bool usePointToPlane) {
+                diffCheck::registrations::DFICPParameters parameters;
+                parameters.MaxCorrespondenceDistance = maxCorrespondenceDistance;
+                parameters.ScalingForPointToPointTransformationEstimation = scaling;
+                parameters.RelativeFitness = relativeFitness;
+                parameters.RelativeRMSE = relativeRMSE;
+                parameters.MaxIteration = maxIteration;
+                parameters.UsePointToPlane = usePointToPlane;
+                return parameters;
+            }),
+            py::arg("max_correspondence_distance") = 0.1,
+            py::arg("is_t_estimate_pt2pt") = false,
+            py::arg("relative_fitness") = 1e-6,
+            py::arg("relative_rmse") = 1e-6,
+            py::arg("max_iteration") = 30,
+            py::arg("use_point_to_plane") = false)
+        .def_readwrite("max_correspondence_distance", &diffCheck::registrations::DFICPParameters::MaxCorrespondenceDistance)
+        .def_readwrite("is_t_estimate_pt2pt", &diffCheck::registrations::DFICPParameters::ScalingForPointToPointTransformationEstimation)
+        .def_readwrite("relative_fitness", &diffCheck::registrations::DFICPParameters::RelativeFitness)
+        .def_readwrite("relative_rmse", &diffCheck::registrations::DFICPParameters::RelativeRMSE)
+        .def_readwrite("max_iteration", &diffCheck::registrations::DFICPParameters::MaxIteration)
+        .def_readwrite("use_point_to_plane", &diffCheck::registrations::DFICPParameters::UsePointToPlane);
+
+    py::class_<diffCheck::registrations::DFICPLevel>(submodule_registrations, "DFICPLevel",
+        "A level of a multi-scale ICP: the voxel size of the downsampling (0 for the full resolution), the maximum correspondence distance and the convergence criteria.")
+        .def(py::init([](double voxelSize, double maxCorrespondenceDistance, double relativeFitness, double relativeRMSE, int maxIteration) {
+                diffCheck::registrations::DFICPLevel level;
+                level.VoxelSize = voxelSize;
+                level.MaxCorrespondenceDistance = maxCorrespondenceDistance;
+                level.RelativeFitness = relativeFitness;
+                level.RelativeRMSE = relativeRMSE;
+                level.MaxIteration = maxIteration;
+                return level;
+            }),
+            py::arg("voxel_size") = 0.0,
+            py::arg("max_correspondence_distance") = 0.1,
+            py::arg("relative_fitness") = 1e-6,
+            py::arg("relative_rmse") = 1e-6,
+            py::arg("max_iteration") = 30)
+        .def_readwrite("voxel_size", &diffCheck::registrations::DFICPLevel::VoxelSize)
+        .def_readwrite("max_correspondence_distance", &diffCheck::registrations::DFICPLevel::MaxCorrespondenceDistance)
+        .def_readwrite("relative_fitness", &diffCheck::registrations::DFICPLevel::RelativeFitness)
+        .def_readwrite("relative_rmse", &diffCheck::registrations::DFICPLevel::RelativeRMSE)
+        .def_readwrite("max_iteration", &diffCheck::registrations::DFICPLevel::MaxIteration);
+
+    py::class_<diffCheck::registrations::DFFeatureCache, std::shared_ptr<diffCheck::registrations::DFFeatureCache>>(submodule_registrations, "DFFeatureCache",
+        "A cache of the FPFH features of the global registrations, keyed on the content of the cloud and the KD-tree search parameters. The most recently used features are kept in memory, and optionally persisted in a directory.")
+        .def(py::init<int, const std::string &>(),
+            py::arg("capacity") = 8,
+            py::arg("directory") = "")
+        .def("clear", &diffCheck::registrations::DFFeatureCache::Clear,
+            "Drop the features kept in memory, the persisted ones are kept.")
+        .def_property_readonly("capacity", &diffCheck::registrations::DFFeatureCache::GetCapacity)
+        .def_property_readonly("directory", &diffCheck::registrations::DFFeatureCache::GetDirectory)
+        .def_property_readonly("num_entries", &diffCheck::registrations::DFFeatureCache::GetNumEntries)
+        .def_property_readonly("num_hits", &diffCheck::registrations::DFFeatureCache::GetNumHits)
+        .def_property_readonly("num_misses", &diffCheck::registrations::DFFeatureCache::GetNumMisses);
+
+    py::class_<diffCheck::registrations::DFRegistrationFeatures, std::shared_ptr<diffCheck::registrations::DFRegistrationFeatures>>(submodule_registrations, "DFRegistrationFeatures",
+        "A point cloud prepared for the global registrations by DFGlobalRegistrations.compute_registration_features: downsampled, with normals, and its FPFH features.")
+        .def_property_readonly("num_points", &diffCheck::registrations::DFRegistrationFeatures::GetNumPoints)
+        .def_readonly("timings", &diffCheck::registrations::DFRegistrationFeatures::Timings);
+
     py::class_<diffCheck::registrations::DFGlobalRegistrations>(submodule_registrations, "DFGlobalRegistrations",
         "A static class for the global registration methods.")
+        .def_static("compute_registration_features", &diffCheck::registrations::DFGlobalRegistrations::ComputeRegistrationFeatures,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("point_cloud"),
+            py::arg("voxel_size") = 0.0,
+            py::arg("radius_kd_tree_search") = 0.8,
+            py::arg("max_neighbor_kd_tree_search") = 50,
+            py::arg("feature_cache") = nullptr,
+            "Downsample a point cloud on a voxel grid (0 keeps all the points), estimate its missing normals and compute its FPFH features once, to register it many times.")
+        .def_static("evaluate_registrations", &diffCheck::registrations::DFGlobalRegistrations::EvaluateRegistrations,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("source"),
+            py::arg("target"),
+            py::arg("transforms"),
+            py::arg("early_termination") = false,
+            py::arg("num_threads") = 0,
+            "Compute in parallel the mean distance of the source to the target for each of a list of 4x4 transforms, e.g. to pick the best of many registrations. With early termination, the transforms that cannot beat the best one get an infinite distance.")
         .def_static("O3DFastGlobalRegistrationFeatureMatching", &diffCheck::registrations::DFGlobalRegistrations::O3DFastGlobalRegistrationFeatureMatching,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("source"),
             py::arg("target"),
             py::arg("voxelize") = false,
@@ -147,8 +886,17 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             py::arg("max_neighbor_kd_tree_search") = 50,
             py::arg("max_correspondence_distance") = 0.05,
             py::arg("iteration_number") = 128,
+            py::arg("max_tuple_count") = 1000,
+            py::arg("feature_cache") = nullptr)
+        .def_static("O3DFastGlobalRegistrationOnFeatures", &diffCheck::registrations::DFGlobalRegistrations::O3DFastGlobalRegistrationOnFeatures,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("source_features"),
+            py::arg("target_features"),
+            py::arg("max_correspondence_distance") = 0.05,
+            py::arg("iteration_number") = 128,
             py::arg("max_tuple_count") = 1000)
         .def_static("O3DRansacOnFeatureMatching", &diffCheck::registrations::DFGlobalRegistrations::O3DRansacOnFeatureMatching,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("source"),
             py::arg("target"),
             py::arg("voxelize") = false,
@@ -161,11 +909,39 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             py::arg("correspondence_checker_distance") = 0.05,
             py::arg("similarity_threshold") = 1.5,
             py::arg("ransac_max_iteration") = 5000,
-            py::arg("ransac_confidence_threshold") = 0.999);
+            py::arg("ransac_confidence_threshold") = 0.999,
+            py::arg("feature_cache") = nullptr)
+        .def_static("O3DRansacOnFeatures", &diffCheck::registrations::DFGlobalRegistrations::O3DRansacOnFeatures,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("source_features"),
+            py::arg("target_features"),
+            py::arg("max_correspondence_distance") = 0.5,
+            py::arg("is_t_estimate_pt2pt") = false,
+            py::arg("ransac_n") = 3,
+            py::arg("correspondence_checker_distance") = 0.05,
+            py::arg("similarity_threshold") = 1.5,
+            py::arg("ransac_max_iteration") = 5000,
+            py::arg("ransac_confidence_threshold") = 0.999)
+        .def_static("O3DRansacMultiStart", &diffCheck::registrations::DFGlobalRegistrations::O3DRansacMultiStart,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("source_features"),
+            py::arg("target_features"),
+            py::arg("num_starts") = 8,
+            py::arg("seeds") = std::vector<unsigned int>(),
+            py::arg("max_correspondence_distance") = 0.5,
+            py::arg("is_t_estimate_pt2pt") = false,
+            py::arg("ransac_n") = 3,
+            py::arg("correspondence_checker_distance") = 0.05,
+            py::arg("similarity_threshold") = 0.9,
+            py::arg("ransac_max_iteration") = 5000,
+            py::arg("ransac_confidence_threshold") = 0.999,
+            py::arg("num_threads") = 0,
+            "Run independent ransacs in parallel, one per seed (or num_starts random seeds), on prepared point clouds and return the best result by fitness and inlier RMSE. The samples are checked on their edge lengths (similarity_threshold between 0 and 1, 0 to disable) and on their distances. The result is reproducible for a given list of seeds.");
 
     py::class_<diffCheck::registrations::DFRefinedRegistration>(submodule_registrations, "DFRefinedRegistration",
         "A static class for the refined registration methods.")
         .def_static("O3DICP", &diffCheck::registrations::DFRefinedRegistration::O3DICP,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("source"),
             py::arg("target"),
             py::arg("max_correspondence_distance") = 0.1,
@@ -174,7 +950,23 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             py::arg("relative_rmse") = 1e-6,
             py::arg("max_iteration") = 30,
             py::arg("use_point_to_plane") = false)
+        .def_static("O3DICPBatch", &diffCheck::registrations::DFRefinedRegistration::O3DICPBatch,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("sources"),
+            py::arg("targets"),
+            py::arg("parameters"),
+            py::arg("num_threads") = 0,
+            "Register many source/target pairs with ICP in parallel. The parameters are a list of DFICPParameters, one for all the pairs or one per pair. It returns a DFRegistrationResult per pair.")
+        .def_static("O3DMultiScaleICP", &diffCheck::registrations::DFRefinedRegistration::O3DMultiScaleICP,
+            py::call_guard<py::gil_scoped_release>(),
+            py::arg("source"),
+            py::arg("target"),
+            py::arg("levels") = std::vector<diffCheck::registrations::DFICPLevel>(),
+            py::arg("initial_transformation") = diffCheck::transformation::DFTransformation(Eigen::Matrix4d::Identity()),
+            py::arg("use_point_to_plane") = false,
+            "Register the source on the target with ICP from the coarsest to the finest level of a list of DFICPLevel, starting from the initial transformation. Without levels, three are derived from the size of the source.")
         .def_static("O3DGeneralizedICP", &diffCheck::registrations::DFRefinedRegistration::O3DGeneralizedICP,
+            py::call_guard<py::gil_scoped_release>(),
             py::arg("source"),
             py::arg("target"),
             py::arg("max_correspondence_distance") = 0.1,
@@ -190,7 +982,17 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
 
     py::class_<diffCheck::segmentation::DFSegmentation>(submodule_segmentation, "DFSegmentation",
         "A static class for the segmentation methods.")
-        .def_static("segment_by_normal", &diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation,
+        .def_static("segment_by_normal",
+            [](std::shared_ptr<diffCheck::geometry::DFPointCloud> &pointCloud, float normalThresholdDegree, int minClusterSize,
+               bool useKnnNeighborhood, int knnNeighborhoodSize, float radiusNeighborhoodSize, bool colorClusters) {
+                // the missing normals are estimated in place with the GIL held, the segmentation itself only reads the cloud
+                if (!pointCloud->HasNormals())
+                    pointCloud->EstimateNormals(false, 50);
+                py::gil_scoped_release release;
+                return diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation(
+                    pointCloud, normalThresholdDegree, minClusterSize, useKnnNeighborhood,
+                    knnNeighborhoodSize, radiusNeighborhoodSize, colorClusters);
+            },
             py::arg("point_cloud"),
             py::arg("normal_threshold_degree") = 20.0,
             py::arg("min_cluster_size") = 10,
@@ -198,6 +1000,32 @@ PYBIND11_MODULE(diffcheck_bindings, m) {
             py::arg("knn_neighborhood_size") = 10,
             py::arg("radius_neighborhood_size") = 0.1,
             py::arg("color_clusters") = false)
+        .def_static("segment_by_normal_tiled",
+            [](std::shared_ptr<diffCheck::geometry::DFPointCloud> &pointCloud, double tileSize, float normalThresholdDegree,
+               int minClusterSize, bool useKnnNeighborhood, int knnNeighborhoodSize, float radiusNeighborhoodSize,
+               double tileOverlap, int numThreads) {
+                if (!pointCloud->HasNormals())
+                    pointCloud->EstimateNormals(false, 50);
+                std::vector<int> labels;
+                {
+                    py::gil_scoped_release release;
+                    labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+                        pointCloud, tileSize, normalThresholdDegree, minClusterSize, useKnnNeighborhood,
+                        knnNeighborhoodSize, radiusNeighborhoodSize, tileOverlap, numThreads);
+                }
+                py::ssize_t numPoints = static_cast<py::ssize_t>(labels.size());
+                return cvt_std_vector_2_ndarray(std::move(labels), {numPoints});
+            },
+            "Segment the point cloud tile by tile, holding the neighborhood graph of one tile per thread, and return the cluster label of each point, -1 for the discarded points. A tile_overlap of 0 uses the search radius, or the extent of the k nearest neighbors with the knn neighborhood.",
+            py::arg("point_cloud"),
+            py::arg("tile_size"),
+            py::arg("normal_threshold_degree") = 20.0,
+            py::arg("min_cluster_size") = 10,
+            py::arg("use_knn_neighborhood") = true,
+            py::arg("knn_neighborhood_size") = 10,
+            py::arg("radius_neighborhood_size") = 0.1,
+            py::arg("tile_overlap") = 0.0,
+            py::arg("num_threads") = 0)
         
         .def_static("associate_clusters", &diffCheck::segmentation::DFSegmentation::AssociateClustersToMeshes,
             py::arg("is_roundwood"),
@@ -66,6 +66,7 @@ class DFICPRegistration(component):
         print("-------------------")
         print("Estimated transformation matrix:")
         print(df_xform.transformation_matrix)
+        print(f"Fitness: {df_xform.fitness}, inlier RMSE: {df_xform.inlier_rmse}")
         print("-------------------")
 
         # cvt df xform to rhino xform
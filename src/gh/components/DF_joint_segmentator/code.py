@@ -70,9 +70,10 @@ class DFJointSegmentator(component):
             joint_center = Rhino.Geometry.BoundingBox(vertices).Center
             rh_joint_centers.append([joint_center.X, joint_center.Y, joint_center.Z])
 
-        # for each joint, find the corresponding faces, store them as such but also merge them, generate a reference point cloud, and register the merged clusters to the reference point cloud
+        # for each joint, find the corresponding faces, store them as such but also merge them, and generate a reference point cloud
+        ref_df_joint_clouds = []
+        df_joints_face_segments = []
         for i, df_joint in enumerate(df_joints):
-            rh_joint_faces_segments = []
             reference_joint_center = rh_joint_centers[i]
 
             # create the reference point cloud
@@ -81,6 +82,7 @@ class DFJointSegmentator(component):
                 ref_face_cloud = face.sample_points_uniformly(1000)
                 ref_df_joint_cloud.add_points(ref_face_cloud)
             o_reference_point_clouds.append(df_cvt.cvt_dfcloud_2_rhcloud(ref_df_joint_cloud))
+            ref_df_joint_clouds.append(ref_df_joint_cloud)
 
             # find the corresponding clusters and merge them
             df_joint_cloud = diffcheck_bindings.dfb_geometry.DFPointCloud()
@@ -116,12 +118,20 @@ class DFJointSegmentator(component):
                 rh_joint_cloud.SetUserString("df_sanity_scan_check", "2")
                 o_joint_segments.append(rh_joint_cloud)
 
-            # register the joint faces to the reference point cloud
-            transform = diffcheck_bindings.dfb_registrations.DFRefinedRegistration.O3DICP(df_joint_cloud, ref_df_joint_cloud, max_correspondence_distance = i_correspondence_distance)
+            df_joint_clouds.append(df_joint_cloud)
+            df_joints_face_segments.append(df_joint_face_segments)
+
+        # register all the merged clusters to their reference point cloud in parallel
+        icp_parameters = diffcheck_bindings.dfb_registrations.DFICPParameters(max_correspondence_distance=i_correspondence_distance)
+        registration_results = diffcheck_bindings.dfb_registrations.DFRefinedRegistration.O3DICPBatch(
+            df_joint_clouds,
+            ref_df_joint_clouds,
+            [icp_parameters])
+        for df_joint_face_segments, registration_result in zip(df_joints_face_segments, registration_results):
+            rh_joint_faces_segments = []
             for df_joint_face_segment in df_joint_face_segments:
-                df_joint_face_segment.apply_transformation(transform)
+                df_joint_face_segment.apply_transformation(registration_result.transformation)
                 rh_joint_faces_segments.append(df_cvt.cvt_dfcloud_2_rhcloud(df_joint_face_segment))
-            df_joint_clouds.append(df_joint_cloud)
             o_joint_faces_segments.append(rh_joint_faces_segments)
 
         for rh_joint_faces, rh_joint in zip(o_joint_faces_segments, o_joint_segments):
@@ -11,9 +11,9 @@ class DFLoadCloudFromFile(component):
     def RunScript(self,
         i_path: str,
         i_scalef: float) -> rg.PointCloud:
-        # import and convert to Rhino Cloud
+        # import through the binary cache written next to the file and convert to Rhino Cloud
         df_cloud = diffcheck_bindings.dfb_geometry.DFPointCloud()
-        df_cloud.load_from_PLY(i_path)
+        df_cloud.load_from_PLY_cached(i_path)
         rh_cloud = df_cvt_bindings.cvt_dfcloud_2_rhcloud(df_cloud)
 
         # scale  if needed
@@ -73,6 +73,7 @@ class DFRANSACGlobalRegistration(component):
         print("-------------------")
         print("Estimated transformation matrix:")
         print(df_xform.transformation_matrix)
+        print(f"Fitness: {df_xform.fitness}, inlier RMSE: {df_xform.inlier_rmse}")
         print("-------------------")
 
         # cvt df xform to rhino xform
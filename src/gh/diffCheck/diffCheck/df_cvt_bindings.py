@@ -7,8 +7,14 @@
 import Rhino.Geometry as rg
 import scriptcontext as sc
 
+import clr
+import ctypes
+
 import System
 import System.Drawing
+from System.Runtime.InteropServices import GCHandle, GCHandleType
+
+import numpy as np
 
 from typing import Any
 
@@ -22,6 +28,50 @@ def test_bindings() -> Any:
     """
     return diffcheck_bindings.dfb_test.test()
 
+def _cvt_flat_buffer_2_rharray(flat_buffer, rh_type, dtype=np.float64, item_size=3):
+    """
+        Copy a flat numpy buffer to a blittable .NET array, e.g. an array of Point3d or Vector3d.
+
+        :param flat_buffer: the flat buffer
+        :param rh_type: the structure of the array, e.g. rg.Point3d, rg.Vector3f or rg.MeshFace
+        :param dtype: the scalar type of the structure
+        :param item_size: the number of scalars of the structure
+
+        :return rh_array: the .NET array
+    """
+    flat_buffer = np.ascontiguousarray(flat_buffer, dtype=dtype)
+    rh_array = System.Array.CreateInstance(clr.GetClrType(rh_type), flat_buffer.size // item_size)
+    if flat_buffer.size == 0:
+        return rh_array
+    handle = GCHandle.Alloc(rh_array, GCHandleType.Pinned)
+    try:
+        ctypes.memmove(handle.AddrOfPinnedObject().ToInt64(), flat_buffer.ctypes.data, flat_buffer.nbytes)
+    finally:
+        handle.Free()
+    return rh_array
+
+def cvt_rharray_2_flat_buffer(rh_array, dtype=np.float64, item_size=3) -> np.ndarray:
+    """
+        Copy a blittable .NET array to a flat numpy buffer, e.g. an array of Point3d or Vector3d
+        (three packed doubles) or the float and int arrays of a Rhino mesh.
+        The pinned memory of the array is copied at once.
+
+        :param rh_array: the .NET array
+        :param dtype: the scalar type of the array
+        :param item_size: the number of scalars of each element of the array
+
+        :return flat_buffer: the flat buffer
+    """
+    flat_buffer = np.empty(item_size * len(rh_array), dtype=dtype)
+    if flat_buffer.size == 0:
+        return flat_buffer
+    handle = GCHandle.Alloc(rh_array, GCHandleType.Pinned)
+    try:
+        ctypes.memmove(flat_buffer.ctypes.data, handle.AddrOfPinnedObject().ToInt64(), flat_buffer.nbytes)
+    finally:
+        handle.Free()
+    return flat_buffer
+
 def cvt_rhcloud_2_dfcloud(rh_cloud) -> diffcheck_bindings.dfb_geometry.DFPointCloud:
     """
         Convert a Rhino cloud to a diffCheck cloud.
@@ -34,23 +84,25 @@ def cvt_rhcloud_2_dfcloud(rh_cloud) -> diffcheck_bindings.dfb_geometry.DFPointCl
     if not isinstance(rh_cloud, rg.PointCloud):
         raise ValueError("rh_cloud for convertion should be a PointCloud")
 
-    df_cloud = diffcheck_bindings.dfb_geometry.DFPointCloud()
-
-    # points
     if rh_cloud.Count == 0:
         print("The input rhino cloud is empty")
-        return df_cloud
-    df_cloud.points = [[pt.X, pt.Y, pt.Z] for pt in rh_cloud]
+        return diffcheck_bindings.dfb_geometry.DFPointCloud()
+
+    # points
+    points = cvt_rharray_2_flat_buffer(rh_cloud.GetPoints())
 
     # normals
+    normals = None
     if rh_cloud.ContainsNormals:
-        df_cloud.normals = [[n.X, n.Y, n.Z] for n in rh_cloud.GetNormals()]
+        normals = cvt_rharray_2_flat_buffer(rh_cloud.GetNormals())
 
     # colors
+    colors = None
     if rh_cloud.ContainsColors:
-        df_cloud.colors = [[rh_c.R, rh_c.G, rh_c.B] for rh_c in rh_cloud.GetColors()]
+        argb = np.array([rh_c.ToArgb() for rh_c in rh_cloud.GetColors()], dtype=np.int64)
+        colors = np.stack(((argb >> 16) & 0xFF, (argb >> 8) & 0xFF, argb & 0xFF), axis=1).astype(np.float64)
 
-    return df_cloud
+    return diffcheck_bindings.dfb_geometry.DFPointCloud.from_flat_buffer(points, normals, colors)
 
 def cvt_dfcloud_2_rhcloud(df_cloud):
     """
@@ -65,19 +117,13 @@ def cvt_dfcloud_2_rhcloud(df_cloud):
 
     rh_cloud = rg.PointCloud()
 
-    if len(df_cloud.points) == 0:
+    if df_cloud.get_num_points() == 0:
         print("The input diffCheck cloud is empty")
         return rh_cloud
 
-    df_cloud_points = df_cloud.points
-    df_cloud_colors = df_cloud.colors
-    df_cloud_normals = df_cloud.normals
-
-    df_cloud_points = [rg.Point3d(pt[0], pt[1], pt[2]) for pt in df_cloud_points]
-    df_cloud_normals = [rg.Vector3d(n[0], n[1], n[2]) for n in df_cloud_normals]
-    df_cloud_colors = [System.Drawing.Color.FromArgb(c[0], c[1], c[2]) for c in df_cloud_colors]
-
-    rh_cloud = rg.PointCloud()
+    df_cloud_points = _cvt_flat_buffer_2_rharray(df_cloud.to_flat_buffer("points"), rg.Point3d)
+    df_cloud_normals = _cvt_flat_buffer_2_rharray(df_cloud.to_flat_buffer("normals"), rg.Vector3d)
+    df_cloud_colors = [System.Drawing.Color.FromArgb(int(c[0]), int(c[1]), int(c[2])) for c in df_cloud.get_colors_view()]
 
     if df_cloud.has_normals() and df_cloud.has_colors():
         rh_cloud.AddRange(df_cloud_points, df_cloud_normals, df_cloud_colors)
@@ -105,34 +151,32 @@ def cvt_dfmesh_2_rhmesh(df_mesh: diffcheck_bindings.dfb_geometry.DFMesh) -> rg.M
 
     rh_mesh = rg.Mesh()
 
-    if len(df_mesh.vertices) == 0:
+    if df_mesh.get_num_vertices() == 0:
         print("The input diffCheck mesh is empty")
         return rh_mesh
 
     # vertices
-    for vertex in df_mesh.vertices:
-        rh_mesh.Vertices.Add(vertex[0], vertex[1], vertex[2])
+    rh_mesh.Vertices.AddVertices(_cvt_flat_buffer_2_rharray(df_mesh.get_vertices_view(), rg.Point3d))
 
-    # faces
-    for face in df_mesh.faces:
-        int_face = [int(f) for f in face]
-        rh_mesh.Faces.AddFace(int_face[0], int_face[1], int_face[2])
+    # faces, the triangles are stored as quads whose last two indices are equal
+    faces = df_mesh.get_faces_view()
+    rh_faces = np.concatenate((faces, faces[:, 2:3]), axis=1)
+    rh_mesh.Faces.AddFaces(_cvt_flat_buffer_2_rharray(rh_faces, rg.MeshFace, np.int32, 4))
 
     # normals
-    if len(df_mesh.normals_vertex) > 0:
-        for i, normal in enumerate(df_mesh.normals_vertex):
-            rh_mesh.Normals.SetNormal(i, normal[0], normal[1], normal[2])
+    if len(df_mesh.get_normals_vertex_view()) > 0:
+        rh_mesh.Normals.SetNormals(_cvt_flat_buffer_2_rharray(df_mesh.get_normals_vertex_view(), rg.Vector3f, np.float32))
 
     # colors
-    if len(df_mesh.colors_vertex) > 0:
-        for i, color in enumerate(df_mesh.colors_vertex):
-            rh_mesh.VertexColors.SetColor(i, color[0], color[1], color[2])
+    if len(df_mesh.get_colors_vertex_view()) > 0:
+        for i, color in enumerate(df_mesh.get_colors_vertex_view()):
+            rh_mesh.VertexColors.SetColor(i, int(color[0]), int(color[1]), int(color[2]))
 
     return rh_mesh
 
 def cvt_rhmesh_2_dfmesh(rh_mesh: rg.Mesh) -> diffcheck_bindings.dfb_geometry.DFMesh:
     """
-        Convert a Rhino mesh to a diffCheck mesh.
+        Convert a Rhino mesh to a diffCheck mesh. The quads are split in two triangles.
 
         :param rh_mesh: rhino mesh
 
@@ -141,45 +185,28 @@ def cvt_rhmesh_2_dfmesh(rh_mesh: rg.Mesh) -> diffcheck_bindings.dfb_geometry.DFM
     if not isinstance(rh_mesh, rg.Mesh):
         raise ValueError("rh_mesh should be a Mesh")
 
-    df_mesh = diffcheck_bindings.dfb_geometry.DFMesh()
-
     if rh_mesh.Vertices.Count == 0:
         print("The input rhino mesh is empty")
-        return df_mesh
+        return diffcheck_bindings.dfb_geometry.DFMesh()
 
     # vertices
-    rh_vertices = rh_mesh.Vertices.ToFloatArray()
-    vertices = []
-    for i in range(0, len(rh_vertices), 3):
-        vertices.append([rh_vertices[i], rh_vertices[i + 1], rh_vertices[i + 2]])
-    df_mesh.vertices = vertices
+    vertices = cvt_rharray_2_flat_buffer(rh_mesh.Vertices.ToFloatArray(), np.float32, 1).reshape(-1, 3)
 
     # faces
-    rh_faces = rh_mesh.Faces
-    faces = []
-    for i in range(len(rh_faces)):
-        face = rh_faces[i]
-        faces.append([face.A, face.B, face.C])
-    df_mesh.faces = faces
+    faces = cvt_rharray_2_flat_buffer(rh_mesh.Faces.ToIntArray(True), np.int32, 1).reshape(-1, 3)
 
     # normals
+    normals_vertex = None
     if rh_mesh.Normals.Count > 0:
-        normals = rh_mesh.Normals.ToFloatArray()
-        normals_vertex = []
-        for i in range(0, len(normals), 3):
-            normals_vertex.append([normals[i], normals[i + 1], normals[i + 2]])
-        df_mesh.normals_vertex = normals_vertex
+        normals_vertex = cvt_rharray_2_flat_buffer(rh_mesh.Normals.ToFloatArray(), np.float32, 1).reshape(-1, 3)
 
     # colors
+    colors_vertex = None
     if rh_mesh.VertexColors.Count > 0:
-        colors = rh_mesh.VertexColors.ToArgbColors()
-        colors_vertex = []
-        for i in range(len(colors)):
-            color = colors[i]
-            colors_vertex.append([color.R, color.G, color.B])
-        df_mesh.colors_vertex = colors_vertex
-
-    return df_mesh
+        argb = cvt_rharray_2_flat_buffer(rh_mesh.VertexColors.ToARGBArray(), np.int32, 1)
+        colors_vertex = np.stack(((argb >> 16) & 0xFF, (argb >> 8) & 0xFF, argb & 0xFF), axis=1)
+
+    return diffcheck_bindings.dfb_geometry.DFMesh.from_numpy(vertices, faces, normals_vertex, colors_vertex)
 
 def cvt_dfxform_2_rhxform(df_xform : diffcheck_bindings.dfb_transformation.DFTransformation) -> rg.Transform:
     """
@@ -169,26 +169,44 @@ def rh_cloud_2_rh_mesh_comparison(
     """
     results = DFVizResults(assembly)
 
-    for idx, source_rh in enumerate(rh_cloud_source_list):
-        source_df = df_cvt_bindings.cvt_rhcloud_2_dfcloud(source_rh)
+    source_df_list = [df_cvt_bindings.cvt_rhcloud_2_dfcloud(source_rh) for source_rh in rh_cloud_source_list]
+    sanity_check_values = []
+    for source_rh in rh_cloud_source_list:
+        sanity_check_value_uncasted = source_rh.GetUserString("df_sanity_scan_check")
+        if sanity_check_value_uncasted is None:
+            sanity_check_values.append(DFInvalidData.VALID.value)
+        else:
+            sanity_check_values.append(int(sanity_check_value_uncasted))
+
+    # the distances of the valid clouds to their meshes are computed natively for all the beams in one call
+    cloud_2_mesh_distances = {}
+    if not swap:
+        valid_indices = [
+            idx for idx, source_df in enumerate(source_df_list)
+            if sanity_check_values[idx] == DFInvalidData.VALID.value and source_df.get_num_points() > 0]
+        if len(valid_indices) > 0:
+            target_df_list = []
+            for idx in valid_indices:
+                target_df_list.append(_cvt_rhmesh_2_triangulated_dfmesh(rhino_mesh_target_list[idx]))
+            closest_points_list = diffcheck_bindings.dfb_geometry.DFMesh.compute_closest_points_batch(
+                target_df_list,
+                [source_df_list[idx] for idx in valid_indices],
+                signed_flag)
+            for idx, closest_points in zip(valid_indices, closest_points_list):
+                cloud_2_mesh_distances[idx] = closest_points[0]
+
+    for idx, source_df in enumerate(source_df_list):
         target = rhino_mesh_target_list[idx]
-
-        source_df_pts = source_df.points
+        num_source_pts = source_df.get_num_points()
+        sanity_check_value = sanity_check_values[idx]
 
         if swap:
             source_df, target = target, source_df
 
-        sanity_check_value_uncasted = source_rh.GetUserString("df_sanity_scan_check")
-        sanity_check_value = None
-        if sanity_check_value_uncasted is None:
-            sanity_check_value = DFInvalidData.VALID.value
-        else:
-            sanity_check_value = int(sanity_check_value_uncasted)
-
         if sanity_check_value == DFInvalidData.OUT_OF_TOLERANCE.value:
-            out_of_tol_distances = np.asarray([DFInvalidData.OUT_OF_TOLERANCE] * len(source_df_pts))
+            out_of_tol_distances = np.asarray([DFInvalidData.OUT_OF_TOLERANCE] * num_source_pts)
             results.add(source_df, target, out_of_tol_distances, sanity_check=DFInvalidData.OUT_OF_TOLERANCE)
-        elif sanity_check_value == DFInvalidData.MISSING_PCD.value or len(source_df_pts) == 0:
+        elif sanity_check_value == DFInvalidData.MISSING_PCD.value or num_source_pts == 0:
             results.add(source_df, target, np.empty(0), sanity_check=DFInvalidData.MISSING_PCD)
         else:
             if swap:
@@ -196,76 +214,63 @@ def rh_cloud_2_rh_mesh_comparison(
                 distances = rh_mesh_2_df_cloud_distance(source_df, target, signed_flag)
             else:
                 # this means we want to visualize the result on the source pcd
-                distances = df_cloud_2_rh_mesh_distance(source_df, target, signed_flag)
+                distances = cloud_2_mesh_distances[idx]
             results.add(source_df, target, distances)
 
     return results
 
 def rh_mesh_2_df_cloud_distance(source, target, signed=False):
     """
-        Calculate the distance between every vertex of a Rhino Mesh to its closest point on a PCD
-    """
-    # make a Df point cloud containing all the vertices of the source rhino mesh
-    df_pcd_from_mesh_vertices = diffcheck_bindings.dfb_geometry.DFPointCloud()
-    df_pcd_from_mesh_vertices.points = [[pt.X, pt.Y, pt.Z] for pt in source.Vertices]
+        Calculate the distance between every vertex of a Rhino Mesh to its closest point on a PCD.
+        The nearest points are found natively with the spatial index of the target, and the distances
+        are signed with the vertex normals in a single vectorized operation.
 
-    # calculate the distances
-    distances = np.asarray(df_pcd_from_mesh_vertices.compute_distance(target))
+        :param source: the Rhino mesh
+        :param target: the diffCheck point cloud
+        :param signed: if True, the vertices whose closest point lies in front of their normal get negative distances
 
-    if signed:
-        # build an RTree containing all the points of the target
-        tree = rg.RTree()
-        for i, ver in enumerate(target.points):
-            tree.Insert(rg.Point3d(ver[0], ver[1], ver[2]), i)
+        :return distances: the distances as a numpy array
+    """
+    # the pinned .NET arrays are copied at once rather than element by element
+    vertices = df_cvt_bindings.cvt_rharray_2_flat_buffer(source.Vertices.ToFloatArray(), np.float32, 1).reshape(-1, 3)
+    closest_indices, distances = target.query_nearest(vertices)
 
-        for idx, p in enumerate(source.Vertices):
-            # find the index on the target that the vertex is closest to
-            search_point = p
-            sphere = rg.Sphere(search_point, distances[idx]*1.0001) #to change later, hack to avoid not finding the point
-            found_indices = []
+    if signed:
+        normals = df_cvt_bindings.cvt_rharray_2_flat_buffer(source.Normals.ToFloatArray(), np.float32, 1).reshape(-1, 3)
+        directions = vertices - target.get_points_view()[closest_indices]
+        distances = np.where(np.einsum('ij,ij->i', directions, normals) < 0, -distances, distances)
 
-            def search_callback(sender, e):
-                found_indices.append(e.Id)
+    return distances
 
-            tree.Search(sphere, search_callback)
 
-            df_closest_point = target.points[found_indices[0]]
-            closest_point = rg.Point3d(df_closest_point[0], df_closest_point[1], df_closest_point[2])
-            # Calculate the direction from target to source
-            direction = p - closest_point
-            # Calculate the signed distance
-            normal = source.Normals[idx]
-            dot_product = direction * normal
-            if dot_product < 0:
-                distances[idx] = - distances[idx]
+def _cvt_rhmesh_2_triangulated_dfmesh(rh_mesh):
+    """
+        Convert a Rhino mesh to a triangulated diffCheck mesh with vertex normals, so that the signs of the
+        native distances follow the interpolated normals of Mesh.NormalAt.
 
-    return np.asarray(distances)
+        :param rh_mesh: the Rhino mesh, left untouched
 
+        :return df_mesh: the diffCheck mesh
+    """
+    rh_mesh_triangulated = rh_mesh.DuplicateMesh()
+    rh_mesh_triangulated.Faces.ConvertQuadsToTriangles()
+    if rh_mesh_triangulated.Normals.Count != rh_mesh_triangulated.Vertices.Count:
+        rh_mesh_triangulated.Normals.ComputeNormals()
+    return df_cvt_bindings.cvt_rhmesh_2_dfmesh(rh_mesh_triangulated)
 
 def df_cloud_2_rh_mesh_distance(source, target, signed=False):
     """
-        Calculate the distance between every point of a source pcd to its closest point on a target Rhino Mesh
-    """
+        Calculate the distance between every point of a source pcd to its closest point on a target Rhino Mesh.
+        The closest points are computed natively for the whole cloud, and the distances are signed with the
+        vertex normals interpolated at the closest points, as with Mesh.NormalAt.
 
-    #for every point on the point cloud find distance to mesh
-    distances = []
+        :param source: the diffCheck point cloud
+        :param target: the Rhino mesh
+        :param signed: if True, the points behind the mesh get negative distances
 
-    for p in source.points:
-
-        rhp = rg.Point3d(p[0], p[1], p[2])
-        closest_meshPoint = target.ClosestMeshPoint(rhp, 1000)
-        closest_point = closest_meshPoint.Point
-        distance = rhp.DistanceTo(closest_point)
-
-        if signed:
-            # Calculate the direction from target to source
-            direction = rhp - closest_point
-            # Calculate the signed distance
-            normal = target.NormalAt(closest_meshPoint)
-            dot_product = direction * normal
-            if dot_product < 0:
-                distance = -distance
-
-        distances.append(distance)
+        :return distances: the distances as a numpy array
+    """
+    target_df = _cvt_rhmesh_2_triangulated_dfmesh(target)
+    distances, _, _, _ = target_df.compute_closest_points(source.get_points_view(), signed)
 
-    return np.asarray(distances)
+    return distances
@@ -0,0 +1,138 @@
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <fstream>
+#include <iostream>
+#include <random>
+#include <string>
+#include <thread>
+
+#ifdef _WIN32
+    #ifndef NOMINMAX
+        #define NOMINMAX
+    #endif
+    #include <windows.h>
+    #include <psapi.h>
+#endif
+
+#include "diffCheck.hh"
+
+namespace diffCheck::benchmark
+{
+    /// @brief Get the current resident memory of the process in MB
+    inline double GetResidentMemoryMB()
+    {
+    #ifdef _WIN32
+        PROCESS_MEMORY_COUNTERS pmc;
+        if (GetProcessMemoryInfo(GetCurrentProcess(), &pmc, sizeof(pmc)))
+            return static_cast<double>(pmc.WorkingSetSize) / (1024.0 * 1024.0);
+        return 0.0;
+    #else
+        std::ifstream status("/proc/self/status");
+        std::string line;
+        while (std::getline(status, line))
+        {
+            if (line.rfind("VmRSS:", 0) == 0)
+                return std::stod(line.substr(6)) / 1024.0;
+        }
+        return 0.0;
+    #endif
+    }
+
+    /**
+     * @brief Time a callable and print its duration, the memory difference it caused and the peak of memory it
+     * reached. The peak is sampled every millisecond from another thread, so that the temporary copies freed
+     * before the callable returns are accounted for.
+     * 
+     * @param label the name of the benchmarked operation
+     * @param func the callable to benchmark
+     * @return double the duration in milliseconds
+     */
+    template <typename Func>
+    double Measure(const std::string &label, Func func)
+    {
+        double memoryBefore = GetResidentMemoryMB();
+        std::atomic<bool> isRunning(true);
+        double memoryPeak = memoryBefore;
+        std::thread sampler([&]() {
+            while (isRunning.load())
+            {
+                memoryPeak = std::max(memoryPeak, GetResidentMemoryMB());
+                std::this_thread::sleep_for(std::chrono::milliseconds(1));
+            }
+        });
+
+        auto start = std::chrono::high_resolution_clock::now();
+        func();
+        auto end = std::chrono::high_resolution_clock::now();
+        isRunning = false;
+        sampler.join();
+
+        double memoryAfter = GetResidentMemoryMB();
+        memoryPeak = std::max(memoryPeak, memoryAfter);
+        double durationMs = std::chrono::duration<double, std::milli>(end - start).count();
+        std::cout << "[ BENCH    ] " << label
+                  << " | " << durationMs << " ms"
+                  << " | memory delta " << memoryAfter - memoryBefore << " MB"
+                  << " | peak +" << memoryPeak - memoryBefore << " MB"
+                  << " (resident " << memoryAfter << " MB)" << std::endl;
+        return durationMs;
+    }
+
+    /**
+     * @brief Time the previous and the current implementation of an operation one after the other and print the
+     * speedup of the current one
+     * 
+     * @param label the name of the benchmarked operation
+     * @param before the callable running the previous implementation
+     * @param after the callable running the current implementation
+     * @return double the speedup, the duration before divided by the duration after
+     */
+    template <typename FuncBefore, typename FuncAfter>
+    double MeasureBeforeAfter(const std::string &label, FuncBefore before, FuncAfter after)
+    {
+        double beforeMs = Measure(label + " (before)", before);
+        double afterMs = Measure(label + " (after)", after);
+        double speedup = afterMs > 0 ? beforeMs / afterMs : 0.0;
+        std::cout << "[ BENCH    ] " << label << " | before " << beforeMs << " ms | after " << afterMs
+                  << " ms | speedup x" << speedup << std::endl;
+        return speedup;
+    }
+
+    /**
+     * @brief Create a synthetic point cloud of noisy points sampled on the faces of a unit cube,
+     * with normals and colors
+     * 
+     * @param numPoints the number of points
+     * @param seed the seed of the random generator
+     * @return std::shared_ptr<diffCheck::geometry::DFPointCloud> the synthetic cloud
+     */
+    inline std::shared_ptr<diffCheck::geometry::DFPointCloud> CreateSyntheticCloud(int numPoints, unsigned int seed = 42)
+    {
+        std::mt19937 generator(seed);
+        std::uniform_real_distribution<double> uniform(0.0, 1.0);
+        std::normal_distribution<double> noise(0.0, 0.001);
+        std::uniform_int_distribution<int> faceDistribution(0, 5);
+
+        auto cloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        cloud->Points.resize(numPoints);
+        cloud->Normals.resize(numPoints);
+        cloud->Colors.resize(numPoints);
+        for (int i = 0; i < numPoints; i++)
+        {
+            int face = faceDistribution(generator);
+            int axis = face / 2;
+            double side = static_cast<double>(face % 2);
+            Eigen::Vector3d point(uniform(generator), uniform(generator), uniform(generator));
+            point[axis] = side + noise(generator);
+            Eigen::Vector3d normal = Eigen::Vector3d::Zero();
+            normal[axis] = side > 0 ? 1.0 : -1.0;
+            cloud->Points[i] = point;
+            cloud->Normals[i] = normal;
+            cloud->Colors[i] = Eigen::Vector3d(uniform(generator), uniform(generator), uniform(generator));
+        }
+        return cloud;
+    }
+} // namespace diffCheck::benchmark
@@ -0,0 +1,137 @@
+#include <gtest/gtest.h>
+#include "diffCheck.hh"
+#include "diffCheck/IOManager.hh"
+
+#include "DFBenchmarkUtils.hh"
+
+//-------------------------------------------------------------------------
+// fixtures
+//-------------------------------------------------------------------------
+
+/// @brief Number of points of the synthetic cloud, it matches a full-resolution scan of a beam
+constexpr int SYNTHETIC_CLOUD_SIZE = 10000000;
+
+class DFPointCloudBenchmarkFixture : public ::testing::Test {
+protected:
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> LoadBunny() {
+        auto cloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        cloud->LoadFromPLY(diffCheck::io::GetBunnyPlyPath());
+        return cloud;
+    }
+
+    /// @brief The element-wise copy to open3d done before the buffers were shared, kept as the reference of the benchmark
+    std::shared_ptr<open3d::geometry::PointCloud> LegacyCvt2O3DPointCloud(const diffCheck::geometry::DFPointCloud &cloud) {
+        auto O3DPointCloud = std::make_shared<open3d::geometry::PointCloud>();
+        for (auto &point : cloud.Points)
+            O3DPointCloud->points_.push_back(point);
+        for (auto &color : cloud.Colors)
+            O3DPointCloud->colors_.push_back(color);
+        for (auto &normal : cloud.Normals)
+            O3DPointCloud->normals_.push_back(normal);
+        return O3DPointCloud;
+    }
+
+    /// @brief The element-wise copy back from open3d done before the buffers were shared
+    void LegacyCvt2DFPointCloud(const open3d::geometry::PointCloud &O3DPointCloud, diffCheck::geometry::DFPointCloud &cloud) {
+        cloud.Points.clear();
+        cloud.Colors.clear();
+        cloud.Normals.clear();
+        for (auto &point : O3DPointCloud.points_)
+            cloud.Points.push_back(point);
+        for (auto &color : O3DPointCloud.colors_)
+            cloud.Colors.push_back(color);
+        for (auto &normal : O3DPointCloud.normals_)
+            cloud.Normals.push_back(normal);
+    }
+
+    /// @brief Benchmark the open3d-backed operations of the cloud, with the element-wise copies (before) and the shared buffers (after)
+    void RunStorageBenchmark(const std::string &name, std::shared_ptr<diffCheck::geometry::DFPointCloud> reference) {
+        std::cout << "[ BENCH    ] " << name << " with " << reference->GetNumPoints() << " points" << std::endl;
+
+        // each operation runs on two fresh copies of the reference, one per implementation
+        std::shared_ptr<diffCheck::geometry::DFPointCloud> before;
+        std::shared_ptr<diffCheck::geometry::DFPointCloud> after;
+        auto resetCopies = [&]() {
+            before = std::make_shared<diffCheck::geometry::DFPointCloud>(*reference);
+            after = std::make_shared<diffCheck::geometry::DFPointCloud>(*reference);
+        };
+
+        resetCopies();
+        diffCheck::benchmark::MeasureBeforeAfter(name + " round-trip to open3d",
+            [&]() { LegacyCvt2DFPointCloud(*LegacyCvt2O3DPointCloud(*before), *before); },
+            [&]() {
+                auto O3DPointCloud = after->MoveToO3DPointCloud();
+                after->MoveFromO3DPointCloud(*O3DPointCloud);
+            });
+        EXPECT_EQ(after->GetNumPoints(), before->GetNumPoints());
+
+        resetCopies();
+        diffCheck::benchmark::MeasureBeforeAfter(name + " VoxelDownsample",
+            [&]() { LegacyCvt2DFPointCloud(*LegacyCvt2O3DPointCloud(*before)->VoxelDownSample(0.01), *before); },
+            [&]() { after->VoxelDownsample(0.01); });
+        EXPECT_EQ(after->GetNumPoints(), before->GetNumPoints());
+
+        resetCopies();
+        diffCheck::benchmark::MeasureBeforeAfter(name + " RemoveStatisticalOutliers",
+            [&]() { LegacyCvt2DFPointCloud(*std::get<0>(LegacyCvt2O3DPointCloud(*before)->RemoveStatisticalOutliers(20, 2.0)), *before); },
+            [&]() { after->RemoveStatisticalOutliers(20, 2.0); });
+        EXPECT_NEAR(after->GetNumPoints(), before->GetNumPoints(), 0.001 * reference->GetNumPoints());
+
+        resetCopies();
+        Eigen::Matrix4d matrix = Eigen::Matrix4d::Identity();
+        matrix.block<3, 1>(0, 3) = Eigen::Vector3d(0.1, 0.2, 0.3);
+        diffCheck::benchmark::MeasureBeforeAfter(name + " ApplyTransformation",
+            [&]() {
+                auto O3DPointCloud = LegacyCvt2O3DPointCloud(*before);
+                O3DPointCloud->Transform(matrix);
+                LegacyCvt2DFPointCloud(*O3DPointCloud, *before);
+            },
+            [&]() { after->ApplyTransformation(diffCheck::transformation::DFTransformation(matrix)); });
+        EXPECT_EQ(after->GetNumPoints(), before->GetNumPoints());
+
+        resetCopies();
+        diffCheck::benchmark::MeasureBeforeAfter(name + " EstimateNormals",
+            [&]() {
+                auto O3DPointCloud = LegacyCvt2O3DPointCloud(*before);
+                O3DPointCloud->EstimateNormals(open3d::geometry::KDTreeSearchParamKNN(30));
+                LegacyCvt2DFPointCloud(*O3DPointCloud, *before);
+            },
+            [&]() { after->EstimateNormals(false, 30); });
+        EXPECT_EQ(after->GetNumNormals(), reference->GetNumPoints());
+    }
+};
+
+//-------------------------------------------------------------------------
+// storage
+//-------------------------------------------------------------------------
+
+TEST_F(DFPointCloudBenchmarkFixture, StorageBunny) {
+    RunStorageBenchmark("bunny", LoadBunny());
+}
+
+TEST_F(DFPointCloudBenchmarkFixture, StorageSynthetic10M) {
+    RunStorageBenchmark("synthetic", diffCheck::benchmark::CreateSyntheticCloud(SYNTHETIC_CLOUD_SIZE));
+}
+
+//-------------------------------------------------------------------------
+// converters
+//-------------------------------------------------------------------------
+
+TEST_F(DFPointCloudBenchmarkFixture, CilantroConversionScaling) {
+    // the time per point should stay constant if the conversion is linear
+    for (int numPoints : {10000, 100000, 1000000, SYNTHETIC_CLOUD_SIZE})
+    {
+        auto cloud = diffCheck::benchmark::CreateSyntheticCloud(numPoints);
+        std::shared_ptr<cilantro::PointCloud3f> cilantroPointCloud;
+        double toCilantroMs = diffCheck::benchmark::Measure(
+            "Cvt2CilantroPointCloud " + std::to_string(numPoints) + " points",
+            [&]() { cilantroPointCloud = cloud->Cvt2CilantroPointCloud(); });
+        double toDFMs = diffCheck::benchmark::Measure(
+            "Cvt2DFPointCloud(cilantro) " + std::to_string(numPoints) + " points",
+            [&]() { cloud->Cvt2DFPointCloud(cilantroPointCloud); });
+        std::cout << "[ BENCH    ] " << numPoints << " points | "
+                  << 1e6 * toCilantroMs / numPoints << " ns/point to cilantro | "
+                  << 1e6 * toDFMs / numPoints << " ns/point to df" << std::endl;
+        EXPECT_EQ(cloud->GetNumPoints(), numPoints);
+    }
+}
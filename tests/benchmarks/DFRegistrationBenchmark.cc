@@ -0,0 +1,75 @@
+#include <gtest/gtest.h>
+#include "diffCheck.hh"
+#include "diffCheck/IOManager.hh"
+
+#include "DFBenchmarkUtils.hh"
+
+//-------------------------------------------------------------------------
+// fixtures
+//-------------------------------------------------------------------------
+
+class DFRegistrationBenchmarkFixture : public ::testing::Test {
+protected:
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> LoadCloud(const std::string &path) {
+        auto cloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        cloud->LoadFromPLY(path);
+        return cloud;
+    }
+
+    /// @brief A rotation of 10 degrees around z and a translation of 2% of the size of the cloud
+    Eigen::Matrix4d CreateMisalignment(double diagonal) {
+        Eigen::Matrix4d matrix = Eigen::Matrix4d::Identity();
+        matrix.block<3, 3>(0, 0) = Eigen::AngleAxisd(10.0 * EIGEN_PI / 180.0, Eigen::Vector3d::UnitZ()).toRotationMatrix();
+        matrix.block<3, 1>(0, 3) = Eigen::Vector3d(0.02, 0.01, 0.0) * diagonal;
+        return matrix;
+    }
+
+    /// @brief Compare the registration of a cloud on its misaligned copy, on all the points and on voxels of 1% of its size
+    void RunVoxelisationBenchmark(const std::string &name, std::shared_ptr<diffCheck::geometry::DFPointCloud> target) {
+        std::vector<Eigen::Vector3d> boundingBox = target->GetAxixAlignedBoundingBox();
+        double diagonal = (boundingBox[1] - boundingBox[0]).norm();
+        double voxelSize = 0.01 * diagonal;
+
+        // the source is moved back on the target by the registration, so the expected transformation is the misalignment
+        Eigen::Matrix4d misalignment = CreateMisalignment(diagonal);
+        auto source = std::make_shared<diffCheck::geometry::DFPointCloud>(*target);
+        source->ApplyTransformation(diffCheck::transformation::DFTransformation(misalignment.inverse()));
+        std::cout << "[ BENCH    ] " << name << " with " << target->GetNumPoints() << " points, voxels of " << voxelSize << std::endl;
+
+        for (bool voxelise : {false, true})
+        {
+            std::string label = name + (voxelise ? " voxelised" : " full-res");
+            diffCheck::registrations::DFRegistrationResult result;
+            diffCheck::benchmark::Measure(label + " O3DRansacOnFeatureMatching", [&]() {
+                result = diffCheck::registrations::DFGlobalRegistrations::O3DRansacOnFeatureMatching(
+                    source, target, voxelise, voxelSize, 5 * voxelSize, 50, 1.5 * voxelSize); });
+
+            Eigen::Matrix4d error = misalignment.inverse() * result.Transformation.TransformationMatrix;
+            double rotationErrorDegrees = Eigen::AngleAxisd(error.block<3, 3>(0, 0)).angle() * 180.0 / EIGEN_PI;
+            double translationError = error.block<3, 1>(0, 3).norm() / diagonal;
+            std::cout << "[ BENCH    ] " << label
+                      << " | preprocessing " << result.Timings["preprocessing"] << " s"
+                      << " | features " << result.Timings["features"] << " s"
+                      << " | registration " << result.Timings["registration"] << " s"
+                      << " | fitness " << result.Fitness
+                      << " | rotation error " << rotationErrorDegrees << " deg"
+                      << " | translation error " << 100 * translationError << " % of the size" << std::endl;
+        }
+
+        // the features of the voxelised cloud are computed on fewer points
+        auto features = diffCheck::registrations::DFGlobalRegistrations::ComputeRegistrationFeatures(target, voxelSize, 5 * voxelSize);
+        EXPECT_LT(features->GetNumPoints(), target->GetNumPoints());
+    }
+};
+
+//-------------------------------------------------------------------------
+// voxelisation
+//-------------------------------------------------------------------------
+
+TEST_F(DFRegistrationBenchmarkFixture, VoxelisationBunny) {
+    RunVoxelisationBenchmark("bunny", LoadCloud(diffCheck::io::GetBunnyPlyPath()));
+}
+
+TEST_F(DFRegistrationBenchmarkFixture, VoxelisationRoof) {
+    RunVoxelisationBenchmark("roof", LoadCloud(diffCheck::io::GetRoofQuarterPlyPath()));
+}
@@ -0,0 +1,148 @@
+#include <gtest/gtest.h>
+#include "diffCheck.hh"
+
+#include <algorithm>
+
+#include "DFBenchmarkUtils.hh"
+
+//-------------------------------------------------------------------------
+// fixtures
+//-------------------------------------------------------------------------
+
+/// @brief Number of points of the largest benchmarked cluster
+constexpr int LARGE_CLUSTER_SIZE = 1000000;
+/// @brief Number of points of the largest cluster associated with the quadratic value lookup of before
+constexpr int LEGACY_CLUSTER_SIZE = 100000;
+
+class DFSegmentationBenchmarkFixture : public ::testing::Test {
+protected:
+    /// @brief A unit square face on the XY plane
+    std::shared_ptr<diffCheck::geometry::DFMesh> CreateSquareFace() {
+        return std::make_shared<diffCheck::geometry::DFMesh>(
+            std::vector<Eigen::Vector3d>{
+                Eigen::Vector3d(0, 0, 0), Eigen::Vector3d(1, 0, 0),
+                Eigen::Vector3d(1, 1, 0), Eigen::Vector3d(0, 1, 0)},
+            std::vector<Eigen::Vector3i>{Eigen::Vector3i(0, 1, 2), Eigen::Vector3i(0, 2, 3)},
+            std::vector<Eigen::Vector3d>(),
+            std::vector<Eigen::Vector3d>(),
+            std::vector<Eigen::Vector3d>());
+    }
+
+    /**
+     * @brief The association of a cluster to a face before the membership masks: the attributes are looked up by
+     * value and the points are removed one by one. It is quadratic in the size of the cluster.
+     */
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> LegacyAssociatePointsToFace(
+        diffCheck::geometry::DFMesh &face,
+        diffCheck::geometry::DFPointCloud &cluster,
+        double associationThreshold) {
+        auto facePoints = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        for (Eigen::Vector3d point : cluster.Points)
+        {
+            if (!face.IsPointOnFace(point, associationThreshold))
+                continue;
+            auto index = std::distance(cluster.Points.begin(), std::find(cluster.Points.begin(), cluster.Points.end(), point));
+            facePoints->Points.push_back(point);
+            facePoints->Normals.push_back(cluster.Normals[index]);
+            facePoints->Colors.push_back(cluster.Colors[index]);
+        }
+        for (Eigen::Vector3d point : facePoints->Points)
+            cluster.Points.erase(std::remove(cluster.Points.begin(), cluster.Points.end(), point), cluster.Points.end());
+        return facePoints;
+    }
+
+    /// @brief A noisy planar cluster, one fourth of its points lie outside of the unit square face
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> CreatePlanarCluster(int numPoints, unsigned int seed = 42) {
+        std::mt19937 generator(seed);
+        std::uniform_real_distribution<double> uniformX(0.0, 1.25);
+        std::uniform_real_distribution<double> uniformY(0.0, 1.0);
+        std::normal_distribution<double> noise(0.0, 0.001);
+
+        auto cluster = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        cluster->Points.resize(numPoints);
+        cluster->Normals.assign(numPoints, Eigen::Vector3d(0, 0, 1));
+        cluster->Colors.resize(numPoints);
+        for (int i = 0; i < numPoints; i++)
+        {
+            cluster->Points[i] = Eigen::Vector3d(uniformX(generator), uniformY(generator), noise(generator));
+            cluster->Colors[i] = Eigen::Vector3d(uniformY(generator), uniformY(generator), uniformY(generator));
+        }
+        return cluster;
+    }
+};
+
+//-------------------------------------------------------------------------
+// association
+//-------------------------------------------------------------------------
+
+TEST_F(DFSegmentationBenchmarkFixture, AssociationScaling) {
+    // the time per point should stay constant if the association is linear
+    for (int numPoints : {10000, 100000, LARGE_CLUSTER_SIZE})
+    {
+        auto face = CreateSquareFace();
+
+        // the quadratic value lookup of before is only run up to LEGACY_CLUSTER_SIZE points
+        double legacyMs = 0.0;
+        std::shared_ptr<diffCheck::geometry::DFPointCloud> legacyFacePoints;
+        auto legacyCluster = CreatePlanarCluster(numPoints);
+        if (numPoints <= LEGACY_CLUSTER_SIZE)
+            legacyMs = diffCheck::benchmark::Measure(
+                "AssociateClustersToMeshes " + std::to_string(numPoints) + " points (before)",
+                [&]() { legacyFacePoints = LegacyAssociatePointsToFace(*face, *legacyCluster, 0.1); });
+
+        std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> clusters = {CreatePlanarCluster(numPoints)};
+        std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> faceSegments;
+        double associateMs = diffCheck::benchmark::Measure(
+            "AssociateClustersToMeshes " + std::to_string(numPoints) + " points (after)",
+            [&]() { faceSegments = diffCheck::segmentation::DFSegmentation::AssociateClustersToMeshes(
+                false, {face}, clusters, 0.1, 0.1); });
+        ASSERT_EQ(faceSegments.size(), 1);
+        EXPECT_GT(faceSegments[0]->GetNumPoints(), 0);
+        EXPECT_EQ(faceSegments[0]->GetNumPoints() + clusters[0]->GetNumPoints(), numPoints);
+        if (legacyFacePoints != nullptr)
+        {
+            EXPECT_EQ(faceSegments[0]->Points, legacyFacePoints->Points);
+            EXPECT_EQ(clusters[0]->Points, legacyCluster->Points);
+        }
+
+        std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> unassociatedClusters = {CreatePlanarCluster(numPoints)};
+        std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> existingSegments = {
+            std::make_shared<diffCheck::geometry::DFPointCloud>()};
+        double cleanMs = diffCheck::benchmark::Measure(
+            "CleanUnassociatedClusters " + std::to_string(numPoints) + " points",
+            [&]() { diffCheck::segmentation::DFSegmentation::CleanUnassociatedClusters(
+                false, unassociatedClusters, existingSegments, {{face}}, 0.1, 0.1); });
+        EXPECT_EQ(existingSegments[0]->GetNumPoints() + unassociatedClusters[0]->GetNumPoints(), numPoints);
+
+        std::cout << "[ BENCH    ] " << numPoints << " points | "
+                  << (legacyMs > 0 ? std::to_string(1e6 * legacyMs / numPoints) : std::string("-")) << " ns/point association before | "
+                  << 1e6 * associateMs / numPoints << " ns/point association after | "
+                  << 1e6 * cleanMs / numPoints << " ns/point cleaning" << std::endl;
+    }
+}
+
+//-------------------------------------------------------------------------
+// region growing
+//-------------------------------------------------------------------------
+
+TEST_F(DFSegmentationBenchmarkFixture, TiledRegionGrowing) {
+    // the tiled segmentation should find the same largest segment while only holding the graph of a tile at a time
+    auto cluster = CreatePlanarCluster(LARGE_CLUSTER_SIZE);
+
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> segments;
+    diffCheck::benchmark::Measure("NormalBasedSegmentation " + std::to_string(LARGE_CLUSTER_SIZE) + " points",
+        [&]() { segments = diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation(cluster, 20.f, 10, true, 10); });
+    ASSERT_FALSE(segments.empty());
+
+    for (double tileSize : {0.5, 0.25, 0.125})
+    {
+        std::vector<int> labels;
+        diffCheck::benchmark::Measure("TiledNormalBasedSegmentation tiles of " + std::to_string(tileSize),
+            [&]() { labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+                cluster, tileSize, 20.f, 10, true, 10); });
+        int largestSegmentSize = static_cast<int>(std::count(labels.begin(), labels.end(), 0));
+        EXPECT_GT(largestSegmentSize, 0);
+        std::cout << "[ BENCH    ] tiles of " << tileSize << " | largest segment " << largestSegmentSize
+                  << " points, " << segments[0]->GetNumPoints() << " without tiles" << std::endl;
+    }
+}
@@ -0,0 +1,69 @@
+"""
+    Round-trip benchmark of a DFMesh through numpy arrays. It is run manually with the built
+    bindings next to this file or on the python path:
+
+        python pybind_mesh_benchmark.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+extra_dll_dir = os.path.join(os.path.dirname(__file__), "./")
+if hasattr(os, "add_dll_directory"):
+    os.add_dll_directory(extra_dll_dir)  # For finding DLL dependencies on Windows
+sys.path.append(extra_dll_dir)
+import diffcheck_bindings as dfb  # noqa: E402
+
+
+def create_grid_mesh_arrays(num_triangles):
+    """
+        Create the arrays of a planar grid mesh with at least the given number of triangles.
+
+        :param num_triangles: the minimal number of triangles
+
+        :return vertices, faces, normals, colors: the (V,3) and (F,3) arrays of the mesh
+    """
+    side = int(np.ceil(np.sqrt(num_triangles / 2)))
+    xs, ys = np.meshgrid(np.arange(side + 1, dtype=np.float64), np.arange(side + 1, dtype=np.float64))
+    vertices = np.stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)), axis=1)
+    normals = np.tile([0.0, 0.0, 1.0], (len(vertices), 1))
+    colors = np.random.default_rng(42).uniform(0, 255, (len(vertices), 3))
+
+    rows, cols = np.meshgrid(np.arange(side), np.arange(side), indexing="ij")
+    v00 = (rows * (side + 1) + cols).ravel()
+    v01 = v00 + 1
+    v10 = v00 + side + 1
+    v11 = v10 + 1
+    faces = np.concatenate((np.stack((v00, v01, v11), axis=1), np.stack((v00, v11, v10), axis=1))).astype(np.int32)
+    return vertices, faces, normals, colors
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"[ BENCH    ] {label} | {1000 * (time.perf_counter() - start):.1f} ms")
+    return result
+
+
+def benchmark_mesh_roundtrip(num_triangles=1000000):
+    vertices, faces, normals, colors = create_grid_mesh_arrays(num_triangles)
+    print(f"[ BENCH    ] grid mesh of {len(vertices)} vertices and {len(faces)} triangles")
+
+    mesh = measure("DFMesh.from_numpy", lambda: dfb.dfb_geometry.DFMesh.from_numpy(vertices, faces, normals, colors))
+    roundtrip = measure("DFMesh views to numpy copies", lambda: (
+        np.array(mesh.get_vertices_view()),
+        np.array(mesh.get_faces_view()),
+        np.array(mesh.get_normals_vertex_view()),
+        np.array(mesh.get_colors_vertex_view())))
+    for original, copied in zip((vertices, faces, normals, colors), roundtrip):
+        assert np.array_equal(original, copied), "The mesh arrays should round-trip without change"
+
+    # reference of the per-element conversion through python lists
+    measure("DFMesh list properties", lambda: (mesh.vertices, mesh.faces))
+
+
+if __name__ == "__main__":
+    benchmark_mesh_roundtrip()
@@ -1,6 +1,10 @@
 import pytest
 import os
 import sys
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 
 # Import the C++ bindings
@@ -199,6 +203,15 @@ def test_DFPointCloud_compute_normals(create_DFPointCloudSampleRoof):
     pc.estimate_normals()
     assert pc.normals.__len__() == 7379, "DFPointCloud should have 7379 normals"
 
+def test_DFPointCloud_compute_normals_threads():
+    xs, ys = np.meshgrid(np.arange(20, dtype=np.float64), np.arange(20, dtype=np.float64))
+    pc = dfb.dfb_geometry.DFPointCloud.from_numpy(np.stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)), axis=1))
+    pc.estimate_normals(knn=8, num_threads=2)
+    assert np.allclose(np.abs(pc.get_normals_view()[:, 2]), 1.0), "The normals of a flat grid should be vertical"
+    assert np.allclose(pc.compute_curvatures(knn=8, num_threads=2), 0.0), "A flat grid should have no curvature"
+    pc.orient_normals_consistently(knn=8)
+    assert np.allclose(pc.get_normals_view()[:, 2], 1.0), "The normals should all be oriented upwards"
+
 def test_DFPointCloud_get_tight_bounding_box(create_DFPointCloudSampleRoof):
     pc = create_DFPointCloudSampleRoof
     obb = pc.get_tight_bounding_box()
@@ -226,6 +239,179 @@ def test_DFPointCloud_compute_distance():
 
     assert distance == 1. , "The distance between the two points should be 1."
 
+def test_DFPointCloud_from_numpy():
+    points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float64)
+    normals = np.array([[0, 0, 1], [0, 0, 1], [0, 0, 1]], dtype=np.float64)
+
+    pc = dfb.dfb_geometry.DFPointCloud.from_numpy(points, normals=normals)
+    assert pc.get_num_points() == 3, "DFPointCloud should have 3 points"
+    assert pc.get_num_normals() == 3, "DFPointCloud should have 3 normals"
+    assert not pc.has_colors(), "DFPointCloud should have no colors"
+    assert np.array_equal(pc.get_points_view(), points), "The points should be copied as they are"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFPointCloud.from_numpy(np.zeros((3, 2)))
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFPointCloud.from_numpy(points, colors=np.zeros((2, 3)))
+
+def test_DFPointCloud_flat_buffer():
+    points = np.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=np.float32)
+    colors = np.array([1, 0, 0, 0, 1, 0, 0, 0, 1], dtype=np.float64)
+
+    pc = dfb.dfb_geometry.DFPointCloud.from_flat_buffer(points, colors=colors)
+    assert pc.get_num_points() == 3, "DFPointCloud should have 3 points"
+    assert pc.get_num_colors() == 3, "DFPointCloud should have 3 colors"
+    assert not pc.has_normals(), "DFPointCloud should have no normals"
+    assert np.array_equal(pc.get_points_view(), points.reshape(-1, 3)), "The float32 points should be widened as they are"
+
+    flat_points = pc.to_flat_buffer()
+    assert flat_points.dtype == np.float64 and flat_points.shape == (9,), "The default buffer should be a flat float64 array"
+    assert np.array_equal(flat_points, points), "The points should round-trip through the flat buffer"
+    flat_colors = pc.to_flat_buffer("colors", np.float32)
+    assert flat_colors.dtype == np.float32, "The buffer should follow the requested dtype"
+    assert np.array_equal(flat_colors, colors), "The colors should round-trip through the flat buffer"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFPointCloud.from_flat_buffer(np.zeros(4))
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFPointCloud.from_flat_buffer(points, normals=np.zeros(6))
+    with pytest.raises(ValueError):
+        pc.to_flat_buffer("points", np.int32)
+
+def test_DFPointCloud_save_to_PLY(tmp_path, create_DFPointCloudSampleRoof):
+    pc = create_DFPointCloudSampleRoof
+    ply_path = tmp_path / "roof_distances.ply"
+    distances = np.linspace(0, 1, pc.get_num_points())
+    clusters = np.arange(pc.get_num_points()) % 5
+    pc.save_to_PLY(str(ply_path), {"distance": distances, "cluster": clusters})
+
+    with open(ply_path, "rb") as f:
+        header = f.read(512).split(b"end_header")[0].decode()
+    assert "format binary_little_endian 1.0" in header, "The PLY file should be binary little-endian"
+    assert "property float distance" in header, "The distances should be written as float"
+    assert "property int cluster" in header, "The cluster ids should be written as int"
+
+    pc_saved = dfb.dfb_geometry.DFPointCloud()
+    pc_saved.load_from_PLY(str(ply_path))
+    assert np.allclose(pc_saved.get_points_view(), pc.get_points_view(), atol=1e-5), "The points should be written as float"
+
+    with pytest.raises(ValueError):
+        pc.save_to_PLY(str(ply_path), {"distance": distances[:10]})
+
+def test_DFMesh_save_to_PLY(tmp_path, create_DFMeshCube):
+    mesh = create_DFMeshCube
+    ply_path = tmp_path / "cube.ply"
+    mesh.save_to_PLY(str(ply_path), is_double_precision=True)
+
+    mesh_saved = dfb.dfb_geometry.DFMesh()
+    mesh_saved.load_from_PLY(str(ply_path))
+    assert np.array_equal(mesh_saved.get_vertices_view(), mesh.get_vertices_view()), "The vertices should round-trip in double precision"
+    assert np.array_equal(mesh_saved.get_faces_view(), mesh.get_faces_view()), "The faces should round-trip"
+
+def test_DFPointCloud_cache(tmp_path):
+    source_path = tmp_path / "roof_quarter.ply"
+    shutil.copyfile(get_ply_cloud_roof_quarter_path(), source_path)
+
+    pc = dfb.dfb_geometry.DFPointCloud()
+    assert not pc.load_from_PLY_cached(str(source_path)), "The first load should parse the PLY file"
+    assert (tmp_path / "roof_quarter.dfcache").exists(), "The cache should be written next to the PLY file"
+    pc_cached = dfb.dfb_geometry.DFPointCloud()
+    assert pc_cached.load_from_PLY_cached(str(source_path)), "The second load should read the cache"
+    assert np.array_equal(pc_cached.get_points_view(), pc.get_points_view()), "The cache should keep the points as they are"
+    assert np.array_equal(pc_cached.get_colors_view(), pc.get_colors_view()), "The cache should keep the colors as they are"
+
+    with open(source_path, "a") as f:
+        f.write("\n")
+    assert not pc_cached.load_cache(str(tmp_path / "roof_quarter.dfcache"), str(source_path)), "The cache should be out of date"
+
+def test_DFPointCloudStreamReader(tmp_path):
+    points = np.random.default_rng(42).uniform(0, 1, (1000, 3))
+    ply_path = tmp_path / "stream.ply"
+    with open(ply_path, "wb") as f:
+        f.write(b"ply\nformat binary_little_endian 1.0\nelement vertex 1000\n")
+        f.write(b"property double x\nproperty double y\nproperty double z\nend_header\n")
+        f.write(points.astype("<f8").tobytes())
+
+    reader = dfb.dfb_geometry.DFPointCloudStreamReader(str(ply_path), chunk_size=300)
+    assert reader.get_num_points() == 1000, "The reader should find 1000 vertices in the header"
+    chunks = [chunk.get_points_view().copy() for chunk in reader]
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100], "The chunks should have the requested size"
+    assert np.array_equal(np.concatenate(chunks), points), "The chunks should contain all the points in order"
+
+    reader.reset()
+    reader.set_crop_box([0, 0, 0], [0.5, 1, 1])
+    cropped = reader.read_all()
+    assert cropped.get_num_points() == np.count_nonzero(points[:, 0] <= 0.5), "Only the points in the box should be kept"
+
+def test_DFPointCloud_numpy_views(create_DFPointCloudSampleRoof):
+    pc = create_DFPointCloudSampleRoof
+    points_view = pc.get_points_view()
+    assert points_view.shape == (7379, 3), "The points view should be of shape (7379, 3)"
+    assert points_view.dtype == np.float64, "The points view should be float64"
+    assert not points_view.flags.writeable, "The default view should be read-only"
+    assert pc.get_normals_view().shape == (7379, 3), "The normals view should be of shape (7379, 3)"
+    assert pc.get_colors_view().shape == (7379, 3), "The colors view should be of shape (7379, 3)"
+
+    points_view_w = pc.get_points_view(writeable=True)
+    points_view_w[0] = [1.0, 2.0, 3.0]
+    assert tuple(pc.points[0]) == (1.0, 2.0, 3.0), "Writing in the view should modify the cloud without copy"
+    assert tuple(points_view[0]) == (1.0, 2.0, 3.0), "All the views share the same memory"
+
+def test_DFPointCloud_spatial_index():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0]])
+    pc = dfb.dfb_geometry.DFPointCloud.from_numpy(points)
+    assert not pc.has_index(), "The index should be built lazily"
+
+    indices, distances = pc.query_nearest(np.array([[0.9, 0.0, 0.0], [0.0, 0.0, 2.5]]))
+    assert pc.has_index(), "The index should be kept after a query"
+    assert indices.tolist() == [1, 3], "The nearest points should be the second and the last ones"
+    assert np.allclose(distances, [0.1, 0.5]), "The distances should not be squared"
+
+    indices, distances = pc.query_knn(np.array([[0.0, 0.0, 0.0]]), 6)
+    assert indices.shape == (1, 6) and distances.shape == (1, 6), "The knn arrays should be of shape (M, knn)"
+    assert indices[0].tolist() == [0, 1, 2, 3, -1, -1], "The missing neighbors should have an index of -1"
+    assert np.isinf(distances[0, 4:]).all(), "The missing neighbors should have an infinite distance"
+
+    indices, distances, offsets = pc.query_radius(np.array([[0.0, 0.0, 0.0], [5.0, 5.0, 5.0]]), 1.5)
+    assert offsets.tolist() == [0, 2, 2], "The first query should have two neighbors and the second none"
+    assert sorted(indices[offsets[0]:offsets[1]].tolist()) == [0, 1], "The neighbors should be the first two points"
+
+    pc.apply_transformation(dfb.dfb_transformation.DFTransformation(np.array([[1, 0, 0, 10], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float)))
+    assert not pc.has_index(), "The index should be invalidated when the points change"
+    indices, distances = pc.query_nearest(np.array([[10.9, 0.0, 0.0]]))
+    assert indices.tolist() == [1] and np.allclose(distances, [0.1]), "The index should be rebuilt on the moved points"
+
+    points_view = pc.get_points_view(writeable=True)
+    points_view[1] = [20.0, 0.0, 0.0]
+    assert not pc.has_index(), "The index should be out of date after an edit through a view"
+    indices, distances = pc.query_nearest(np.array([[20.1, 0.0, 0.0]]))
+    assert indices.tolist() == [1] and np.allclose(distances, [0.1]), "The index should be rebuilt on the edited points"
+
+def test_DFPointCloud_mesh_vertices_distance_matches_legacy(create_DFPointCloudSampleRoof):
+    # rh_mesh_2_df_cloud_distance copies the float32 vertices and normals of the rhino mesh, queries the nearest
+    # target points and signs the distances with numpy: it must match the former compute_distance and per-vertex loop
+    target = create_DFPointCloudSampleRoof
+    rng = np.random.default_rng(3)
+    target_points = target.get_points_view()
+    vertices = (target_points[::10] + rng.normal(0, 0.01, (len(target_points[::10]), 3))).astype(np.float32)
+    normals = rng.normal(0, 1, vertices.shape).astype(np.float32)
+
+    closest_indices, distances = target.query_nearest(vertices)
+    directions = vertices - target_points[closest_indices]
+    signed_distances = np.where(np.einsum('ij,ij->i', directions, normals) < 0, -distances, distances)
+
+    legacy_cloud = dfb.dfb_geometry.DFPointCloud()
+    legacy_cloud.points = [[float(v[0]), float(v[1]), float(v[2])] for v in vertices]
+    legacy_distances = np.asarray(legacy_cloud.compute_distance(target))
+    legacy_signed_distances = legacy_distances.copy()
+    for idx, vertex in enumerate(vertices.astype(np.float64)):
+        closest_point = target_points[np.argmin(np.linalg.norm(target_points - vertex, axis=1))]
+        if np.dot(vertex - closest_point, normals[idx].astype(np.float64)) < 0:
+            legacy_signed_distances[idx] = -legacy_signed_distances[idx]
+
+    assert np.allclose(distances, legacy_distances), "The distances should match compute_distance"
+    assert np.allclose(signed_distances, legacy_signed_distances), "The signs should match the per-vertex loop"
+
 # mesh tests
 
 def test_DFMesh_init():
@@ -252,6 +438,51 @@ def test_DFMesh_properties():
     assert len(mesh.vertices[0]) == 3, "vertices should be a list of 3 coordinates"
     assert len(mesh.faces[0]) == 3, "faces should be a list of 3 indexes"
 
+def test_DFMesh_from_numpy():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float64)
+    faces = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+    colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 255]], dtype=np.float64)
+
+    mesh = dfb.dfb_geometry.DFMesh.from_numpy(vertices, faces, colors_vertex=colors)
+    assert mesh.get_num_vertices() == 4, "DFMesh should have 4 vertices"
+    assert mesh.get_num_faces() == 2, "DFMesh should have 2 faces"
+    assert mesh.get_faces_view().dtype == np.int32, "The faces view should be int32"
+    assert np.array_equal(mesh.get_vertices_view(), vertices), "The vertices should round-trip without change"
+    assert np.array_equal(mesh.get_faces_view(), faces), "The faces should round-trip without change"
+    assert np.array_equal(mesh.get_colors_vertex_view(), colors), "The colors should round-trip without change"
+    assert mesh.get_normals_vertex_view().shape == (0, 3), "DFMesh should have no vertex normals"
+
+    vertices_view = mesh.get_vertices_view(writeable=True)
+    vertices_view[:, 2] = 1.0
+    assert mesh.vertices[0][2] == 1.0, "Writing in the view should modify the mesh without copy"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFMesh.from_numpy(vertices, np.array([[0, 1, 4]], dtype=np.int32))
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFMesh.from_numpy(vertices, faces, normals_vertex=np.zeros((2, 3)))
+
+def test_DFMesh_apply_transformation():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float64)
+    faces = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+    normals = np.array([[1, 0, 0]] * 4, dtype=np.float64)
+    colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 255]], dtype=np.float64)
+    mesh = dfb.dfb_geometry.DFMesh.from_numpy(vertices, faces, normals_vertex=normals, colors_vertex=colors)
+
+    # 90 degree rotation around z and translation
+    rotation = dfb.dfb_transformation.DFTransformation(np.array([[0, -1, 0, 1], [1, 0, 0, 2], [0, 0, 1, 3], [0, 0, 0, 1]], dtype=float))
+    mesh.apply_transformation(rotation)
+    assert np.allclose(mesh.get_vertices_view()[1], [1, 3, 3]), "The vertices should be transformed"
+    assert np.allclose(mesh.get_normals_vertex_view(), [[0, 1, 0]] * 4), "The normals should be rotated and kept"
+    assert np.array_equal(mesh.get_colors_vertex_view(), colors), "The colors should be kept"
+    assert np.array_equal(mesh.get_faces_view(), faces), "The faces should be kept"
+
+    clouds = [dfb.dfb_geometry.DFPointCloud([[0, 0, 0]], [], [[1, 0, 0]]), dfb.dfb_geometry.DFPointCloud([[1, 0, 0]], [], [])]
+    dfb.dfb_geometry.DFPointCloud.apply_transformation_batch(clouds, [rotation])
+    assert np.allclose(clouds[0].points[0], [1, 2, 3]) and np.allclose(clouds[1].points[0], [1, 3, 3]), "The points of all the clouds should be transformed"
+    assert np.allclose(clouds[0].normals[0], [0, 1, 0]), "The normals of the clouds should be rotated"
+    with pytest.raises(ValueError):
+        dfb.dfb_geometry.DFMesh.apply_transformation_batch([mesh], [rotation, rotation])
+
 def test_DFMesh_compute_distance():
     vertices = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
     faces = [[0, 1, 2]]
@@ -263,6 +494,81 @@ def test_DFMesh_compute_distance():
     distance = mesh.compute_distance(pc)[0]
     assert distance == 1.0, "The distance between the point and the mesh should be 1.0"
 
+def test_DFMesh_compute_closest_points():
+    vertices = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    faces = [[0, 1, 2]]
+    mesh = dfb.dfb_geometry.DFMesh(vertices, faces, [], [], [])
+    points = np.array([[0.2, 0.2, 1.0], [0.2, 0.2, -0.5], [2.0, 0.0, 0.0]])
+    distances, closest_points, triangle_ids, normals = mesh.compute_closest_points(points, is_signed=True)
+    assert np.allclose(distances, [1.0, -0.5, 1.0]), "The point behind the triangle should have a negative distance"
+    assert np.allclose(closest_points, [[0.2, 0.2, 0.0], [0.2, 0.2, 0.0], [1.0, 0.0, 0.0]]), "The closest points should be on the triangle"
+    assert triangle_ids.tolist() == [0, 0, 0], "The closest triangle should be the only one"
+    assert np.allclose(np.abs(normals[:, 2]), 1.0), "The normals should be the triangle normal"
+
+    distances, _, _, _ = mesh.compute_closest_points(points)
+    assert np.allclose(distances, [1.0, 0.5, 1.0]), "The distances should be unsigned by default"
+
+    cloud = dfb.dfb_geometry.DFPointCloud.from_numpy(points)
+    results = dfb.dfb_geometry.DFMesh.compute_closest_points_batch([mesh, mesh], [cloud, cloud], True)
+    assert len(results) == 2, "There should be one result per mesh and cloud pair"
+    assert np.allclose(results[1][0], [1.0, -0.5, 1.0]), "The batch should give the same distances"
+
+def test_DFMesh_compute_closest_points_vertex_normals():
+    # the vertex normals, interpolated at the closest point as rhino Mesh.NormalAt does, sign the distances
+    vertices = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    faces = [[0, 1, 2]]
+    points = np.array([[0.2, 0.2, 1.0], [0.2, 0.2, -0.5]])
+    flipped_mesh = dfb.dfb_geometry.DFMesh(vertices, faces, [[0, 0, -1]] * 3, [], [])
+    distances, _, _, normals = flipped_mesh.compute_closest_points(points, is_signed=True)
+    assert np.allclose(distances, [-1.0, 0.5]), "The vertex normals should win over the winding of the face"
+    assert np.allclose(normals, [[0, 0, -1]] * 2), "The normals should be the interpolated vertex normals"
+
+    # near a vertex, the interpolated normal is dominated by the normal of that vertex
+    tilted_mesh = dfb.dfb_geometry.DFMesh(vertices, faces, [[0, 0, 1], [1, 0, 0], [0, 0, 1]], [], [])
+    point_near_v1 = np.array([[0.95, 0.01, 0.001]])
+    distances, closest_points, _, normals = tilted_mesh.compute_closest_points(point_near_v1, is_signed=True)
+    u, v = closest_points[0, 1], closest_points[0, 0]
+    expected_normal = (1 - u - v) * np.array([0, 0, 1]) + v * np.array([1, 0, 0]) + u * np.array([0, 0, 1])
+    assert np.allclose(normals[0], expected_normal / np.linalg.norm(expected_normal)), "The normal should be interpolated"
+
+    cloud = dfb.dfb_geometry.DFPointCloud.from_numpy(points)
+    results = dfb.dfb_geometry.DFMesh.compute_closest_points_batch([flipped_mesh, flipped_mesh], [cloud, cloud], True)
+    assert all(np.allclose(result[0], [-1.0, 0.5]) for result in results), "The batch should sign the same way"
+
+def test_DFMesh_are_points_on_face():
+    vertices = [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]]
+    faces = [[0, 1, 2], [0, 2, 3]]
+    mesh = dfb.dfb_geometry.DFMesh(vertices, faces, [], [], [])
+    points = np.array([[0.5, 0.5, 0.0], [0.2, 0.8, 0.01], [1.5, 0.5, 0.0], [0.5, 0.5, 0.5]])
+    mask = mesh.are_points_on_face(points, 0.1)
+    assert mask.dtype == np.bool_, "The mask should be a numpy boolean array"
+    assert mask.tolist() == [True, True, False, False], "Only the first two points are on the face"
+
+    # the cached triangle frames follow the changes of the geometry
+    mesh.vertices = [[v[0] + 1.0, v[1], v[2]] for v in vertices]
+    mask = mesh.are_points_on_face(points, 0.1)
+    assert mask.tolist() == [False, False, True, False], "Only the third point is on the moved face"
+
+def test_DFMeshDistanceQuery(create_DFMeshCube):
+    mesh = create_DFMeshCube
+    query = dfb.dfb_geometry.DFMeshDistanceQuery(mesh)
+    points = np.array([[50.0, 50.0, 50.0], [150.0, 50.0, 50.0]])
+    assert query.compute_occupancy(points).tolist() == [True, False], "Only the first point is inside the cube"
+    assert np.allclose(query.compute_distance(points), [50.0, 50.0]), "Both points should be 50 away from the cube"
+
+    distances, triangle_ids, normals = query.cast_rays(np.array([[50.0, 50.0, -50.0], [50.0, 50.0, -50.0]]),
+                                                       np.array([[0.0, 0.0, 1.0], [0.0, 0.0, -1.0]]))
+    assert np.isclose(distances[0], 50.0), "The first ray should hit the bottom of the cube"
+    assert np.isinf(distances[1]) and triangle_ids[1] == -1, "The second ray should miss the cube"
+    assert normals.shape == (2, 3), "The normals should be a (N,3) array"
+
+    # the query keeps its scene until it is updated, the mesh itself follows the changes of the geometry
+    mesh.vertices = [[v[0] + 200.0, v[1], v[2]] for v in mesh.vertices]
+    assert query.compute_occupancy(points).tolist() == [True, False], "The query should keep the scene it was built with"
+    assert np.allclose(mesh.compute_closest_points(points)[0], [150.0, 50.0]), "The mesh should rebuild its own scene"
+    query.update()
+    assert query.compute_occupancy(points).tolist() == [False, False], "No point is inside the moved cube"
+
 def test_DFMesh_sample_points(create_DFMeshCube):
     mesh = create_DFMeshCube
     pc = mesh.sample_points_uniformly(1000)
@@ -398,6 +704,187 @@ def test_DFRegistration_composite_bunny(create_two_DFPointCloudBunny):
     make_assertions(df_transformation_result_o3dgicp)
 
 
+def test_DFRegistration_concurrent_gil_release():
+    n_registrations = 4
+    pairs = []
+    for _ in range(n_registrations):
+        source = dfb.dfb_geometry.DFPointCloud()
+        target = dfb.dfb_geometry.DFPointCloud()
+        source.load_from_PLY(get_ply_cloud_bunny_path())
+        target.load_from_PLY(get_ply_cloud_bunny_path())
+        pairs.append((source, target))
+
+    def register(pair):
+        return dfb.dfb_registrations.DFRefinedRegistration.O3DICP(pair[0], pair[1], max_correspondence_distance=1.0, max_iteration=100)
+
+    serial_results = [register(pair) for pair in pairs]
+    with ThreadPoolExecutor(max_workers=n_registrations) as executor:
+        concurrent_results = list(executor.map(register, pairs))
+
+    assert len(concurrent_results) == n_registrations, "All the concurrent registrations should return a transformation"
+    for serial, concurrent in zip(serial_results, concurrent_results):
+        assert np.allclose(concurrent.transformation_matrix, serial.transformation_matrix), "Concurrent registrations should match the serial ones"
+        assert np.isclose(concurrent.fitness, serial.fitness), "Concurrent registrations should match the serial ones"
+        assert np.isclose(concurrent.inlier_rmse, serial.inlier_rmse), "Concurrent registrations should match the serial ones"
+
+def test_DFPointCloud_concurrent_reads(create_DFPointCloudSampleRoof):
+    # a cloud can be read by several threads at the same time, its KD-tree being built by the first of them
+    target = create_DFPointCloudSampleRoof
+    rng = np.random.default_rng(42)
+    sources = [dfb.dfb_geometry.DFPointCloud.from_numpy(target.get_points_view() + rng.normal(0, 0.01, (target.get_num_points(), 3))) for _ in range(4)]
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        concurrent_distances = list(executor.map(lambda source: np.asarray(source.compute_distance(target)), sources))
+    serial_distances = [np.asarray(source.compute_distance(target)) for source in sources]
+
+    for serial, concurrent in zip(serial_distances, concurrent_distances):
+        assert np.array_equal(concurrent, serial), "Concurrent reads of the same target should match the serial ones"
+
+def test_DFPointCloud_views_and_modifications(create_DFPointCloudSampleRoof):
+    pc = create_DFPointCloudSampleRoof
+    points_view = pc.get_points_view()
+    original_points = points_view.copy()
+
+    # a modification keeping the number of points keeps the views valid
+    t = dfb.dfb_transformation.DFTransformation()
+    t.transformation_matrix = [[1.0, 0.0, 0.0, 1.0],
+                               [0.0, 1.0, 0.0, 0.0],
+                               [0.0, 0.0, 1.0, 0.0],
+                               [0.0, 0.0, 0.0, 1.0]]
+    pc.apply_transformation(t)
+    assert np.allclose(points_view, original_points + [1.0, 0.0, 0.0]), "The view should see the points transformed in place"
+
+    # a modification changing the number of points needs a new view
+    pc.voxel_downsample(0.1)
+    assert pc.get_points_view().shape == (pc.get_num_points(), 3), "A new view should follow the new number of points"
+
+def test_DFRegistration_icp_batch(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    t = dfb.dfb_transformation.DFTransformation()
+    t.transformation_matrix = [[1.0, 0.0, 0.0, 0.01],
+                               [0.0, 1.0, 0.0, 0.0],
+                               [0.0, 0.0, 1.0, 0.0],
+                               [0.0, 0.0, 0.0, 1.0]]
+    bunny_2.apply_transformation(t)
+    empty = dfb.dfb_geometry.DFPointCloud()
+
+    parameters = [dfb.dfb_registrations.DFICPParameters(max_correspondence_distance=1.0, max_iteration=100),
+                  dfb.dfb_registrations.DFICPParameters(max_correspondence_distance=0.5),
+                  dfb.dfb_registrations.DFICPParameters()]
+    results = dfb.dfb_registrations.DFRefinedRegistration.O3DICPBatch([bunny_1, bunny_2, empty], [bunny_2, bunny_1, bunny_1], parameters)
+    assert len(results) == 3, "There should be one result per pair"
+    assert abs(results[0].transformation.transformation_matrix[0][3] - 0.01) < 0.005, "The first pair should be registered"
+    assert abs(results[1].transformation.transformation_matrix[0][3] + 0.01) < 0.005, "The second pair should be registered"
+    assert results[0].fitness > 0.9 and results[0].inlier_rmse < 0.01, "The fitness and RMSE should be returned"
+    assert results[2].fitness == 0.0, "The pair with an empty cloud should be skipped"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_registrations.DFRefinedRegistration.O3DICPBatch([bunny_1], [bunny_2, bunny_1], parameters[:1])
+
+def test_DFRegistrationResult(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+
+    result = dfb.dfb_registrations.DFRefinedRegistration.O3DICP(bunny_1, bunny_2, max_correspondence_distance=1.0)
+    assert result.fitness == 1.0 and result.inlier_rmse < 1e-9, "Identical clouds should be fully matched"
+    assert 1 <= result.num_iterations <= 30, "The ICP should report its number of iterations"
+    correspondences = result.correspondence_set
+    assert correspondences.shape == (bunny_1.get_num_points(), 2) and correspondences.dtype == np.int32, "The correspondences should be a (N,2) int array"
+    assert np.array_equal(correspondences[:, 0], correspondences[:, 1]), "Each point should match itself"
+    assert set(result.timings) == {"preprocessing", "registration"}, "The timings of the stages should be returned"
+
+    result = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacOnFeatureMatching(bunny_1, bunny_2)
+    assert result.num_iterations == -1, "The ransac does not report its number of iterations"
+    assert set(result.timings) == {"preprocessing", "features", "registration"}, "The timings of the stages should be returned"
+    assert np.array_equal(result.transformation_matrix, result.transformation.transformation_matrix), "The matrix should be reachable as for a DFTransformation"
+
+def test_DFFeatureCache(create_two_DFPointCloudBunny, tmp_path):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    cache = dfb.dfb_registrations.DFFeatureCache(capacity=1, directory=str(tmp_path))
+
+    first = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacOnFeatureMatching(bunny_1, bunny_2, feature_cache=cache)
+    assert cache.num_misses == 1 and cache.num_hits == 1, "Identical clouds should share their features"
+    assert cache.num_entries == 1, "The cache should keep one entry per cloud and parameters"
+
+    dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacOnFeatureMatching(bunny_1, bunny_2, radius_kd_tree_search=0.5, feature_cache=cache)
+    assert cache.num_misses == 2, "Other search parameters should compute the features again"
+    assert cache.num_entries == 1, "The least recently used features should be dropped beyond the capacity"
+
+    persisted_cache = dfb.dfb_registrations.DFFeatureCache(directory=str(tmp_path))
+    second = dfb.dfb_registrations.DFGlobalRegistrations.O3DFastGlobalRegistrationFeatureMatching(bunny_1, bunny_2, radius_kd_tree_search=1.0, feature_cache=persisted_cache)
+    assert persisted_cache.num_misses == 0 and persisted_cache.num_hits == 2, "The features should be reloaded from the directory"
+    assert first.fitness > 0.0 and second.fitness > 0.0, "The cached features should still register the clouds"
+
+def test_DFRegistration_voxelized_features(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    source_features = dfb.dfb_registrations.DFGlobalRegistrations.compute_registration_features(bunny_1, voxel_size=0.005, radius_kd_tree_search=0.025)
+    target_features = dfb.dfb_registrations.DFGlobalRegistrations.compute_registration_features(bunny_2, voxel_size=0.005, radius_kd_tree_search=0.025)
+    assert 0 < source_features.num_points < bunny_1.get_num_points(), "The features should be computed on the downsampled cloud"
+    assert set(source_features.timings) == {"preprocessing", "features"}, "The timings of the stages should be returned"
+
+    result = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacOnFeatures(source_features, target_features, max_correspondence_distance=0.01)
+    assert abs(result.transformation_matrix[0][3]) < 0.01, "Identical clouds should be registered in place"
+
+    result = dfb.dfb_registrations.DFGlobalRegistrations.O3DFastGlobalRegistrationFeatureMatching(bunny_1, bunny_2, voxelize=True, voxel_size=0.005, radius_kd_tree_search=0.025)
+    assert len(result.correspondence_set) <= source_features.num_points, "The voxelization should not be discarded"
+
+def test_DFRegistration_ransac_multi_start(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    source_features = dfb.dfb_registrations.DFGlobalRegistrations.compute_registration_features(bunny_1, voxel_size=0.005, radius_kd_tree_search=0.025)
+    target_features = dfb.dfb_registrations.DFGlobalRegistrations.compute_registration_features(bunny_2, voxel_size=0.005, radius_kd_tree_search=0.025)
+
+    seeds = [1, 2, 3, 4]
+    first = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacMultiStart(source_features, target_features, seeds=seeds, max_correspondence_distance=0.01)
+    second = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacMultiStart(source_features, target_features, seeds=seeds, max_correspondence_distance=0.01, num_threads=1)
+    assert np.array_equal(first.transformation_matrix, second.transformation_matrix), "The result should only depend on the seeds"
+    assert first.fitness == second.fitness and first.num_iterations == second.num_iterations, "The result should only depend on the seeds"
+    assert first.fitness > 0.9 and abs(first.transformation_matrix[0][3]) < 0.01, "Identical clouds should be registered in place"
+    assert len(first.correspondence_set) == round(first.fitness * source_features.num_points), "The correspondences of the best run should be returned"
+
+    unchecked = dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacMultiStart(source_features, target_features, seeds=seeds, max_correspondence_distance=0.01, similarity_threshold=0.0)
+    assert unchecked.fitness > 0.9, "The runs without edge length check should register identical clouds too"
+    with pytest.raises(ValueError):
+        dfb.dfb_registrations.DFGlobalRegistrations.O3DRansacMultiStart(source_features, target_features, seeds=seeds, similarity_threshold=1.5)
+
+def test_DFRegistration_evaluate_registrations(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    translation = np.eye(4)
+    translation[0, 3] = 0.01
+    far_translation = np.eye(4)
+    far_translation[0, 3] = 0.05
+    transforms = [translation, np.eye(4), far_translation]
+
+    assert not bunny_2.has_index(), "The target should not be indexed yet"
+    errors = dfb.dfb_registrations.DFGlobalRegistrations.evaluate_registrations(bunny_1, bunny_2, transforms)
+    assert bunny_2.has_index(), "The persistent index of the target should be used and kept"
+    assert len(errors) == 3, "There should be one error per transform"
+    assert errors[1] == 0.0 and 0.0 < errors[0] < errors[2], "The identity should match the identical cloud"
+    assert np.isclose(np.mean(bunny_1.compute_distance(bunny_2)), errors[1]), "The error should be the mean distance"
+
+    errors = dfb.dfb_registrations.DFGlobalRegistrations.evaluate_registrations(bunny_1, bunny_2, transforms, early_termination=True)
+    assert np.argmin(errors) == 1 and errors[1] == 0.0, "The early termination should keep the best transform"
+
+def test_DFRegistration_multi_scale_icp(create_two_DFPointCloudBunny):
+    bunny_1, bunny_2 = create_two_DFPointCloudBunny
+    t = dfb.dfb_transformation.DFTransformation()
+    t.transformation_matrix = [[1.0, 0.0, 0.0, 0.01],
+                               [0.0, 1.0, 0.0, 0.0],
+                               [0.0, 0.0, 1.0, 0.0],
+                               [0.0, 0.0, 0.0, 1.0]]
+    bunny_2.apply_transformation(t)
+
+    levels = [dfb.dfb_registrations.DFICPLevel(voxel_size=0.01, max_correspondence_distance=0.05),
+              dfb.dfb_registrations.DFICPLevel(voxel_size=0.0, max_correspondence_distance=0.02)]
+    result = dfb.dfb_registrations.DFRefinedRegistration.O3DMultiScaleICP(bunny_1, bunny_2, levels)
+    assert abs(result.transformation_matrix[0][3] - 0.01) < 0.005, "The pyramid should register the translation"
+    assert set(result.timings) == {"preprocessing", "level_0", "level_1"}, "Each level should be timed"
+    assert result.num_iterations >= 2, "The iterations of all the levels should be counted"
+
+    result = dfb.dfb_registrations.DFRefinedRegistration.O3DMultiScaleICP(bunny_1, bunny_2, initial_transformation=t)
+    assert abs(result.transformation_matrix[0][3] - 0.01) < 0.005, "The default levels should start from the initial transformation"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_registrations.DFRefinedRegistration.O3DMultiScaleICP(bunny_1, bunny_2, [dfb.dfb_registrations.DFICPLevel(voxel_size=-1.0)])
+
 #------------------------------------------------------------------------------
 # dfb_segmentation namespace
 #------------------------------------------------------------------------------
@@ -422,5 +909,63 @@ def test_DFPlaneSegmentation_connected_plans(create_DFPointCloudTwoConnectedPlan
 
     assert len(segments) == 2, "DFPlaneSegmentation should return 2 segments"
 
+def test_DFPlaneSegmentation_tiled():
+    # a floor and a wall meeting along y = 2, both spanning several tiles
+    xs, ys = np.meshgrid(np.arange(1, 40) * 0.05, np.arange(1, 40) * 0.05)
+    floor = np.stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)), axis=1)
+    xs, zs = np.meshgrid(np.arange(1, 40) * 0.05, np.arange(1, 20) * 0.05)
+    wall = np.stack((xs.ravel(), np.full(xs.size, 2.0), zs.ravel()), axis=1)
+    normals = np.concatenate((np.tile([0.0, 0.0, 1.0], (len(floor), 1)), np.tile([0.0, 1.0, 0.0], (len(wall), 1))))
+    pc = dfb.dfb_geometry.DFPointCloud.from_numpy(np.concatenate((floor, wall)), normals=normals)
+
+    labels = dfb.dfb_segmentation.DFSegmentation.segment_by_normal_tiled(pc,
+                                                                         tile_size=0.5,
+                                                                         normal_threshold_degree=5,
+                                                                         min_cluster_size=100,
+                                                                         use_knn_neighborhood=False,
+                                                                         radius_neighborhood_size=0.08,
+                                                                         num_threads=2)
+
+    assert labels.dtype == np.int32 and labels.shape == (pc.get_num_points(),), "There should be one int32 label per point"
+    assert np.all(labels[:len(floor)] == 0), "The floor should be stitched across the tiles in the largest cluster"
+    assert np.all(labels[len(floor):] == 1), "The wall should be stitched across the tiles in the second cluster"
+
+    with pytest.raises(ValueError):
+        dfb.dfb_segmentation.DFSegmentation.segment_by_normal_tiled(pc, tile_size=0.5, tile_overlap=0.5)
+
+def test_DFPlaneSegmentation_tiled_knn():
+    # the same floor and wall jittered in their planes, so that the k nearest neighbors are not tied, and stray points
+    # beyond the edge of the floor, appended last: they have floor points as nearest neighbors but not the other way round
+    rng = np.random.default_rng(42)
+    xs, ys = np.meshgrid(np.arange(1, 40) * 0.05, np.arange(1, 40) * 0.05)
+    floor = np.stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)), axis=1)
+    floor[:, :2] += rng.uniform(-0.01, 0.01, (len(floor), 2))
+    xs, zs = np.meshgrid(np.arange(1, 40) * 0.05, np.arange(1, 20) * 0.05)
+    wall = np.stack((xs.ravel(), np.full(xs.size, 2.0), zs.ravel()), axis=1)
+    wall[:, [0, 2]] += rng.uniform(-0.01, 0.01, (len(wall), 2))
+    strays = np.array([[2.3, 0.5, 0.0], [2.3, 1.0, 0.0], [2.3, 1.5, 0.0]])
+    normals = np.concatenate((np.tile([0.0, 0.0, 1.0], (len(floor), 1)),
+                              np.tile([0.0, 1.0, 0.0], (len(wall), 1)),
+                              np.tile([0.0, 0.0, 1.0], (len(strays), 1))))
+    pc = dfb.dfb_geometry.DFPointCloud.from_numpy(np.concatenate((floor, wall, strays)), normals=normals)
+
+    labels = dfb.dfb_segmentation.DFSegmentation.segment_by_normal_tiled(pc,
+                                                                         tile_size=0.5,
+                                                                         normal_threshold_degree=5,
+                                                                         min_cluster_size=100,
+                                                                         knn_neighborhood_size=10,
+                                                                         tile_overlap=0.4,
+                                                                         num_threads=2)
+    segments = dfb.dfb_segmentation.DFSegmentation.segment_by_normal(pc,
+                                                                     normal_threshold_degree=5,
+                                                                     min_cluster_size=100,
+                                                                     knn_neighborhood_size=10)
+
+    assert np.bincount(labels[labels >= 0]).tolist() == [segment.get_num_points() for segment in segments], \
+        "The tiled knn segmentation should find the same segments as the segmentation of the whole cloud"
+    assert np.all(labels[:len(floor)] == 0) and np.all(labels[len(floor):len(floor) + len(wall)] == 1), "The floor and the wall should be stitched across the tiles"
+    assert np.all(labels[len(floor) + len(wall):] == 0), "The strays should be linked to the floor having them as nearest neighbors"
+    assert segments[0].get_num_points() == len(floor) + len(strays), "The strays should be in the floor segment of the whole cloud"
+
 if __name__ == "__main__":
     pytest.main()
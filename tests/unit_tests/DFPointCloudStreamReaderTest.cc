@@ -0,0 +1,130 @@
+#include <gtest/gtest.h>
+#include "diffCheck.hh"
+
+#include <cstdint>
+#include <filesystem>
+#include <fstream>
+
+//-------------------------------------------------------------------------
+// fixtures
+//-------------------------------------------------------------------------
+
+class DFPointCloudStreamReaderTestFixture : public ::testing::Test {
+protected:
+    /// @brief Number of points of the written grid, a 100 x 10 grid on the XY plane with a spacing of 0.1,
+    /// shifted by half a spacing to keep the points away from the voxel boundaries
+    const int numPoints = 1000;
+    std::string binaryPath;
+    std::string asciiPath;
+
+    void SetUp() override {
+        std::filesystem::path tempDir = std::filesystem::temp_directory_path();
+        binaryPath = (tempDir / "df_stream_reader_test_binary.ply").string();
+        asciiPath = (tempDir / "df_stream_reader_test_ascii.ply").string();
+        WritePLY(binaryPath, false);
+        WritePLY(asciiPath, true);
+    }
+
+    void TearDown() override {
+        std::filesystem::remove(binaryPath);
+        std::filesystem::remove(asciiPath);
+    }
+
+    Eigen::Vector3d GetGridPoint(int i) const { return Eigen::Vector3d(0.05 + 0.1 * (i % 100), 0.05 + 0.1 * (i / 100), 0.0); }
+
+    /// @brief Write the grid with float points and normals and uchar colors, preceded by an unrelated element
+    void WritePLY(const std::string &path, bool isAscii) {
+        std::ofstream file(path, std::ios::binary);
+        file << "ply\n"
+             << "format " << (isAscii ? "ascii" : "binary_little_endian") << " 1.0\n"
+             << "comment written by the diffCheck tests\n"
+             << "element camera 1\n"
+             << "property float focal\n"
+             << "element vertex " << numPoints << "\n"
+             << "property float x\nproperty float y\nproperty float z\n"
+             << "property float nx\nproperty float ny\nproperty float nz\n"
+             << "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+             << "end_header\n";
+        float focal = 35.0f;
+        if (isAscii)
+            file << focal << "\n";
+        else
+            file.write(reinterpret_cast<const char*>(&focal), sizeof(float));
+        for (int i = 0; i < numPoints; i++)
+        {
+            Eigen::Vector3f point = GetGridPoint(i).cast<float>();
+            float values[6] = {point.x(), point.y(), point.z(), 0.0f, 0.0f, 1.0f};
+            std::uint8_t color[3] = {255, static_cast<std::uint8_t>(i % 256), 0};
+            if (isAscii)
+            {
+                for (float value : values)
+                    file << value << " ";
+                file << int(color[0]) << " " << int(color[1]) << " " << int(color[2]) << "\n";
+            }
+            else
+            {
+                file.write(reinterpret_cast<const char*>(values), sizeof(values));
+                file.write(reinterpret_cast<const char*>(color), sizeof(color));
+            }
+        }
+    }
+};
+
+//-------------------------------------------------------------------------
+// reading
+//-------------------------------------------------------------------------
+
+TEST_F(DFPointCloudStreamReaderTestFixture, ReadChunks) {
+    for (const std::string &path : {binaryPath, asciiPath})
+    {
+        diffCheck::geometry::DFPointCloudStreamReader reader(path, 300);
+        EXPECT_EQ(reader.GetNumPoints(), numPoints);
+        EXPECT_TRUE(reader.HasNormals());
+        EXPECT_TRUE(reader.HasColors());
+
+        std::vector<int> chunkSizes;
+        int pointIndex = 0;
+        while (reader.HasNext())
+        {
+            std::shared_ptr<diffCheck::geometry::DFPointCloud> chunk = reader.ReadChunk();
+            chunkSizes.push_back(chunk->GetNumPoints());
+            for (int i = 0; i < chunk->GetNumPoints(); i++, pointIndex++)
+            {
+                EXPECT_NEAR((chunk->Points[i] - GetGridPoint(pointIndex)).norm(), 0.0, 1e-5);
+                EXPECT_NEAR(chunk->Normals[i].z(), 1.0, 1e-9);
+                EXPECT_NEAR(chunk->Colors[i].x(), 1.0, 1e-9);
+                EXPECT_NEAR(chunk->Colors[i].y(), (pointIndex % 256) / 255.0, 1e-9);
+            }
+        }
+        EXPECT_EQ(chunkSizes, std::vector<int>({300, 300, 300, 100}));
+
+        // the whole file matches the open3d reader
+        reader.Reset();
+        std::shared_ptr<diffCheck::geometry::DFPointCloud> cloud = reader.ReadAll();
+        std::shared_ptr<diffCheck::geometry::DFPointCloud> o3dCloud = diffCheck::io::ReadPLYPointCloud(path);
+        ASSERT_EQ(cloud->GetNumPoints(), o3dCloud->GetNumPoints());
+        for (int i = 0; i < cloud->GetNumPoints(); i++)
+        {
+            EXPECT_NEAR((cloud->Points[i] - o3dCloud->Points[i]).norm(), 0.0, 1e-9);
+            EXPECT_NEAR((cloud->Colors[i] - o3dCloud->Colors[i]).norm(), 0.0, 1e-9);
+        }
+    }
+}
+
+TEST_F(DFPointCloudStreamReaderTestFixture, FiltersOnTheFly) {
+    // the crop box keeps the first 5 rows
+    diffCheck::geometry::DFPointCloudStreamReader reader(binaryPath, 256);
+    reader.SetCropBox(Eigen::Vector3d(-1, -1, -1), Eigen::Vector3d(100, 0.5, 1));
+    EXPECT_EQ(reader.ReadAll()->GetNumPoints(), 500);
+
+    // the voxels of 0.2 merge 2 x 2 points of the grid over the whole file, even across the chunks
+    reader.Reset();
+    reader.SetVoxelSize(0.2);
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> cloud = reader.ReadAll();
+    EXPECT_EQ(cloud->GetNumPoints(), 50 * 3);
+    EXPECT_EQ(cloud->GetNumNormals(), cloud->GetNumPoints());
+    EXPECT_EQ(cloud->GetNumColors(), cloud->GetNumPoints());
+
+    EXPECT_THROW(diffCheck::geometry::DFPointCloudStreamReader("not_a_file.ply"), std::invalid_argument);
+    EXPECT_THROW(reader.SetVoxelSize(-1.0), std::invalid_argument);
+}
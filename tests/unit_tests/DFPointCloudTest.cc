@@ -2,6 +2,10 @@
 #include "diffCheck.hh"
 #include "diffCheck/IOManager.hh"
 
+#include <filesystem>
+#include <fstream>
+#include <thread>
+
 //-------------------------------------------------------------------------
 // fixtures
 //-------------------------------------------------------------------------
@@ -59,6 +63,78 @@ TEST_F(DFPointCloudTestFixture, LoadFromPLY) {
     EXPECT_EQ(dfPointCloud.GetNumNormals(), 7379);
 }
 
+TEST_F(DFPointCloudTestFixture, SaveToPLY) {
+    std::string path = (std::filesystem::temp_directory_path() / "df_save_test.ply").string();
+    std::vector<double> distances(dfPointCloud.GetNumPoints());
+    std::vector<int> clusters(dfPointCloud.GetNumPoints());
+    for (int i = 0; i < dfPointCloud.GetNumPoints(); i++)
+    {
+        distances[i] = 0.001 * i;
+        clusters[i] = i % 7;
+    }
+    dfPointCloud.SaveToPLY(path, {{"distance", distances}}, {{"cluster", clusters}}, true);
+
+    // the scalar fields are ignored by the readers
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> savedCloud = diffCheck::io::ReadPLYPointCloud(path);
+    ASSERT_EQ(savedCloud->GetNumPoints(), 7379);
+    EXPECT_EQ(savedCloud->Points, dfPointCloud.Points);
+    EXPECT_EQ(savedCloud->Normals, dfPointCloud.Normals);
+    for (int i = 0; i < savedCloud->GetNumPoints(); i++)
+        EXPECT_NEAR((savedCloud->Colors[i] - dfPointCloud.Colors[i]).norm(), 0.0, 0.5 / 255.0 * std::sqrt(3.0));
+    diffCheck::geometry::DFPointCloudStreamReader reader(path);
+    EXPECT_EQ(reader.GetNumPoints(), 7379);
+    EXPECT_TRUE(reader.HasNormals());
+
+    EXPECT_THROW(dfPointCloud.SaveToPLY(path, {{"distance", std::vector<double>(3)}}), std::invalid_argument);
+    EXPECT_THROW(dfPointCloud.SaveToPLY(path, {{"x", distances}}), std::invalid_argument);
+    std::filesystem::remove(path);
+}
+
+TEST_F(DFPointCloudTestFixture, Cache) {
+    std::filesystem::path tempDir = std::filesystem::temp_directory_path();
+    std::string sourcePath = (tempDir / "df_cache_test.ply").string();
+    std::string cachePath = (tempDir / "df_cache_test.dfcache").string();
+    std::filesystem::copy_file(diffCheck::io::GetRoofQuarterPlyPath(), sourcePath, std::filesystem::copy_options::overwrite_existing);
+    std::filesystem::remove(cachePath);
+
+    // the first load parses the PLY and writes the cache, the second one reads it back with the graph
+    diffCheck::geometry::DFPointCloud cloud;
+    EXPECT_FALSE(cloud.LoadFromPLYCached(sourcePath));
+    cloud.GetNeighborhoodGraph(20);
+    cloud.SaveCache(cachePath, sourcePath);
+    diffCheck::geometry::DFPointCloud cachedCloud;
+    EXPECT_TRUE(cachedCloud.LoadFromPLYCached(sourcePath));
+    ASSERT_EQ(cachedCloud.GetNumPoints(), 7379);
+    EXPECT_EQ(cachedCloud.Points, cloud.Points);
+    EXPECT_EQ(cachedCloud.Normals, cloud.Normals);
+    EXPECT_EQ(cachedCloud.Colors, cloud.Colors);
+    EXPECT_EQ(cachedCloud.GetNeighborhoodGraph(20)->Indices, cloud.GetNeighborhoodGraph(20)->Indices);
+
+    // float32 blocks
+    cloud.SaveCache(cachePath, sourcePath, false);
+    EXPECT_TRUE(cachedCloud.LoadCache(cachePath, sourcePath));
+    for (int i = 0; i < cloud.GetNumPoints(); i++)
+        EXPECT_NEAR((cachedCloud.Points[i] - cloud.Points[i]).norm(), 0.0, 1e-4);
+
+    // the cache is out of date once the source changes
+    std::ofstream(sourcePath, std::ios::app) << "\n";
+    EXPECT_FALSE(cachedCloud.LoadCache(cachePath, sourcePath));
+    EXPECT_TRUE(cachedCloud.LoadCache(cachePath));
+    EXPECT_FALSE(cachedCloud.LoadCache(sourcePath));
+
+    // a graph index out of the cloud is rejected even if the size of the file is right
+    {
+        std::fstream stream(cachePath, std::ios::binary | std::ios::in | std::ios::out);
+        stream.seekp(-static_cast<std::streamoff>(sizeof(int)), std::ios::end);
+        int outOfRangeIndex = cloud.GetNumPoints();
+        stream.write(reinterpret_cast<const char*>(&outOfRangeIndex), sizeof(int));
+    }
+    EXPECT_FALSE(cachedCloud.LoadCache(cachePath));
+
+    std::filesystem::remove(sourcePath);
+    std::filesystem::remove(cachePath);
+}
+
 //-------------------------------------------------------------------------
 // properties
 //-------------------------------------------------------------------------
@@ -109,6 +185,22 @@ TEST_F(DFPointCloudTestFixture, ConvertionCilantroPointCloud) {
     EXPECT_EQ(dfPointCloud.GetNumPoints(), dfPointCloud2->GetNumPoints());
     EXPECT_EQ(dfPointCloud.GetNumColors(), dfPointCloud2->GetNumColors());
     EXPECT_EQ(dfPointCloud.GetNumNormals(), dfPointCloud2->GetNumNormals());
+    for (int i = 0; i < dfPointCloud.GetNumPoints(); i++) {
+        EXPECT_TRUE(dfPointCloud.Points[i].isApprox(dfPointCloud2->Points[i], 1e-6));
+        EXPECT_TRUE(dfPointCloud.Normals[i].isApprox(dfPointCloud2->Normals[i], 1e-6));
+    }
+}
+
+TEST_F(DFPointCloudTestFixture, MoveO3dPointCloud) {
+    std::shared_ptr<open3d::geometry::PointCloud> o3dPointCloud = dfPointCloud.MoveToO3DPointCloud();
+    EXPECT_EQ(dfPointCloud.GetNumPoints(), 0);
+    EXPECT_EQ(o3dPointCloud->points_.size(), 7379);
+
+    dfPointCloud.MoveFromO3DPointCloud(*o3dPointCloud);
+    EXPECT_EQ(o3dPointCloud->points_.size(), 0);
+    EXPECT_EQ(dfPointCloud.GetNumPoints(), 7379);
+    EXPECT_EQ(dfPointCloud.GetNumColors(), 7379);
+    EXPECT_EQ(dfPointCloud.GetNumNormals(), 7379);
 }
 
 //-------------------------------------------------------------------------
@@ -122,6 +214,56 @@ TEST_F(DFPointCloudTestFixture, ComputeDistance) {
     EXPECT_EQ(distances.size(), 7379);
 }
 
+TEST_F(DFPointCloudTestFixture, SpatialIndex) {
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> dfPointCloud2 = std::make_shared<diffCheck::geometry::DFPointCloud>();
+    dfPointCloud2->LoadFromPLY(diffCheck::io::GetRoofQuarterPlyPath());
+    Eigen::Matrix4d matrix = Eigen::Matrix4d::Identity();
+    matrix.block<3, 1>(0, 3) = Eigen::Vector3d(0.01, 0.02, 0.03);
+    dfPointCloud2->ApplyTransformation(diffCheck::transformation::DFTransformation(matrix));
+    EXPECT_FALSE(dfPointCloud2->HasIndex());
+
+    // the distances match the open3d ones and the index of the target is kept
+    std::vector<double> distances = dfPointCloud.ComputeDistance(dfPointCloud2);
+    std::vector<double> o3dDistances = dfPointCloud.Cvt2O3DPointCloud()->ComputePointCloudDistance(*dfPointCloud2->Cvt2O3DPointCloud());
+    ASSERT_EQ(distances.size(), o3dDistances.size());
+    for (int i = 0; i < distances.size(); i++)
+        EXPECT_NEAR(distances[i], o3dDistances[i], 1e-9);
+    EXPECT_TRUE(dfPointCloud2->HasIndex());
+
+    // the index is invalidated by the operations changing the points
+    dfPointCloud2->ApplyTransformation(diffCheck::transformation::DFTransformation(matrix.inverse()));
+    EXPECT_FALSE(dfPointCloud2->HasIndex());
+    std::vector<int> indices;
+    std::tie(indices, distances) = dfPointCloud2->QueryNearest(dfPointCloud.Points);
+    for (int i = 0; i < distances.size(); i++)
+        EXPECT_NEAR(distances[i], 0.0, 1e-9);
+
+    // the points edited in place, without reallocation, are detected by the next query
+    EXPECT_TRUE(dfPointCloud2->HasIndex());
+    const Eigen::Vector3d *pointsData = dfPointCloud2->Points.data();
+    for (Eigen::Vector3d &point : dfPointCloud2->Points)
+        point += Eigen::Vector3d(0.0, 0.0, 1.0);
+    ASSERT_EQ(dfPointCloud2->Points.data(), pointsData);
+    EXPECT_FALSE(dfPointCloud2->HasIndex());
+    std::tie(indices, distances) = dfPointCloud2->QueryNearest(dfPointCloud.Points);
+    for (int i = 0; i < distances.size(); i++)
+        EXPECT_NEAR(distances[i], 1.0, 1e-9);
+}
+
+TEST_F(DFPointCloudTestFixture, ConcurrentIndexBuild) {
+    // the threads querying a cloud without index all get the same tree and the same results
+    std::vector<Eigen::Vector3d> queryPoints(dfPointCloud.Points.begin(), dfPointCloud.Points.begin() + 100);
+    std::vector<std::vector<int>> indices(8);
+    std::vector<std::thread> threads;
+    for (int t = 0; t < 8; t++)
+        threads.emplace_back([&, t]() { indices[t] = std::get<0>(dfPointCloud.QueryKNN(queryPoints, 5)); });
+    for (std::thread &thread : threads)
+        thread.join();
+    EXPECT_TRUE(dfPointCloud.HasIndex());
+    for (int t = 1; t < 8; t++)
+        EXPECT_EQ(indices[t], indices[0]);
+}
+
 TEST_F(DFPointCloudTestFixture, AddPoints) {
     std::shared_ptr<diffCheck::geometry::DFPointCloud> dfPointCloud2 = std::make_shared<diffCheck::geometry::DFPointCloud>();
     dfPointCloud2->LoadFromPLY(diffCheck::io::GetRoofQuarterPlyPath());
@@ -147,6 +289,40 @@ TEST_F(DFPointCloudTestFixture, EstimateNormals) {
     dfPointCloud.EstimateNormals(false, 50, 0.1);
 }
 
+TEST_F(DFPointCloudTestFixture, NeighborhoodGraph) {
+    // the native normals match the open3d ones up to their orientation
+    std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud = dfPointCloud.Cvt2O3DPointCloud();
+    O3DPointCloud->normals_.clear();
+    O3DPointCloud->EstimateNormals(open3d::geometry::KDTreeSearchParamKNN(50));
+    dfPointCloud.EstimateNormals(false, 50, std::nullopt, 2);
+    ASSERT_EQ(dfPointCloud.GetNumNormals(), 7379);
+    for (int i = 0; i < dfPointCloud.GetNumNormals(); i++)
+        EXPECT_NEAR(std::abs(dfPointCloud.Normals[i].dot(O3DPointCloud->normals_[i])), 1.0, 1e-6);
+
+    // the graph is kept for the same neighborhood and dropped with the index
+    std::shared_ptr<const diffCheck::geometry::DFNeighborhoodGraph> graph = dfPointCloud.GetNeighborhoodGraph(50);
+    EXPECT_EQ(graph->GetNumPoints(), 7379);
+    EXPECT_EQ(graph->Indices.size(), 7379 * 50);
+    EXPECT_EQ(dfPointCloud.GetNeighborhoodGraph(50), graph);
+    EXPECT_NE(dfPointCloud.GetNeighborhoodGraph(20), graph);
+    dfPointCloud.InvalidateIndex();
+    EXPECT_NE(dfPointCloud.GetNeighborhoodGraph(20), graph);
+    EXPECT_THROW(dfPointCloud.GetNeighborhoodGraph(std::nullopt), std::invalid_argument);
+
+    // a flat grid has no curvature and its normals are oriented upwards
+    diffCheck::geometry::DFPointCloud grid;
+    for (int x = 0; x < 20; x++)
+        for (int y = 0; y < 20; y++)
+            grid.Points.push_back(Eigen::Vector3d(x, y, 0));
+    grid.EstimateNormals(false, 8);
+    for (double curvature : grid.ComputeCurvatures(8))
+        EXPECT_NEAR(curvature, 0.0, 1e-9);
+    grid.Normals[0] = -grid.Normals[0];
+    grid.OrientNormalsConsistently(8);
+    for (const Eigen::Vector3d &normal : grid.Normals)
+        EXPECT_NEAR(normal.z(), 1.0, 1e-9);
+}
+
 TEST_F(DFPointCloudTestFixture, ApplyColor) {
     dfPointCloud.ApplyColor(Eigen::Vector3d(1.0, 0.0, 0.0));
     for (int i = 0; i < dfPointCloud.GetNumColors(); i++) {
@@ -207,6 +383,25 @@ TEST_F(DFPointCloudTestFixture, Transform) {
     }
 }
 
+TEST_F(DFPointCloudTestFixture, TransformNormals) {
+    // 90 degree rotation around z and translation, compared with open3d
+    Eigen::Matrix4d transformationMatrix = Eigen::Matrix4d::Identity();
+    transformationMatrix.block<3, 3>(0, 0) = Eigen::AngleAxisd(EIGEN_PI / 2, Eigen::Vector3d::UnitZ()).toRotationMatrix();
+    transformationMatrix.block<3, 1>(0, 3) = Eigen::Vector3d(1, 2, 3);
+    dfPointCloud.EstimateNormals(false, 30);
+    std::shared_ptr<open3d::geometry::PointCloud> O3DPointCloud = dfPointCloud.Cvt2O3DPointCloud();
+    O3DPointCloud->Transform(transformationMatrix);
+
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> dfPointCloud2 = std::make_shared<diffCheck::geometry::DFPointCloud>(dfPointCloud);
+    diffCheck::geometry::DFPointCloud::ApplyTransformationBatch({dfPointCloud2}, {diffCheck::transformation::DFTransformation(transformationMatrix)});
+    ASSERT_EQ(dfPointCloud2->GetNumNormals(), dfPointCloud.GetNumPoints());
+    for (int i = 0; i < dfPointCloud2->GetNumPoints(); i++)
+    {
+        EXPECT_TRUE(dfPointCloud2->Points[i].isApprox(O3DPointCloud->points_[i], 1e-12));
+        EXPECT_TRUE(dfPointCloud2->Normals[i].isApprox(O3DPointCloud->normals_[i], 1e-12));
+    }
+}
+
 //-------------------------------------------------------------------------
 // Others
 //-------------------------------------------------------------------------
\ No newline at end of file
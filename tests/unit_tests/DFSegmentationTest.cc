@@ -0,0 +1,310 @@
+#include <gtest/gtest.h>
+#include "diffCheck.hh"
+
+#include <algorithm>
+#include <array>
+#include <map>
+#include <random>
+
+//-------------------------------------------------------------------------
+// fixtures
+//-------------------------------------------------------------------------
+
+class DFSegmentationTestFixture : public ::testing::Test {
+protected:
+    std::shared_ptr<diffCheck::geometry::DFMesh> face;
+    std::shared_ptr<diffCheck::geometry::DFPointCloud> cluster;
+    int numPointsOnFace = 0;
+
+    /// @brief a unit square face on the XY plane and a cluster spanning the face and beyond it along X
+    void SetUp() override {
+        face = std::make_shared<diffCheck::geometry::DFMesh>(
+            std::vector<Eigen::Vector3d>{
+                Eigen::Vector3d(0, 0, 0), Eigen::Vector3d(1, 0, 0),
+                Eigen::Vector3d(1, 1, 0), Eigen::Vector3d(0, 1, 0)},
+            std::vector<Eigen::Vector3i>{Eigen::Vector3i(0, 1, 2), Eigen::Vector3i(0, 2, 3)},
+            std::vector<Eigen::Vector3d>(),
+            std::vector<Eigen::Vector3d>(),
+            std::vector<Eigen::Vector3d>());
+
+        // the color encodes the point so that we can check that the attributes follow their point
+        cluster = std::make_shared<diffCheck::geometry::DFPointCloud>();
+        for (int i = 0; i < 20; ++i)
+        {
+            for (int j = 0; j < 10; ++j)
+            {
+                Eigen::Vector3d point(0.05 + 0.06 * i, 0.05 + 0.1 * j, 0.0);
+                cluster->Points.push_back(point);
+                cluster->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+                cluster->Colors.push_back(Eigen::Vector3d(point.x(), point.y(), 0.0));
+                if (point.x() < 1.0)
+                    numPointsOnFace++;
+            }
+        }
+    }
+};
+
+/**
+ * @brief The association of a cluster to a face before the membership masks, kept as the reference of the tests:
+ * the attributes are looked up by value and only the points are removed from the cluster
+ */
+diffCheck::geometry::DFPointCloud LegacyAssociatePointsToFace(
+    diffCheck::geometry::DFMesh &face,
+    diffCheck::geometry::DFPointCloud &cluster,
+    double associationThreshold)
+{
+    diffCheck::geometry::DFPointCloud facePoints;
+    for (Eigen::Vector3d point : cluster.Points)
+    {
+        if (!face.IsPointOnFace(point, associationThreshold))
+            continue;
+        auto index = std::distance(cluster.Points.begin(), std::find(cluster.Points.begin(), cluster.Points.end(), point));
+        facePoints.Points.push_back(point);
+        facePoints.Normals.push_back(cluster.Normals[index]);
+        facePoints.Colors.push_back(cluster.Colors[index]);
+    }
+    for (Eigen::Vector3d point : facePoints.Points)
+        cluster.Points.erase(std::remove(cluster.Points.begin(), cluster.Points.end(), point), cluster.Points.end());
+    return facePoints;
+}
+
+//-------------------------------------------------------------------------
+// association
+//-------------------------------------------------------------------------
+
+TEST_F(DFSegmentationTestFixture, AssociationMatchesValueLookup) {
+    // duplicated points with their own normal and color, the value lookup gives them the ones of their first copy
+    for (int i : {0, 1, 2})
+    {
+        cluster->Points.push_back(cluster->Points[i]);
+        cluster->Normals.push_back(Eigen::Vector3d(0, 0, -1));
+        cluster->Colors.push_back(Eigen::Vector3d(1, 1, 1));
+    }
+    int numPoints = cluster->GetNumPoints();
+    diffCheck::geometry::DFPointCloud legacyCluster = *cluster;
+    diffCheck::geometry::DFPointCloud legacyFacePoints = LegacyAssociatePointsToFace(*face, legacyCluster, 0.1);
+
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> clusters = {cluster};
+    auto faceSegments = diffCheck::segmentation::DFSegmentation::AssociateClustersToMeshes(
+        false, {face}, clusters, 0.1, 0.1);
+    ASSERT_EQ(faceSegments.size(), 1);
+    auto faceSegment = faceSegments[0];
+
+    // the points, and their order, are the same as with the value lookup
+    EXPECT_EQ(faceSegment->Points, legacyFacePoints.Points);
+    EXPECT_EQ(cluster->Points, legacyCluster.Points);
+
+    // the duplicates keep their own attributes, the other points get the same ones
+    int numDuplicates = 0;
+    for (int i = 0; i < faceSegment->GetNumPoints(); ++i)
+    {
+        if (faceSegment->Colors[i] == Eigen::Vector3d(1, 1, 1))
+        {
+            EXPECT_EQ(faceSegment->Normals[i], Eigen::Vector3d(0, 0, -1));
+            EXPECT_EQ(legacyFacePoints.Normals[i], Eigen::Vector3d(0, 0, 1));
+            numDuplicates++;
+            continue;
+        }
+        EXPECT_EQ(faceSegment->Normals[i], legacyFacePoints.Normals[i]);
+        EXPECT_EQ(faceSegment->Colors[i], legacyFacePoints.Colors[i]);
+    }
+    EXPECT_EQ(numDuplicates, 3);
+
+    // the value lookup left the attributes of the removed points in the cluster, they are now removed with them
+    EXPECT_EQ(legacyCluster.GetNumNormals(), numPoints);
+    EXPECT_EQ(cluster->GetNumNormals(), cluster->GetNumPoints());
+}
+
+TEST_F(DFSegmentationTestFixture, AssociateClustersToMeshes) {
+    int numPoints = cluster->GetNumPoints();
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> clusters = {cluster};
+    auto faceSegments = diffCheck::segmentation::DFSegmentation::AssociateClustersToMeshes(
+        false, {face}, clusters, 0.1, 0.1);
+
+    ASSERT_EQ(faceSegments.size(), 1);
+    auto faceSegment = faceSegments[0];
+    EXPECT_EQ(faceSegment->GetNumPoints(), numPointsOnFace);
+    EXPECT_EQ(faceSegment->GetNumNormals(), numPointsOnFace);
+    EXPECT_EQ(faceSegment->GetNumColors(), numPointsOnFace);
+    for (int i = 0; i < faceSegment->GetNumPoints(); ++i)
+    {
+        EXPECT_LT(faceSegment->Points[i].x(), 1.0);
+        EXPECT_TRUE(faceSegment->Colors[i].head<2>().isApprox(faceSegment->Points[i].head<2>()));
+    }
+
+    // the associated points are removed from the cluster, its attributes stay aligned
+    EXPECT_EQ(cluster->GetNumPoints(), numPoints - numPointsOnFace);
+    EXPECT_EQ(cluster->GetNumNormals(), cluster->GetNumPoints());
+    EXPECT_EQ(cluster->GetNumColors(), cluster->GetNumPoints());
+    for (int i = 0; i < cluster->GetNumPoints(); ++i)
+    {
+        EXPECT_GT(cluster->Points[i].x(), 1.0);
+        EXPECT_TRUE(cluster->Colors[i].head<2>().isApprox(cluster->Points[i].head<2>()));
+    }
+}
+
+TEST_F(DFSegmentationTestFixture, CleanUnassociatedClusters) {
+    int numPoints = cluster->GetNumPoints();
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> unassociatedClusters = {cluster};
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> existingSegments = {
+        std::make_shared<diffCheck::geometry::DFPointCloud>()};
+    diffCheck::segmentation::DFSegmentation::CleanUnassociatedClusters(
+        false, unassociatedClusters, existingSegments, {{face}}, 0.1, 0.1);
+
+    auto completedSegment = existingSegments[0];
+    EXPECT_EQ(completedSegment->GetNumPoints(), numPointsOnFace);
+    EXPECT_EQ(completedSegment->GetNumColors(), numPointsOnFace);
+    EXPECT_EQ(cluster->GetNumPoints(), numPoints - numPointsOnFace);
+    EXPECT_EQ(cluster->GetNumNormals(), cluster->GetNumPoints());
+    for (int i = 0; i < cluster->GetNumPoints(); ++i)
+        EXPECT_TRUE(cluster->Colors[i].head<2>().isApprox(cluster->Points[i].head<2>()));
+}
+
+TEST_F(DFSegmentationTestFixture, CleanUnassociatedClustersMismatchedAttributes) {
+    // the existing segment has normals but no colors: the colors of the cluster cannot be kept aligned with its points
+    auto existingSegment = std::make_shared<diffCheck::geometry::DFPointCloud>();
+    existingSegment->Points.push_back(Eigen::Vector3d(0.5, 0.5, 0.0));
+    existingSegment->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> unassociatedClusters = {cluster};
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> existingSegments = {existingSegment};
+    diffCheck::segmentation::DFSegmentation::CleanUnassociatedClusters(
+        false, unassociatedClusters, existingSegments, {{face}}, 0.1, 0.1);
+
+    EXPECT_EQ(existingSegment->GetNumPoints(), numPointsOnFace + 1);
+    EXPECT_EQ(existingSegment->GetNumNormals(), existingSegment->GetNumPoints());
+    EXPECT_EQ(existingSegment->GetNumColors(), 0);
+}
+
+//-------------------------------------------------------------------------
+// tiled segmentation
+//-------------------------------------------------------------------------
+
+TEST_F(DFSegmentationTestFixture, TiledNormalBasedSegmentation) {
+    // a floor and a wall meeting along y = 2, both spanning several tiles
+    auto pointCloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+    for (int i = 1; i < 40; ++i)
+    {
+        for (int j = 1; j < 40; ++j)
+        {
+            pointCloud->Points.push_back(Eigen::Vector3d(0.05 * i, 0.05 * j, 0.0));
+            pointCloud->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+        }
+    }
+    int numFloorPoints = pointCloud->GetNumPoints();
+    for (int i = 1; i < 40; ++i)
+    {
+        for (int j = 1; j < 20; ++j)
+        {
+            pointCloud->Points.push_back(Eigen::Vector3d(0.05 * i, 2.0, 0.05 * j));
+            pointCloud->Normals.push_back(Eigen::Vector3d(0, 1, 0));
+        }
+    }
+
+    std::vector<int> labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+        pointCloud, 0.5, 5.f, 100, false, 10, 0.08f, 0.0, 2);
+
+    ASSERT_EQ(labels.size(), pointCloud->GetNumPoints());
+    for (int i = 0; i < pointCloud->GetNumPoints(); ++i)
+        EXPECT_EQ(labels[i], i < numFloorPoints ? 0 : 1);
+
+    // the segments discarded by their size are labelled -1
+    labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+        pointCloud, 0.5, 5.f, numFloorPoints, false, 10, 0.08f, 0.0, 2);
+    for (int i = 0; i < pointCloud->GetNumPoints(); ++i)
+        EXPECT_EQ(labels[i], i < numFloorPoints ? 0 : -1);
+
+    EXPECT_THROW(diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(pointCloud, 0.0), std::invalid_argument);
+    EXPECT_THROW(diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+        pointCloud, 0.5, 5.f, 100, false, 10, 0.08f, 0.5), std::invalid_argument);
+}
+
+TEST_F(DFSegmentationTestFixture, TiledNormalBasedSegmentationKnn) {
+    // a floor and a wall jittered in their planes, so that the k nearest neighbors are not tied
+    std::mt19937 generator(42);
+    std::uniform_real_distribution<double> jitter(-0.01, 0.01);
+    auto pointCloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+    for (int i = 1; i < 40; ++i)
+    {
+        for (int j = 1; j < 40; ++j)
+        {
+            pointCloud->Points.push_back(Eigen::Vector3d(0.05 * i + jitter(generator), 0.05 * j + jitter(generator), 0.0));
+            pointCloud->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+        }
+    }
+    for (int i = 1; i < 40; ++i)
+    {
+        for (int j = 1; j < 20; ++j)
+        {
+            pointCloud->Points.push_back(Eigen::Vector3d(0.05 * i + jitter(generator), 2.0, 0.05 * j + jitter(generator)));
+            pointCloud->Normals.push_back(Eigen::Vector3d(0, 1, 0));
+        }
+    }
+    std::map<std::array<double, 3>, int> pointIndices;
+    for (int i = 0; i < pointCloud->GetNumPoints(); ++i)
+        pointIndices[{pointCloud->Points[i].x(), pointCloud->Points[i].y(), pointCloud->Points[i].z()}] = i;
+
+    // the tile overlap is derived from the extent of the k nearest neighbors
+    std::vector<int> labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+        pointCloud, 0.5, 5.f, 100, true, 10, 10.f, 0.0, 2);
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> segments =
+        diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation(pointCloud, 5.f, 100, true, 10);
+
+    ASSERT_EQ(labels.size(), pointCloud->GetNumPoints());
+    ASSERT_EQ(segments.size(), 2);
+    EXPECT_EQ(*std::max_element(labels.begin(), labels.end()), 1);
+    for (int label = 0; label < static_cast<int>(segments.size()); ++label)
+    {
+        EXPECT_EQ(std::count(labels.begin(), labels.end(), label), segments[label]->GetNumPoints());
+        for (const Eigen::Vector3d &point : segments[label]->Points)
+            EXPECT_EQ(labels[pointIndices.at({point.x(), point.y(), point.z()})], label);
+    }
+}
+
+TEST_F(DFSegmentationTestFixture, NormalBasedSegmentationAsymmetricKnn) {
+    // a floor and a few stray points beyond its edge, appended last: the strays have floor points as nearest
+    // neighbors while no floor point has a stray among its nearest neighbors
+    std::mt19937 generator(42);
+    std::uniform_real_distribution<double> jitter(-0.01, 0.01);
+    auto pointCloud = std::make_shared<diffCheck::geometry::DFPointCloud>();
+    for (int i = 1; i < 40; ++i)
+    {
+        for (int j = 1; j < 40; ++j)
+        {
+            pointCloud->Points.push_back(Eigen::Vector3d(0.05 * i + jitter(generator), 0.05 * j + jitter(generator), 0.0));
+            pointCloud->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+        }
+    }
+    int numFloorPoints = pointCloud->GetNumPoints();
+    for (double y : {0.5, 1.0, 1.5})
+    {
+        pointCloud->Points.push_back(Eigen::Vector3d(2.3, y, 0.0));
+        pointCloud->Normals.push_back(Eigen::Vector3d(0, 0, 1));
+    }
+
+    std::shared_ptr<const diffCheck::geometry::DFNeighborhoodGraph> graph = pointCloud->GetNeighborhoodGraph(10);
+    for (int i = 0; i < numFloorPoints; ++i)
+        for (int j = graph->Offsets[i]; j < graph->Offsets[i + 1]; ++j)
+            ASSERT_LT(graph->Indices[j], numFloorPoints);
+    for (int i = numFloorPoints; i < pointCloud->GetNumPoints(); ++i)
+        for (int j = graph->Offsets[i]; j < graph->Offsets[i + 1]; ++j)
+            ASSERT_TRUE(graph->Indices[j] == i || graph->Indices[j] < numFloorPoints);
+
+    // the strays are linked to the floor even though the floor is reached first
+    std::vector<std::shared_ptr<diffCheck::geometry::DFPointCloud>> segments =
+        diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation(pointCloud, 5.f, 1, true, 10);
+    ASSERT_EQ(segments.size(), 1);
+    EXPECT_EQ(segments[0]->GetNumPoints(), pointCloud->GetNumPoints());
+
+    std::vector<int> labels = diffCheck::segmentation::DFSegmentation::TiledNormalBasedSegmentation(
+        pointCloud, 0.5, 5.f, 1, true, 10, 10.f, 0.4, 2);
+    ASSERT_EQ(labels.size(), pointCloud->GetNumPoints());
+    for (int label : labels)
+        EXPECT_EQ(label, 0);
+
+    // the segments do not depend on the order of the points
+    std::reverse(pointCloud->Points.begin(), pointCloud->Points.end());
+    std::reverse(pointCloud->Normals.begin(), pointCloud->Normals.end());
+    segments = diffCheck::segmentation::DFSegmentation::NormalBasedSegmentation(pointCloud, 5.f, 1, true, 10);
+    ASSERT_EQ(segments.size(), 1);
+    EXPECT_EQ(segments[0]->GetNumPoints(), pointCloud->GetNumPoints());
+}